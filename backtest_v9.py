@@ -0,0 +1,841 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+v9 选股策略向量化历史回测 v1.0
+
+问题背景：
+analyze_previous_selection 只能用实时接口逐只检查最近一个批次，
+想知道"过去一年每天按v9逻辑选股，各评级的真实胜率是多少"根本做不到。
+
+回测原理：
+1. 数据来源：日K线来自本地 BarStore（宽表：日期 × 代码），D日盘中行情优先读取
+   market_archive 的时点快照；没有快照的日期用当日K线还原
+   （量比 = 当日成交量 / 前5日均量，流通市值 = 成交额 / 换手率）
+   使用快照时，历史窗口由D-1日及之前的K线加上快照拼成的D日部分K线组成（时点回放，不读取D日收盘数据）
+2. 横截面计算：每个交易日把全市场股票作为一个向量，一次性算出第1~11步的全部因子，
+   不再逐只调用接口
+3. 评分口径：游资/综合评分只对通过全部"与参数无关"过滤条件的候选股计算，
+   直接复用 StockScreener 的评分函数，保证和实盘一致
+4. 前瞻收益：以D日入选价（快照最新价，即盘中实际买入价；日K还原时为收盘价）为基准，
+   计算次日/3日/5日收益，按评级统计胜率和收益分布
+
+与实盘的口径差异：
+- 资金流向只有归档过的日期才有，缺失时按"无法获取"处理（与实盘一致：默认中性保留）
+- 第十步主题加分依赖板块接口，回测不计算；板块龙头按全市场涨幅/成交额排名计算
+- 历史窗口按交易日对齐，停牌股与实盘"最近N根K线"的口径略有差异
+- ST判断使用K线库同步时的股票名称
+
+使用方法：
+    python market_archive.py bars 20230101        # 先同步日K线库
+    python backtest_v9.py 20250101 20251231        # 回测指定区间
+    python backtest_v9.py 20250101 20251231 1430   # 指定盘中快照时刻（默认14:30）
+"""
+
+import pandas as pd
+import numpy as np
+from datetime import datetime, timedelta
+import warnings
+import json
+import sys
+import time
+from pathlib import Path
+from market_archive import SnapshotArchiver, BarStore
+from frame_schema import panel_dtype, compact_spot
+from trade_calendar import TradeCalendar
+from scan_stock_v9 import StockScreener, SCREEN_PARAMS, HOT_MONEY_CONFIG
+warnings.filterwarnings('ignore')
+
+# ============================================================
+# 回测配置
+# ============================================================
+BACKTEST_DIR = Path(__file__).parent / "backtest_results"  # 回测结果保存目录
+
+BACKTEST_CONFIG = {
+    "snapshot_time": "143000",  # 回放的盘中时刻（使用该时刻之前最近一次归档快照）
+    "forward_days": [1, 3, 5],  # 前瞻收益天数
+    "warmup_days": 400,  # 预热自然日（覆盖250日价格位置窗口）
+    "forward_buffer_days": 15,  # 区间结束后多加载的自然日（计算前瞻收益）
+}
+
+FUND_FLOW_COLUMNS = {
+    'super_large': '今日超大单净流入-净额',
+    'large': '今日大单净流入-净额',
+    'medium': '今日中单净流入-净额',
+    'small': '今日小单净流入-净额',
+    'super_large_pct': '今日超大单净流入-净占比',
+    'large_pct': '今日大单净流入-净占比',
+}
+
+
+def forward_label(n):
+    """前瞻收益列名"""
+    return "次日收益" if n == 1 else f"{n}日收益"
+
+
+def _tail(values, n):
+    """取最近n行（不足n行时取全部）"""
+    return values[-n:]
+
+
+def _valid_count(values, n):
+    """最近n行中每列的有效值个数"""
+    return (~np.isnan(_tail(values, n))).sum(axis=0)
+
+
+def _tail_mean(values, n):
+    """最近n行均值，有效值不足n个时为NaN（与rolling(n).mean()口径一致）"""
+    tail = _tail(values, n)
+    with np.errstate(all='ignore'):
+        mean = np.nanmean(tail, axis=0)
+    return np.where(_valid_count(values, n) >= n, mean, np.nan)
+
+
+def _tail_max(values, n):
+    with np.errstate(all='ignore'):
+        return np.nanmax(_tail(values, n), axis=0)
+
+
+def _tail_min(values, n):
+    with np.errstate(all='ignore'):
+        return np.nanmin(_tail(values, n), axis=0)
+
+
+def _pct_change(current, previous):
+    """涨跌幅(%)，分母无效时为NaN"""
+    with np.errstate(all='ignore'):
+        return np.where(previous > 0, (current / previous - 1) * 100, np.nan)
+
+
+class BacktestEngine:
+    """
+    v9 选股策略向量化回测引擎
+
+    build_features(日期) 返回当日所有候选股的完整因子表（已通过第1.5/5/6/7/8/9步等
+    与参数无关的过滤条件），apply_screen(因子表, 参数) 再套用第1~4步和第十一步的阈值，
+    同一份因子表可以反复套用不同参数。
+    """
+
+    def __init__(self, start_date, end_date, params=None, snapshot_time=None, bar_store=None, archiver=None):
+        self.start_date = pd.to_datetime(SnapshotArchiver._normalize_date(start_date))
+        self.end_date = pd.to_datetime(SnapshotArchiver._normalize_date(end_date))
+        self.params = {**SCREEN_PARAMS, **(params or {})}
+        self.snapshot_time = snapshot_time or BACKTEST_CONFIG['snapshot_time']
+        self.bar_store = bar_store or BarStore()
+        self.archiver = archiver or SnapshotArchiver()
+        self.screener = StockScreener(params=self.params)  # 复用评分函数，不调用接口
+
+        self.codes = []  # 宽表列顺序
+        self.trade_dates = None  # 宽表日期索引
+        self.calendar = None  # 由K线库交易日建立的交易日历（龙虎榜窗口、游资连续性）
+        self.values = {}  # {字段: ndarray(日期 × 代码)}
+        self.names = {}  # {代码: 名称}
+        self.index_close = {}  # {指数代码: Series(日期 -> 收盘)}
+        self.lhb_all = pd.DataFrame()  # 区间内全部龙虎榜明细
+        self.dates = []  # 回测交易日
+        self.snapshot_days = 0  # 使用了归档快照的交易日数
+
+    # ========== 数据加载 ==========
+
+    def load_data(self):
+        """一次性加载回测区间（含预热和前瞻缓冲）的全部K线和龙虎榜"""
+        load_start = self.start_date - timedelta(days=BACKTEST_CONFIG['warmup_days'])
+        load_end = self.end_date + timedelta(days=BACKTEST_CONFIG['forward_buffer_days'])
+
+        print(f"\n⏳ 正在加载日K线宽表: {load_start.strftime('%Y-%m-%d')} ~ {load_end.strftime('%Y-%m-%d')}")
+        load_begin = time.time()
+        panels = self.bar_store.load_panel(start_date=load_start, end_date=load_end)
+        close = panels['收盘']
+        if close.empty:
+            raise ValueError("日K线库为空，请先运行: python market_archive.py bars")
+
+        self.codes = list(close.columns)
+        self.trade_dates = close.index
+        self.values = {
+            field: df.reindex(index=self.trade_dates, columns=self.codes).to_numpy(dtype=panel_dtype(field))
+            for field, df in panels.items()
+        }
+        self.names = self.bar_store.load_names()
+
+        for index_code in ['000001', '000300']:
+            df_index = self.bar_store.get(index_code, load_start, load_end, kind='index')
+            if df_index is not None and not df_index.empty:
+                self.index_close[index_code] = df_index.set_index('日期')['收盘'].reindex(self.trade_dates)
+            else:
+                print(f"   ⚠️ 指数{index_code}K线缺失，相对强度/强度确认按0%基准计算")
+                self.index_close[index_code] = pd.Series(np.nan, index=self.trade_dates)
+
+        self.dates = [d for d in self.trade_dates if self.start_date <= d <= self.end_date]
+        # K线库的交易日即交易日历，评分函数（游资连续性）也按它计算，不调用接口
+        self.calendar = TradeCalendar(self.trade_dates, source='K线库')
+        self.screener.data.calendar = self.calendar
+
+        lookback = self.calendar.count(self.start_date, self.end_date) + HOT_MONEY_CONFIG['lookback_days']
+        self.lhb_all = self.archiver.load_lhb_window(self.end_date, lookback_days=lookback, calendar=self.calendar)
+        if not self.lhb_all.empty:
+            self.lhb_all['_上榜日期'] = pd.to_datetime(self.lhb_all['上榜日期'])
+
+        print(f"   ✅ {len(self.codes)} 只股票 × {len(self.trade_dates)} 个交易日 | "
+              f"回测交易日 {len(self.dates)} 个 | 龙虎榜 {len(self.lhb_all)} 条 | "
+              f"耗时 {time.time() - load_begin:.1f}s")
+
+    def _index_change(self, index_code, i, index_spot):
+        """D日指数涨跌幅：优先取归档的指数快照，否则用指数日K线计算"""
+        if index_spot is not None and not index_spot.empty:
+            row = index_spot[index_spot['代码'] == index_code]
+            if not row.empty:
+                return float(pd.to_numeric(row['涨跌幅'], errors='coerce').values[0])
+        series = self.index_close[index_code]
+        if i >= 1 and series.iloc[i - 1] > 0:
+            return float((series.iloc[i] / series.iloc[i - 1] - 1) * 100)
+        return 0.0
+
+    def _build_spot(self, i, archived_spot):
+        """
+        还原D日全市场行情（列名与 stock_zh_a_spot_em 一致）
+
+        有归档快照时直接使用快照；否则用当日K线还原
+        """
+        if archived_spot is not None and not archived_spot.empty:
+            return compact_spot(archived_spot)
+
+        volume = self.values['成交量']
+        prev_volume_ma5 = np.nanmean(volume[max(0, i - 5):i], axis=0) if i >= 1 else np.full(len(self.codes), np.nan)
+        turnover_rate = self.values['换手率'][i]
+        amount = self.values['成交额'][i]
+        with np.errstate(all='ignore'):
+            volume_ratio = np.where(prev_volume_ma5 > 0, volume[i] / prev_volume_ma5, np.nan)
+            float_cap = np.where(turnover_rate > 0, amount / (turnover_rate / 100), np.nan)
+
+        return pd.DataFrame({
+            '代码': self.codes,
+            '名称': [self.names.get(code, '') for code in self.codes],
+            '最新价': self.values['收盘'][i],
+            '涨跌幅': self.values['涨跌幅'][i],
+            '量比': volume_ratio,
+            '换手率': turnover_rate,
+            '流通市值': float_cap,
+            '成交额': amount,
+        })
+
+    @staticmethod
+    def _partial_bar(df):
+        """
+        由盘中快照拼出D日截至快照时刻的K线：{字段: 与df行对应的数组}
+
+        收盘取最新价；开盘/最高/最低/成交量取快照的今开/最高/最低/成交量（缺列时用最新价/NaN）
+        """
+        price = df['最新价'].to_numpy(dtype=float)
+
+        def col(name, default):
+            if name not in df.columns:
+                return default
+            values = pd.to_numeric(df[name], errors='coerce').to_numpy(dtype=float)
+            return np.where(np.isnan(values), default, values)
+
+        return {
+            '收盘': price,
+            '开盘': col('今开', price),
+            '最高': np.fmax(col('最高', price), price),
+            '最低': np.fmin(col('最低', price), price),
+            '成交量': col('成交量', np.full(len(df), np.nan)),
+        }
+
+    # ========== 横截面因子 ==========
+
+    def _fund_flow_factors(self, df, fund_flow):
+        """第五步资金流向因子（向量化版 analyze_fund_flow_signal + analyze_fund_flow_depth）"""
+        n = len(df)
+        if fund_flow is None or fund_flow.empty:
+            flow = pd.DataFrame(index=df.index)
+            known = np.zeros(n, dtype=bool)
+        else:
+            flow = fund_flow.drop_duplicates('代码').set_index('代码').reindex(df['代码'].values)
+            flow.index = df.index
+            known = flow.notna().any(axis=1).to_numpy()
+
+        def col(key):
+            name = FUND_FLOW_COLUMNS[key]
+            if name not in flow.columns:
+                return np.zeros(n)
+            return pd.to_numeric(flow[name], errors='coerce').fillna(0).to_numpy()
+
+        super_large, large = col('super_large'), col('large')
+        medium, small = col('medium'), col('small')
+        super_large_pct, large_pct = col('super_large_pct'), col('large_pct')
+
+        main_net = super_large + large
+        main_pct = super_large_pct + large_pct
+        total_net = main_net + medium + small
+        retail_net = medium + small
+
+        signal = np.select(
+            [(super_large > 0) & (large > 0) & (super_large_pct > 5),
+             (main_net > 0) & (main_pct > 3),
+             (super_large < 0) & (large < 0) & (main_pct < -5),
+             (main_net < 0) & (main_pct < -3)],
+            ['STRONG_BUY', 'BUY', 'STRONG_SELL', 'SELL'], default='NEUTRAL')
+        strength = np.select([signal == 'STRONG_BUY', signal == 'BUY', signal == 'STRONG_SELL', signal == 'SELL'],
+                             [10, 7, -10, -7], default=0)
+
+        consistency_conditions = [
+            (main_net > 0) & (total_net > 0),
+            (main_net > 0) & (total_net < 0) & (np.abs(main_net) > np.abs(retail_net)),
+            (main_net > 0) & (total_net < 0),
+            (main_net < 0) & (total_net < 0),
+            (main_net < 0) & (total_net > 0),
+        ]
+        consistency = np.select(consistency_conditions, ['强一致流入', '主力吸筹', '资金背离', '一致流出', '主力出货'],
+                                default='资金平衡')
+        consistency_score = np.select(consistency_conditions, [10, 7, 3, -10, -5], default=0)
+
+        amount = df['成交额'].to_numpy(dtype=float)
+        with np.errstate(all='ignore'):
+            flow_ratio = np.where(amount > 0, main_net / amount * 100, 0)
+        flow_ratio_score = np.select(
+            [amount <= 0, flow_ratio > 10, flow_ratio > 5, flow_ratio > 2, flow_ratio > 0,
+             flow_ratio > -2, flow_ratio > -5, flow_ratio > -10],
+            [0, 10, 7, 5, 3, 0, -3, -7], default=-10)
+
+        # 无法获取资金流向的股票按中性保留（与实盘一致）
+        df['资金信号'] = np.where(known, signal, 'NEUTRAL')
+        df['信号强度'] = np.where(known, strength, 0)
+        df['主力净流入'] = np.where(known, main_net, 0)
+        df['主力占比'] = np.where(known, main_pct, 0)
+        df['超大单净流入'] = np.where(known, super_large, 0)
+        df['超大单占比'] = np.where(known, super_large_pct, 0)
+        df['资金一致性'] = np.where(known, consistency, '未知')
+        df['一致性得分'] = np.where(known, consistency_score, 0)
+        df['整体净流入'] = np.where(known, total_net, 0)
+        df['散户净流入'] = np.where(known, retail_net, 0)
+        df['流量占比'] = np.where(known, flow_ratio, 0)
+        df['流量占比得分'] = np.where(known, flow_ratio_score, 0)
+
+        return ~known | (~np.isin(signal, ['STRONG_SELL', 'SELL']) & (consistency != '一致流出'))
+
+    def build_features(self, date):
+        """
+        计算D日全部候选股的因子表
+
+        返回：(因子表DataFrame, 当日概况dict)
+        因子表只包含通过第1.5/5/6/7/8/9步（与参数无关）的主板非ST股票，
+        第1~4步及第十一步的阈值由 apply_screen 按参数套用
+        """
+        i = self.trade_dates.get_loc(date)
+        date_str = date.strftime('%Y%m%d')
+        # 龙虎榜已在load_data中整段加载，这里只读取盘中快照
+        market = {name: self.archiver.load_dataset_as_of(name, date_str, self.snapshot_time)
+                  for name in ['spot', 'fund_flow', 'index_spot']}
+        spot_times = [t for t in self.archiver.list_snapshot_times(date_str, 'spot')
+                      if t <= SnapshotArchiver._normalize_time(self.snapshot_time)]
+        market['snapshot_time'] = spot_times[-1] if spot_times else None
+        if market['spot'] is not None:
+            self.snapshot_days += 1
+
+        sh_change = self._index_change('000001', i, market['index_spot'])
+        hs300_change = self._index_change('000300', i, market['index_spot'])
+
+        df_all = self._build_spot(i, market['spot'])
+        sentiment_score, sentiment_status, _, _, _ = self.screener.score_market_sentiment(df_all, sh_change)
+
+        # 板块龙头：全市场涨幅/成交额排名（与step11中的 identify_sector_leader 口径一致）
+        all_changes = np.sort(df_all['涨跌幅'].dropna().to_numpy(dtype=float))
+        all_amounts = np.sort(df_all['成交额'].dropna().to_numpy(dtype=float))
+
+        # 第一步的板块/ST排除条件（与参数无关部分）
+        df = df_all[df_all['最新价'].notna() & (df_all['最新价'] > 0)]
+        df = df[~df['名称'].str.contains('ST|退', na=False)]
+        df = df[~df['代码'].str.startswith(('8', '4', '3', '688'))]
+        df = df[df['代码'].isin(self.codes)].reset_index(drop=True)
+
+        meta = {'日期': date.strftime('%Y-%m-%d'), '情绪评分': sentiment_score, '情绪状态': sentiment_status,
+                '上证涨幅': sh_change, '主板股票数': len(df), '快照': market['snapshot_time'] or '日K还原'}
+        if df.empty:
+            meta['候选数'] = 0
+            return df, meta
+
+        cols = pd.Index(self.codes).get_indexer(df['代码'])
+        window = 250  # 与实盘 get_historical_data(250) 的K线根数一致（按交易日历请求）
+        lo = max(0, i - window + 1)
+        # 有归档快照时D日只用快照时刻已经发生的部分K线（D-1日及之前的完整K线 + 快照拼成的D日K线），
+        # 不读取D日收盘后才知道的收盘价/最高/最低/全天成交量；日K还原模式下D日K线就是当日行情
+        partial = self._partial_bar(df) if market['spot'] is not None else None
+
+        def hist(field):
+            values = self.values[field][lo:i + 1, cols]
+            if partial is None:
+                return values
+            values = values.copy()
+            values[-1] = partial[field]
+            return values
+
+        close, open_, high, low, volume = hist('收盘'), hist('开盘'), hist('最高'), hist('最低'), hist('成交量')
+        price = df['最新价'].to_numpy(dtype=float)
+        change = df['涨跌幅'].to_numpy(dtype=float)
+        last_close = close[-1]
+
+        def back(values, k):
+            return values[-(k + 1)] if len(values) > k else np.full(values.shape[1], np.nan)
+
+        bars30 = _valid_count(close, 30)
+        bars35 = _valid_count(close, 35)
+        bars90 = _valid_count(close, 90)
+        bars250 = _valid_count(close, window)
+
+        # === 第1.5步：月涨幅 ===
+        monthly_gain = np.where(bars35 >= 20, _pct_change(last_close, back(close, 20)), np.nan)
+        recent_3d_gain = np.nan_to_num(_pct_change(last_close, back(close, 3)))
+        normal = monthly_gain < 30
+        pullback = (monthly_gain >= 20) & (monthly_gain <= 50) & (recent_3d_gain < 5)
+        df['月涨幅'] = monthly_gain
+        df['月涨幅类型'] = np.select([np.isnan(monthly_gain), normal, pullback], [None, '正常', '强势回调'], default='月涨幅过高')
+        pass_1b = np.isnan(monthly_gain) | normal | pullback
+
+        # === 第五步：资金流向 ===
+        pass_5 = self._fund_flow_factors(df, market['fund_flow'])
+
+        # === 第六步：成交量台阶式放大 ===
+        first_half = _tail_mean(volume[:-5], 5) if len(volume) > 5 else np.full(len(df), np.nan)
+        second_half = _tail_mean(volume, 5)
+        vol_mean10 = _tail_mean(volume, 10)
+        with np.errstate(all='ignore'):
+            vol_std10 = np.nanstd(_tail(volume, 10), axis=0)
+            volume_increase = np.where(first_half > 0, (second_half - first_half) / first_half, np.nan)
+            volume_volatility = vol_std10 / vol_mean10
+        pass_6 = (volume_increase > 0.1) & (volume_volatility < 0.8)
+
+        # === 第七步：均线多头排列 ===
+        ma5, ma10, ma20, ma60 = (_tail_mean(close, n) for n in (5, 10, 20, 60))
+        with np.errstate(all='ignore'):
+            ma_spread = np.where(ma20 > 0, (ma5 - ma20) / ma20, np.nan)
+        pass_7 = (bars90 >= 60) & (ma5 > ma10) & (ma10 > ma20) & (last_close > ma60) & (ma_spread > 0.02)
+
+        # === 第八步：强于大盘 ===
+        pass_8 = change > sh_change + 2
+
+        # === 第九步：近20日胜率 ===
+        with np.errstate(invalid='ignore'):
+            up_days = (_tail(close, 20) > _tail(open_, 20)).sum(axis=0)
+            down_days = (_tail(close, 20) < _tail(open_, 20)).sum(axis=0)
+        pass_9 = (bars30 >= 20) & (up_days >= 12)
+        df['上涨天数'] = up_days
+        df['下跌天数'] = down_days
+        df['胜率'] = [f"{d}/20" for d in up_days]
+        df['胜率百分比'] = up_days / 20 * 100
+
+        # === 维度2：市场相对强度 ===
+        hs300 = self.index_close['000300'].to_numpy(dtype=float)[max(0, i - 11):i + 1]
+        if partial is not None and len(hs300) >= 2:
+            hs300 = hs300.copy()
+            hs300[-1] = hs300[-2] * (1 + hs300_change / 100)  # D日指数按快照涨跌幅推算
+        daily_excess = change - hs300_change
+        has_rs = bars30 >= 20
+        index_5d = _pct_change(hs300[-1], hs300[-6]) if len(hs300) >= 6 else 0
+        index_10d = _pct_change(hs300[-1], hs300[-11]) if len(hs300) >= 11 else 0
+        rs_5d = np.where(has_rs, np.nan_to_num(_pct_change(last_close, back(close, 5)) - index_5d), 0)
+        rs_10d = np.where(has_rs, np.nan_to_num(_pct_change(last_close, back(close, 10)) - index_10d), 0)
+        with np.errstate(all='ignore'):
+            stock_daily = _tail(close, 11)[1:] / _tail(close, 11)[:-1]
+            index_daily = (hs300[1:] / hs300[:-1])[-stock_daily.shape[0]:, None]
+            outperform_days = (stock_daily > index_daily).sum(axis=0)
+        trend = np.where(has_rs, outperform_days - 5, 0)  # (跑赢天数-5)*2 // 2
+
+        rs_score = np.select([daily_excess > 3, daily_excess > 2, daily_excess > 1, daily_excess > 0, daily_excess > -1],
+                             [10, 7, 5, 3, 0], default=-5)
+        rs_score = rs_score + np.select([rs_5d > 5, rs_5d > 2, rs_5d < -5], [5, 3, -5], default=0)
+        rs_score = rs_score + np.select([rs_10d > 8, rs_10d < -8], [5, -5], default=0)
+        rs_score = np.clip(rs_score + trend, -15, 15)
+        df['相对强度'] = np.select([rs_score >= 10, rs_score >= 5, rs_score >= 0, rs_score >= -5],
+                               ['显著强势', '相对强势', '基本同步', '相对弱势'], default='显著弱势')
+        df['相对强度得分'] = rs_score
+        df['当日超额'] = daily_excess
+        df['5日超额'] = rs_5d
+        df['沪深300涨幅'] = hs300_change
+
+        # === 维度3：关键价格位置 ===
+        current_volume = volume[-1]
+        half_year_high, half_year_low = _tail_max(high, 120), _tail_min(low, 120)
+        recent_high = _tail_max(high, 20)
+        with np.errstate(all='ignore'):
+            vol_ma20 = np.nanmean(_tail(volume, 20), axis=0)
+            vwap_60 = np.nansum(_tail(close * volume, 60), axis=0) / np.nansum(_tail(volume, 60), axis=0)
+            dist_low = (last_close - half_year_low) / half_year_low * 100
+            dist_high = (half_year_high - last_close) / half_year_high * 100
+            position_ratio = (last_close - half_year_low) / (half_year_high - half_year_low)
+
+        near_half_high = last_close >= half_year_high * 0.98
+        near_recent_high = last_close >= recent_high * 0.98
+        breakthrough_conditions = [
+            near_half_high & (current_volume > vol_ma20 * 1.5),
+            near_half_high & (current_volume > vol_ma20 * 1.2),
+            near_half_high,
+            near_recent_high & (current_volume > vol_ma20 * 1.3),
+            near_recent_high,
+            last_close > vwap_60,
+        ]
+        breakthrough_score = np.select(breakthrough_conditions, [10, 7, 3, 6, 3, 2], default=-2)
+        breakthrough_status = np.select(breakthrough_conditions,
+                                        ['放量突破半年高点', '突破半年高点', '缩量触及高点(需确认)',
+                                         '放量突破近期高点', '突破近期高点', '站上密集成交区'], default='未突破压力位')
+        support_conditions = [dist_low > 50, dist_low > 30, dist_low > 15, dist_low > 5]
+        support_score = np.select(support_conditions, [8, 5, 2, -2], default=-5)
+        support_status = np.select(support_conditions, ['远离底部区域', '脱离底部', '离底部有距离', '接近底部支撑'],
+                                   default='处于底部区域')
+        ranging = (half_year_high > half_year_low) & (position_ratio >= 0.4) & (position_ratio <= 0.6)
+        support_score = np.where(ranging, support_score - 3, support_score)
+        support_status = np.where(ranging, np.char.add(support_status.astype(str), '(震荡区间中部)'), support_status)
+
+        has_position = bars250 >= 60
+        position_score = np.where(has_position, breakthrough_score + support_score, 0)
+        df['位置状态'] = np.where(has_position, np.select(
+            [position_score >= 15, position_score >= 10, position_score >= 5, position_score >= 0],
+            ['突破确认+支撑稳固', '位置良好', '位置一般', '位置中性'], default='位置不佳'), '数据不足')
+        df['位置得分'] = position_score
+        df['突破状态'] = np.where(has_position, breakthrough_status, '')
+        df['支撑状态'] = np.where(has_position, support_status, '')
+        df['距半年高点'] = [f"{v:.1f}%" if ok else '' for v, ok in zip(dist_high, has_position)]
+        df['距半年低点'] = [f"{v:.1f}%" if ok else '' for v, ok in zip(dist_low, has_position)]
+        df['是否放量'] = has_position & (current_volume > vol_ma20 * 1.3)
+
+        # === 板块龙头（全市场排名）===
+        amount = df['成交额'].to_numpy(dtype=float)
+        change_rank = len(all_changes) - np.searchsorted(all_changes, change, side='right') + 1
+        turnover_rank = len(all_amounts) - np.searchsorted(all_amounts, amount, side='right') + 1
+        leader_conditions = [(change_rank <= 3) & (turnover_rank <= 3), (change_rank <= 5) & (turnover_rank <= 10),
+                             change_rank <= 10]
+        df['是否龙头'] = (change_rank <= 5) & (turnover_rank <= 10)
+        df['龙头等级'] = np.select(leader_conditions, ['超级龙头', '龙头', '准龙头'], default='跟随股')
+        df['涨幅排名'] = change_rank
+
+        # === 风险收益比 ===
+        rr_recent_high, rr_recent_low = _tail_max(high, 20), _tail_min(low, 20)
+        stop_loss = np.fmax(np.fmax(ma5, price * 0.97), rr_recent_low * 0.98)
+        take_profit = np.fmax(price * 1.05, rr_recent_high * 1.02)
+        with np.errstate(all='ignore'):
+            potential_loss = price - stop_loss
+            risk_reward = np.where(potential_loss > 0, (take_profit - price) / potential_loss, 0)
+        has_rr = bars30 >= 20
+        df['止损位'] = np.where(has_rr, stop_loss, 0)
+        df['止盈位'] = np.where(has_rr, take_profit, 0)
+        df['风险收益比'] = np.where(has_rr, risk_reward, 0)
+        with np.errstate(all='ignore'):
+            df['止损幅度'] = np.where(has_rr, (stop_loss - price) / price * 100, 0)
+            df['止盈幅度'] = np.where(has_rr, (take_profit - price) / price * 100, 0)
+
+        # === 前瞻收益（只用于统计，不参与筛选；以入选价为基准）===
+        for n in BACKTEST_CONFIG['forward_days']:
+            if i + n < len(self.trade_dates):
+                df[forward_label(n)] = _pct_change(self.values['收盘'][i + n, cols], price)
+            else:
+                df[forward_label(n)] = np.nan
+
+        # 只保留通过全部与参数无关过滤条件的候选股，再计算游资和综合评分
+        candidates = pass_1b & pass_5 & pass_6 & pass_7 & pass_8 & pass_9
+        df = df[candidates].reset_index(drop=True)
+        meta['候选数'] = len(df)
+        if df.empty:
+            return df, meta
+
+        window_high = _tail_max(high, 30)[candidates]
+        window_low = _tail_min(low, 30)[candidates]
+        self._score_candidates(df, date, window_high, window_low, has_rr[candidates])
+
+        df.insert(0, '选股日期', meta['日期'])
+        df['情绪评分'] = sentiment_score
+        df['流通市值_亿'] = df['流通市值'] / 1e8
+        return df, meta
+
+    def _lhb_for_date(self, date, codes):
+        """候选股在D日盘中可见的龙虎榜窗口（不含D日当天），返回{代码: 明细}"""
+        if self.lhb_all.empty:
+            return {}
+        code_col = next((c for c in ['代码', '股票代码', 'symbol'] if c in self.lhb_all.columns), None)
+        if code_col is None:
+            return {}
+        start = pd.Timestamp(self.calendar.window_start(date, HOT_MONEY_CONFIG['lookback_days']))
+        lhb = self.lhb_all
+        window = lhb[(lhb['_上榜日期'] >= start) & (lhb['_上榜日期'] < date) & lhb[code_col].isin(codes)]
+        return {code: group for code, group in window.groupby(code_col)}
+
+    def _score_candidates(self, df, date, window_high, window_low, has_history):
+        """计算候选股的游资评分和综合评分（复用 StockScreener 的评分函数）"""
+        screener = self.screener
+        lhb_by_code = self._lhb_for_date(date, set(df['代码']))
+        as_of = date.to_pydatetime().replace(hour=15)
+        empty_lhb = {'appearances': 0, 'records': [], 'buy_desks': {}, 'sell_desks': {}, 'net_buy': 0}
+
+        results = {key: [] for key in ['游资评分', '龙虎榜次数', '游资净买入', '游资强度', '买入时机', '游资风险',
+                                       '有游资', '游资活跃', '游资阶段', '游资建议', '游资风险提示',
+                                       '综合评分', '综合评级', '风险提示', '矛盾信号']}
+
+        for k, (_, row) in enumerate(df.iterrows()):
+            code = row['代码']
+            if has_history[k]:
+                lhb_data = screener._parse_lhb_records(lhb_by_code[code]) if code in lhb_by_code else empty_lhb
+                strength = screener.calculate_hot_money_strength(lhb_data, code)
+                timing = screener.assess_buy_timing(lhb_data, row['最新价'], window_high[k], window_low[k])
+                risk = screener.detect_risk_signals(lhb_data, code, as_of=as_of)
+                hot_money_score = screener._calculate_final_hot_money_score(strength, timing, risk)
+                appearances, net_buy = lhb_data['appearances'], lhb_data['net_buy']
+            else:
+                strength, timing, risk = {'total_score': 0}, {}, {'risk_score': 0}
+                hot_money_score, appearances, net_buy = 0, 0, 0
+
+            has_hot_money = appearances >= HOT_MONEY_CONFIG['min_appearances']
+            composite, rating, risk_warning, contradictions = screener.calculate_composite_score(
+                row['一致性得分'], row['流量占比得分'], row['相对强度得分'], row['位置得分'], row['信号强度'], hot_money_score
+            )
+
+            results['游资评分'].append(hot_money_score)
+            results['龙虎榜次数'].append(appearances)
+            results['游资净买入'].append(net_buy)
+            results['游资强度'].append(strength.get('total_score', 0))
+            results['买入时机'].append(timing.get('timing_score', 0))
+            results['游资风险'].append(risk.get('risk_score', 0))
+            results['有游资'].append(has_hot_money)
+            results['游资活跃'].append(has_hot_money and net_buy > 0)
+            results['游资阶段'].append(timing.get('stage', '观望'))
+            results['游资建议'].append(timing.get('recommendation', '观望'))
+            results['游资风险提示'].append(risk.get('suggestion', ''))
+            results['综合评分'].append(composite)
+            results['综合评级'].append(rating)
+            results['风险提示'].append(risk_warning)
+            results['矛盾信号'].append('|'.join(contradictions) if contradictions else '')
+
+        for key, values in results.items():
+            df[key] = values
+        df['所属板块'] = '未知板块'
+
+    # ========== 参数筛选 ==========
+
+    @staticmethod
+    def rank_features(features):
+        """
+        按实盘顺序排序因子表：先按第十步的(信号强度, 涨跌幅)排序（回测不计算主题分），
+        再按(游资活跃, 综合评分+游资活跃加权)稳定排序。排序与参数无关，可预先排好反复使用
+        """
+        df = features.sort_values(['信号强度', '涨跌幅'], ascending=[False, False], kind='stable')
+        weight = df['综合评分'] + df['游资活跃'].astype(int) * 5
+        df = df.assign(排序权重=weight).sort_values(['游资活跃', '排序权重'], ascending=[False, False], kind='stable')
+        return df.drop('排序权重', axis=1)
+
+    @staticmethod
+    def apply_screen(features, params=None, ranked=False):
+        """
+        对因子表套用第1~4步和第十一步的参数阈值，返回最终入选股票（多日因子表按日分别取前N只）
+
+        ranked=True 表示因子表已经过 rank_features 排序，跳过排序
+        """
+        if features is None or features.empty:
+            return pd.DataFrame()
+        p = {**SCREEN_PARAMS, **(params or {})}
+
+        mask = (
+            (features['涨跌幅'] >= p['change_pct_min']) & (features['涨跌幅'] <= p['change_pct_max']) &
+            (features['量比'] >= p['volume_ratio_min']) &
+            (features['换手率'] >= p['turnover_min']) & (features['换手率'] <= p['turnover_max']) &
+            (features['流通市值_亿'] >= p['market_cap_min']) & (features['流通市值_亿'] <= p['market_cap_max']) &
+            (features['综合评分'] >= p['composite_min']) & (features['风险收益比'] >= p['risk_reward_min'])
+        )
+        df = features[mask]
+        if df.empty:
+            return df
+        if not ranked:
+            df = BacktestEngine.rank_features(df)
+
+        # 多日因子表按日期分别取前N只（参数扫描时一次套用整段区间）
+        if '选股日期' in df.columns:
+            return df.groupby('选股日期', sort=False).head(p['max_output'])
+        return df.head(p['max_output'])
+
+    def build_feature_table(self):
+        """
+        计算回测区间内每个交易日的因子表并纵向拼接
+
+        因子表与参数无关，参数扫描等场景只需计算一次，再用 apply_screen 反复套用不同参数
+        返回：(全部日期的因子表, 每日概况)
+        """
+        if self.trade_dates is None:
+            self.load_data()
+
+        print(f"\n⏳ 正在计算 {len(self.dates)} 个交易日的因子表...")
+        begin = time.time()
+        frames = []
+        daily = []
+        for n, date in enumerate(self.dates, 1):
+            try:
+                features, meta = self.build_features(date)
+            except Exception as e:
+                print(f"   ⚠️ {date.strftime('%Y-%m-%d')} 因子计算失败: {str(e)[:50]}")
+                continue
+            daily.append(meta)
+            if not features.empty:
+                frames.append(features)
+            if n % 50 == 0 or n == len(self.dates):
+                print(f"   ⏳ 已完成 {n}/{len(self.dates)} ({n*100//len(self.dates)}%) | 耗时 {time.time() - begin:.0f}s")
+
+        df_features = pd.concat(frames, ignore_index=True) if frames else pd.DataFrame()
+        return df_features, pd.DataFrame(daily)
+
+    # ========== 主流程 ==========
+
+    def run(self):
+        """逐日回放，返回(全部入选记录, 每日概况)"""
+        if self.trade_dates is None:
+            self.load_data()
+        if not self.dates:
+            print("\n❌ 回测区间内没有交易日数据")
+            return pd.DataFrame(), pd.DataFrame()
+
+        print(f"\n🚀 开始回测: {len(self.dates)} 个交易日")
+        begin = time.time()
+        selections = []
+        daily = []
+
+        for n, date in enumerate(self.dates, 1):
+            try:
+                features, meta = self.build_features(date)
+                selected = self.apply_screen(features, self.params)
+            except Exception as e:
+                print(f"   ⚠️ {date.strftime('%Y-%m-%d')} 回测失败: {str(e)[:50]}")
+                continue
+
+            meta['入选数'] = len(selected)
+            daily.append(meta)
+            if not selected.empty:
+                selections.append(selected)
+
+            if n % 20 == 0 or n == len(self.dates):
+                elapsed = time.time() - begin
+                print(f"   ⏳ 已完成 {n}/{len(self.dates)} ({n*100//len(self.dates)}%) | 耗时 {elapsed:.0f}s")
+
+        df_selected = pd.concat(selections, ignore_index=True) if selections else pd.DataFrame()
+        print(f"\n   ✅ 回测完成: {len(df_selected)} 条入选记录 | 使用归档快照 {self.snapshot_days} 天 | "
+              f"总耗时 {time.time() - begin:.1f}s")
+        return df_selected, pd.DataFrame(daily)
+
+
+def _rating_level(rating):
+    """'AA(强势)' -> 'AA'"""
+    return str(rating).split('(')[0]
+
+
+def summarize_returns(df_selected):
+    """按评级统计各前瞻周期的胜率和收益分布"""
+    summary = {}
+    if df_selected.empty:
+        return summary
+
+    groups = [('全部', df_selected)]
+    levels = df_selected['综合评级'].map(_rating_level)
+    for level in ['AAA', 'AA', 'A', 'B', 'C', 'D']:
+        group = df_selected[levels == level]
+        if not group.empty:
+            groups.append((level, group))
+
+    for name, group in groups:
+        stats = {'样本数': len(group)}
+        for n in BACKTEST_CONFIG['forward_days']:
+            returns = group[forward_label(n)].dropna()
+            if returns.empty:
+                continue
+            stats[forward_label(n)] = {
+                '样本数': int(len(returns)),
+                '胜率': float((returns > 0).mean() * 100),
+                '平均': float(returns.mean()),
+                '中位数': float(returns.median()),
+                'P10': float(returns.quantile(0.1)),
+                'P90': float(returns.quantile(0.9)),
+                '最大': float(returns.max()),
+                '最小': float(returns.min()),
+            }
+        summary[name] = stats
+    return summary
+
+
+def print_backtest_report(summary, daily, start_date, end_date):
+    """打印回测报告"""
+    print("\n" + "=" * 70)
+    print(f"📈 【v9 策略历史回测报告】{start_date} ~ {end_date}")
+    print("=" * 70)
+
+    if daily is not None and not daily.empty:
+        active_days = int((daily['入选数'] > 0).sum())
+        print(f"\n📅 交易日: {len(daily)} 天 | 有入选: {active_days} 天 | "
+              f"日均候选: {daily['候选数'].mean():.1f} 只 | 日均入选: {daily['入选数'].mean():.1f} 只")
+        low_sentiment = int((daily['情绪评分'] < 30).sum())
+        if low_sentiment > 0:
+            print(f"   ⚠️ 其中 {low_sentiment} 天情绪评分<30（实盘会建议空仓）")
+
+    if not summary:
+        print("\n⚠️ 回测区间内没有入选股票")
+        print("\n" + "=" * 70)
+        return
+
+    for n in BACKTEST_CONFIG['forward_days']:
+        label = forward_label(n)
+        print(f"\n📊 【{label}】")
+        print(f"{'评级':<6} {'样本':>6} {'胜率':>8} {'平均':>8} {'中位数':>8} {'P10':>8} {'P90':>8}")
+        print("-" * 60)
+        for name, stats in summary.items():
+            s = stats.get(label)
+            if not s:
+                continue
+            print(f"{name:<6} {s['样本数']:>6} {s['胜率']:>7.1f}% {s['平均']:>+7.2f}% {s['中位数']:>+7.2f}% "
+                  f"{s['P10']:>+7.2f}% {s['P90']:>+7.2f}%")
+
+    overall = summary.get('全部', {}).get(forward_label(1))
+    aaa = summary.get('AAA', {}).get(forward_label(1))
+    if overall and aaa:
+        print("\n💡 【评级有效性】")
+        if aaa['平均'] > overall['平均']:
+            print(f"   → AAA级次日均涨 {aaa['平均']:+.2f}% 跑赢整体 {overall['平均']:+.2f}%，评级系统有效")
+        else:
+            print(f"   → AAA级次日均涨 {aaa['平均']:+.2f}% 未跑赢整体 {overall['平均']:+.2f}%，可能需调整评分权重")
+
+    print("\n" + "=" * 70)
+
+
+def save_backtest_results(df_selected, daily, summary, start_date, end_date, params):
+    """保存入选明细(CSV)、每日概况(CSV)和统计汇总(JSON)"""
+    BACKTEST_DIR.mkdir(parents=True, exist_ok=True)
+    tag = f"{start_date}_{end_date}"
+
+    if not df_selected.empty:
+        df_selected.to_csv(BACKTEST_DIR / f"backtest_{tag}_selections.csv", index=False, encoding='utf-8-sig')
+    if daily is not None and not daily.empty:
+        daily.to_csv(BACKTEST_DIR / f"backtest_{tag}_daily.csv", index=False, encoding='utf-8-sig')
+
+    summary_file = BACKTEST_DIR / f"backtest_{tag}_summary.json"
+    with open(summary_file, 'w', encoding='utf-8') as f:
+        json.dump({
+            'start_date': start_date,
+            'end_date': end_date,
+            'run_time': datetime.now().strftime('%Y-%m-%d %H:%M:%S'),
+            'params': params,
+            'forward_days': BACKTEST_CONFIG['forward_days'],
+            'summary': summary,
+        }, f, ensure_ascii=False, indent=2)
+
+    print(f"\n💾 回测结果已保存: {BACKTEST_DIR}")
+    return summary_file
+
+
+def main():
+    """命令行入口"""
+    args = sys.argv[1:]
+    if len(args) < 2:
+        print(__doc__)
+        return
+
+    start_date, end_date = args[0], args[1]
+    snapshot_time = args[2] if len(args) > 2 else None
+
+    engine = BacktestEngine(start_date, end_date, snapshot_time=snapshot_time)
+    df_selected, daily = engine.run()
+    summary = summarize_returns(df_selected)
+    print_backtest_report(summary, daily, start_date, end_date)
+    save_backtest_results(df_selected, daily, summary, start_date, end_date, engine.params)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,726 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+筛选各阶段基准测试 v1.1
+
+问题背景：
+仓库里没有任何基准测试，每一次性能优化都只能凭感觉判断是否有效，也无法发现某次改动让某一步变慢。
+
+功能：
+1. 覆盖范围：scan_stock_v9 第1~11步和市场情绪检查、select_stock_v2_enhanced 的形态识别和增强分析，
+   以及历史库/周记录/因子库的读写
+2. 离线数据：SyntheticMarket 按固定随机种子生成与akshare接口同名、同列名的合成行情（不访问网络）；
+   也可以用 replay 模式回放 market_archive 中某一天的归档快照 + bar_store 日K线
+3. 多个规模：默认 1000 / 5000 / 20000 只股票，每个阶段记录吞吐量（行/秒）、耗时分位数、峰值内存
+4. 回归检查：结果与保存的基线对比，任一阶段耗时或峰值内存超出容差时以非零状态码退出
+5. 启动耗时（v1.1新增）：每个场景在新的Python进程中执行，统计导入+执行耗时和已加载的重模块
+   （pandas/numpy/akshare），确认查看日历/历史/周记录等菜单不会加载数据栈
+
+说明：
+- 第6步及之后的阶段以"第5步对全部股票的输出"为输入，每个阶段都在完整规模上单独计时，不受前面步骤过滤的影响
+- 峰值内存用 tracemalloc 单独跑一遍统计（只统计Python分配），计时轮次不开启 tracemalloc
+- 每轮计时前重建筛选器实例并清空磁盘缓存，测得的是冷启动耗时
+
+使用方法：
+    python benchmark_stages.py run                  # 按默认规模运行，结果保存到 benchmark_results/
+    python benchmark_stages.py run 1000 5000        # 指定规模
+    python benchmark_stages.py baseline 1000 5000   # 运行并保存为基线
+    python benchmark_stages.py check 1000 5000      # 运行并与基线对比，退化时退出码为1
+    python benchmark_stages.py run 1000 --replay 20260115  # 回放归档数据
+    python benchmark_stages.py startup              # 启动耗时
+"""
+
+import pandas as pd
+import numpy as np
+from datetime import datetime, timedelta
+from contextlib import redirect_stdout
+from pathlib import Path
+import io
+import json
+import platform
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+import warnings
+warnings.filterwarnings('ignore')
+
+# ============================================================
+# 基准测试配置
+# ============================================================
+BENCHMARK_DIR = Path(__file__).parent / "benchmark_results"  # 结果保存目录
+BASELINE_FILE = BENCHMARK_DIR / "baseline.json"  # 基线文件
+
+BENCHMARK_CONFIG = {
+    "sizes": [1000, 5000, 20000],  # 股票池规模
+    "repeats": 5,  # 每个阶段的计时轮数
+    "max_seconds_per_stage": 60,  # 单个阶段累计计时超过此秒数后不再追加轮次（至少跑1轮）
+    "seed": 42,  # 合成数据随机种子
+    "history_bars": 300,  # 合成日K线长度（交易日）
+    "pattern_ratio": 0.05,  # 合成数据中带四日形态的上证股票比例
+    "tolerance": 0.25,  # 回归容差：超出基线25%视为退化
+    "min_delta_seconds": 0.02,  # 耗时差小于此值不算退化（避免毫秒级阶段的抖动误报）
+    "min_delta_mb": 5,  # 峰值内存差小于此值不算退化
+    "startup_repeats": 5,  # 启动耗时每个场景的进程数
+}
+
+# 启动耗时场景: (名称, 在新进程中执行的代码)；历史记录的二级菜单输入0直接返回
+STARTUP_CASES = [
+    ('v9 导入', "import scan_stock_v9"),
+    ('v9 主题日历', "import scan_stock_v9 as m; m.show_monthly_calendar()"),
+    ('v9 周记录', "import scan_stock_v9 as m; m.show_weekly_records()"),
+    ('v9 历史记录', "import builtins; builtins.input = lambda *a: '0'; import scan_stock_v9 as m; m.show_history_list()"),
+    ('v2 导入', "import select_stock_v2_enhanced"),
+    ('参照: pandas', "import pandas"),
+    ('参照: akshare', "import akshare"),
+]
+HEAVY_MODULES = ['pandas', 'numpy', 'akshare']
+
+# 子进程中执行的计时代码：屏幕输出丢弃，最后一行输出JSON结果
+_STARTUP_RUNNER = """
+import contextlib, io, json, sys, time
+start = time.perf_counter()
+with contextlib.redirect_stdout(io.StringIO()):
+    exec(sys.argv[1])
+print(json.dumps({'seconds': time.perf_counter() - start,
+                  'loaded': [m for m in sys.argv[2].split(',') if m in sys.modules]}))
+"""
+
+
+# ============================================================
+# 离线数据源
+# ============================================================
+
+class SyntheticMarket:
+    """
+    合成行情数据源
+
+    方法名、参数和返回列名与筛选器用到的akshare接口一致，可直接替换模块中的 ak 对象。
+    同一规模、同一种子生成的数据完全相同，保证多次运行可比。
+    """
+
+    def __init__(self, size, seed=None, bars=None):
+        self.size = size
+        self.seed = BENCHMARK_CONFIG['seed'] if seed is None else seed
+        self.bars = bars or BENCHMARK_CONFIG['history_bars']
+        self.dates = pd.bdate_range(end=pd.Timestamp(datetime.now().date()), periods=self.bars)
+        self._hist_cache = {}
+
+        rng = np.random.default_rng(self.seed)
+        # 按固定比例分配板块前缀：沪市主板45%、深市主板35%、创业板15%、科创板5%
+        layout = ['60'] * 9 + ['00'] * 7 + ['30'] * 3 + ['68']
+        counters = {}
+        codes = []
+        for i in range(size):
+            prefix = layout[i % len(layout)]
+            counters[prefix] = counters.get(prefix, 0) + 1
+            codes.append(f"{prefix}{counters[prefix]:04d}")
+        self.codes = codes
+        names = [f"合成{i:05d}" for i in range(size)]
+        for i in rng.choice(size, size // 50, replace=False):
+            names[i] = f"ST合成{i:05d}"
+        self.names = names
+
+        price = rng.uniform(3, 80, size)
+        change = np.clip(rng.normal(0.5, 3, size), -10, 10)
+        turnover = np.clip(rng.lognormal(1.6, 0.8, size), 0.1, 45)
+        float_cap = rng.lognormal(np.log(8e9), 0.9, size)
+        amount = float_cap * turnover / 100
+        prev_close = price / (1 + change / 100)
+        self.spot = pd.DataFrame({
+            '序号': np.arange(1, size + 1),
+            '代码': codes,
+            '名称': names,
+            '最新价': price.round(2),
+            '涨跌幅': change.round(2),
+            '涨跌额': (price - prev_close).round(2),
+            '成交量': (amount / price / 100).round(0),
+            '成交额': amount.round(0),
+            '振幅': np.abs(rng.normal(4, 2, size)).round(2),
+            '最高': (price * (1 + np.abs(rng.normal(0, 0.02, size)))).round(2),
+            '最低': (price * (1 - np.abs(rng.normal(0, 0.02, size)))).round(2),
+            '今开': (prev_close * (1 + rng.normal(0, 0.01, size))).round(2),
+            '昨收': prev_close.round(2),
+            '量比': np.clip(rng.lognormal(0.1, 0.5, size), 0.1, 10).round(2),
+            '换手率': turnover.round(2),
+            '市盈率-动态': rng.uniform(5, 120, size).round(2),
+            '市净率': rng.uniform(0.5, 10, size).round(2),
+            '总市值': (float_cap * rng.uniform(1, 1.6, size)).round(0),
+            '流通市值': float_cap.round(0),
+            '涨速': rng.normal(0, 0.3, size).round(2),
+            '5分钟涨跌': rng.normal(0, 0.5, size).round(2),
+            '60日涨跌幅': rng.normal(5, 20, size).round(2),
+            '年初至今涨跌幅': rng.normal(5, 30, size).round(2),
+        })
+
+        # 资金流向排名：约80%的股票有数据
+        flow_idx = np.sort(rng.choice(size, int(size * 0.8), replace=False))
+        n_flow = len(flow_idx)
+        flow_amount = amount[flow_idx]
+        super_large = rng.normal(0, 0.04, n_flow) * flow_amount
+        large = rng.normal(0, 0.04, n_flow) * flow_amount
+        medium = rng.normal(0, 0.03, n_flow) * flow_amount
+        small = -(super_large + large + medium) + rng.normal(0, 0.01, n_flow) * flow_amount
+        self.fund_flow = pd.DataFrame({
+            '序号': np.arange(1, n_flow + 1),
+            '代码': [codes[i] for i in flow_idx],
+            '名称': [names[i] for i in flow_idx],
+            '最新价': price[flow_idx].round(2),
+            '今日涨跌幅': change[flow_idx].round(2),
+            '今日主力净流入-净额': (super_large + large).round(0),
+            '今日主力净流入-净占比': ((super_large + large) / flow_amount * 100).round(2),
+            '今日超大单净流入-净额': super_large.round(0),
+            '今日超大单净流入-净占比': (super_large / flow_amount * 100).round(2),
+            '今日大单净流入-净额': large.round(0),
+            '今日大单净流入-净占比': (large / flow_amount * 100).round(2),
+            '今日中单净流入-净额': medium.round(0),
+            '今日中单净流入-净占比': (medium / flow_amount * 100).round(2),
+            '今日小单净流入-净额': small.round(0),
+            '今日小单净流入-净占比': (small / flow_amount * 100).round(2),
+        })
+
+        # 龙虎榜：约3%的股票近30天上榜1~3次
+        lhb_rows = []
+        recent = self.dates[-20:]
+        for i in rng.choice(size, max(1, size * 3 // 100), replace=False):
+            for _ in range(rng.integers(1, 4)):
+                row = {
+                    '代码': codes[i], '名称': names[i],
+                    '上榜日期': recent[rng.integers(0, len(recent))].strftime('%Y-%m-%d'),
+                    '上榜原因': '日涨幅偏离值达到7%的前5只证券',
+                    '收盘价': round(float(price[i]), 2),
+                    '涨跌幅': round(float(rng.uniform(7, 10)), 2),
+                    '成交额': round(float(amount[i]), 0),
+                }
+                for k in range(1, 6):
+                    row[f'买{k}营业部'] = f"营业部{rng.integers(0, 200):03d}"
+                    row[f'买{k}金额'] = float(rng.uniform(1e6, 5e7))
+                    row[f'卖{k}营业部'] = f"营业部{rng.integers(0, 200):03d}"
+                    row[f'卖{k}金额'] = float(rng.uniform(1e6, 5e7))
+                lhb_rows.append(row)
+        self.lhb = pd.DataFrame(lhb_rows)
+
+        self.index_spot = pd.DataFrame({
+            '代码': ['000001', '000300', '399001', '399006'],
+            '名称': ['上证指数', '沪深300', '深证成指', '创业板指'],
+            '最新价': [3300.0, 3900.0, 10500.0, 2100.0],
+            '涨跌幅': np.round(rng.normal(0.2, 0.8, 4), 2),
+        })
+
+    def _bars(self, seed, base_price, inject_pattern=False):
+        """生成一只股票/指数的完整日K线"""
+        rng = np.random.default_rng(seed)
+        n = self.bars
+        pct = np.clip(rng.normal(0.05, 2.2, n), -10, 10)
+        volume = rng.lognormal(np.log(1e5), 0.35, n)
+        if inject_pattern:
+            # 最后4个交易日构造四日形态：涨停 → 放量小涨 → 缩量回调 → 地量横盘
+            pct[-4:] = [10.0, 1.5, -2.0, 0.5]
+            volume[-4:] = [volume[-5] * 2, volume[-5] * 2.6, volume[-5] * 2.0, volume[-5] * 0.9]
+        close = base_price * np.cumprod(1 + pct / 100)
+        open_ = close / (1 + pct / 100) * (1 + rng.normal(0, 0.005, n))
+        high = np.maximum(open_, close) * (1 + np.abs(rng.normal(0, 0.01, n)))
+        low = np.minimum(open_, close) * (1 - np.abs(rng.normal(0, 0.01, n)))
+        return pd.DataFrame({
+            '日期': self.dates.strftime('%Y-%m-%d'),
+            '开盘': open_.round(2),
+            '收盘': close.round(2),
+            '最高': high.round(2),
+            '最低': low.round(2),
+            '成交量': volume.round(0),
+            '成交额': (volume * close * 100).round(0),
+            '振幅': ((high - low) / np.roll(close, 1) * 100).round(2),
+            '涨跌幅': pct.round(2),
+            '涨跌额': (close - close / (1 + pct / 100)).round(2),
+            '换手率': np.clip(rng.lognormal(1.4, 0.6, n), 0.1, 40).round(2),
+        })
+
+    @staticmethod
+    def _slice(df, start_date, end_date):
+        dates = pd.to_datetime(df['日期'])
+        mask = np.ones(len(df), dtype=bool)
+        if start_date:
+            mask &= dates >= pd.to_datetime(start_date)
+        if end_date:
+            mask &= dates <= pd.to_datetime(end_date)
+        return df[mask].reset_index(drop=True)
+
+    def stock_zh_a_spot_em(self):
+        return self.spot.copy()
+
+    def stock_individual_fund_flow_rank(self, indicator="今日"):
+        return self.fund_flow.copy()
+
+    def stock_zh_index_spot_em(self, symbol=None):
+        return self.index_spot.copy()
+
+    def stock_lhb_detail_em(self, start_date=None, end_date=None):
+        return self.lhb.copy()
+
+    def tool_trade_date_hist_sina(self):
+        # 合成K线按工作日生成，交易日历与之一致
+        return pd.DataFrame({'trade_date': pd.bdate_range('1990-12-19', self.dates[-1] + pd.Timedelta(days=400)).date})
+
+    def stock_zh_a_hist(self, symbol, period="daily", start_date=None, end_date=None, adjust=""):
+        df = self._hist_cache.get(symbol)
+        if df is None:
+            code_num = int(symbol) if str(symbol).isdigit() else 0
+            inject = (str(symbol).startswith('60') and
+                      code_num % int(1 / BENCHMARK_CONFIG['pattern_ratio']) == 0)
+            df = self._bars(self.seed * 1000003 + code_num, 5 + code_num % 60, inject)
+            df.insert(1, '股票代码', symbol)
+            self._hist_cache[symbol] = df
+        return self._slice(df, start_date, end_date)
+
+    def index_zh_a_hist(self, symbol, period="daily", start_date=None, end_date=None):
+        key = f"index_{symbol}"
+        df = self._hist_cache.get(key)
+        if df is None:
+            df = self._bars(self.seed * 7919 + int(symbol), 3000)
+            self._hist_cache[key] = df
+        return self._slice(df, start_date, end_date)
+
+    def stock_individual_info_em(self, symbol):
+        industries = ['半导体', '电力设备', '医药生物', '汽车', '计算机', '有色金属']
+        code_num = int(symbol) if str(symbol).isdigit() else 0
+        return pd.DataFrame({'item': ['股票代码', '行业'], 'value': [symbol, industries[code_num % len(industries)]]})
+
+
+class ReplayMarket(SyntheticMarket):
+    """
+    归档回放数据源：实时行情/资金流向/指数/龙虎榜取自 market_archive，日K线取自 bar_store
+
+    规模大于归档股票数时按实际股票数运行；日K线请求按"截至回放日的同等交易日数"返回，
+    不受运行当天日期的影响。
+    """
+
+    def __init__(self, size, replay_date, at_time=None):
+        from market_archive import SnapshotArchiver, BarStore
+
+        archiver = SnapshotArchiver()
+        self.bar_store = BarStore()
+        self.replay_date = pd.to_datetime(str(replay_date))
+        self.seed = BENCHMARK_CONFIG['seed']
+        self._hist_cache = {}
+
+        spot = archiver.load_dataset_as_of('spot', replay_date, at_time)
+        if spot is None or spot.empty:
+            raise ValueError(f"{replay_date} 没有归档的实时行情快照")
+        for col in ['最新价', '涨跌幅', '量比', '换手率', '流通市值', '成交额']:
+            if col in spot.columns:
+                spot[col] = pd.to_numeric(spot[col], errors='coerce')
+        self.spot = spot.head(size).reset_index(drop=True)
+        self.size = len(self.spot)
+        self.codes = list(self.spot['代码'])
+        self.names = list(self.spot['名称'])
+
+        fund_flow = archiver.load_dataset_as_of('fund_flow', replay_date, at_time)
+        self.fund_flow = fund_flow if fund_flow is not None else pd.DataFrame()
+        index_spot = archiver.load_dataset_as_of('index_spot', replay_date, at_time)
+        self.index_spot = index_spot if index_spot is not None else pd.DataFrame({'代码': [], '涨跌幅': []})
+        lhb = archiver.load_lhb_window(self.replay_date, lookback_days=20, include_end=False)
+        self.lhb = lhb if lhb is not None else pd.DataFrame()
+
+    def _replay_bars(self, df, start_date, end_date):
+        """返回截至回放日、与请求区间等长（交易日数）的K线"""
+        if df is None or df.empty:
+            return pd.DataFrame()
+        n_bars = len(pd.bdate_range(pd.to_datetime(start_date), pd.to_datetime(end_date))) if start_date and end_date else len(df)
+        df = df[df['日期'] <= self.replay_date].tail(n_bars).copy()
+        df['日期'] = df['日期'].dt.strftime('%Y-%m-%d')
+        return df.reset_index(drop=True)
+
+    def stock_zh_a_hist(self, symbol, period="daily", start_date=None, end_date=None, adjust=""):
+        if symbol not in self._hist_cache:
+            self._hist_cache[symbol] = self.bar_store.get(symbol)
+        return self._replay_bars(self._hist_cache[symbol], start_date, end_date)
+
+    def index_zh_a_hist(self, symbol, period="daily", start_date=None, end_date=None):
+        key = f"index_{symbol}"
+        if key not in self._hist_cache:
+            self._hist_cache[key] = self.bar_store.get(symbol, kind='index')
+        return self._replay_bars(self._hist_cache[key], start_date, end_date)
+
+
+# ============================================================
+# 计时与测量
+# ============================================================
+
+def _measure(setup, func, repeats, budget):
+    """
+    执行 setup() → func(state)，先用tracemalloc统计一次峰值内存，再计时repeats轮
+
+    返回：{'times': [...], 'peak_mb': 峰值内存, 'rows_out': 最后一轮输出行数}
+    """
+    sink = io.StringIO()
+
+    state = setup()
+    tracemalloc.start()
+    with redirect_stdout(sink):
+        func(state)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    times = []
+    rows_out = None
+    spent = 0.0
+    for _ in range(repeats):
+        state = setup()
+        sink.seek(0)
+        sink.truncate()
+        start = time.perf_counter()
+        with redirect_stdout(sink):
+            result = func(state)
+        elapsed = time.perf_counter() - start
+        times.append(elapsed)
+        rows_out = len(result) if hasattr(result, '__len__') else rows_out
+        spent += elapsed
+        if spent >= budget:
+            break
+
+    return {'times': times, 'peak_mb': peak / 1024 / 1024, 'rows_out': rows_out}
+
+
+def _summarize(stage, size, rows_in, measured):
+    times = np.array(measured['times'])
+    p50 = float(np.percentile(times, 50))
+    return {
+        'stage': stage,
+        'size': size,
+        'rows_in': rows_in,
+        'rows_out': measured['rows_out'],
+        'repeats': len(times),
+        'p50': p50,
+        'p95': float(np.percentile(times, 95)),
+        'max': float(times.max()),
+        'throughput': rows_in / p50 if p50 > 0 and rows_in else None,
+        'peak_mb': measured['peak_mb'],
+    }
+
+
+class BenchmarkEnv:
+    """
+    把筛选器模块的数据源和所有磁盘路径指向临时目录，退出时还原
+
+    筛选器模块通过模块级 ak 对象访问数据，只需替换该对象即可，不修改任何筛选逻辑。
+    """
+
+    def __init__(self, market):
+        self.market = market
+        self.tmp_dir = Path(tempfile.mkdtemp(prefix="bench_"))
+        self._saved = []
+
+    def _patch(self, module, name, value):
+        self._saved.append((module, name, getattr(module, name)))
+        setattr(module, name, value)
+
+    def __enter__(self):
+        import scan_stock_v9
+        import select_stock_v2_enhanced
+        import history_store
+        import market_data
+        import checkpoint
+        import trade_calendar
+        from run_profiler import InstrumentedModule
+
+        ak = InstrumentedModule(self.market)
+        self._patch(scan_stock_v9, 'ak', ak)
+        self._patch(select_stock_v2_enhanced, 'ak', ak)
+        self._patch(scan_stock_v9, 'HOT_MONEY_CACHE_DIR', self.tmp_dir / "hot_money_v9")
+        self._patch(select_stock_v2_enhanced, 'HOT_MONEY_CACHE_DIR', self.tmp_dir / "hot_money_v2")
+        self._patch(market_data, 'HOT_MONEY_CACHE_DIR', self.tmp_dir / "hot_money")
+        self._patch(market_data, 'KLINE_CACHE_DIR', self.tmp_dir / "kline")
+        self._patch(history_store, 'HISTORY_DB', self.tmp_dir / "history" / "history.db")
+        self._patch(checkpoint, 'CHECKPOINT_DIR', self.tmp_dir / "checkpoints")
+        self._patch(trade_calendar, 'CALENDAR_FILE', self.tmp_dir / "trade_calendar.txt")
+        return self
+
+    def reset_caches(self):
+        """清空磁盘缓存（每轮计时前调用，保证冷启动）"""
+        for name in ["hot_money_v9", "hot_money_v2", "hot_money", "kline"]:
+            path = self.tmp_dir / name
+            shutil.rmtree(path, ignore_errors=True)
+            path.mkdir(parents=True, exist_ok=True)
+
+    def __exit__(self, *exc):
+        for module, name, value in reversed(self._saved):
+            setattr(module, name, value)
+        shutil.rmtree(self.tmp_dir, ignore_errors=True)
+        return False
+
+
+# ============================================================
+# 阶段定义
+# ============================================================
+
+V9_STAGES = [
+    ('v9.第1步 涨幅', 'step1_filter_by_change_pct', 'spot'),
+    ('v9.第1.5步 月涨幅', 'step1b_filter_by_monthly_gain', 'spot'),
+    ('v9.第2步 量比', 'step2_filter_by_volume_ratio', 'spot'),
+    ('v9.第3步 换手率', 'step3_filter_by_turnover', 'spot'),
+    ('v9.第4步 市值', 'step4_filter_by_market_cap', 'spot'),
+    ('v9.第5步 资金流向', 'step5_filter_by_fund_flow', 'spot'),
+    ('v9.第6步 量能形态', 'step6_filter_by_volume_pattern', 'flow'),
+    ('v9.第7步 均线', 'step7_filter_by_ma_trend', 'flow'),
+    ('v9.第8步 分时强度', 'step8_filter_by_intraday_strength', 'flow'),
+    ('v9.第9步 胜率', 'step9_filter_by_win_rate', 'flow'),
+    ('v9.第10步 主题', 'step10_theme_scoring', 'flow'),
+    ('v9.第11步 综合分析', 'step11_multidimensional_analysis', 'flow'),
+]
+
+
+def _screening_cases(env, size):
+    """筛选阶段的 (名称, 输入行数, setup, func) 列表"""
+    import scan_stock_v9
+    import select_stock_v2_enhanced
+
+    market = env.market
+
+    def new_v9():
+        env.reset_caches()
+        return scan_stock_v9.StockScreener()
+
+    def new_v2():
+        env.reset_caches()
+        return select_stock_v2_enhanced.StockScreener()
+
+    spot = market.stock_zh_a_spot_em()
+    with redirect_stdout(io.StringIO()):
+        flow = new_v9().step5_filter_by_fund_flow(spot)
+        patterns = new_v2().identify_4day_pattern(None)
+    inputs = {'spot': spot, 'flow': flow}
+
+    cases = [('v9.市场情绪', len(spot), new_v9, lambda s: [s.check_market_sentiment()])]
+    for label, method, source in V9_STAGES:
+        df_in = inputs[source]
+        cases.append((label, len(df_in), new_v9,
+                      lambda s, method=method, df_in=df_in: getattr(s, method)(df_in.copy())))
+
+    shanghai = int(spot['代码'].str.startswith('60').sum())
+    cases.append(('v2.形态识别', shanghai, new_v2, lambda s: s.identify_4day_pattern(None)))
+    cases.append(('v2.增强分析', len(patterns), new_v2, lambda s: s.add_enhanced_analysis(patterns.copy())))
+    return cases
+
+
+def _history_cases(env, size):
+    """历史记录读写的 (名称, 行数, setup, func) 列表；size为历史选股记录条数（每批次20只）"""
+    from history_store import HistoryStore
+    from weekly_log import WeeklyLog
+    from feature_store import FeatureStore
+
+    market = env.market
+    n_batches = max(1, size // 20)
+    base = datetime(2020, 1, 1)
+
+    def batch(k):
+        date = (base + timedelta(days=k)).strftime('%Y-%m-%d')
+        return {
+            'batch_id': (base + timedelta(days=k)).strftime('%Y%m%d_143000'),
+            'selection_time': f"{date} 14:30:00",
+            'selection_date': date,
+            'target_sector': None,
+            'stock_count': 20,
+            'stocks': [{'code': market.codes[(k * 20 + j) % len(market.codes)], 'name': 'x',
+                        'selection_price': 10.0, 'rating': 'A', 'composite_score': 60.0,
+                        'fund_signal': 'BUY', 'volume_ratio': 1.5} for j in range(20)],
+        }
+
+    history_dir = env.tmp_dir / "bench_history"
+    shutil.rmtree(history_dir, ignore_errors=True)
+    store = HistoryStore(history_dir / "history.db")
+    weekly = WeeklyLog(history_dir / "weekly")
+    week_number = None
+    for k in range(n_batches):
+        data = batch(k)
+        store.save_batch(data, 'benchmark')
+        # 周记录：全部追加到同一周，测汇总重建的最坏情况
+        weekly_data = dict(data, selection_date=base.strftime('%Y-%m-%d'))
+        week_number = weekly.append(weekly_data, 'benchmark')
+
+    features = market.stock_zh_a_spot_em()
+    for col in ['相对强度得分', '位置得分', '综合评分', '风险收益比', '游资评分']:
+        features[col] = np.random.default_rng(0).uniform(0, 100, len(features))
+    feature_store = FeatureStore(history_dir / "features")
+    for k in range(5):
+        feature_store.save(features, f"2020010{k + 1}_143000", f"2020-01-0{k + 1}")
+
+    def drop_summary():
+        summary = weekly._summary_path(week_number)
+        if summary.exists():
+            summary.unlink()
+        return weekly
+
+    counter = {'k': n_batches}
+
+    def next_batch():
+        counter['k'] += 1
+        return batch(counter['k'])
+
+    return [
+        ('历史库.保存批次', 20, next_batch, lambda data: store.save_batch(data, 'benchmark') or [data]),
+        ('历史库.最近批次', 20, lambda: store, lambda s: s.get_last_batch()['stocks']),
+        ('历史库.连续选中', size, lambda: store, lambda s: list(s.get_date_stock_sets(max_dates=10))),
+        ('历史库.全部记录', size, lambda: store, lambda s: s.load_selection_records()),
+        ('周记录.追加', 20, next_batch, lambda data: [weekly.append(data, 'benchmark')]),
+        ('周记录.重建汇总', size, drop_summary, lambda w: w.load_summary(week_number)['daily_records']),
+        ('因子库.保存', len(features), lambda: feature_store,
+         lambda s: [s.save(features, "20200110_143000", "2020-01-10")]),
+        ('因子库.区间读取', len(features) * 5, lambda: feature_store,
+         lambda s: s.load("20200101", "20200105", latest_only=True)),
+        ('因子库.按代码读取', 5, lambda: feature_store,
+         lambda s: s.load("20200101", "20200105", codes=market.codes[:1])),
+    ]
+
+
+def run_benchmarks(sizes=None, repeats=None, replay_date=None):
+    """运行全部阶段，返回结果字典"""
+    sizes = sizes or BENCHMARK_CONFIG['sizes']
+    repeats = repeats or BENCHMARK_CONFIG['repeats']
+    budget = BENCHMARK_CONFIG['max_seconds_per_stage']
+
+    results = []
+    for size in sizes:
+        market = ReplayMarket(size, replay_date) if replay_date else SyntheticMarket(size)
+        print(f"\n🧪 规模 {size}（实际股票数 {market.size}）")
+        with BenchmarkEnv(market) as env:
+            for build_cases in (_screening_cases, _history_cases):
+                for stage, rows_in, setup, func in build_cases(env, market.size):
+                    measured = _measure(setup, func, repeats, budget)
+                    record = _summarize(stage, size, rows_in, measured)
+                    results.append(record)
+                    throughput = f"{record['throughput']:>10.0f}行/秒" if record['throughput'] else f"{'-':>13}"
+                    print(f"   {stage:<22} 行数 {rows_in:>6}→{str(record['rows_out']):<6} | "
+                          f"p50 {record['p50']:>8.3f}s | p95 {record['p95']:>8.3f}s | "
+                          f"{throughput} | 峰值 {record['peak_mb']:>7.1f}MB | {record['repeats']}轮")
+
+    return {
+        'created_at': datetime.now().strftime('%Y-%m-%d %H:%M:%S'),
+        'source': f"replay:{replay_date}" if replay_date else f"synthetic:seed={BENCHMARK_CONFIG['seed']}",
+        'python': platform.python_version(),
+        'machine': platform.platform(),
+        'results': results,
+    }
+
+
+def save_results(report, path=None):
+    """保存结果文件，返回路径"""
+    BENCHMARK_DIR.mkdir(parents=True, exist_ok=True)
+    path = Path(path) if path else BENCHMARK_DIR / f"bench_{datetime.now().strftime('%Y%m%d_%H%M%S')}.json"
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump(report, f, ensure_ascii=False, indent=2)
+    return path
+
+
+def check_regressions(report, baseline, tolerance=None):
+    """
+    与基线对比
+
+    返回：退化列表 [(阶段, 规模, 指标, 基线值, 当前值), ...]
+    """
+    tolerance = BENCHMARK_CONFIG['tolerance'] if tolerance is None else tolerance
+    base_map = {(r['stage'], r['size']): r for r in baseline.get('results', [])}
+    regressions = []
+    for record in report['results']:
+        base = base_map.get((record['stage'], record['size']))
+        if base is None:
+            continue
+        if (record['p50'] > base['p50'] * (1 + tolerance) and
+                record['p50'] - base['p50'] > BENCHMARK_CONFIG['min_delta_seconds']):
+            regressions.append((record['stage'], record['size'], 'p50耗时(s)', base['p50'], record['p50']))
+        if (record['peak_mb'] > base['peak_mb'] * (1 + tolerance) and
+                record['peak_mb'] - base['peak_mb'] > BENCHMARK_CONFIG['min_delta_mb']):
+            regressions.append((record['stage'], record['size'], '峰值内存(MB)', base['peak_mb'], record['peak_mb']))
+    return regressions
+
+
+def _run_startup_case(code):
+    """在新进程中执行一次场景，返回 (场景内耗时, 进程总耗时, 已加载的重模块)，失败返回None"""
+    start = time.perf_counter()
+    proc = subprocess.run([sys.executable, '-c', _STARTUP_RUNNER, code, ','.join(HEAVY_MODULES)],
+                          cwd=Path(__file__).parent, capture_output=True, text=True)
+    total = time.perf_counter() - start
+    if proc.returncode != 0 or not proc.stdout.strip():
+        return None
+    result = json.loads(proc.stdout.strip().splitlines()[-1])
+    return result['seconds'], total, result['loaded']
+
+
+def run_startup(repeats=None):
+    """测量各菜单路径的启动耗时（v1.1新增），返回结果字典"""
+    repeats = repeats or BENCHMARK_CONFIG['startup_repeats']
+    print(f"\n🚀 启动耗时（每个场景 {repeats} 个新进程，取中位数）")
+    print(f"   {'场景':<14} {'导入+执行':>10} {'进程总耗时':>10}   已加载的重模块")
+
+    results = []
+    for name, code in STARTUP_CASES:
+        runs = [r for r in (_run_startup_case(code) for _ in range(repeats)) if r is not None]
+        if not runs:
+            print(f"   {name:<14} {'失败':>10}")
+            results.append({'stage': name, 'error': True})
+            continue
+        record = {
+            'stage': name,
+            'repeats': len(runs),
+            'p50': float(np.median([r[0] for r in runs])),
+            'process_p50': float(np.median([r[1] for r in runs])),
+            'loaded': runs[-1][2],
+        }
+        results.append(record)
+        print(f"   {name:<14} {record['p50']:>9.3f}s {record['process_p50']:>9.3f}s   "
+              f"{', '.join(record['loaded']) or '-'}")
+
+    return {
+        'created_at': datetime.now().strftime('%Y-%m-%d %H:%M:%S'),
+        'source': 'startup',
+        'python': platform.python_version(),
+        'machine': platform.platform(),
+        'results': results,
+    }
+
+
+def main():
+    """命令行入口"""
+    args = sys.argv[1:]
+    if args and args[0] == 'startup':
+        report = run_startup()
+        path = save_results(report, BENCHMARK_DIR / f"startup_{datetime.now().strftime('%Y%m%d_%H%M%S')}.json")
+        print(f"\n💾 启动耗时已保存: {path}")
+        return
+    if not args or args[0] not in ('run', 'baseline', 'check'):
+        print(__doc__)
+        return
+
+    command = args[0]
+    replay_date = None
+    if '--replay' in args:
+        pos = args.index('--replay')
+        replay_date = args[pos + 1]
+        args = args[:pos] + args[pos + 2:]
+    sizes = [int(a) for a in args[1:]] or None
+
+    report = run_benchmarks(sizes, replay_date=replay_date)
+    path = save_results(report)
+    print(f"\n💾 基准结果已保存: {path}")
+
+    if command == 'baseline':
+        save_results(report, BASELINE_FILE)
+        print(f"📌 已保存为基线: {BASELINE_FILE}")
+    elif command == 'check':
+        if not BASELINE_FILE.exists():
+            print(f"\n❌ 没有基线文件，请先运行: python benchmark_stages.py baseline")
+            sys.exit(2)
+        with open(BASELINE_FILE, 'r', encoding='utf-8') as f:
+            baseline = json.load(f)
+        regressions = check_regressions(report, baseline)
+        if regressions:
+            print(f"\n🔴 发现 {len(regressions)} 项性能退化（容差 {BENCHMARK_CONFIG['tolerance'] * 100:.0f}%）:")
+            for stage, size, metric, base, current in regressions:
+                print(f"   {stage:<22} 规模{size:>6} {metric}: {base:.3f} → {current:.3f} ({(current / base - 1) * 100:+.0f}%)")
+            sys.exit(1)
+        print("\n✅ 与基线相比没有性能退化")
+
+
+if __name__ == "__main__":
+    main()
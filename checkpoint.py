@@ -0,0 +1,264 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+筛选运行检查点 v1.0
+
+问题背景：
+全市场筛选在第1.5~11步要花几分钟逐只下载K线，各步骤之后的存活股票只保存在 run() 的局部变量里，
+中途崩溃、断网或 Ctrl-C 之后只能从头再来，已经下载过的数据全部白费。
+
+功能：
+1. 保存：每个筛选步骤完成后保存该步骤之后存活的股票，以及本次运行已获取的数据
+   （实时行情、资金流向排名、指数行情、龙虎榜明细、日K线），按批次ID分目录
+2. 续跑：--resume 找到当天最近一次未完成的运行，恢复数据后从最后一个完成的步骤继续，
+   沿用原批次ID、参数、参数方案和板块范围
+3. 清理：运行正常结束后删除本批次的检查点，非当天的检查点在下次运行时删除
+
+原理：
+- 续跑时数据服务恢复为中断前的同一份数据，且不再过期（MarketDataService.pinned），
+  实时行情/情绪检查/已完成步骤都不再调用接口，结果与不中断时相同
+- 第十一步在续跑时重新执行（其中的K线、龙虎榜已恢复，基本不调用接口）
+
+存储：
+- 列式压缩文件（parquet + lz4，压缩/解压都很快），步骤结果和日K线按增量追加写入，每步只写新增部分
+- manifest.json 最后写入（先写临时文件再改名），记录已完成的步骤；中途中断时最多丢失当前步骤
+
+目录结构：
+selection_history/checkpoints/
+    20260115_143012/
+        manifest.json                 # 批次ID、脚本、日期、参数、板块代码、执行计划、已完成步骤
+        stage_01.parquet              # 各步骤之后存活的股票（保留行标签）
+        data_spot.parquet             # 实时行情等全市场数据（每份只写一次）
+        history_01.parquet            # 该步骤新获取的日K线（含代码、起始日期列）
+
+使用方法：
+    python scan_stock_v9.py --mode market --resume --quiet    # 续跑当天最近一次中断的运行
+    python checkpoint.py list                                 # 查看未完成的检查点
+    python checkpoint.py clear                                # 删除全部检查点
+"""
+
+import json
+import shutil
+import sys
+from datetime import datetime
+from pathlib import Path
+
+from lazy_import import LazyModule
+
+pd = LazyModule('pandas')
+
+# ============================================================
+# 检查点配置
+# ============================================================
+CHECKPOINT_DIR = Path(__file__).parent / "selection_history" / "checkpoints"
+
+CHECKPOINT_CONFIG = {
+    "enabled": True,  # 是否在每个步骤后保存检查点
+    "compression": "lz4",  # parquet压缩算法（lz4写入开销最小）
+    "keep_completed": False,  # 运行正常结束后是否保留检查点
+}
+
+ROW_LABEL = '__行标签__'  # 保存步骤结果时保留原行标签的列
+
+
+def _save_frame(df, path):
+    """保存DataFrame（混合类型的object列转为字符串，先写临时文件再改名）"""
+    df = df.copy()
+    for col in df.columns:
+        if df[col].dtype == object:
+            non_null = df[col].dropna()
+            if not non_null.map(lambda v: isinstance(v, str)).all():
+                df[col] = df[col].map(lambda v: v if v is None or isinstance(v, str) or pd.isna(v) else str(v))
+    tmp_path = path.with_suffix(path.suffix + '.tmp')
+    df.to_parquet(tmp_path, compression=CHECKPOINT_CONFIG['compression'], index=False)
+    tmp_path.replace(path)
+
+
+class RunCheckpoint:
+    """
+    一次筛选运行的检查点
+
+    参数：
+    - batch_id: 批次ID（目录名）
+    - script: 脚本标识（续跑时只匹配同一脚本）
+    """
+
+    def __init__(self, batch_id, script, root=None):
+        self.batch_id = batch_id
+        self.script = script
+        self.dir = Path(root or CHECKPOINT_DIR) / batch_id
+        self.manifest = {
+            'batch_id': batch_id,
+            'script': script,
+            'date': datetime.now().strftime('%Y%m%d'),
+            'completed': False,
+            'meta': {},
+            'plan': [],
+            'stages': [],  # [{'name', 'file', 'rows'}]，按完成顺序
+            'data': [],  # 已保存的全市场数据名称
+            'history_files': [],
+            'history_codes': [],
+            'lhb_days': None,
+        }
+        self._saved_frames = {}  # {数据名称: 已保存对象的id}（同一对象不重复写）
+
+    # ---------- 保存 ----------
+
+    def start(self, meta, plan=None):
+        """开始记录：meta 为续跑需要的运行参数（可JSON序列化），plan 为步骤执行顺序"""
+        self.dir.mkdir(parents=True, exist_ok=True)
+        self.manifest['meta'] = meta
+        self.manifest['plan'] = list(plan or [])
+        self._write_manifest()
+
+    def set_plan(self, plan):
+        self.manifest['plan'] = list(plan)
+        self._write_manifest()
+
+    def save_stage(self, name, df, data=None):
+        """保存一个步骤之后存活的股票，以及该步骤期间新获取的数据"""
+        if data is not None:
+            self._save_data(data)
+        seq = len(self.manifest['stages']) + 1
+        file_name = f"stage_{seq:02d}.parquet"
+        _save_frame(df.rename_axis(None).reset_index(names=ROW_LABEL), self.dir / file_name)
+        self.manifest['stages'].append({'name': name, 'file': file_name, 'rows': len(df)})
+        self._write_manifest()
+
+    def save_data(self, data):
+        """只保存数据（没有步骤结果时，如第十一步之后）"""
+        self._save_data(data)
+        self._write_manifest()
+
+    def _save_data(self, data):
+        frames, histories = data.export_state(exclude_codes=set(self.manifest['history_codes']))
+        for name, df in frames.items():
+            if df is None or self._saved_frames.get(name) == id(df):
+                continue
+            _save_frame(df, self.dir / f"data_{name}.parquet")
+            self._saved_frames[name] = id(df)
+            if name not in self.manifest['data']:
+                self.manifest['data'].append(name)
+        if data.lhb_key is not None:
+            self.manifest['lhb_days'] = data.lhb_key[1]
+        histories = {code: item for code, item in histories.items() if item[1] is not None}
+        if histories:
+            seq = len(self.manifest['history_files']) + 1
+            file_name = f"history_{seq:02d}.parquet"
+            frame = pd.concat([df.assign(代码=code, 起始日期=start) for code, (start, df) in histories.items()],
+                              ignore_index=True)
+            _save_frame(frame, self.dir / file_name)
+            self.manifest['history_files'].append(file_name)
+            self.manifest['history_codes'].extend(histories)
+
+    def _write_manifest(self):
+        path = self.dir / "manifest.json"
+        tmp_path = path.with_suffix('.json.tmp')
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(self.manifest, f, ensure_ascii=False, indent=2)
+        tmp_path.replace(path)
+
+    def complete(self):
+        """运行正常结束：删除检查点（或按配置标记为已完成）"""
+        if not self.dir.exists():
+            return
+        if CHECKPOINT_CONFIG['keep_completed']:
+            self.manifest['completed'] = True
+            self._write_manifest()
+        else:
+            shutil.rmtree(self.dir, ignore_errors=True)
+
+    # ---------- 续跑 ----------
+
+    @classmethod
+    def load(cls, path):
+        """从检查点目录读取"""
+        path = Path(path)
+        with open(path / "manifest.json", 'r', encoding='utf-8') as f:
+            manifest = json.load(f)
+        checkpoint = cls(manifest['batch_id'], manifest['script'], root=path.parent)
+        checkpoint.manifest = manifest
+        return checkpoint
+
+    @classmethod
+    def latest(cls, script, root=None):
+        """当天最近一次未完成的运行，没有时返回None"""
+        root = Path(root or CHECKPOINT_DIR)
+        today = datetime.now().strftime('%Y%m%d')
+        for path in sorted(root.glob("*/manifest.json"), reverse=True):
+            try:
+                checkpoint = cls.load(path.parent)
+            except Exception:
+                continue
+            m = checkpoint.manifest
+            if m['script'] == script and m['date'] == today and not m['completed']:
+                return checkpoint
+        return None
+
+    @property
+    def completed_stages(self):
+        return [stage['name'] for stage in self.manifest['stages']]
+
+    def load_stage(self, name):
+        """读取某步骤之后存活的股票（恢复原行标签）"""
+        stage = next(s for s in self.manifest['stages'] if s['name'] == name)
+        df = pd.read_parquet(self.dir / stage['file']).set_index(ROW_LABEL)
+        return df.rename_axis(None)
+
+    def restore_data(self, data):
+        """把保存的数据恢复到数据服务（恢复后不再过期）"""
+        frames = {name: pd.read_parquet(self.dir / f"data_{name}.parquet") for name in self.manifest['data']}
+        histories = {}
+        for file_name in self.manifest['history_files']:
+            frame = pd.read_parquet(self.dir / file_name)
+            for (code, start), df in frame.groupby(['代码', '起始日期'], sort=False):
+                histories[code] = (start, df.drop(columns=['代码', '起始日期']).reset_index(drop=True))
+        data.restore_state(frames, histories, lhb_days=self.manifest['lhb_days'])
+        # 恢复的数据对象与文件一致，续跑时不再重复保存
+        self._saved_frames = {name: id(df) for name, df in frames.items()}
+        return len(histories)
+
+
+def clear_stale(script=None, root=None):
+    """删除非当天的检查点（可只删除某个脚本的）"""
+    root = Path(root or CHECKPOINT_DIR)
+    today = datetime.now().strftime('%Y%m%d')
+    removed = 0
+    for path in root.glob("*/manifest.json"):
+        try:
+            checkpoint = RunCheckpoint.load(path.parent)
+        except Exception:
+            continue
+        m = checkpoint.manifest
+        if (script is None or m['script'] == script) and m['date'] != today:
+            shutil.rmtree(path.parent, ignore_errors=True)
+            removed += 1
+    return removed
+
+
+def main():
+    """命令行入口"""
+    args = sys.argv[1:]
+    if not args:
+        print(__doc__)
+        return
+
+    command = args[0]
+    if command == 'list':
+        paths = sorted(CHECKPOINT_DIR.glob("*/manifest.json"))
+        if not paths:
+            print("暂无检查点")
+        for path in paths:
+            m = RunCheckpoint.load(path.parent).manifest
+            last = m['stages'][-1]['name'] if m['stages'] else '（尚未完成任何步骤）'
+            status = '已完成' if m['completed'] else '未完成'
+            print(f"   {m['batch_id']}  {m['script']:<26} {status}  最后完成: {last}  日K线 {len(m['history_codes'])} 只")
+    elif command == 'clear':
+        shutil.rmtree(CHECKPOINT_DIR, ignore_errors=True)
+        print("✅ 已删除全部检查点")
+    else:
+        print(__doc__)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,159 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+截止时间预算 v1.0
+
+问题背景：
+次日冲高策略的结果必须在15:00收盘前拿到才有意义。数据源变慢时，第十一步逐只获取游资数据、
+一年K线（价格位置）和所属板块，整次运行可能拖过收盘，结果再完整也没有用。
+
+功能：
+1. 截止时间：--deadline 14:55（当日时刻）或 --budget 600（从现在起的秒数）
+2. 进度估算：按维度记录每只股票的实际耗时（滑动平均），估算剩余候选股全部完整分析所需时间
+3. 逐级降级：时间不够时按 DEADLINE_CONFIG['degrade_order'] 依次跳过可选维度，
+   用近似值代替（价格位置优先使用内存中已有的一年K线）；所属板块查询不够时间时不查询
+4. 截止即止：到达截止时间（扣除保留时间）后剩余候选股不再分析，已完成的照常输出；
+   前面的步骤已经用完时间时，仍按全部降级分析排在最前面的几只（min_analyzed），保证有可用结果
+5. 标记：每只股票的"降级因子"列、运行汇总、无人值守结果的 degraded 字段
+
+说明：
+候选股按已知信号算出的综合评分上界从高到低分析，时间不够时被降级或放弃的是排在后面、最不可能入选的股票。
+风险收益比和相对强度只用近期K线，属于必需维度，不参与降级。
+
+使用方法：
+    python scan_stock_v9.py --mode market --deadline 14:55 --quiet
+    python scan_stock_v9.py --mode sector --sector 半导体 --budget 120
+"""
+
+import time
+from collections import defaultdict
+from contextlib import contextmanager
+from datetime import datetime, timedelta
+
+# ============================================================
+# 截止时间配置
+# ============================================================
+DEADLINE_CONFIG = {
+    "reserve_seconds": 30,  # 为保存结果/周记录/剖析文件保留的时间
+    "degrade_order": ['游资', '价格位置'],  # 时间不够时依次降级的维度
+    "initial_estimates": {  # 还没有实测值时每只股票各维度的估计耗时（秒）
+        '风险收益比': 1.0,
+        '游资': 0.5,
+        '相对强度': 0.5,
+        '价格位置': 1.5,
+        '所属板块': 0.5,
+    },
+    "smoothing": 0.3,  # 实测耗时滑动平均的新值权重
+    "min_analyzed": 5,  # 到达截止时间时仍至少分析的候选股数（全部降级，保证有可用结果）
+    "fallback_scores": {  # 降级维度的近似得分（游资按无上榜处理，价格位置取满分18的一半）
+        '游资': 0,
+        '价格位置': 9,
+    },
+}
+
+SECTOR_FACTOR = '所属板块'
+
+
+def parse_deadline(deadline=None, budget=None, now=None):
+    """
+    解析截止时间
+
+    参数：
+    - deadline: 当日时刻 "HH:MM" 或 "HH:MM:SS"
+    - budget: 从现在起的秒数
+
+    返回：datetime 或 None（两者都没有给出时）；格式错误抛出 ValueError
+    """
+    now = now or datetime.now()
+    if budget is not None:
+        return now + timedelta(seconds=float(budget))
+    if not deadline:
+        return None
+    for fmt in ('%H:%M:%S', '%H:%M'):
+        try:
+            t = datetime.strptime(deadline, fmt).time()
+            return datetime.combine(now.date(), t)
+        except ValueError:
+            continue
+    raise ValueError(f"截止时间格式应为 HH:MM: {deadline}")
+
+
+class DeadlineBudget:
+    """一次运行的时间预算：记录各维度耗时，决定剩余候选股需要降级的维度"""
+
+    def __init__(self, deadline, reserve_seconds=None):
+        self.deadline = deadline
+        self.reserve = DEADLINE_CONFIG['reserve_seconds'] if reserve_seconds is None else reserve_seconds
+        self.estimates = dict(DEADLINE_CONFIG['initial_estimates'])
+        self.samples = defaultdict(int)
+        self.degraded = defaultdict(int)  # {维度: 被降级的股票数}
+        self.abandoned = 0  # 到达截止时间后未分析的候选股数
+
+    def seconds_left(self):
+        """距截止时间（扣除保留时间）的剩余秒数"""
+        return (self.deadline - datetime.now()).total_seconds() - self.reserve
+
+    def expired(self):
+        return self.seconds_left() <= 0
+
+    def record(self, factor, seconds):
+        """记录一次实测耗时（滑动平均）"""
+        if self.samples[factor] == 0:
+            self.estimates[factor] = seconds
+        else:
+            alpha = DEADLINE_CONFIG['smoothing']
+            self.estimates[factor] = (1 - alpha) * self.estimates[factor] + alpha * seconds
+        self.samples[factor] += 1
+
+    @contextmanager
+    def timed(self, factor):
+        """计时一个维度的分析"""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.record(factor, time.perf_counter() - start)
+
+    def plan(self, remaining, required, optional=None):
+        """
+        剩余候选股要降级的维度
+
+        参数：
+        - remaining: 包括当前股票在内还要分析的候选股数
+        - required: 必需维度（不降级）
+        - optional: 可选维度，默认 DEADLINE_CONFIG['degrade_order']
+
+        返回：本只股票要降级的维度集合（按降级顺序逐个加入，直到剩余时间够用）
+        """
+        optional = DEADLINE_CONFIG['degrade_order'] if optional is None else optional
+        left = self.seconds_left()
+        per_stock = sum(self.estimates.get(f, 0) for f in list(required) + list(optional))
+        skipped = set()
+        for factor in optional:
+            if per_stock * remaining <= left:
+                break
+            skipped.add(factor)
+            per_stock -= self.estimates.get(factor, 0)
+        return skipped
+
+    def mark(self, factor, count=1):
+        """记录实际被降级的股票数"""
+        self.degraded[factor] += count
+
+    def affordable(self, factor, count):
+        """剩余时间是否够为 count 只股票执行该维度"""
+        return self.estimates.get(factor, 0) * count <= self.seconds_left()
+
+    def summary(self):
+        """降级统计（无人值守结果的 degraded 字段）"""
+        result = {factor: count for factor, count in self.degraded.items() if count}
+        if self.abandoned:
+            result['未分析'] = self.abandoned
+        return result
+
+    def describe(self):
+        """一行文字说明"""
+        parts = [f"{factor} {count}只" for factor, count in self.degraded.items() if count]
+        if self.abandoned:
+            parts.append(f"截止时未分析 {self.abandoned}只")
+        return '、'.join(parts) if parts else '无'
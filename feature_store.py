@@ -0,0 +1,160 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+逐日因子库 v1.0
+
+问题背景：
+第十一步对每只候选股计算约30个因子（相对强度、价格位置、龙头排名、止损止盈位、
+游资强度/时机/风险、综合评分等），但 save_selection_result 只保存最终≤20只股票的12个字段，
+其余候选股的因子全部丢弃。做因子研究或校准评级时只能重新通过接口全部计算一遍。
+
+功能：
+1. 保存：每次运行把第十一步评估过的全部候选股的完整因子向量按日期分区保存（parquet + zstd），
+   并标记是否入选
+2. 读取：按日期区间只打开对应分区，按代码过滤时下推到parquet行过滤，可只读取部分列
+3. 同日多次运行各存一份文件，读取时默认每只股票每天只保留最后一次运行的结果
+
+目录结构：
+feature_store/
+    date=20260115/
+        factors_20260115_143012.parquet   # 文件名为批次ID
+
+使用方法：
+    python feature_store.py list                          # 查看已保存的日期
+    python feature_store.py show 20260101 20260131 600000 # 查看某只股票的因子记录
+"""
+
+import sys
+from pathlib import Path
+from market_archive import save_frame, load_frame
+from lazy_import import LazyModule
+
+pd = LazyModule('pandas')
+
+# ============================================================
+# 因子库配置
+# ============================================================
+FEATURE_STORE_DIR = Path(__file__).parent / "feature_store"  # 因子库根目录
+
+FEATURE_STORE_CONFIG = {
+    "auto_save": True,  # 筛选器运行第十一步后自动保存全部候选股因子
+}
+
+
+class FeatureStore:
+    """逐日因子库（按选股日期分区）"""
+
+    def __init__(self, store_dir=None):
+        self.store_dir = Path(store_dir) if store_dir else FEATURE_STORE_DIR
+
+    @staticmethod
+    def _normalize_date(date):
+        """统一日期格式为YYYYMMDD"""
+        if hasattr(date, 'strftime'):
+            return date.strftime('%Y%m%d')
+        return str(date).replace('-', '')
+
+    def _date_dir(self, date_str):
+        return self.store_dir / f"date={date_str}"
+
+    def save(self, df, batch_id, selection_date):
+        """
+        保存一次运行的全部候选股因子
+
+        参数：
+        - df: 候选股因子表（每行一只股票，需含'代码'列）
+        - batch_id: 批次ID（作为文件名，同日多次运行互不覆盖）
+        - selection_date: 选股日期（YYYY-MM-DD 或 YYYYMMDD）
+        返回：保存路径，df为空时返回None
+        """
+        if df is None or df.empty:
+            return None
+
+        df = df.copy()
+        for col in df.columns:
+            # 字典/列表类明细（如游资分析详情）无法按列存储，转为字符串
+            if df[col].dtype == object:
+                df[col] = df[col].map(lambda v: str(v) if isinstance(v, (dict, list, tuple, set)) else v)
+        df.insert(0, '批次ID', batch_id)
+        df.insert(0, '选股日期', pd.to_datetime(str(selection_date)).strftime('%Y-%m-%d'))
+        df = df.sort_values('代码')  # 按代码排序，代码过滤时可利用行组统计跳过无关数据
+
+        path = self._date_dir(self._normalize_date(selection_date)) / f"factors_{batch_id}.parquet"
+        save_frame(df, path)
+        return path
+
+    def list_dates(self):
+        """列出已保存的日期（升序，YYYYMMDD）"""
+        if not self.store_dir.exists():
+            return []
+        return sorted(p.name.split('=', 1)[1] for p in self.store_dir.glob("date=*") if p.is_dir())
+
+    def load(self, start_date=None, end_date=None, codes=None, columns=None, latest_only=True):
+        """
+        读取区间内的因子记录
+
+        参数：
+        - start_date / end_date: 日期区间（含），None表示不限
+        - codes: 股票代码列表，None表示全部
+        - columns: 只读取的因子列，None表示全部（'选股日期'、'批次ID'、'代码'总会读取）
+        - latest_only: 同一股票同一天有多次运行时只保留最后一次
+        返回：DataFrame（无记录时为空表）
+        """
+        start = self._normalize_date(start_date) if start_date else None
+        end = self._normalize_date(end_date) if end_date else None
+        dates = [d for d in self.list_dates() if (start is None or d >= start) and (end is None or d <= end)]
+
+        if columns is not None:
+            columns = ['选股日期', '批次ID', '代码'] + [c for c in columns if c not in ('选股日期', '批次ID', '代码')]
+        filters = [('代码', 'in', [str(c) for c in codes])] if codes is not None else None
+
+        frames = []
+        for date_str in dates:
+            for path in sorted(self._date_dir(date_str).glob("factors_*.parquet")):
+                try:
+                    frames.append(load_frame(path, columns=columns, filters=filters))
+                except Exception as e:
+                    print(f"   ⚠️ 读取{path.name}失败: {e}")
+
+        frames = [f for f in frames if not f.empty]
+        if not frames:
+            return pd.DataFrame()
+
+        df = pd.concat(frames, ignore_index=True)
+        if latest_only:
+            df = df.sort_values(['选股日期', '批次ID']).drop_duplicates(['选股日期', '代码'], keep='last')
+        return df.reset_index(drop=True)
+
+
+def main():
+    """命令行入口"""
+    args = sys.argv[1:]
+    if not args:
+        print(__doc__)
+        return
+
+    store = FeatureStore()
+    command = args[0]
+
+    if command == 'list':
+        dates = store.list_dates()
+        if not dates:
+            print("\n暂无因子记录")
+            return
+        print(f"\n📂 因子库共 {len(dates)} 个交易日: {dates[0]} ~ {dates[-1]}")
+        for date_str in dates[-20:]:
+            files = list(store._date_dir(date_str).glob("factors_*.parquet"))
+            print(f"   {date_str}: {len(files)} 次运行")
+    elif command == 'show' and len(args) >= 4:
+        df = store.load(args[1], args[2], codes=args[3:])
+        if df.empty:
+            print("\n暂无匹配的因子记录")
+            return
+        with pd.option_context('display.max_columns', None, 'display.width', 200):
+            print(df.T)
+    else:
+        print(__doc__)
+
+
+if __name__ == "__main__":
+    main()
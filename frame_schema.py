@@ -0,0 +1,190 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+行情数据内部类型表 v1.0
+
+问题背景：
+stock_zh_a_spot_em 全市场行情和每只股票的日K线，数值列一律是float64，代码/名称是字符串对象，
+日期是datetime或字符串。涨跌幅、换手率这类两位小数的比率用float32足够，代码和名称用分类编码
+只存一份字符串，日期用int32天数只占4字节。回测要把全市场多年的K线常驻内存时，这些浪费成倍放大。
+
+原理：
+1. 数据进入程序时（接口返回、K线库加载）按类型表统一转换一次，之后各步骤直接使用
+2. 比率类（量比/换手率/振幅等）降为float32；价格和金额保留float64，
+   保证入库的选股价格、止损止盈位与原来完全一致；涨跌幅保留float64（见说明）
+3. 代码、名称转为分类类型；K线日期转为int32日序号（自1970-01-01起的天数）
+4. 输出/保存前用 widen_for_output 把float32恢复为float64（按最短十进制表示，9.9仍是9.9），
+   避免结果文件里出现9.899999618这样的数
+
+说明：
+numpy比较float32数组与Python浮点数时，把阈值也转为float32再比较。阈值是两位小数的常量时
+（如 df['换手率'] >= 2.5），结果与float64一致；阈值是计算出来的时不一致：第八步
+df['涨跌幅'] > 大盘涨幅 + 2，大盘-0.39%时阈值为1.6099999999999999，float64下1.61通过，
+float32下两者舍入为同一个数而不通过。涨跌幅要与大盘涨幅相加减、与计算阈值比较，因此保留float64；
+float32比率列只与常量阈值比较，不要与计算值或float64列直接比较。
+"""
+
+from lazy_import import LazyModule
+
+np = LazyModule('numpy')
+pd = LazyModule('pandas')
+
+# ============================================================
+# 类型表配置
+# ============================================================
+SCHEMA_CONFIG = {
+    "enabled": True,  # 关闭后只把数值列转为float64，不降精度、不转分类和日序号（排查类型问题时使用）
+}
+
+RATIO_DTYPE = 'float32'  # 比率类数值
+PANEL_DTYPE = 'float32'  # 回测宽表数值（日期 × 代码）
+EXACT_COLUMNS = {'涨跌幅'}  # 与计算阈值比较的列，行情表和回测宽表中都保留float64（见模块说明）
+
+# stock_zh_a_spot_em 全市场实时行情
+SPOT_SCHEMA = {
+    '序号': 'int',
+    '代码': 'category',
+    '名称': 'category',
+    '最新价': 'float64',
+    '涨跌幅': 'float64',
+    '涨跌额': RATIO_DTYPE,
+    '成交量': 'float64',
+    '成交额': 'float64',
+    '振幅': RATIO_DTYPE,
+    '最高': 'float64',
+    '最低': 'float64',
+    '今开': 'float64',
+    '昨收': 'float64',
+    '量比': RATIO_DTYPE,
+    '换手率': RATIO_DTYPE,
+    '市盈率-动态': RATIO_DTYPE,
+    '市净率': RATIO_DTYPE,
+    '总市值': 'float64',
+    '流通市值': 'float64',
+    '涨速': RATIO_DTYPE,
+    '5分钟涨跌': RATIO_DTYPE,
+    '60日涨跌幅': RATIO_DTYPE,
+    '年初至今涨跌幅': RATIO_DTYPE,
+}
+
+# stock_zh_a_hist 个股日K线
+HISTORY_SCHEMA = {
+    '日期': 'date',
+    '股票代码': 'category',
+    '开盘': 'float64',
+    '收盘': 'float64',
+    '最高': 'float64',
+    '最低': 'float64',
+    '成交量': 'int',
+    '成交额': 'float64',
+    '振幅': RATIO_DTYPE,
+    '涨跌幅': 'float64',
+    '涨跌额': RATIO_DTYPE,
+    '换手率': RATIO_DTYPE,
+}
+
+
+def panel_dtype(field):
+    """回测宽表字段的数值类型（EXACT_COLUMNS 保留float64，其余为PANEL_DTYPE）"""
+    return 'float64' if field in EXACT_COLUMNS else PANEL_DTYPE
+
+
+def date_to_ordinal(values):
+    """日期列转为int32日序号（已是整数时原样返回）"""
+    values = pd.Series(values)
+    if pd.api.types.is_integer_dtype(values):
+        return values.astype('int32')
+    days = pd.to_datetime(values).to_numpy().astype('datetime64[D]').astype('int64')
+    return pd.Series(days.astype('int32'), index=values.index, name=values.name)
+
+
+def ordinal_to_datetime(values):
+    """int32日序号转回datetime"""
+    values = pd.Series(values)
+    return pd.Series(pd.to_datetime(values.to_numpy().astype('datetime64[D]')), index=values.index, name=values.name)
+
+
+def _convert(series, kind):
+    if not SCHEMA_CONFIG['enabled']:
+        return series if kind in ('category', 'date') else pd.to_numeric(series, errors='coerce')
+    if kind == 'category':
+        return series.astype('category')
+    if kind == 'date':
+        return date_to_ordinal(series)
+    values = pd.to_numeric(series, errors='coerce')
+    if kind == 'int':
+        # 有缺失值（停牌等）时无法用整数表示，保持原类型
+        return pd.to_numeric(values, downcast='integer') if not values.isna().any() else values
+    return values.astype(kind)
+
+
+def compact_frame(df, schema):
+    """
+    按类型表转换DataFrame（不修改传入的DataFrame），类型表中没有的列保持不变
+
+    参数：
+    - df: 接口返回或从文件读取的DataFrame
+    - schema: {列名: 'category' / 'date' / 'int' / numpy数值类型}
+    """
+    if df is None or df.empty:
+        return df
+    df = df.copy(deep=False)  # 浅拷贝：替换列不影响调用方持有的原DataFrame
+    for col, kind in schema.items():
+        if col in df.columns:
+            try:
+                df[col] = _convert(df[col], kind)
+            except (TypeError, ValueError):
+                pass  # 个别列格式异常时保留原列，不影响其余列
+    return df
+
+
+def compact_spot(df):
+    """全市场实时行情按内部类型表转换"""
+    return compact_frame(df, SPOT_SCHEMA)
+
+
+def compact_history(df):
+    """个股日K线按内部类型表转换（日期转为int32日序号）"""
+    return compact_frame(df, HISTORY_SCHEMA)
+
+
+def widen_for_output(df):
+    """
+    输出/保存前恢复通用类型：float32 → float64（按最短十进制表示），分类 → 原始值
+    """
+    if df is None or df.empty:
+        return df
+    df = df.copy(deep=False)
+    for col in df.columns:
+        dtype = df[col].dtype
+        if dtype == np.float32:
+            df[col] = df[col].astype(str).astype('float64')
+        elif isinstance(dtype, pd.CategoricalDtype):
+            df[col] = df[col].astype(dtype.categories.dtype)
+    return df
+
+
+def attach_columns(df, index, records):
+    """
+    按行标签选出保留的行，并把逐行计算的新字段整列写入
+
+    替代"row.copy() 逐行追加新字段再 pd.DataFrame(行列表)"的写法：
+    不再为每一行复制一份Series，原有列的float32/分类类型也不会退化成object。
+
+    参数：
+    - df: 原DataFrame（行标签唯一）
+    - index: 保留行的行标签列表（按输出顺序）
+    - records: 与index一一对应的新字段字典列表，缺少的字段为NaN
+    """
+    result = df.loc[list(index)]
+    extra = pd.DataFrame.from_records(list(records), index=result.index) if len(index) else pd.DataFrame()
+    for col in extra.columns:
+        result[col] = extra[col]
+    return result
+
+
+def frame_memory_mb(df):
+    """DataFrame内存占用（MB，含字符串对象）"""
+    if df is None:
+        return 0.0
+    return df.memory_usage(deep=True).sum() / 1024 / 1024
@@ -0,0 +1,304 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+选股历史记录库 v1.0（SQLite）
+
+问题背景：
+原来每次保存都要整体重写 history_index.json 且只保留最近30个批次，
+get_consecutive_stocks / get_last_selection 每次调用都要重新打开并解析多个JSON文件，
+批次越多越慢，超过30个批次的历史在索引里直接丢失。
+
+功能：
+1. 单一数据库：selection_history/history.db，批次、入选股票、因子值三张表，日期和代码建索引
+2. 追加写入：每次保存只插入本批次的行，不重写历史，不截断
+3. 查询接口：最近批次、指定批次、按日期聚合的入选代码、全部选股记录（DataFrame）
+4. 兼容迁移：首次创建数据库时自动导入已有的 batch_*.json
+
+表结构：
+batches        批次（batch_id, source, selection_time, selection_date, target_sector, month_theme, strategy, stock_count）
+batch_stocks   入选股票（batch_id, code, name, selection_price, rating）
+stock_factors  因子值（batch_id, code, factor, value），保存批次股票字典中的其余字段
+
+使用方法：
+    python history_store.py list          # 查看最近的批次
+    python history_store.py import        # 重新导入 selection_history/batch_*.json
+"""
+
+import sqlite3
+import json
+import sys
+import threading
+from contextlib import contextmanager
+from datetime import datetime
+from pathlib import Path
+from lazy_import import LazyModule
+
+pd = LazyModule('pandas')  # 只有 load_selection_records 需要，查看历史列表不加载pandas
+
+# ============================================================
+# 历史库配置
+# ============================================================
+HISTORY_DIR = Path(__file__).parent / "selection_history"  # 历史记录保存目录
+HISTORY_DB = HISTORY_DIR / "history.db"  # 历史记录数据库
+
+HISTORY_STORE_CONFIG = {
+    "timeout": 30,  # 等待其他进程写锁的秒数（scan_stock_v9与select_stock_v2_enhanced可能同时写入）
+    "legacy_pattern": "batch_*.json",  # 旧版批次文件（首次建库时自动导入）
+}
+
+STOCK_COLUMNS = ['code', 'name', 'selection_price', 'rating']  # batch_stocks表的固定字段，其余字段存入stock_factors
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS batches (
+    batch_id TEXT PRIMARY KEY,
+    source TEXT NOT NULL,
+    selection_time TEXT,
+    selection_date TEXT NOT NULL,
+    target_sector TEXT,
+    month_theme TEXT,
+    strategy TEXT,
+    stock_count INTEGER
+);
+CREATE TABLE IF NOT EXISTS batch_stocks (
+    batch_id TEXT NOT NULL,
+    seq INTEGER NOT NULL,
+    code TEXT NOT NULL,
+    name TEXT,
+    selection_price REAL,
+    rating TEXT,
+    PRIMARY KEY (batch_id, code)
+);
+CREATE TABLE IF NOT EXISTS stock_factors (
+    batch_id TEXT NOT NULL,
+    code TEXT NOT NULL,
+    factor TEXT NOT NULL,
+    value,
+    PRIMARY KEY (batch_id, code, factor)
+);
+CREATE INDEX IF NOT EXISTS idx_batches_date ON batches(selection_date);
+CREATE INDEX IF NOT EXISTS idx_batches_source ON batches(source, batch_id);
+CREATE INDEX IF NOT EXISTS idx_batch_stocks_code ON batch_stocks(code);
+"""
+
+
+_batch_id_lock = threading.Lock()
+_last_batch_id = {'base': None, 'seq': 1}
+
+
+def new_batch_id(now=None):
+    """
+    生成批次ID（YYYYmmdd_HHMMSS）
+
+    同一进程同一秒内生成多个批次时（常驻服务连续处理请求），依次追加 _2、_3 …，
+    避免后一个批次覆盖前一个（batches 以 batch_id 为主键）；按字符串排序仍与生成顺序一致
+    """
+    base = (now or datetime.now()).strftime('%Y%m%d_%H%M%S')
+    with _batch_id_lock:
+        if base == _last_batch_id['base']:
+            _last_batch_id['seq'] += 1
+            return f"{base}_{_last_batch_id['seq']}"
+        _last_batch_id['base'], _last_batch_id['seq'] = base, 1
+        return base
+
+
+def _to_sql(value):
+    """numpy标量转为Python原生类型（sqlite3不接受np.int64/np.bool_）"""
+    if hasattr(value, 'item'):
+        value = value.item()
+    if isinstance(value, (list, dict)):
+        return json.dumps(value, ensure_ascii=False)
+    return value
+
+
+class HistoryStore:
+    """选股历史记录库"""
+
+    def __init__(self, db_path=None):
+        self.db_path = Path(db_path) if db_path else HISTORY_DB
+        self.db_path.parent.mkdir(parents=True, exist_ok=True)
+        is_new = not self.db_path.exists()
+
+        with self._connect() as conn:
+            conn.executescript(SCHEMA)
+
+        if is_new:
+            self.import_legacy_json()
+
+    @contextmanager
+    def _connect(self):
+        """
+        打开一个连接：正常结束提交、异常回滚，退出时关闭
+        （sqlite3连接自身的with只提交不关闭，常驻服务中每次查询都会遗留一个连接和文件句柄）
+        """
+        conn = sqlite3.connect(self.db_path, timeout=HISTORY_STORE_CONFIG['timeout'])
+        conn.row_factory = sqlite3.Row
+        try:
+            with conn:
+                yield conn
+        finally:
+            conn.close()
+
+    def save_batch(self, selection_data, source):
+        """
+        保存一个批次（同一batch_id重复保存时覆盖）
+
+        参数：
+        - selection_data: 与原batch_*.json结构相同的字典（batch_id, selection_date, stocks, ...）
+        - source: 来源脚本（如 'scan_stock_v9'、'select_stock_v2_enhanced'）
+        """
+        batch_id = selection_data['batch_id']
+        stock_rows = []
+        factor_rows = []
+        for seq, stock in enumerate(selection_data.get('stocks', [])):
+            code = stock['code']
+            stock_rows.append((batch_id, seq, code, stock.get('name'),
+                               _to_sql(stock.get('selection_price')), stock.get('rating')))
+            for factor, value in stock.items():
+                if factor not in STOCK_COLUMNS:
+                    factor_rows.append((batch_id, code, factor, _to_sql(value)))
+
+        with self._connect() as conn:
+            conn.execute("DELETE FROM batch_stocks WHERE batch_id = ?", (batch_id,))
+            conn.execute("DELETE FROM stock_factors WHERE batch_id = ?", (batch_id,))
+            conn.execute(
+                "INSERT OR REPLACE INTO batches VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                (batch_id, source, selection_data.get('selection_time'), selection_data['selection_date'],
+                 selection_data.get('target_sector'), selection_data.get('month_theme'),
+                 selection_data.get('strategy'), len(stock_rows)))
+            conn.executemany("INSERT OR REPLACE INTO batch_stocks VALUES (?, ?, ?, ?, ?, ?)", stock_rows)
+            conn.executemany("INSERT OR REPLACE INTO stock_factors VALUES (?, ?, ?, ?)", factor_rows)
+
+    def list_batches(self, source=None, limit=None):
+        """批次摘要列表（最新的在前）"""
+        sql = "SELECT * FROM batches"
+        params = []
+        if source:
+            sql += " WHERE source = ?"
+            params.append(source)
+        sql += " ORDER BY batch_id DESC"
+        if limit:
+            sql += " LIMIT ?"
+            params.append(limit)
+
+        with self._connect() as conn:
+            return [dict(row) for row in conn.execute(sql, params)]
+
+    def count_batches(self, source=None):
+        """批次总数"""
+        with self._connect() as conn:
+            if source:
+                return conn.execute("SELECT COUNT(*) FROM batches WHERE source = ?", (source,)).fetchone()[0]
+            return conn.execute("SELECT COUNT(*) FROM batches").fetchone()[0]
+
+    def get_batch(self, batch_id):
+        """读取指定批次，返回与原batch_*.json相同结构的字典，不存在时返回None"""
+        with self._connect() as conn:
+            batch = conn.execute("SELECT * FROM batches WHERE batch_id = ?", (batch_id,)).fetchone()
+            if batch is None:
+                return None
+            stocks = conn.execute(
+                "SELECT code, name, selection_price, rating FROM batch_stocks WHERE batch_id = ? ORDER BY seq",
+                (batch_id,)).fetchall()
+            factors = conn.execute(
+                "SELECT code, factor, value FROM stock_factors WHERE batch_id = ? ORDER BY rowid",
+                (batch_id,)).fetchall()
+
+        selection_data = {k: batch[k] for k in batch.keys() if batch[k] is not None or k == 'target_sector'}
+        stock_map = {row['code']: dict(row) for row in stocks}
+        for row in factors:
+            if row['code'] in stock_map:
+                stock_map[row['code']][row['factor']] = row['value']
+        selection_data['stocks'] = list(stock_map.values())
+        return selection_data
+
+    def get_last_batch(self, source=None):
+        """读取最近一个批次，没有记录时返回None"""
+        batches = self.list_batches(source=source, limit=1)
+        return self.get_batch(batches[0]['batch_id']) if batches else None
+
+    def get_date_stock_sets(self, source=None, max_dates=10):
+        """
+        最近max_dates个选股日期各自的入选代码
+
+        同一天有多个批次时取当天最后一个批次（与原history_index按最新优先遍历的口径一致）
+        返回：{选股日期: set(代码)}
+        """
+        sql = """
+            SELECT b.selection_date, s.code
+            FROM batch_stocks s
+            JOIN (
+                SELECT selection_date, MAX(batch_id) AS batch_id
+                FROM batches {where}
+                GROUP BY selection_date
+                ORDER BY selection_date DESC
+                LIMIT ?
+            ) b ON s.batch_id = b.batch_id
+        """.format(where="WHERE source = ?" if source else "")
+        params = ([source] if source else []) + [max_dates]
+
+        date_stocks = {}
+        with self._connect() as conn:
+            for row in conn.execute(sql, params):
+                date_stocks.setdefault(row['selection_date'], set()).add(row['code'])
+        return date_stocks
+
+    def load_selection_records(self, source=None):
+        """全部(批次, 股票)选股记录，返回DataFrame[batch_id, selection_date, code, name, rating, selection_price]"""
+        sql = """
+            SELECT s.batch_id, b.selection_date, s.code, s.name, s.rating, s.selection_price
+            FROM batch_stocks s JOIN batches b ON s.batch_id = b.batch_id
+        """
+        params = []
+        if source:
+            sql += " WHERE b.source = ?"
+            params.append(source)
+        sql += " ORDER BY s.batch_id, s.seq"
+
+        with self._connect() as conn:
+            return pd.read_sql_query(sql, conn, params=params)
+
+    def import_legacy_json(self, history_dir=None):
+        """导入旧版 batch_*.json（带strategy字段的是select_stock_v2_enhanced保存的），返回导入批次数"""
+        history_dir = Path(history_dir) if history_dir else self.db_path.parent
+        imported = 0
+        for batch_file in sorted(history_dir.glob(HISTORY_STORE_CONFIG['legacy_pattern'])):
+            try:
+                with open(batch_file, 'r', encoding='utf-8') as f:
+                    selection_data = json.load(f)
+                source = 'select_stock_v2_enhanced' if 'strategy' in selection_data else 'scan_stock_v9'
+                self.save_batch(selection_data, source)
+                imported += 1
+            except Exception as e:
+                print(f"   ⚠️ 导入{batch_file.name}失败: {e}")
+
+        if imported:
+            print(f"   📥 已将 {imported} 个旧版批次文件导入历史库: {self.db_path.name}")
+        return imported
+
+
+def main():
+    """命令行入口"""
+    args = sys.argv[1:]
+    if not args:
+        print(__doc__)
+        return
+
+    store = HistoryStore()
+    command = args[0]
+
+    if command == 'list':
+        batches = store.list_batches(limit=30)
+        print(f"\n📚 历史库共 {store.count_batches()} 个批次，最近 {len(batches)} 个：\n")
+        print(f"{'批次ID':<20} {'来源':<26} {'选股时间':<22} {'股票数':>6}")
+        print("-" * 78)
+        for batch in batches:
+            print(f"{batch['batch_id']:<20} {batch['source']:<26} {batch['selection_time'] or '':<22} {batch['stock_count']:>6}")
+    elif command == 'import':
+        store.import_legacy_json()
+    else:
+        print(f"❌ 未知命令: {command}")
+        print(__doc__)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,50 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+按需导入 v1.0
+
+问题背景：
+akshare 导入时会加载大量子模块，pandas 也要零点几秒；选股脚本在模块顶部导入它们，
+即使只是查看主题日历、历史记录、周记录这类只读本地JSON/SQLite的菜单，也要先等数据栈全部加载完。
+
+原理：
+LazyModule 是模块的占位对象，第一次访问属性（如 pd.DataFrame、ak.stock_zh_a_spot_em）时才真正导入，
+之后把取到的属性缓存在占位对象上，再次访问与直接使用模块没有区别。
+
+说明：
+- 只适用于"import xxx as yy"后通过 yy.属性 使用的模块；from xxx import yyy 仍会立即导入
+- 模块级代码（常量定义、函数默认参数）不能访问占位对象的属性，否则导入时就会触发加载
+
+使用方法：
+    pd = LazyModule('pandas')
+    ak = InstrumentedModule(LazyModule('akshare'))
+"""
+
+import importlib
+
+
+class LazyModule:
+    """首次访问属性时才导入的模块占位对象"""
+
+    def __init__(self, name):
+        object.__setattr__(self, '_name', name)
+        object.__setattr__(self, '_module', None)
+
+    def _load(self):
+        module = self._module
+        if module is None:
+            module = importlib.import_module(self._name)
+            object.__setattr__(self, '_module', module)
+        return module
+
+    def __getattr__(self, attr):
+        if attr.startswith('__'):
+            raise AttributeError(attr)
+        value = getattr(self._load(), attr)
+        object.__setattr__(self, attr, value)  # 缓存到实例属性，之后不再经过 __getattr__
+        return value
+
+    def __repr__(self):
+        state = "已加载" if self._module is not None else "未加载"
+        return f"<LazyModule {self._name} ({state})>"
+
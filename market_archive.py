@@ -0,0 +1,480 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+A股行情时点快照归档 v1.1
+
+问题背景：
+stock_zh_a_spot_em 和 stock_individual_fund_flow_rank(indicator="今日") 只返回当前值，
+当日收盘后第1~5步的输入数据就永久丢失，历史选股无法复现，也无法做忠实回测。
+
+功能：
+1. 归档：把每日的实时行情、资金流向排名、指数行情按日期分区保存为压缩列式文件（parquet + zstd）
+2. 龙虎榜：按上榜日期分区保存龙虎榜明细，回测时可以拼出任意日期的回溯窗口
+3. 时点加载：load_market_as_of(日期, 时间) 还原"D日T时刻的市场"，供筛选器回放使用
+4. 日K线库：BarStore 按股票保存前复权日K线，回测时一次性加载为宽表（日期 × 代码）
+
+目录结构：
+market_archive/
+    date=20260115/
+        spot_143000.parquet        # 14:30:00 抓取的全市场实时行情
+        fund_flow_143000.parquet   # 同一时刻的资金流向排名
+        index_spot_143000.parquet  # 同一时刻的指数行情
+        lhb.parquet                # 当日龙虎榜明细（收盘后数据，每日一份）
+bar_store/
+    stock_600000.parquet           # 个股前复权日K线
+    index_000300.parquet           # 指数日K线
+    names.parquet                  # 代码-名称对照表
+
+使用方法：
+    python market_archive.py archive              # 立即抓取并归档当前市场
+    python market_archive.py lhb 20260101 20260115 # 补齐一段日期的龙虎榜
+    python market_archive.py list                 # 查看已归档的日期
+    python market_archive.py bars 20230101        # 同步全市场日K线（从指定日期开始）
+"""
+
+from datetime import datetime
+from concurrent.futures import ThreadPoolExecutor, as_completed
+import warnings
+import sys
+from pathlib import Path
+from frame_schema import panel_dtype
+from lazy_import import LazyModule
+from trade_calendar import load_calendar
+
+pd = LazyModule('pandas')
+ak = LazyModule('akshare')
+warnings.filterwarnings('ignore')
+
+# ============================================================
+# 归档配置
+# ============================================================
+ARCHIVE_DIR = Path(__file__).parent / "market_archive"  # 快照归档根目录
+
+ARCHIVE_CONFIG = {
+    "compression": "zstd",  # parquet压缩算法
+    "auto_archive": True,  # 筛选器运行结束后自动归档本次已获取的数据（不额外调用接口）
+    "intraday_datasets": ["spot", "fund_flow", "index_spot"],  # 盘中按时刻归档的数据集
+}
+
+BAR_STORE_DIR = Path(__file__).parent / "bar_store"  # 日K线库目录
+
+BAR_STORE_CONFIG = {
+    "start_date": "20200101",  # 默认同步起始日期
+    "max_workers": 10,  # 同步并发线程数（限制并发避免API限流）
+    "index_codes": ["000001", "000300"],  # 需要同步的指数（上证指数、沪深300）
+    "fields": ["开盘", "收盘", "最高", "最低", "成交量", "成交额", "涨跌幅", "换手率"],  # 加载宽表的字段
+}
+
+
+def save_frame(df, path):
+    """
+    以压缩列式格式保存DataFrame
+
+    akshare部分列可能混有字符串和数字（如停牌股的'-'），
+    parquet要求单列类型一致，这类列统一转成字符串保存。
+    """
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+
+    df = df.reset_index(drop=True)
+    for col in df.columns:
+        if df[col].dtype == object:
+            non_null = df[col].dropna()
+            if not non_null.map(lambda v: isinstance(v, str)).all():
+                df[col] = df[col].map(lambda v: v if v is None or isinstance(v, str) or pd.isna(v) else str(v))
+
+    # 先写临时文件再改名，避免中途中断留下半个文件
+    tmp_path = path.with_suffix(path.suffix + '.tmp')
+    df.to_parquet(tmp_path, compression=ARCHIVE_CONFIG['compression'], index=False)
+    tmp_path.replace(path)
+    return path
+
+
+def load_frame(path, columns=None, filters=None):
+    """读取列式文件，可只读取部分列；filters为pyarrow行过滤条件（如 [('代码', 'in', codes)]）"""
+    return pd.read_parquet(path, columns=columns, filters=filters)
+
+
+class SnapshotArchiver:
+    """
+    市场时点快照归档器
+
+    盘中数据（实时行情/资金流向/指数）每次归档一份，文件名带抓取时刻；
+    龙虎榜属于收盘后数据，每个上榜日期只保存一份。
+    """
+
+    def __init__(self, archive_dir=None):
+        self.archive_dir = Path(archive_dir) if archive_dir else ARCHIVE_DIR
+
+    def _date_dir(self, date_str):
+        """获取日期分区目录（date_str格式：YYYYMMDD）"""
+        return self.archive_dir / f"date={date_str}"
+
+    @staticmethod
+    def _normalize_date(date):
+        """统一日期格式为YYYYMMDD"""
+        if isinstance(date, datetime):
+            return date.strftime('%Y%m%d')
+        return str(date).replace('-', '')
+
+    @staticmethod
+    def _normalize_time(at_time):
+        """统一时间格式为HHMMSS"""
+        if at_time is None:
+            return None
+        if isinstance(at_time, datetime):
+            return at_time.strftime('%H%M%S')
+        return str(at_time).replace(':', '').ljust(6, '0')
+
+    # ========== 归档 ==========
+
+    def save_snapshot(self, frames, captured_at=None):
+        """
+        保存一组盘中快照
+
+        参数：
+            frames: {'spot': df, 'fund_flow': df, 'index_spot': df}，值为None的数据集跳过
+            captured_at: 抓取时刻（datetime），默认当前时间
+
+        返回：
+            已保存的文件路径列表
+        """
+        captured_at = captured_at or datetime.now()
+        date_dir = self._date_dir(captured_at.strftime('%Y%m%d'))
+        time_tag = captured_at.strftime('%H%M%S')
+
+        saved = []
+        for name in ARCHIVE_CONFIG['intraday_datasets']:
+            df = frames.get(name)
+            if df is None or df.empty:
+                continue
+            saved.append(save_frame(df, date_dir / f"{name}_{time_tag}.parquet"))
+        return saved
+
+    def save_lhb(self, df_lhb):
+        """
+        按上榜日期分区保存龙虎榜明细（同一日期重复保存时以最新数据覆盖）
+        """
+        if df_lhb is None or df_lhb.empty or '上榜日期' not in df_lhb.columns:
+            return []
+
+        df_lhb = df_lhb.copy()
+        df_lhb['上榜日期'] = pd.to_datetime(df_lhb['上榜日期']).dt.strftime('%Y-%m-%d')
+
+        saved = []
+        for date_val, df_day in df_lhb.groupby('上榜日期'):
+            saved.append(save_frame(df_day, self._date_dir(date_val.replace('-', '')) / "lhb.parquet"))
+        return saved
+
+    def archive_now(self):
+        """
+        立即抓取并归档当前市场快照（供定时任务调用）
+        """
+        print(f"\n📦 正在归档市场快照: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}")
+        captured_at = datetime.now()
+        frames = {}
+
+        fetchers = {
+            'spot': lambda: ak.stock_zh_a_spot_em(),
+            'fund_flow': lambda: ak.stock_individual_fund_flow_rank(indicator="今日"),
+            'index_spot': lambda: ak.stock_zh_index_spot_em(),
+        }
+        for name, fetch in fetchers.items():
+            try:
+                frames[name] = fetch()
+                print(f"   ✅ {name}: {len(frames[name])} 行")
+            except Exception as e:
+                print(f"   ⚠️ 获取{name}失败: {str(e)[:50]}")
+
+        saved = self.save_snapshot(frames, captured_at)
+        print(f"   📝 已保存 {len(saved)} 个文件到 {self._date_dir(captured_at.strftime('%Y%m%d'))}")
+        return saved
+
+    def archive_lhb_range(self, start_date, end_date):
+        """抓取并归档一段日期的龙虎榜明细"""
+        start_date = self._normalize_date(start_date)
+        end_date = self._normalize_date(end_date)
+        print(f"\n📦 正在归档龙虎榜: {start_date} ~ {end_date}")
+        try:
+            df_lhb = ak.stock_lhb_detail_em(start_date=start_date, end_date=end_date)
+        except Exception as e:
+            print(f"   ⚠️ 获取龙虎榜数据失败: {str(e)[:50]}")
+            return []
+
+        saved = self.save_lhb(df_lhb)
+        print(f"   📝 已保存 {len(saved)} 个交易日的龙虎榜")
+        return saved
+
+    # ========== 时点加载 ==========
+
+    def list_dates(self):
+        """列出已归档的日期（升序，YYYYMMDD）"""
+        if not self.archive_dir.exists():
+            return []
+        return sorted(p.name.split('=', 1)[1] for p in self.archive_dir.glob("date=*") if p.is_dir())
+
+    def list_snapshot_times(self, date, dataset='spot'):
+        """列出某日某数据集的所有快照时刻（升序，HHMMSS）"""
+        date_dir = self._date_dir(self._normalize_date(date))
+        if not date_dir.exists():
+            return []
+        prefix = f"{dataset}_"
+        return sorted(p.stem[len(prefix):] for p in date_dir.glob(f"{prefix}*.parquet")
+                      if p.stem[len(prefix):].isdigit())
+
+    def load_dataset_as_of(self, dataset, date, at_time=None, columns=None):
+        """
+        读取D日T时刻（含）之前最近一次的快照
+
+        at_time为None时取当日最后一份快照；该日没有不晚于T的快照时返回None
+        """
+        date_str = self._normalize_date(date)
+        time_tag = self._normalize_time(at_time)
+
+        times = self.list_snapshot_times(date_str, dataset)
+        if time_tag is not None:
+            times = [t for t in times if t <= time_tag]
+        if not times:
+            return None
+
+        return load_frame(self._date_dir(date_str) / f"{dataset}_{times[-1]}.parquet", columns=columns)
+
+    def load_lhb_window(self, end_date, lookback_days=20, include_end=True, calendar=None):
+        """
+        拼接回溯窗口内的龙虎榜明细
+
+        参数：
+            end_date: 窗口结束日期
+            lookback_days: 回溯交易日数（含结束日，与HOT_MONEY_CONFIG['lookback_days']口径一致）
+            include_end: 是否包含结束日当天（盘中回放时当天龙虎榜尚未公布，应传False）
+            calendar: 交易日历（默认 trade_calendar.load_calendar()，回测传入K线库的交易日）
+        """
+        end_str = self._normalize_date(end_date)
+        calendar = calendar if calendar is not None else load_calendar()
+        start_str = calendar.window_start(end_str, lookback_days).strftime('%Y%m%d')
+
+        frames = []
+        for date_str in self.list_dates():
+            if date_str < start_str or date_str > end_str:
+                continue
+            if date_str == end_str and not include_end:
+                continue
+            lhb_file = self._date_dir(date_str) / "lhb.parquet"
+            if lhb_file.exists():
+                frames.append(load_frame(lhb_file))
+
+        if not frames:
+            return pd.DataFrame()
+        return pd.concat(frames, ignore_index=True)
+
+    def load_market_as_of(self, date, at_time=None, lhb_lookback_days=20):
+        """
+        还原"D日T时刻的市场"
+
+        返回：
+            dict: {
+                'spot': 全市场实时行情,
+                'fund_flow': 资金流向排名,
+                'index_spot': 指数行情,
+                'lhb': 回溯窗口内的龙虎榜明细（不含D日当天，盘中不可见）,
+                'date': 'YYYYMMDD',
+                'snapshot_time': 实际使用的行情快照时刻
+            }
+        """
+        date_str = self._normalize_date(date)
+        time_tag = self._normalize_time(at_time)
+
+        market = {'date': date_str}
+        for dataset in ARCHIVE_CONFIG['intraday_datasets']:
+            market[dataset] = self.load_dataset_as_of(dataset, date_str, time_tag)
+
+        spot_times = [t for t in self.list_snapshot_times(date_str, 'spot') if time_tag is None or t <= time_tag]
+        market['snapshot_time'] = spot_times[-1] if spot_times else None
+        market['lhb'] = self.load_lhb_window(date_str, lhb_lookback_days, include_end=False)
+        return market
+
+
+class BarStore:
+    """
+    本地日K线库（v1.1新增）
+
+    每只股票一个文件，保存stock_zh_a_hist返回的前复权日K线。
+    前复权价格会随除权整体变化，因此同步时整段重新下载而不是增量追加，
+    保证同一文件内的价格口径一致。
+    """
+
+    def __init__(self, store_dir=None):
+        self.store_dir = Path(store_dir) if store_dir else BAR_STORE_DIR
+
+    def _path(self, code, kind='stock'):
+        """K线文件路径（kind: stock/index）"""
+        return self.store_dir / f"{kind}_{code}.parquet"
+
+    # ========== 同步 ==========
+
+    def sync(self, code, start_date=None, end_date=None):
+        """同步单只股票的前复权日K线，返回K线条数（失败返回0）"""
+        start_date = SnapshotArchiver._normalize_date(start_date or BAR_STORE_CONFIG['start_date'])
+        end_date = SnapshotArchiver._normalize_date(end_date or datetime.now())
+        try:
+            df = ak.stock_zh_a_hist(symbol=code, period="daily", start_date=start_date,
+                                    end_date=end_date, adjust="qfq")
+        except Exception:
+            return 0
+        if df is None or df.empty:
+            return 0
+        save_frame(df, self._path(code))
+        return len(df)
+
+    def sync_index(self, code, start_date=None, end_date=None):
+        """同步指数日K线"""
+        start_date = SnapshotArchiver._normalize_date(start_date or BAR_STORE_CONFIG['start_date'])
+        end_date = SnapshotArchiver._normalize_date(end_date or datetime.now())
+        try:
+            df = ak.index_zh_a_hist(symbol=code, period="daily", start_date=start_date, end_date=end_date)
+        except Exception as e:
+            print(f"   ⚠️ 获取指数{code}失败: {str(e)[:50]}")
+            return 0
+        if df is None or df.empty:
+            return 0
+        save_frame(df, self._path(code, 'index'))
+        return len(df)
+
+    def sync_all(self, codes=None, start_date=None, end_date=None):
+        """
+        同步全市场日K线
+
+        codes为None时以当前实时行情的股票列表为准，并顺带保存代码-名称对照表
+        """
+        print(f"\n📦 正在同步日K线库: {self.store_dir}")
+
+        if codes is None:
+            try:
+                df_spot = ak.stock_zh_a_spot_em()
+            except Exception as e:
+                print(f"   ❌ 获取股票列表失败: {e}")
+                return 0
+            save_frame(df_spot[['代码', '名称']], self.store_dir / "names.parquet")
+            codes = df_spot['代码'].tolist()
+
+        for index_code in BAR_STORE_CONFIG['index_codes']:
+            n = self.sync_index(index_code, start_date, end_date)
+            print(f"   ✅ 指数{index_code}: {n} 条")
+
+        total = len(codes)
+        completed = 0
+        synced = 0
+        with ThreadPoolExecutor(max_workers=min(BAR_STORE_CONFIG['max_workers'], max(total, 1))) as executor:
+            futures = {executor.submit(self.sync, code, start_date, end_date): code for code in codes}
+            for future in as_completed(futures):
+                completed += 1
+                if future.result() > 0:
+                    synced += 1
+                if completed % 200 == 0 or completed == total:
+                    print(f"   ⏳ 已完成 {completed}/{total} ({completed*100//total}%)")
+
+        print(f"   📝 成功同步 {synced}/{total} 只股票")
+        return synced
+
+    # ========== 加载 ==========
+
+    def list_codes(self):
+        """列出库中已有的股票代码"""
+        if not self.store_dir.exists():
+            return []
+        return sorted(p.stem[len("stock_"):] for p in self.store_dir.glob("stock_*.parquet"))
+
+    def load_names(self):
+        """读取代码-名称对照表（{代码: 名称}）"""
+        names_file = self.store_dir / "names.parquet"
+        if not names_file.exists():
+            return {}
+        df = load_frame(names_file)
+        return dict(zip(df['代码'], df['名称']))
+
+    def get(self, code, start_date=None, end_date=None, kind='stock'):
+        """读取单只股票/指数的日K线（日期为datetime，升序），不存在时返回None"""
+        path = self._path(code, kind)
+        if not path.exists():
+            return None
+        df = load_frame(path)
+        df['日期'] = pd.to_datetime(df['日期'])
+        if start_date is not None:
+            df = df[df['日期'] >= pd.to_datetime(SnapshotArchiver._normalize_date(start_date))]
+        if end_date is not None:
+            df = df[df['日期'] <= pd.to_datetime(SnapshotArchiver._normalize_date(end_date))]
+        return df.sort_values('日期').reset_index(drop=True)
+
+    def load_panel(self, codes=None, start_date=None, end_date=None, fields=None):
+        """
+        加载宽表：{字段: DataFrame(index=日期, columns=代码)}
+
+        回测按日期横截面计算时，从宽表中切片即可得到全市场的向量，
+        避免逐只股票读取和循环。停牌日为NaN。
+        数值为float32（涨跌幅保留float64，见 frame_schema.panel_dtype），全市场多年宽表的内存占用约减半。
+        """
+        codes = codes if codes is not None else self.list_codes()
+        fields = fields or BAR_STORE_CONFIG['fields']
+
+        series = {field: {} for field in fields}
+        for code in codes:
+            df = self.get(code, start_date, end_date)
+            if df is None or df.empty:
+                continue
+            df = df.drop_duplicates('日期').set_index('日期')
+            for field in fields:
+                if field in df.columns:
+                    series[field][code] = pd.to_numeric(df[field], errors='coerce')
+
+        return {field: pd.DataFrame(cols, dtype=panel_dtype(field)).sort_index() for field, cols in series.items()}
+
+
+def show_archive_list():
+    """显示已归档的日期及快照数量"""
+    archiver = SnapshotArchiver()
+    dates = archiver.list_dates()
+
+    print("\n" + "=" * 70)
+    print("📦 【市场快照归档】")
+    print("=" * 70)
+
+    if not dates:
+        print("\n暂无归档数据")
+        return
+
+    print(f"\n共有 {len(dates)} 个交易日的归档:\n")
+    print(f"{'日期':<12} {'行情快照':>8} {'资金流向':>8} {'指数':>6} {'龙虎榜':>6}")
+    print("-" * 70)
+    for date_str in dates[-30:]:
+        spot_n = len(archiver.list_snapshot_times(date_str, 'spot'))
+        flow_n = len(archiver.list_snapshot_times(date_str, 'fund_flow'))
+        index_n = len(archiver.list_snapshot_times(date_str, 'index_spot'))
+        has_lhb = "✅" if (archiver._date_dir(date_str) / "lhb.parquet").exists() else "-"
+        print(f"{date_str:<12} {spot_n:>8} {flow_n:>8} {index_n:>6} {has_lhb:>6}")
+
+    print("\n" + "=" * 70)
+
+
+def main():
+    """命令行入口"""
+    args = sys.argv[1:]
+    command = args[0] if args else "archive"
+
+    archiver = SnapshotArchiver()
+    if command == "archive":
+        archiver.archive_now()
+    elif command == "lhb":
+        end_date = args[2] if len(args) > 2 else datetime.now().strftime('%Y%m%d')
+        start_date = args[1] if len(args) > 1 else end_date
+        archiver.archive_lhb_range(start_date, end_date)
+    elif command == "list":
+        show_archive_list()
+    elif command == "bars":
+        start_date = args[1] if len(args) > 1 else None
+        BarStore().sync_all(start_date=start_date)
+    else:
+        print(__doc__)
+
+
+if __name__ == "__main__":
+    main()
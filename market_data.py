@@ -0,0 +1,759 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+共享行情数据服务 v1.0
+
+问题背景：
+scan_stock_v9 和 select_stock_v2_enhanced 各自获取实时行情、日K线和龙虎榜，游资模块的龙虎榜汇总整段重复，
+只有四日形态脚本有K线缓存（CacheManager）。14:30 在同一进程里先后跑两个策略时，
+同一张全市场行情表、同一份龙虎榜和大量重叠的日K线都要下载两遍。
+
+功能：
+1. 实时行情：一次抓取，有效期内（默认120秒）所有策略、所有步骤共用
+2. 日K线：每只股票保存已获取的最长区间，较短区间的请求从中截取（与单独请求返回的行相同，
+   前复权以最新价为基准，起始日期不影响价格）；可选落盘缓存（原四日形态脚本的 CacheManager）
+3. 龙虎榜：全市场明细按回溯天数只获取一次，按股票汇总的上榜记录/席位统计/净买入共用（含当日JSON缓存）
+4. 资金流向排名、指数行情：与实时行情相同的有效期；指数日K线、板块成分股、个股行业：当日有效
+5. 定时刷新：refresh() 重新获取盘中会变化的数据，供常驻服务（screener_daemon.py）保持缓存新鲜
+6. 统计：各类数据的内存命中、落盘命中和接口获取次数
+7. 无数据记录：日K线获取失败、无数据或K线根数不足（新股、停牌股）时按 接口+代码 记录，
+   后续步骤请求同一只股票时直接跳过，不再等待接口超时；运行汇总列出被跳过的股票和原因
+
+说明：
+- 返回的日K线是副本，调用方可以直接添加列；实时行情表为共享对象，调用方不应原地修改
+- 不传数据服务时，每个筛选器各自创建一个，与之前的行为一致；共用时由调用方创建后传入
+- 无数据记录：获取失败只在本次运行内有效（failure_max_age），无数据/根数不足当天有效并落盘
+  （kline_cache/negative_日期.json）。根数不足只对不长于记录区间、且要求更多根数的请求跳过；
+  首根K线晚于区间起点 listing_gap_days 个交易日以上视为上市不足（全部历史只有这些K线），更长的区间也跳过
+- 日期窗口按交易日历计算（trade_calendar.py）：days 根日K线的请求从截至今天的第 days 个交易日开始，
+  龙虎榜回溯 lookback_days 个交易日
+
+使用方法：
+    from market_data import MarketDataService
+    data = MarketDataService()
+    scan_stock_v9.StockScreener(data=data).run()
+    select_stock_v2_enhanced.StockScreener(data=data).run()     # 行情/龙虎榜/重叠K线不再重复下载
+    python run_combined.py                                      # 两个策略共用一个数据服务依次运行
+"""
+
+import copy
+import hashlib
+import json
+import threading
+from collections import defaultdict
+from datetime import datetime
+from pathlib import Path
+
+from lazy_import import LazyModule
+from run_profiler import InstrumentedModule, record_cache
+from trade_calendar import load_calendar
+
+pd = LazyModule('pandas')
+ak = InstrumentedModule(LazyModule('akshare'))
+
+# ============================================================
+# 目录与缓存配置
+# ============================================================
+HOT_MONEY_CACHE_DIR = Path(__file__).parent / "hot_money_cache"
+KLINE_CACHE_DIR = Path(__file__).parent / "kline_cache"  # K线落盘缓存（原四日形态脚本v2.1）
+
+CACHE_CONFIG = {
+    "kline_expire_hours": 24,  # K线数据缓存24小时
+    "enable_cache": True,  # 是否启用缓存
+    "cache_version": "v1",  # 缓存版本号
+}
+
+SERVICE_CONFIG = {
+    "spot_max_age": 120,  # 实时行情、资金流向排名、指数行情有效期（秒）
+    "history_max_age": 1800,  # 内存中日K线有效期（秒，盘中最新一根K线会变化）
+    "failure_max_age": 600,  # 获取失败的股票在此时间内不再请求（秒，覆盖一次运行）
+    "listing_gap_days": 10,  # 首根K线晚于区间起点超过此交易日数时视为上市不足
+}
+
+NEGATIVE_REASONS = {'failed': '获取失败', 'no_data': '无K线数据', 'insufficient': 'K线不足'}
+
+EMPTY_LHB = {'appearances': 0, 'records': [], 'buy_desks': {}, 'sell_desks': {}, 'net_buy': 0}
+
+
+class CacheManager:
+    """
+    缓存管理器（v2.1新增，v1.0从select_stock_v2_enhanced迁移）
+    负责K线数据的缓存读写，大幅提升重复运行速度
+    """
+
+    def __init__(self):
+        self.cache_dir = KLINE_CACHE_DIR
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+        self.expire_hours = CACHE_CONFIG['kline_expire_hours']
+        self.enabled = CACHE_CONFIG['enable_cache']
+        self.version = CACHE_CONFIG['cache_version']
+
+    def _get_cache_key(self, stock_code, days):
+        """生成缓存键"""
+        key_str = f"{stock_code}_{days}_{self.version}"
+        return hashlib.md5(key_str.encode()).hexdigest()
+
+    def _get_cache_path(self, cache_key):
+        """获取缓存文件路径"""
+        # 按日期分目录存储
+        today = datetime.now().strftime('%Y%m%d')
+        date_dir = self.cache_dir / today
+        date_dir.mkdir(exist_ok=True)
+        return date_dir / f"{cache_key}.pkl"
+
+    def _is_cache_valid(self, cache_path):
+        """检查缓存是否有效"""
+        if not cache_path.exists():
+            return False
+
+        # 检查文件修改时间
+        mtime = datetime.fromtimestamp(cache_path.stat().st_mtime)
+        now = datetime.now()
+        age_hours = (now - mtime).total_seconds() / 3600
+
+        return age_hours < self.expire_hours
+
+    def get(self, stock_code, days):
+        """读取缓存"""
+        if not self.enabled:
+            return None
+
+        try:
+            cache_key = self._get_cache_key(stock_code, days)
+            cache_path = self._get_cache_path(cache_key)
+
+            if self._is_cache_valid(cache_path):
+                df = pd.read_pickle(cache_path)
+                return df
+        except Exception as e:
+            pass
+
+        return None
+
+    def set(self, stock_code, days, data):
+        """写入缓存"""
+        if not self.enabled or data is None:
+            return
+
+        try:
+            cache_key = self._get_cache_key(stock_code, days)
+            cache_path = self._get_cache_path(cache_key)
+
+            # 保存为pickle格式（速度快）
+            data.to_pickle(cache_path)
+        except Exception as e:
+            pass
+
+    def clear_old_caches(self):
+        """清理过期缓存"""
+        try:
+            for date_dir in self.cache_dir.iterdir():
+                if not date_dir.is_dir():
+                    continue
+
+                # 删除3天前的缓存目录
+                try:
+                    date_str = date_dir.name
+                    cache_date = datetime.strptime(date_str, '%Y%m%d')
+                    age_days = (datetime.now() - cache_date).days
+
+                    if age_days > 3:
+                        import shutil
+                        shutil.rmtree(date_dir)
+                        print(f"   已清理过期缓存: {date_str}")
+                except:
+                    pass
+        except Exception as e:
+            pass
+
+
+def history_start(days, now=None, calendar=None):
+    """日K线请求的起始日期：截至今天（非交易日为之前最近的交易日）的第 days 个交易日"""
+    calendar = calendar if calendar is not None else load_calendar()
+    return calendar.window_start(now or datetime.now(), days).strftime('%Y%m%d')
+
+
+def parse_lhb_records(df_lhb):
+    """
+    将单只股票的龙虎榜明细汇总为上榜记录和席位统计（v9.2从fetch_lhb_data中提取，供回测复用）
+    """
+    result = {
+        'appearances': len(df_lhb),
+        'records': [],
+        'buy_desks': defaultdict(float),
+        'sell_desks': defaultdict(float),
+        'net_buy': 0
+    }
+
+    for _, row in df_lhb.iterrows():
+        # 确保日期格式正确
+        date_val = row.get('上榜日期', '')
+        if pd.notna(date_val):
+            if isinstance(date_val, str):
+                date_str = date_val
+            else:
+                date_str = pd.to_datetime(date_val).strftime('%Y-%m-%d')
+        else:
+            date_str = ''
+
+        record = {
+            'date': date_str,
+            'reason': str(row.get('上榜原因', '')),
+            'close_price': float(row.get('收盘价', 0)) if pd.notna(row.get('收盘价')) else 0,
+            'change_pct': float(row.get('涨跌幅', 0)) if pd.notna(row.get('涨跌幅')) else 0,
+            'turnover': float(row.get('成交额', 0)) if pd.notna(row.get('成交额')) else 0,
+        }
+        result['records'].append(record)
+
+        # 统计买卖席位
+        for i in range(1, 6):  # 前5大买卖席位
+            buy_desk = row.get(f'买{i}营业部', '')
+            sell_desk = row.get(f'卖{i}营业部', '')
+            buy_amount_val = row.get(f'买{i}金额', 0)
+            sell_amount_val = row.get(f'卖{i}金额', 0)
+
+            # 安全转换金额
+            try:
+                buy_amount = float(buy_amount_val) if pd.notna(buy_amount_val) else 0
+                sell_amount = float(sell_amount_val) if pd.notna(sell_amount_val) else 0
+            except:
+                buy_amount = 0
+                sell_amount = 0
+
+            if buy_desk and buy_amount > 0:
+                result['buy_desks'][buy_desk] += buy_amount
+            if sell_desk and sell_amount > 0:
+                result['sell_desks'][sell_desk] += sell_amount
+
+    # 计算净买入
+    total_buy = sum(result['buy_desks'].values())
+    total_sell = sum(result['sell_desks'].values())
+    result['net_buy'] = total_buy - total_sell
+
+    # 转换defaultdict为普通dict以便JSON序列化
+    result['buy_desks'] = dict(result['buy_desks'])
+    result['sell_desks'] = dict(result['sell_desks'])
+    return result
+
+
+class MarketDataService:
+    """
+    进程内共享的行情数据服务
+
+    参数：
+    - source: 行情接口模块（默认本模块的 ak；回放/回归测试时传入离线数据源）
+    - disk_cache: 是否使用K线落盘缓存（None 时按 CACHE_CONFIG['enable_cache']）
+    """
+
+    def __init__(self, source=None, disk_cache=None):
+        self.source = source
+        self.disk_cache_enabled = CACHE_CONFIG['enable_cache'] if disk_cache is None else disk_cache
+        self.kline_cache = None  # 落盘缓存在第一次使用时创建（建立缓存目录）
+        self.spot_data = None
+        self.spot_fetched_at = None
+        self.lhb_cache = None  # 全市场龙虎榜明细
+        self.lhb_key = None  # (日期, 回溯天数)
+        self._history = {}  # {代码: (起始日期, 获取时刻, 原始日K线)}
+        self._lhb_summaries = {}  # {(代码, 回溯天数, 日期): 汇总}
+        self._snapshots = {}  # {名称: (获取时刻, DataFrame)} 资金流向排名/指数行情
+        self._daily = {}  # {(类别, 参数..., 日期): 结果} 指数K线/板块成分股/个股行业（当日有效）
+        self._lock = threading.Lock()
+        self.stats = defaultdict(int)
+        self.pinned = False  # 从检查点恢复后为True：恢复的数据不过期（续跑使用中断前的同一份数据）
+        self._negative = {}  # {(接口, 代码): 记录} 获取失败/无数据/根数不足
+        self._negative_date = None  # 已加载的当日落盘记录日期
+        self._calendar = None  # 交易日历（第一次使用时加载）
+
+    @property
+    def _ak(self):
+        return self.source if self.source is not None else ak
+
+    @property
+    def calendar(self):
+        """交易日历（第一次使用时从本地文件或数据源加载，见 trade_calendar.py；回测可直接赋值）"""
+        if self._calendar is None:
+            self._calendar = load_calendar(self._ak)
+        return self._calendar
+
+    @calendar.setter
+    def calendar(self, calendar):
+        self._calendar = calendar
+
+    # ---------- 实时行情 ----------
+
+    def spot(self, max_age=None):
+        """
+        全市场实时行情（原始列类型）
+
+        有效期内重复调用返回同一张表；获取失败时抛出异常（与直接调用接口一致）
+        """
+        max_age = SERVICE_CONFIG['spot_max_age'] if max_age is None else max_age
+        now = datetime.now()
+        if self.spot_data is not None and (self.pinned or (now - self.spot_fetched_at).total_seconds() <= max_age):
+            self.stats['spot_hits'] += 1
+            record_cache(True)
+            return self.spot_data
+        record_cache(False)
+        df = self._ak.stock_zh_a_spot_em()
+        self.spot_data = df
+        self.spot_fetched_at = now
+        self.stats['spot_fetches'] += 1
+        return df
+
+    # ---------- 资金流向 / 指数 / 板块 ----------
+
+    def _snapshot(self, name, fetch, max_age=None):
+        """有效期内复用的全市场快照（获取失败时抛出异常）"""
+        max_age = SERVICE_CONFIG['spot_max_age'] if max_age is None else max_age
+        now = datetime.now()
+        with self._lock:
+            entry = self._snapshots.get(name)
+        if entry is not None and (self.pinned or (now - entry[0]).total_seconds() <= max_age):
+            self.stats[f'{name}_hits'] += 1
+            record_cache(True)
+            return entry[1]
+        record_cache(False)
+        df = fetch()
+        with self._lock:
+            self._snapshots[name] = (now, df)
+            self.stats[f'{name}_fetches'] += 1
+        return df
+
+    def fund_flow(self, max_age=None):
+        """全市场个股资金流向排名（今日）"""
+        return self._snapshot('fund_flow', lambda: self._ak.stock_individual_fund_flow_rank(indicator="今日"), max_age)
+
+    def index_spot(self, max_age=None):
+        """指数实时行情"""
+        return self._snapshot('index_spot', self._ak.stock_zh_index_spot_em, max_age)
+
+    def _daily_value(self, key, fetch):
+        """当日有效的缓存（获取失败时抛出异常，不缓存）"""
+        key = key + (datetime.now().strftime('%Y%m%d'),)
+        with self._lock:
+            if key in self._daily:
+                self.stats['daily_hits'] += 1
+                record_cache(True)
+                return self._daily[key]
+        record_cache(False)
+        value = fetch()
+        with self._lock:
+            self._daily[key] = value
+        return value
+
+    def index_history(self, index_code='000300', days=120):
+        """指数日K线（与个股日K线相同的起始日期规则，当日有效）"""
+        return self._daily_value(('index', index_code, days), lambda: self._ak.index_zh_a_hist(
+            symbol=index_code,
+            period="daily",
+            start_date=history_start(days, calendar=self.calendar),
+            end_date=datetime.now().strftime('%Y%m%d')
+        ))
+
+    def board_members(self, kind, name):
+        """概念（concept）/行业（industry）板块成分股表（当日有效）"""
+        fetch = self._ak.stock_board_concept_cons_em if kind == 'concept' else self._ak.stock_board_industry_cons_em
+        return self._daily_value(('board', kind, name), lambda: fetch(symbol=name))
+
+    def stock_info(self, stock_code):
+        """个股基本信息（行业等，当日有效；获取失败的股票在 failure_max_age 内直接抛出 LookupError）"""
+        reason = self.skip_reason('stock_individual_info_em', stock_code)
+        if reason is not None:
+            raise LookupError(f"{stock_code} {reason}，跳过")
+        try:
+            return self._daily_value(('info', stock_code),
+                                     lambda: self._ak.stock_individual_info_em(symbol=stock_code))
+        except Exception:
+            self._record_negative('stock_individual_info_em', stock_code, 'failed')
+            raise
+
+    def refresh(self, lhb_days=None):
+        """
+        刷新盘中会变化的数据（常驻服务定时调用）：实时行情、资金流向排名、指数行情；
+        给出 lhb_days 时同时预取当日龙虎榜明细。单项失败不影响其他项，返回失败项名称列表
+        """
+        failed = []
+        for name, func in (('spot', self.spot), ('fund_flow', self.fund_flow), ('index_spot', self.index_spot)):
+            try:
+                func(max_age=0)
+            except Exception:
+                failed.append(name)
+        if lhb_days:
+            self.lhb_table(lhb_days)
+        with self._lock:
+            today = datetime.now().strftime('%Y%m%d')
+            self._daily = {key: value for key, value in self._daily.items() if key[-1] == today}
+        return failed
+
+    # ---------- 日K线 ----------
+
+    def history_with_source(self, stock_code, days=30, disk_cache=False, min_bars=None):
+        """
+        个股日K线（前复权，原始列类型）及其来源
+
+        min_bars: 调用方需要的最少K线根数，接口返回的根数不足时记录，后续同样的请求直接跳过
+
+        返回：(DataFrame或None, 来源) 来源为 memory / disk / api，获取失败时为 (None, None)，
+        按无数据记录跳过时为 (None, 'negative')
+        """
+        start_date = history_start(days, calendar=self.calendar)
+        now = datetime.now()
+
+        with self._lock:
+            entry = self._history.get(stock_code)
+        if entry is not None:
+            cached_start, fetched_at, df = entry
+            fresh = self.pinned or (now - fetched_at).total_seconds() <= SERVICE_CONFIG['history_max_age']
+            if fresh and cached_start <= start_date:
+                self.stats['history_hits'] += 1
+                record_cache(True)
+                return self._slice(df, start_date, cached_start), 'memory'
+
+        if self.skip_reason('stock_zh_a_hist', stock_code, start_date, min_bars) is not None:
+            return None, 'negative'
+
+        if disk_cache and self.disk_cache_enabled:
+            if self.kline_cache is None:
+                self.kline_cache = CacheManager()
+            df = self.kline_cache.get(stock_code, days)
+            if df is not None:
+                self.stats['history_disk_hits'] += 1
+                record_cache(True)
+                self._remember(stock_code, start_date, now, df)
+                return df.copy(), 'disk'
+
+        record_cache(False)
+        try:
+            df = self._ak.stock_zh_a_hist(
+                symbol=stock_code,
+                period="daily",
+                start_date=start_date,
+                end_date=now.strftime('%Y%m%d'),
+                adjust="qfq"
+            )
+        except Exception:
+            self._record_negative('stock_zh_a_hist', stock_code, 'failed')
+            return None, None
+        self.stats['history_fetches'] += 1
+        if df is None:
+            self._record_negative('stock_zh_a_hist', stock_code, 'failed')
+            return None, None
+        if df.empty:
+            self._record_negative('stock_zh_a_hist', stock_code, 'no_data', 0, start_date)
+        elif min_bars and len(df) < min_bars:
+            self._record_negative('stock_zh_a_hist', stock_code, 'insufficient', len(df), start_date,
+                                  listing=self._listed_within(df, start_date))
+        else:
+            with self._lock:
+                entry = self._negative.get(('stock_zh_a_hist', stock_code))
+                if entry is not None and entry['reason'] == 'failed':
+                    del self._negative[('stock_zh_a_hist', stock_code)]  # 之前的失败是暂时的
+        if disk_cache and self.disk_cache_enabled and not df.empty:
+            self.kline_cache.set(stock_code, days, df)
+        self._remember(stock_code, start_date, now, df)
+        return df.copy(), 'api'
+
+    def history(self, stock_code, days=30, disk_cache=False, min_bars=None):
+        """个股日K线（见 history_with_source），获取失败或被跳过时返回None"""
+        return self.history_with_source(stock_code, days, disk_cache, min_bars)[0]
+
+    def peek_history(self, stock_code, days=30):
+        """只从内存读取个股日K线（不调用接口），没有覆盖该区间的有效数据时返回None"""
+        start_date = history_start(days, calendar=self.calendar)
+        with self._lock:
+            entry = self._history.get(stock_code)
+        if entry is None:
+            return None
+        cached_start, fetched_at, df = entry
+        if cached_start > start_date or (datetime.now() - fetched_at).total_seconds() > SERVICE_CONFIG['history_max_age']:
+            return None
+        return self._slice(df, start_date, cached_start)
+
+    def _remember(self, stock_code, start_date, fetched_at, df):
+        """保存每只股票区间最长的日K线"""
+        with self._lock:
+            entry = self._history.get(stock_code)
+            if entry is None or start_date <= entry[0] or (fetched_at - entry[1]).total_seconds() > SERVICE_CONFIG['history_max_age']:
+                self._history[stock_code] = (start_date, fetched_at, df)
+
+    @staticmethod
+    def _slice(df, start_date, cached_start):
+        """从较长区间截取较短区间（起始日期相同时直接复制；行号从0开始，与单独请求返回的表一致）"""
+        if start_date == cached_start or df.empty or '日期' not in df.columns:
+            return df.copy()
+        dates = pd.to_datetime(df['日期'].astype(str))
+        return df[dates >= pd.Timestamp(start_date)].reset_index(drop=True)
+
+    # ---------- 无数据记录 ----------
+
+    def skip_reason(self, endpoint, code, start_date=None, min_bars=None):
+        """
+        按无数据记录判断是否跳过一次请求
+
+        参数：
+        - start_date: 请求区间起点（YYYYMMDD，日K线）
+        - min_bars: 需要的最少根数（默认1根）
+
+        返回：跳过原因（文字），不跳过时返回None
+        """
+        self._load_negative()
+        min_bars = min_bars or 1
+        now = datetime.now()
+        with self._lock:
+            entry = self._negative.get((endpoint, code))
+            if entry is None:
+                return None
+            if entry['reason'] == 'failed':
+                if (now - entry['at']).total_seconds() > SERVICE_CONFIG['failure_max_age']:
+                    return None
+            elif entry['bars'] >= min_bars:
+                return None
+            elif not entry['listing'] and (start_date is None or start_date < entry['start']):
+                return None  # 请求的区间更长，停牌股可能有更早的K线
+            entry['skipped'] += 1
+            entry['last_seen'] = now
+            self.stats['negative_hits'] += 1
+        record_cache(True)
+        return self._describe_negative(entry)
+
+    def _record_negative(self, endpoint, code, reason, bars=0, start_date=None, listing=False):
+        """记录一次获取失败/无数据/根数不足（后两者当天有效并落盘）"""
+        self._load_negative()
+        now = datetime.now()
+        entry = {'endpoint': endpoint, 'code': code, 'reason': reason, 'bars': bars,
+                 'start': start_date, 'listing': listing, 'at': now, 'last_seen': now, 'skipped': 0}
+        with self._lock:
+            self._negative[(endpoint, code)] = entry
+            self.stats['negative_records'] += 1
+        if reason != 'failed':
+            self._save_negative()
+
+    def _listed_within(self, df, start_date):
+        """首根K线是否晚于区间起点 listing_gap_days 个交易日以上（上市不足，全部历史都在区间内）"""
+        try:
+            first = str(df['日期'].iloc[0])
+            return self.calendar.distance(start_date, first) > SERVICE_CONFIG['listing_gap_days']
+        except Exception:
+            return False
+
+    @staticmethod
+    def _describe_negative(entry):
+        if entry['reason'] != 'insufficient':
+            return NEGATIVE_REASONS[entry['reason']]
+        return f"{NEGATIVE_REASONS['insufficient']}（{entry['bars']}根{'，上市不足' if entry['listing'] else ''}）"
+
+    def _negative_path(self, date):
+        return KLINE_CACHE_DIR / f"negative_{date}.json"
+
+    def _load_negative(self):
+        """加载当日落盘的无数据记录（跨日时丢弃前一天的记录）"""
+        today = datetime.now().strftime('%Y%m%d')
+        if self._negative_date == today:
+            return
+        with self._lock:
+            if self._negative_date == today:
+                return
+            self._negative = {key: entry for key, entry in self._negative.items() if entry['reason'] == 'failed'}
+            self._negative_date = today
+            if not self.disk_cache_enabled:
+                return
+            try:
+                with open(self._negative_path(today), 'r', encoding='utf-8') as f:
+                    records = json.load(f)
+            except Exception:
+                return
+            for record in records:
+                entry = dict(record, at=None, last_seen=None, skipped=0)
+                self._negative.setdefault((entry['endpoint'], entry['code']), entry)
+
+    def _save_negative(self):
+        """落盘当日的无数据/根数不足记录（失败不影响主流程）"""
+        if not self.disk_cache_enabled:
+            return
+        fields = ('endpoint', 'code', 'reason', 'bars', 'start', 'listing')
+        with self._lock:
+            records = [{k: entry[k] for k in fields} for entry in self._negative.values()
+                       if entry['reason'] != 'failed']
+            path = self._negative_path(self._negative_date)
+        try:
+            KLINE_CACHE_DIR.mkdir(parents=True, exist_ok=True)
+            for old in KLINE_CACHE_DIR.glob("negative_*.json"):
+                if old != path:
+                    old.unlink()
+            tmp_path = path.with_suffix('.json.tmp')
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump(records, f, ensure_ascii=False)
+            tmp_path.replace(path)
+        except Exception:
+            pass
+
+    def skipped(self, since=None):
+        """
+        无数据记录涉及的股票（运行汇总用）
+
+        参数：since 只返回此时刻之后记录或跳过的股票（一次运行的开始时刻），None 时返回全部
+
+        返回：{代码: 原因}（同一代码多个接口时原因以"；"连接）
+        """
+        with self._lock:
+            entries = [entry for entry in self._negative.values()
+                       if since is None or (entry['last_seen'] is not None and entry['last_seen'] >= since)]
+        result = {}
+        for entry in sorted(entries, key=lambda e: e['code']):
+            reason = self._describe_negative(entry)
+            result[entry['code']] = f"{result[entry['code']]}；{reason}" if entry['code'] in result else reason
+        return result
+
+    def print_skipped(self, since=None, limit=20):
+        """打印无数据记录涉及的股票（运行汇总）"""
+        skipped = self.skipped(since)
+        if not skipped:
+            return
+        print(f"\n🚫 无数据/K线不足的股票: {len(skipped)} 只（后续步骤不再请求）")
+        for code, reason in list(skipped.items())[:limit]:
+            print(f"   {code}: {reason}")
+        if len(skipped) > limit:
+            print(f"   ... 其余 {len(skipped) - limit} 只")
+
+    # ---------- 龙虎榜 ----------
+
+    def lhb_table(self, lookback_days=20, log=print):
+        """
+        全市场龙虎榜明细（每天每个回溯交易日数只获取一次）
+
+        log: 过程输出函数（筛选器传入自己的 _log，静默运行时不打印）
+        返回：DataFrame，获取失败或无数据时为空表
+        """
+        key = (datetime.now().strftime('%Y%m%d'), lookback_days)
+        with self._lock:
+            if self.lhb_cache is not None and self.lhb_key == key:
+                return self.lhb_cache
+        end_date = datetime.now()
+        start_date = self.calendar.window_start(end_date, lookback_days)
+        log(f"      📊 正在获取{lookback_days}个交易日龙虎榜数据（首次，稍后会缓存）...")
+        try:
+            df = self._ak.stock_lhb_detail_em(
+                start_date=start_date.strftime('%Y%m%d'),
+                end_date=end_date.strftime('%Y%m%d')
+            )
+            if df is not None and not df.empty:
+                log(f"      ✅ 成功获取{len(df)}条龙虎榜记录")
+            else:
+                log(f"      ⚠️ 近{lookback_days}个交易日无龙虎榜数据")
+                df = pd.DataFrame()  # 空DataFrame作为标记
+        except Exception as e:
+            log(f"      ⚠️ 获取龙虎榜数据失败: {str(e)[:50]}")
+            df = pd.DataFrame()  # 空DataFrame作为标记
+        with self._lock:
+            self.lhb_cache, self.lhb_key = df, key
+            self.stats['lhb_fetches'] += 1
+        return df
+
+    def lhb_summary(self, stock_code, lookback_days=20, log=print):
+        """
+        个股龙虎榜汇总（上榜次数、上榜记录、买卖席位、净买入），当日JSON缓存有效
+
+        log: 过程输出函数（首次获取全市场明细时使用，见 lhb_table）
+        返回：dict（与 EMPTY_LHB 结构相同）
+        """
+        today = datetime.now().strftime('%Y%m%d')
+        key = (stock_code, lookback_days, today)
+        with self._lock:
+            cached = self._lhb_summaries.get(key)
+        if cached is not None:
+            self.stats['lhb_hits'] += 1
+            record_cache(True)
+            return copy.deepcopy(cached)
+
+        try:
+            # 检查缓存（当日缓存有效）
+            cache_file = HOT_MONEY_CACHE_DIR / f"lhb_{stock_code}_{today}.json"
+            if cache_file.exists():
+                record_cache(True)
+                with open(cache_file, 'r', encoding='utf-8') as f:
+                    result = json.load(f)
+            else:
+                record_cache(False)
+                result = dict(EMPTY_LHB)
+                try:
+                    df_lhb_all = self.lhb_table(lookback_days, log=log)
+                    # 从缓存中过滤出当前股票的记录（可能的列名：'代码', '股票代码', 'symbol'）
+                    if df_lhb_all is not None and not df_lhb_all.empty:
+                        code_col = next((col for col in ['代码', '股票代码', 'symbol'] if col in df_lhb_all.columns), None)
+                        if code_col:
+                            df_lhb = df_lhb_all[df_lhb_all[code_col] == stock_code]
+                            if not df_lhb.empty:
+                                result = parse_lhb_records(df_lhb)
+                except Exception:
+                    pass  # 静默处理，很多股票可能没有龙虎榜数据
+
+                # 保存缓存
+                try:
+                    HOT_MONEY_CACHE_DIR.mkdir(parents=True, exist_ok=True)
+                    with open(cache_file, 'w', encoding='utf-8') as f:
+                        json.dump(result, f, ensure_ascii=False, indent=2)
+                except:
+                    pass  # 缓存失败不影响主流程
+        except Exception:
+            result = dict(EMPTY_LHB)
+
+        with self._lock:
+            self._lhb_summaries[key] = result
+        return copy.deepcopy(result)
+
+    # ---------- 检查点 ----------
+
+    def export_state(self, exclude_codes=()):
+        """
+        已获取的数据（检查点保存用）
+
+        返回：(快照 {spot/fund_flow/index_spot/lhb: DataFrame}, 日K线 {代码: (起始日期, DataFrame)})，
+        exclude_codes 中的股票（已保存过的）不返回
+        """
+        with self._lock:
+            frames = {name: df for name, (_, df) in self._snapshots.items()}
+            if self.spot_data is not None:
+                frames['spot'] = self.spot_data
+            if self.lhb_cache is not None:
+                frames['lhb'] = self.lhb_cache
+            histories = {code: (start, df) for code, (start, _, df) in self._history.items()
+                         if code not in exclude_codes}
+        return frames, histories
+
+    def restore_state(self, frames, histories, lhb_days=None):
+        """从检查点恢复数据，恢复后本服务内的数据不再过期（见 pinned）"""
+        now = datetime.now()
+        with self._lock:
+            self.pinned = True
+            if 'spot' in frames:
+                self.spot_data, self.spot_fetched_at = frames['spot'], now
+            for name in ('fund_flow', 'index_spot'):
+                if name in frames:
+                    self._snapshots[name] = (now, frames[name])
+            if 'lhb' in frames and lhb_days:
+                self.lhb_cache, self.lhb_key = frames['lhb'], (now.strftime('%Y%m%d'), lhb_days)
+            for code, (start, df) in histories.items():
+                self._history[code] = (start, now, df)
+
+    def clear_old_caches(self):
+        """清理过期的K线落盘缓存"""
+        if self.kline_cache is None:
+            self.kline_cache = CacheManager()
+        self.kline_cache.clear_old_caches()
+
+    # ---------- 统计 ----------
+
+    def summary(self):
+        """各类数据的命中/获取次数"""
+        return dict(self.stats)
+
+    def print_summary(self):
+        """打印数据服务统计"""
+        s = self.stats
+        print("\n📦 共享数据服务:")
+        print(f"   实时行情: 获取 {s['spot_fetches']} 次 | 复用 {s['spot_hits']} 次")
+        print(f"   日K线: 接口 {s['history_fetches']} 次 | 内存命中 {s['history_hits']} 次 | 落盘命中 {s['history_disk_hits']} 次")
+        print(f"   龙虎榜: 全市场明细获取 {s['lhb_fetches']} 次 | 个股汇总复用 {s['lhb_hits']} 次")
+        print(f"   无数据记录: 记录 {s['negative_records']} 只 | 跳过请求 {s['negative_hits']} 次")
+        print(f"   资金流向/指数行情: 获取 {s['fund_flow_fetches'] + s['index_spot_fetches']} 次 | "
+              f"复用 {s['fund_flow_hits'] + s['index_spot_hits']} 次 | 指数K线/板块/个股信息复用 {s['daily_hits']} 次")
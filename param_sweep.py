@@ -0,0 +1,307 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+v9 筛选参数网格扫描 + 滚动样本外验证 v1.0
+
+问题背景：
+第1~4步和第十一步的阈值（涨幅-1~5.5%、量比≥1.2、换手率10~18%、市值40~120亿、
+综合评分≥55、风险收益比≥1.5）每次版本升级都靠手工调整，没有系统性的证据。
+
+原理：
+1. 因子表只算一次：BacktestEngine.build_feature_table 计算区间内每日候选股的全部因子，
+   缓存为parquet，参数组合只影响阈值过滤和排序截断
+2. 多进程并行：每个进程启动时读取一次因子表，按参数组合分块评估，用满全部CPU核心
+3. 滚动样本外（walk-forward）：按交易日历切分为"训练窗口 + 紧随其后的测试窗口"，
+   训练窗口内选出最优参数，只统计其在测试窗口的表现，避免用未来数据调参；
+   没有候选股的交易日也计入窗口长度，各窗口覆盖的时间跨度一致
+
+使用方法：
+    python param_sweep.py 20240101 20251231            # 扫描（因子表有缓存时直接复用）
+    python param_sweep.py 20240101 20251231 rebuild    # 重新计算因子表
+"""
+
+import pandas as pd
+import numpy as np
+from concurrent.futures import ProcessPoolExecutor
+import itertools
+import warnings
+import json
+import os
+import sys
+import time
+from backtest_v9 import BacktestEngine, BACKTEST_DIR, forward_label
+from market_archive import save_frame, load_frame
+from scan_stock_v9 import SCREEN_PARAMS
+from trade_calendar import load_calendar
+warnings.filterwarnings('ignore')
+
+# ============================================================
+# 扫描配置
+# ============================================================
+PARAM_GRID = {
+    "change_pct_min": [-1, 0],
+    "change_pct_max": [4.5, 5.5, 7],
+    "volume_ratio_min": [1.0, 1.2, 1.5],
+    "turnover_min": [5, 8, 10],
+    "turnover_max": [15, 18, 25],
+    "market_cap_min": [20, 40],
+    "market_cap_max": [120, 200],
+    "composite_min": [50, 55, 60],
+    "risk_reward_min": [1.0, 1.5, 2.0],
+}
+
+SWEEP_CONFIG = {
+    "target": forward_label(1),  # 评估指标使用的前瞻收益列（次日收益）
+    "train_days": 120,  # 训练窗口（交易日）
+    "test_days": 20,  # 测试窗口（交易日），窗口按此步长滚动
+    "min_train_samples": 20,  # 训练窗口内入选样本少于此数的参数组合不参与择优
+    "max_workers": None,  # 进程数，None表示使用全部CPU核心
+    "chunksize": 16,  # 每次分发给进程的参数组合数
+}
+
+_FEATURES = None  # 子进程内的因子表（进程启动时读取一次）
+_FOLDS = None  # 子进程内的滚动窗口划分
+
+
+def build_grid(grid=None):
+    """展开参数网格，跳过上限不大于下限的无效组合"""
+    grid = grid or PARAM_GRID
+    keys = list(grid.keys())
+    combos = []
+    for values in itertools.product(*(grid[k] for k in keys)):
+        params = dict(zip(keys, values))
+        if params.get('change_pct_min', -np.inf) >= params.get('change_pct_max', np.inf):
+            continue
+        if params.get('turnover_min', -np.inf) >= params.get('turnover_max', np.inf):
+            continue
+        if params.get('market_cap_min', -np.inf) >= params.get('market_cap_max', np.inf):
+            continue
+        combos.append(params)
+    return combos
+
+
+def trading_days(start_date, end_date, extra_dates=(), calendar=None):
+    """
+    区间内的全部交易日（'YYYY-MM-DD'，与因子表的选股日期格式一致）
+
+    参数：
+    - extra_dates: 需要并入的日期（因子表里的选股日期，防止日历缺日时丢样本）
+    - calendar: 交易日历（默认 trade_calendar.load_calendar()）
+    """
+    calendar = calendar if calendar is not None else load_calendar()
+    start = calendar.ceil(start_date)
+    end = calendar.floor(end_date)
+    days = {calendar.date_at(i).strftime('%Y-%m-%d') for i in range(start, end + 1)}
+    return sorted(days | set(extra_dates))
+
+
+def build_folds(dates, train_days=None, test_days=None):
+    """
+    划分滚动窗口
+
+    参数：
+    - dates: 区间内的全部交易日（trading_days），没有候选股的交易日同样占用窗口长度
+
+    返回：[(训练日期列表, 测试日期列表), ...]，测试窗口首尾相接、互不重叠
+    """
+    train_days = train_days or SWEEP_CONFIG['train_days']
+    test_days = test_days or SWEEP_CONFIG['test_days']
+    dates = sorted(dates)
+    folds = []
+    start = train_days
+    while start < len(dates):
+        folds.append((dates[start - train_days:start], dates[start:start + test_days]))
+        start += test_days
+    return folds
+
+
+def _init_worker(features_path, folds):
+    """子进程初始化：读取因子表并预先排序（排序与参数无关）"""
+    global _FEATURES, _FOLDS
+    _FEATURES = BacktestEngine.rank_features(load_frame(features_path))
+    _FOLDS = folds
+
+
+def _window_stats(returns):
+    """一组收益的(样本数, 上涨数, 收益和)"""
+    returns = returns.dropna()
+    return len(returns), int((returns > 0).sum()), float(returns.sum())
+
+
+def evaluate_params(params):
+    """
+    评估单个参数组合（在子进程中运行）
+
+    返回：{'params':..., 'folds': [(训练统计, 测试统计), ...], 'all': 全区间统计}
+    """
+    target = SWEEP_CONFIG['target']
+    selected = BacktestEngine.apply_screen(_FEATURES, params, ranked=True)
+    if selected.empty:
+        empty = (0, 0, 0.0)
+        return {'params': params, 'folds': [(empty, empty)] * len(_FOLDS), 'all': empty}
+
+    returns = selected[target]
+    dates = selected['选股日期']
+    folds = []
+    for train_dates, test_dates in _FOLDS:
+        folds.append((_window_stats(returns[dates.isin(train_dates)]),
+                      _window_stats(returns[dates.isin(test_dates)])))
+    return {'params': params, 'folds': folds, 'all': _window_stats(returns)}
+
+
+def _rate(stats):
+    """(样本数, 上涨数, 收益和) -> (胜率, 平均收益)"""
+    n, wins, total = stats
+    return (wins / n * 100, total / n) if n else (np.nan, np.nan)
+
+
+def summarize_sweep(results, folds):
+    """
+    汇总扫描结果
+
+    返回：
+        df_combos: 每个参数组合的全区间和样本外（全部测试窗口合并）胜率
+        df_walk: 每个窗口在训练集上选出的最优参数及其测试集表现
+    """
+    rows = []
+    for result in results:
+        oos = tuple(map(sum, zip(*(test for _, test in result['folds'])))) if result['folds'] else (0, 0, 0.0)
+        all_rate, all_avg = _rate(result['all'])
+        oos_rate, oos_avg = _rate(oos)
+        rows.append({**result['params'],
+                     '全区间样本': result['all'][0], '全区间胜率': all_rate, '全区间均值': all_avg,
+                     '样本外样本': oos[0], '样本外胜率': oos_rate, '样本外均值': oos_avg})
+    df_combos = pd.DataFrame(rows)
+
+    walk_rows = []
+    for k, (train_dates, test_dates) in enumerate(folds):
+        best = None
+        for result in results:
+            train, test = result['folds'][k]
+            if train[0] < SWEEP_CONFIG['min_train_samples']:
+                continue
+            train_rate, train_avg = _rate(train)
+            key = (train_rate, train_avg)
+            if best is None or key > best[0]:
+                best = (key, result['params'], test)
+        if best is None:
+            continue
+        test_rate, test_avg = _rate(best[2])
+        walk_rows.append({
+            '窗口': k + 1,
+            '训练区间': f"{train_dates[0]}~{train_dates[-1]}",
+            '测试区间': f"{test_dates[0]}~{test_dates[-1]}",
+            '训练胜率': best[0][0],
+            '测试样本': best[2][0],
+            '测试胜率': test_rate,
+            '测试均值': test_avg,
+            '最优参数': json.dumps(best[1], ensure_ascii=False),
+        })
+    return df_combos, pd.DataFrame(walk_rows)
+
+
+def print_sweep_report(df_combos, df_walk, top_n=10):
+    """打印扫描报告"""
+    target = SWEEP_CONFIG['target']
+    keys = list(PARAM_GRID.keys())
+
+    print("\n" + "=" * 70)
+    print(f"🔬 【参数扫描报告】{len(df_combos)} 个组合 | 指标: {target}")
+    print("=" * 70)
+
+    baseline = df_combos
+    for key in keys:
+        baseline = baseline[baseline[key] == SCREEN_PARAMS[key]]
+    if not baseline.empty:
+        b = baseline.iloc[0]
+        print(f"\n📌 当前参数(SCREEN_PARAMS): 样本外胜率 {b['样本外胜率']:.1f}% | "
+              f"样本外均值 {b['样本外均值']:+.2f}% | 样本 {int(b['样本外样本'])}")
+
+    min_samples = SWEEP_CONFIG['min_train_samples']
+    ranked = df_combos[df_combos['样本外样本'] >= min_samples].sort_values(
+        ['样本外胜率', '样本外均值'], ascending=False)
+    print(f"\n🏆 样本外胜率前{top_n}（样本≥{min_samples}）:")
+    print("-" * 70)
+    for _, row in ranked.head(top_n).iterrows():
+        params = " ".join(f"{k}={row[k]:g}" for k in keys)
+        print(f"   {row['样本外胜率']:5.1f}% | {row['样本外均值']:+.2f}% | n={int(row['样本外样本']):<4} | {params}")
+
+    if not df_walk.empty:
+        print(f"\n🔁 滚动择优（训练窗口选最优 → 下一窗口检验）:")
+        print("-" * 70)
+        for _, row in df_walk.iterrows():
+            test_rate = f"{row['测试胜率']:.1f}%" if pd.notna(row['测试胜率']) else "N/A"
+            print(f"   窗口{row['窗口']:>2}: {row['测试区间']} | 训练胜率 {row['训练胜率']:.1f}% → "
+                  f"测试胜率 {test_rate} (n={row['测试样本']})")
+        total = df_walk['测试样本'].sum()
+        if total > 0:
+            weighted = (df_walk['测试胜率'].fillna(0) * df_walk['测试样本']).sum() / total
+            print(f"\n   💡 滚动择优的整体样本外胜率: {weighted:.1f}%（{total}个样本）")
+
+    print("\n" + "=" * 70)
+
+
+def load_or_build_features(start_date, end_date, rebuild=False):
+    """读取或计算区间因子表（缓存于backtest_results/features_*.parquet）"""
+    features_path = BACKTEST_DIR / f"features_{start_date}_{end_date}.parquet"
+    if features_path.exists() and not rebuild:
+        print(f"\n📂 复用已缓存的因子表: {features_path.name}")
+        return features_path
+
+    engine = BacktestEngine(start_date, end_date)
+    df_features, _ = engine.build_feature_table()
+    if df_features.empty:
+        return None
+    save_frame(df_features, features_path)
+    print(f"   💾 因子表已缓存: {features_path.name}（{len(df_features)} 行）")
+    return features_path
+
+
+def run_sweep(start_date, end_date, grid=None, rebuild=False):
+    """执行参数扫描，返回(组合汇总, 滚动择优结果)"""
+    features_path = load_or_build_features(start_date, end_date, rebuild)
+    if features_path is None:
+        print("\n❌ 区间内没有候选股，无法扫描")
+        return None, None
+
+    candidate_dates = load_frame(features_path, columns=['选股日期'])['选股日期'].unique()
+    dates = trading_days(start_date, end_date, extra_dates=candidate_dates)
+    folds = build_folds(dates)
+    combos = build_grid(grid)
+    if not folds:
+        print(f"\n⚠️ 区间内只有 {len(dates)} 个交易日，不足一个训练窗口，只统计全区间表现")
+
+    workers = SWEEP_CONFIG['max_workers'] or os.cpu_count()
+    print(f"\n🚀 开始扫描: {len(combos)} 个参数组合 | {len(folds)} 个滚动窗口 | {workers} 个进程")
+    begin = time.time()
+
+    results = []
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker,
+                             initargs=(str(features_path), folds)) as executor:
+        for n, result in enumerate(executor.map(evaluate_params, combos, chunksize=SWEEP_CONFIG['chunksize']), 1):
+            results.append(result)
+            if n % 500 == 0 or n == len(combos):
+                print(f"   ⏳ 已完成 {n}/{len(combos)} ({n*100//len(combos)}%) | 耗时 {time.time() - begin:.0f}s")
+
+    df_combos, df_walk = summarize_sweep(results, folds)
+    print_sweep_report(df_combos, df_walk)
+
+    tag = f"{start_date}_{end_date}"
+    df_combos.to_csv(BACKTEST_DIR / f"sweep_{tag}.csv", index=False, encoding='utf-8-sig')
+    if not df_walk.empty:
+        df_walk.to_csv(BACKTEST_DIR / f"sweep_{tag}_walkforward.csv", index=False, encoding='utf-8-sig')
+    print(f"\n💾 扫描结果已保存: {BACKTEST_DIR}")
+    return df_combos, df_walk
+
+
+def main():
+    """命令行入口"""
+    args = sys.argv[1:]
+    if len(args) < 2:
+        print(__doc__)
+        return
+    run_sweep(args[0], args[1], rebuild=len(args) > 2 and args[2] == 'rebuild')
+
+
+if __name__ == "__main__":
+    main()
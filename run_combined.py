@@ -0,0 +1,92 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+双策略联合运行 v1.0
+
+问题背景：
+14:30 先后运行 scan_stock_v9 和 select_stock_v2_enhanced 时，两个进程各自下载全市场实时行情、
+龙虎榜和大量重叠的日K线，第二个策略的大部分等待时间花在重复下载上。
+
+功能：
+1. 在同一进程中创建一个共享行情数据服务（market_data.MarketDataService），依次运行两个策略
+2. 第二个策略直接复用第一个策略已获取的实时行情、龙虎榜明细/个股汇总和日K线
+3. 运行结束打印每个策略的状态、入选数量、耗时、接口调用次数，以及数据服务的命中统计
+
+说明：
+- 两个策略的保存逻辑（历史库、周记录、剖析文件等）与单独运行时相同
+- 情绪低迷处理策略只对 scan_stock_v9 生效，默认放弃选股（不在运行中途等待输入）
+
+使用方法：
+    python run_combined.py                              # 依次运行两个策略，显示运行过程
+    python run_combined.py --quiet                      # 只打印汇总
+    python run_combined.py --on-weak-market continue    # 市场情绪低于30分时继续选股
+"""
+
+import sys
+import time
+
+from market_data import MarketDataService
+from screen_cli import WEAK_MARKET_POLICIES
+
+# 运行顺序：(模块名, 策略名)
+STRATEGIES = [
+    ('scan_stock_v9', '次日冲高'),
+    ('select_stock_v2_enhanced', '四日形态'),
+]
+
+
+def _api_calls(result):
+    """一次运行的接口调用次数（来自剖析结果）"""
+    return sum(stage.get('api_calls') or 0 for stage in result.profile.get('stages', []))
+
+
+def run_combined(quiet=False, weak_market_policy='abort', data=None):
+    """
+    用同一个数据服务依次运行各策略
+
+    返回：[(策略名, ScreenResult, 耗时秒)]
+    """
+    import importlib
+
+    data = data if data is not None else MarketDataService()
+    results = []
+    for module_name, label in STRATEGIES:
+        module = importlib.import_module(module_name)
+        screener = module.StockScreener(reporter=None if quiet else 'console', data=data)
+        if hasattr(screener, 'weak_market_policy'):
+            screener.weak_market_policy = weak_market_policy
+        start = time.perf_counter()
+        result = screener.run()
+        results.append((label, result, time.perf_counter() - start))
+
+    print("\n" + "=" * 70)
+    print("【联合运行汇总】")
+    print("=" * 70)
+    print(f"{'策略':<10} {'状态':<8} {'入选':>4} {'耗时(s)':>8} {'接口调用':>8}  批次ID")
+    for label, result, seconds in results:
+        print(f"{label:<10} {result.status:<8} {len(result):>4} {seconds:>8.1f} {_api_calls(result):>8}  {result.batch_id}")
+    data.print_summary()
+    return results
+
+
+def main():
+    """命令行入口"""
+    args = sys.argv[1:]
+    if any(arg in ('-h', '--help', 'help') for arg in args):
+        print(__doc__)
+        return
+
+    quiet = '--quiet' in args
+    policy = 'abort'
+    if '--on-weak-market' in args:
+        i = args.index('--on-weak-market')
+        if i + 1 >= len(args) or args[i + 1] not in WEAK_MARKET_POLICIES:
+            print(f"❌ --on-weak-market 可选: {', '.join(WEAK_MARKET_POLICIES)}")
+            return
+        policy = args[i + 1]
+
+    run_combined(quiet=quiet, weak_market_policy=policy)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,346 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+筛选流程分阶段性能剖析 v1.0
+
+问题背景：
+一次选股运行变慢时，无法判断是11个筛选步骤中的哪一步、还是哪个akshare接口拖慢了整体。
+select_stock_v2_enhanced 只统计了K线缓存命中数，scan_stock_v9 没有任何统计。
+
+功能：
+1. 阶段统计：每个阶段记录耗时、CPU时间、输入/输出行数、接口调用次数、返回数据量、缓存命中率
+2. 接口统计：InstrumentedModule 包装 akshare 模块，每次 ak.* 调用自动计入当前阶段（线程安全）
+3. 剖析文件：每个批次保存一份 selection_history/profile_{批次ID}.json
+4. 对比命令：按阶段横向对比多次运行的耗时和接口调用
+
+说明：
+akshare内部使用requests下载后直接解析为DataFrame，拿不到原始响应字节数，
+"数据量"以接口返回DataFrame的内存占用（memory_usage(deep=True)）近似。
+
+使用方法：
+    python run_profiler.py list                    # 列出已保存的剖析文件
+    python run_profiler.py compare                 # 对比最近5次运行
+    python run_profiler.py compare 批次ID1 批次ID2  # 对比指定批次
+"""
+
+import json
+import sys
+import threading
+import time
+from datetime import datetime
+from pathlib import Path
+from contextlib import contextmanager
+import source_health
+
+# ============================================================
+# 剖析配置
+# ============================================================
+PROFILE_DIR = Path(__file__).parent / "selection_history"  # 剖析文件与历史记录放在一起
+
+PROFILER_CONFIG = {
+    "enabled": True,  # 是否保存剖析文件
+    "compare_runs": 5,  # compare 命令默认对比的最近运行次数
+}
+
+OTHER_STAGE = "其他"  # 不在任何阶段内的接口调用/缓存访问计入此阶段
+
+_active_profiler = None  # 当前进程中正在记录的剖析器
+
+
+def _frame_bytes(result):
+    """接口返回数据量（字节，DataFrame按内存占用近似）"""
+    try:
+        if hasattr(result, 'memory_usage'):
+            usage = result.memory_usage(deep=True)
+            return int(usage.sum()) if hasattr(usage, 'sum') else int(usage)
+    except Exception:
+        pass
+    return 0
+
+
+def _new_stage(name):
+    return {
+        'name': name,
+        'wall': 0.0,
+        'cpu': 0.0,
+        'rows_in': None,
+        'rows_out': None,
+        'api_calls': 0,
+        'api_errors': 0,
+        'api_time': 0.0,
+        'api_bytes': 0,
+        'cache_hits': 0,
+        'cache_misses': 0,
+        'endpoints': {},
+    }
+
+
+class RunProfiler:
+    """单次筛选运行的分阶段剖析器"""
+
+    def __init__(self, batch_id, script):
+        self.batch_id = batch_id
+        self.script = script
+        self.started_at = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+        self.stages = []
+        self._current = None
+        self._other = _new_stage(OTHER_STAGE)
+        self._lock = threading.Lock()
+        self._wall_start = time.perf_counter()
+        self._cpu_start = time.process_time()
+
+    def activate(self):
+        """设为当前剖析器（InstrumentedModule的调用计入此剖析器）"""
+        global _active_profiler
+        _active_profiler = self
+        return self
+
+    def _target(self):
+        return self._current if self._current is not None else self._other
+
+    @contextmanager
+    def stage(self, name, rows_in=None):
+        """
+        记录一个阶段
+
+        用法：
+            with profiler.stage('第一步', rows_in=len(df)) as st:
+                df = ...
+                st['rows_out'] = len(df)
+        """
+        record = _new_stage(name)
+        record['rows_in'] = rows_in
+        previous = self._current
+        self._current = record
+        wall_start = time.perf_counter()
+        cpu_start = time.process_time()
+        try:
+            yield record
+        finally:
+            record['wall'] = time.perf_counter() - wall_start
+            record['cpu'] = time.process_time() - cpu_start
+            self._current = previous
+            self.stages.append(record)
+
+    def run_stage(self, name, func, df, **fields):
+        """执行一个DataFrame进、DataFrame出的筛选步骤并记录行数（fields 为附加记录项，如执行位置）"""
+        with self.stage(name, rows_in=len(df) if df is not None else None) as record:
+            record.update(fields)
+            result = func(df)
+            record['rows_out'] = len(result) if result is not None else None
+        return result
+
+    def record_api_call(self, endpoint, elapsed, result=None, error=False):
+        """记录一次接口调用（可在多个线程中同时调用）"""
+        size = _frame_bytes(result) if result is not None else 0
+        with self._lock:
+            record = self._target()
+            record['api_calls'] += 1
+            record['api_time'] += elapsed
+            record['api_bytes'] += size
+            if error:
+                record['api_errors'] += 1
+            ep = record['endpoints'].setdefault(endpoint, {'calls': 0, 'errors': 0, 'time': 0.0, 'bytes': 0})
+            ep['calls'] += 1
+            ep['time'] += elapsed
+            ep['bytes'] += size
+            if error:
+                ep['errors'] += 1
+
+    def record_cache(self, hit):
+        """记录一次缓存访问"""
+        with self._lock:
+            record = self._target()
+            record['cache_hits' if hit else 'cache_misses'] += 1
+
+    def to_dict(self):
+        """剖析结果（可直接JSON序列化）"""
+        stages = list(self.stages)
+        if self._other['api_calls'] or self._other['cache_hits'] or self._other['cache_misses']:
+            stages.append(self._other)
+
+        endpoints = {}
+        for record in stages:
+            for name, ep in record['endpoints'].items():
+                total = endpoints.setdefault(name, {'calls': 0, 'errors': 0, 'time': 0.0, 'bytes': 0})
+                for key in total:
+                    total[key] += ep[key]
+
+        return {
+            'batch_id': self.batch_id,
+            'script': self.script,
+            'started_at': self.started_at,
+            'wall': time.perf_counter() - self._wall_start,
+            'cpu': time.process_time() - self._cpu_start,
+            'api_calls': sum(r['api_calls'] for r in stages),
+            'cache_hits': sum(r['cache_hits'] for r in stages),
+            'cache_misses': sum(r['cache_misses'] for r in stages),
+            'stages': stages,
+            'endpoints': endpoints,
+        }
+
+    def save(self, profile_dir=None):
+        """保存剖析文件，返回路径"""
+        if not PROFILER_CONFIG['enabled']:
+            return None
+        profile_dir = Path(profile_dir) if profile_dir else PROFILE_DIR
+        profile_dir.mkdir(parents=True, exist_ok=True)
+        path = profile_dir / f"profile_{self.batch_id}.json"
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump(self.to_dict(), f, ensure_ascii=False, indent=2)
+        return path
+
+    def print_summary(self):
+        """打印本次运行的阶段耗时"""
+        profile = self.to_dict()
+        print("\n" + "-" * 70)
+        print(f"⏱️ 【运行剖析】总耗时 {profile['wall']:.1f}s | CPU {profile['cpu']:.1f}s | 接口调用 {profile['api_calls']} 次")
+        print("-" * 70)
+        print(f"{'阶段':<16} {'耗时':>8} {'CPU':>7} {'行数':>12} {'接口':>6} {'数据量':>9} {'缓存命中':>10}")
+        for record in profile['stages']:
+            print(_format_stage_row(record))
+
+
+def _format_rows(record):
+    if record['rows_in'] is None and record['rows_out'] is None:
+        return "-"
+    rows_in = '-' if record['rows_in'] is None else record['rows_in']
+    rows_out = '-' if record['rows_out'] is None else record['rows_out']
+    return f"{rows_in}→{rows_out}"
+
+
+def _format_cache(record):
+    total = record['cache_hits'] + record['cache_misses']
+    return f"{record['cache_hits'] / total * 100:.0f}%/{total}" if total else "-"
+
+
+def _format_stage_row(record):
+    return (f"{record['name']:<16} {record['wall']:>7.1f}s {record['cpu']:>6.1f}s {_format_rows(record):>12} "
+            f"{record['api_calls']:>6} {record['api_bytes'] / 1024 / 1024:>7.1f}MB {_format_cache(record):>10}")
+
+
+class InstrumentedModule:
+    """
+    接口模块包装器
+
+    用法：ak = InstrumentedModule(akshare)，之后 ak.xxx(...) 与原模块用法完全相同，
+    每次调用的耗时、返回数据量、是否异常计入当前剖析器的当前阶段；没有剖析器时直接调用。
+    激活了数据源健康监控器（source_health.py）时，调用还会按接口归类计时，配置了重试的接口超时/连接中断时重试。
+    """
+
+    def __init__(self, module):
+        self._module = module
+        self._wrapped = {}
+
+    def __getattr__(self, name):
+        attr = getattr(self._module, name)
+        if not callable(attr):
+            return attr
+        wrapped = self._wrapped.get(name)
+        if wrapped is None:
+            def wrapped(*args, **kwargs):
+                profiler = _active_profiler
+                monitor = source_health._active_monitor
+                if monitor is not None:
+                    # 由健康监控器计时、归类和重试，每次尝试同时计入剖析器
+                    def on_attempt(elapsed, result, error):
+                        if profiler is not None:
+                            profiler.record_api_call(name, elapsed, result, error=error)
+                    return monitor.call(name, attr, args, kwargs, on_attempt)
+                if profiler is None:
+                    return attr(*args, **kwargs)
+                start = time.perf_counter()
+                try:
+                    result = attr(*args, **kwargs)
+                except Exception:
+                    profiler.record_api_call(name, time.perf_counter() - start, error=True)
+                    raise
+                profiler.record_api_call(name, time.perf_counter() - start, result)
+                return result
+            self._wrapped[name] = wrapped
+        return wrapped
+
+
+def record_cache(hit):
+    """在当前剖析器中记录一次缓存访问（没有剖析器时忽略）"""
+    if _active_profiler is not None:
+        _active_profiler.record_cache(hit)
+
+
+def load_profiles(batch_ids=None, profile_dir=None):
+    """读取剖析文件（未指定批次时取最近的compare_runs个），按批次ID升序返回"""
+    profile_dir = Path(profile_dir) if profile_dir else PROFILE_DIR
+    if batch_ids:
+        paths = [profile_dir / f"profile_{b}.json" for b in batch_ids]
+    else:
+        paths = sorted(profile_dir.glob("profile_*.json"))[-PROFILER_CONFIG['compare_runs']:]
+
+    profiles = []
+    for path in paths:
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                profiles.append(json.load(f))
+        except Exception as e:
+            print(f"   ⚠️ 读取{path.name}失败: {e}")
+    return sorted(profiles, key=lambda p: p['batch_id'])
+
+
+def compare_profiles(profiles):
+    """按阶段对比多次运行的耗时和接口调用次数"""
+    if not profiles:
+        print("\n暂无剖析记录")
+        return
+
+    print("\n" + "=" * 70)
+    print(f"⏱️ 【运行剖析对比】{len(profiles)} 次运行")
+    print("=" * 70)
+
+    header = f"{'阶段':<16}" + "".join(f" {p['batch_id'][-13:]:>15}" for p in profiles)
+    print(f"\n📋 阶段耗时（秒） / 接口调用次数")
+    print(header)
+    print("-" * 70)
+
+    stage_names = []
+    for profile in profiles:
+        for record in profile['stages']:
+            if record['name'] not in stage_names:
+                stage_names.append(record['name'])
+
+    for name in stage_names:
+        cells = []
+        for profile in profiles:
+            record = next((r for r in profile['stages'] if r['name'] == name), None)
+            cells.append(f"{record['wall']:>7.1f}s/{record['api_calls']:<5}" if record else f"{'-':>15}")
+        print(f"{name:<16}" + "".join(f" {c:>15}" for c in cells))
+
+    totals = "".join(f" {p['wall']:>7.1f}s/{p['api_calls']:<5}" for p in profiles)
+    print(f"{'合计':<16}{totals}")
+
+    print(f"\n📋 接口耗时排行（最近一次运行）")
+    latest = profiles[-1]
+    for name, ep in sorted(latest['endpoints'].items(), key=lambda kv: kv[1]['time'], reverse=True)[:10]:
+        errors = f" | 失败 {ep['errors']}" if ep['errors'] else ""
+        print(f"   {name:<40} {ep['calls']:>5}次 {ep['time']:>8.1f}s {ep['bytes'] / 1024 / 1024:>7.1f}MB{errors}")
+
+    print("\n" + "=" * 70)
+
+
+def main():
+    """命令行入口"""
+    args = sys.argv[1:]
+    if not args:
+        print(__doc__)
+        return
+
+    command = args[0]
+    if command == 'list':
+        for path in sorted(PROFILE_DIR.glob("profile_*.json")):
+            print(f"   {path.stem[len('profile_'):]}")
+    elif command == 'compare':
+        compare_profiles(load_profiles(args[1:] or None))
+    else:
+        print(__doc__)
+
+
+if __name__ == "__main__":
+    main()
@@ -4,6 +4,52 @@
 A股次日冲高标的筛选脚本 v9.1 - 游资追踪版
 基于量化条件 + 月份主题 + 形态分析 + 主力资金流向 + 三维度综合评估 + 游资动向追踪
 
+核心升级（v9.2 - 回测基建版）：
+1. 市场快照归档：运行结束后将实时行情、资金流向、指数行情、龙虎榜按日期归档（market_archive.py）
+2. 向量化历史回测：筛选参数集中到SCREEN_PARAMS，按日横截面回放第1~11步并统计各评级胜率（backtest_v9.py）
+3. 批量批次回测：全部历史批次的股票去重后每只只取一次K线，按日期连接一次算出所有批次表现（菜单8）
+4. SQLite历史库：批次、入选股票、因子值存入selection_history/history.db（history_store.py），
+   替代history_index.json和逐批次JSON文件，历史不再截断为30个批次
+5. 只追加周记录：每次选股向week_*.jsonl追加一行（weekly_log.py），周汇总读取时按需重建，
+   多个筛选器同时运行不再互相覆盖
+6. 逐日因子库：第十一步评估过的全部候选股的完整因子向量按日期分区保存（feature_store.py）
+7. 分阶段剖析：记录每个步骤的耗时/CPU/行数/接口调用/数据量/缓存命中率，
+   每批次保存profile_{批次ID}.json，python run_profiler.py compare 对比多次运行（run_profiler.py）
+8. 数据源健康监控：每次接口调用按接口归类为成功/空数据/失败/超时，配置了重试的接口（日K线）超时和连接中断时重试，
+   运行结束打印p50/p95/p99延迟、失败率、重试次数，并保存health_{批次ID}.json（source_health.py）
+9. 内部类型表：实时行情和日K线进入程序时转换一次（比率float32但涨跌幅float64、代码名称分类、日期int32日序号），
+   各步骤按行标签选行、整列写入新字段，不再逐行复制；回测宽表为float32（涨跌幅float64）（frame_schema.py）
+10. 无人值守模式：带参数运行时不进入交互菜单，支持运行模式、多板块、参数覆盖、json/csv/parquet输出、
+   静默模式和情绪低迷处理策略，以退出码报告结果，供cron/调度器调用（screen_cli.py）
+   用法：python scan_stock_v9.py --mode market --format json --quiet
+11. 按需导入：akshare/pandas/numpy在第一次使用时才导入，游资缓存目录在创建筛选器时建立，
+   查看主题日历/历史记录/周记录不再等待数据栈加载（lazy_import.py，python benchmark_stages.py startup 测量）
+12. 库调用接口：run() 返回 ScreenResult（最终结果、各阶段存活股票、市场情绪、各阶段耗时、批次ID），
+   屏幕展示交给报告器，StockScreener(reporter=None) 整个运行不打印；同一实例可重复运行并复用缓存（screen_result.py）
+13. 筛选顺序规划：第1~9步声明单只代价、所需数据和通过率（SCREEN_STAGES），只用实时行情的步骤（含第8步分时强度）
+   先于逐只下载K线的步骤执行，通过率取最近运行的实测值；各步骤是独立条件，最终入选集合不变（stage_planner.py）
+14. 第十一步上界剪枝：按已知维度估算综合评分上界，按上界从高到低评估，先算风险收益比，
+   上界达不到阈值或已进不了前N名时跳过相对强度/价格位置等分析，所属板块只查询最终入选股票，结果不变（PRUNING_CONFIG）
+15. 多参数方案：SCREEN_PROFILES 定义多套参数（v8.1收紧版、v8.0宽松区间、不同游资权重），按各方案的并集获取一次数据，
+   再在第十一步的共享因子表上按方案过滤和重算综合评分，每个方案一张结果表
+   用法：python scan_stock_v9.py --mode market --profile v8.1 v8.0 hot_money_25 --quiet
+16. 共享行情数据服务：实时行情、日K线、龙虎榜统一由 MarketDataService 获取和缓存（market_data.py），
+   StockScreener(data=...) 可与 select_stock_v2_enhanced 共用同一份数据（python run_combined.py）
+17. 常驻选股服务：资金流向排名、指数行情/K线、板块成分股也由数据服务缓存，常驻进程定时刷新并预热日K线，
+   通过本机HTTP接口执行全市场/板块/四日形态筛选（python screener_daemon.py serve / scan_sector 人工智能）
+18. 截止时间模式：--deadline 14:55 或 --budget 秒数，第十一步按综合评分上界从高到低分析并实测各维度耗时，
+   时间不够时依次降级游资、价格位置（近似得分）和所属板块查询，到时未分析的候选股放弃，
+   结果的"降级因子"列和 degraded 字段标明降级情况（deadline_budget.py）
+19. 检查点续跑：每个步骤完成后把存活股票和已获取的行情/K线/龙虎榜按批次ID保存为列式压缩文件，
+   中断后 --resume 恢复同一份数据，从最后完成的步骤继续，沿用原参数和板块范围（checkpoint.py）；
+   传入共享数据服务（常驻服务/run_combined）时不记录检查点
+   用法：python scan_stock_v9.py --mode market --resume --quiet
+20. 无数据记录：日K线获取失败、无数据或根数不足（新股、停牌股）时由数据服务按接口+代码记录，
+   后续步骤和第十一步直接跳过该股票、不再等待接口超时，运行汇总列出被跳过的股票和原因（market_data.py）
+21. 交易日历：本地交易日历索引（trade_calendar.py，日期与交易日序号O(1)换算），日K线窗口按交易日请求
+   （days 根K线，不再多取30个自然日），龙虎榜回溯20个交易日，游资连续上榜/消失天数、连续入选按交易日判断，
+   选股日期不是交易日时次日涨跌幅以之前最近的交易日为基准；回测的K线窗口与实盘完全一致
+
 核心升级（v9.1 - 游资追踪版）：
 1. 龙虎榜数据分析：获取个股上榜记录、营业部买卖明细
 2. 游资强度评分：多维度计算游资介入强度（0-100分）
@@ -53,31 +99,45 @@ v6.0功能：
 - 指定板块/概念筛选功能
 """
 
-import akshare as ak
-import pandas as pd
-import numpy as np
 from datetime import datetime, timedelta
 from concurrent.futures import ThreadPoolExecutor, as_completed
 import warnings
-import json
-import os
 from pathlib import Path
 from collections import defaultdict
-import time
+from contextlib import nullcontext
+import sys
+from lazy_import import LazyModule
+from market_archive import SnapshotArchiver, ARCHIVE_CONFIG
+from history_store import HistoryStore, new_batch_id
+from weekly_log import WeeklyLog, get_week_number
+from feature_store import FeatureStore, FEATURE_STORE_CONFIG
+from run_profiler import RunProfiler, InstrumentedModule
+from source_health import SourceHealth
+from frame_schema import compact_spot, compact_history, widen_for_output, attach_columns, date_to_ordinal
+from screen_cli import build_parser, parse_overrides, run_screening, EXIT_CODES, WEAK_MARKET_POLICIES
+from screen_result import ScreenResult, make_reporter
+from stage_planner import plan_order, observed_selectivity, PLANNER_CONFIG
+from market_data import MarketDataService, parse_lhb_records, HOT_MONEY_CACHE_DIR
+from deadline_budget import DeadlineBudget, DEADLINE_CONFIG, SECTOR_FACTOR, parse_deadline
+from checkpoint import RunCheckpoint, CHECKPOINT_CONFIG, clear_stale
 warnings.filterwarnings('ignore')
 
+# v9.2：akshare/pandas/numpy按需导入，查看日历/历史/周记录等菜单不加载数据栈
+pd = LazyModule('pandas')
+np = LazyModule('numpy')
+ak = InstrumentedModule(LazyModule('akshare'))  # v9.2：ak.*调用自动计入当前剖析阶段
+
 # ============================================================
 # 历史记录配置
 # ============================================================
 HISTORY_DIR = Path(__file__).parent / "selection_history"  # 历史记录保存目录
-HISTORY_FILE = HISTORY_DIR / "history_index.json"  # 历史索引文件
 WEEKLY_DIR = HISTORY_DIR / "weekly"  # 周记录保存目录
+HISTORY_SOURCE = "scan_stock_v9"  # v9.2新增：本脚本在历史库中的来源标识
 
 # ============================================================
 # 游资追踪配置 (v9.1新增)
 # ============================================================
-HOT_MONEY_CACHE_DIR = Path(__file__).parent / "hot_money_cache"  # 游资数据缓存目录
-HOT_MONEY_CACHE_DIR.mkdir(exist_ok=True)
+# 游资数据缓存目录 HOT_MONEY_CACHE_DIR 见 market_data.py（v9.2：与四日形态脚本共用）
 
 # 知名游资营业部数据库（基于历史龙虎榜统计的活跃游资席位）
 KNOWN_HOT_MONEY_DESKS = {
@@ -103,13 +163,94 @@ KNOWN_HOT_MONEY_DESKS = {
 
 # 游资分析参数配置
 HOT_MONEY_CONFIG = {
-    "lookback_days": 30,  # 龙虎榜回溯天数
+    "lookback_days": 20,  # 龙虎榜回溯交易日数（约一个月；v9.2：按交易日历，原为30个自然日）
     "min_appearances": 2,  # 最小上榜次数
     "min_net_buy": 5000000,  # 最小净买入金额（500万）
     "continuity_days": 3,  # 连续性评估天数
     "weight_in_composite": 0.15,  # 游资因子在综合评分中的权重（默认15%）
 }
 
+# ============================================================
+# 筛选参数配置（v9.2：从各步骤中提取，供回测/参数扫描复用）
+# ============================================================
+SCREEN_PARAMS = {
+    "change_pct_min": -1,  # 第一步：涨幅下限(%)
+    "change_pct_max": 5.5,  # 第一步：涨幅上限(%)
+    "volume_ratio_min": 1.2,  # 第二步：最小量比
+    "turnover_min": 10,  # 第三步：换手率下限(%)
+    "turnover_max": 18,  # 第三步：换手率上限(%)
+    "market_cap_min": 40,  # 第四步：流通市值下限(亿)
+    "market_cap_max": 120,  # 第四步：流通市值上限(亿)
+    "composite_min": 55,  # 第十一步：综合评分阈值
+    "risk_reward_min": 1.5,  # 第十一步：风险收益比阈值
+    "max_output": 20,  # 第十一步：最多输出数量
+}
+
+# 综合评分各维度权重（游资权重见 HOT_MONEY_CONFIG['weight_in_composite']）
+COMPOSITE_WEIGHTS = {
+    "fund": 0.35,  # 资金流向权重（从45%降至35%）
+    "rs": 0.25,  # 相对强度权重（保持25%）
+    "position": 0.15,  # 价格位置权重（从20%降至15%）
+    "original": 0.10,  # 原有信号权重（保持10%）
+}
+
+# 参数方案（v9.2新增）：同一批候选股按多套参数同时评估，数据按各方案的并集只获取一次
+# 每个方案在当前参数之上覆盖；hot_money_weight 为游资因子权重（缺省为 HOT_MONEY_CONFIG['weight_in_composite']）
+SCREEN_PROFILES = {
+    "v8.1": {},  # 当前参数（收紧版）
+    "v8.0": {  # 短线优化版的宽松区间
+        "change_pct_min": -2, "change_pct_max": 7,
+        "turnover_min": 8, "turnover_max": 20,
+        "market_cap_min": 30, "market_cap_max": 150,
+    },
+    "hot_money_25": {"hot_money_weight": 0.25},  # 游资权重25%
+    "no_hot_money": {"hot_money_weight": 0},  # 不计游资因子
+}
+
+# 并集参数：下限/阈值取最小，上限/数量取最大
+PROFILE_LOWER_KEYS = ('change_pct_min', 'volume_ratio_min', 'turnover_min', 'market_cap_min',
+                      'composite_min', 'risk_reward_min')
+PROFILE_UPPER_KEYS = ('change_pct_max', 'turnover_max', 'market_cap_max', 'max_output')
+
+# 第十一步上界剪枝（v9.2新增）：未计算维度按最大值估算综合评分上界，
+# 上界达不到阈值、风险收益比不达标或已进不了前N名的股票跳过其余分析，最终结果不变
+PRUNING_CONFIG = {
+    "enabled": True,
+    "position_max": 18,  # 价格位置得分最大值（突破10 + 支撑8）
+    "hot_money_max": 100,  # 游资评分最大值
+}
+
+# ============================================================
+# 筛选阶段声明（v9.2新增：供 stage_planner 按代价和通过率规划执行顺序）
+# cost: 单只股票的相对代价（下载一只股票日K线=1，只用实时行情=0.001，查资金排行表=0.01）
+# selectivity: 预期通过率（有剖析记录后使用实测值）
+# produces/requires: 新增的列 / 依赖其他阶段新增的列（规划时保证依赖先执行）
+# 第10步主题、第11步综合分析是评分步骤，不参与规划，始终最后执行
+# ============================================================
+SCREEN_STAGES = [
+    {"name": "第1步 涨幅", "method": "step1_filter_by_change_pct", "data": "snapshot",
+     "cost": 0.001, "selectivity": 0.5, "produces": [], "requires": []},
+    {"name": "第1.5步 月涨幅", "method": "step1b_filter_by_monthly_gain", "data": "history",
+     "cost": 1.0, "selectivity": 0.95, "produces": ["月涨幅", "月涨幅类型"], "requires": []},
+    {"name": "第2步 量比", "method": "step2_filter_by_volume_ratio", "data": "snapshot",
+     "cost": 0.001, "selectivity": 0.45, "produces": [], "requires": []},
+    {"name": "第3步 换手率", "method": "step3_filter_by_turnover", "data": "snapshot",
+     "cost": 0.001, "selectivity": 0.15, "produces": [], "requires": []},
+    {"name": "第4步 市值", "method": "step4_filter_by_market_cap", "data": "snapshot",
+     "cost": 0.001, "selectivity": 0.5, "produces": ["流通市值_亿"], "requires": []},
+    {"name": "第5步 资金流向", "method": "step5_filter_by_fund_flow", "data": "fund_flow",
+     "cost": 0.01, "selectivity": 0.6,
+     "produces": ["资金信号", "信号强度", "主力净流入", "资金一致性", "流量占比"], "requires": []},
+    {"name": "第6步 量能形态", "method": "step6_filter_by_volume_pattern", "data": "history",
+     "cost": 1.0, "selectivity": 0.3, "produces": [], "requires": []},
+    {"name": "第7步 均线", "method": "step7_filter_by_ma_trend", "data": "history",
+     "cost": 1.0, "selectivity": 0.3, "produces": [], "requires": []},
+    {"name": "第8步 分时强度", "method": "step8_filter_by_intraday_strength", "data": "index",
+     "cost": 0.001, "selectivity": 0.3, "produces": [], "requires": []},
+    {"name": "第9步 胜率", "method": "step9_filter_by_win_rate", "data": "history",
+     "cost": 1.0, "selectivity": 0.3, "produces": ["上涨天数", "下跌天数", "胜率", "胜率百分比"], "requires": []},
+]
+
 
 # ============================================================
 # 月份主题配置
@@ -241,8 +382,26 @@ MONTHLY_THEMES = {
 }
 
 
+def profile_params(name, base=None):
+    """参数方案的完整参数（在base之上覆盖，v9.2新增）"""
+    params = {**(base or SCREEN_PARAMS), 'hot_money_weight': HOT_MONEY_CONFIG['weight_in_composite']}
+    params.update(SCREEN_PROFILES[name])
+    return params
+
+
+def union_params(param_sets):
+    """多个参数方案的并集：区间取最宽、阈值取最低，各方案的候选股都包含在内（v9.2新增）"""
+    union = dict(param_sets[0])
+    for params in param_sets[1:]:
+        for key in PROFILE_LOWER_KEYS:
+            union[key] = min(union[key], params[key])
+        for key in PROFILE_UPPER_KEYS:
+            union[key] = max(union[key], params[key])
+    return union
+
+
 class StockScreener:
-    def __init__(self, target_sector=None):
+    def __init__(self, target_sector=None, params=None, reporter='console', profiles=None, data=None):
         self.today = datetime.now().strftime('%Y%m%d')
         self.current_month = datetime.now().month
         self.theme = MONTHLY_THEMES.get(self.current_month, {})
@@ -250,16 +409,50 @@ class StockScreener:
         self.concept_stocks = {}  # 缓存概念板块数据
         self.fund_flow_data = None  # 缓存资金流向数据
         self.target_sector = target_sector  # 目标板块/概念
+        self.params = {**SCREEN_PARAMS, **(params or {})}  # v9.2新增：筛选参数
+        self.base_params = dict(self.params)  # v9.2新增：应用参数方案前的参数（检查点续跑用）
+        # v9.2新增：多参数方案（第一个为主方案），筛选按并集参数执行
+        self.profiles = {name: profile_params(name, self.params) for name in (profiles or [])}
+        if self.profiles:
+            self.params = union_params(list(self.profiles.values()))
+        self.profile_results = {}  # v9.2新增：各参数方案的结果
         self.market_index_data = None  # 缓存大盘指数数据
-        self.index_history = {}  # 缓存指数历史数据
-        self.batch_id = datetime.now().strftime('%Y%m%d_%H%M%S')  # 批次ID
+        self.batch_id = new_batch_id()  # 批次ID（v9.2：同一秒内的多个批次追加序号）
         self.selection_date = datetime.now().strftime('%Y-%m-%d')  # 选股日期
         self.is_monday = datetime.now().weekday() == 0  # 是否周一
-        self.lhb_cache = None  # v9.1新增：龙虎榜数据缓存（全局，避免重复获取）
+        # v9.2新增：共享行情数据服务（实时行情/日K线/龙虎榜），不传时本筛选器独用一个
+        self.data = data if data is not None else MarketDataService(source=ak)
+        self.spot_data = None  # v9.2新增：全市场实时行情（归档用）
+        self.spot_fetched_at = None  # v9.2新增：实时行情抓取时刻
+        self.index_spot_data = None  # v9.2新增：最近一次获取的指数行情（归档用）
+        self.evaluated_features = None  # v9.2新增：第十一步评估过的全部候选股因子（因子库用）
+        self.scored_features = None  # v9.2新增：第十一步完整评估的候选股（多参数方案用）
+        self.profiler = RunProfiler(self.batch_id, HISTORY_SOURCE)  # v9.2新增：分阶段剖析
+        self.source_health = SourceHealth(self.batch_id, HISTORY_SOURCE)  # v9.2新增：数据源健康监控
+        self.weak_market_policy = 'ask'  # v9.2新增：情绪低迷时 ask询问 / continue继续 / abort放弃（无人值守模式）
+        self.run_status = None  # v9.2新增：提前结束的原因（no_data/skipped），正常完成为None
+        self.result_df = None  # v9.2新增：最终入选结果（无人值守模式写出）
+        self.reporter = make_reporter(reporter)  # v9.2新增：结果展示（None时整个运行不打印）
+        self.stage_frames = {}  # v9.2新增：各阶段之后存活的股票
+        self.sentiment = None  # v9.2新增：本次运行的市场情绪
+        self.run_count = 0  # v9.2新增：本实例已运行次数（重复运行时重置单次状态）
+        self.deadline = None  # v9.2新增：截止时间（datetime），设置后第十一步按剩余时间降级可选维度
+        self.budget = None  # v9.2新增：本次运行的时间预算（DeadlineBudget）
+        self.checkpoint = None  # v9.2新增：本次运行的检查点（RunCheckpoint）
+        # v9.2新增：是否记录检查点。传入共享数据服务（常驻服务/run_combined）时默认不记录：
+        # 服务里已有的大量K线不属于本次运行，每次都落盘代价太大，且这类调用方不会续跑
+        self.checkpointing = data is None
+        # v9.2新增：常驻服务模式，跳过上周回顾和上次回测（每次请求都重新计算，与本次筛选无关），不记录检查点
+        self.daemon_mode = False
+        self.resuming = False  # v9.2新增：本次运行是否从检查点续跑
+        self.run_started = None  # v9.2新增：本次运行开始时刻（汇总无数据记录用）
 
         # 确保历史记录目录存在
         HISTORY_DIR.mkdir(parents=True, exist_ok=True)
         WEEKLY_DIR.mkdir(parents=True, exist_ok=True)
+        HOT_MONEY_CACHE_DIR.mkdir(parents=True, exist_ok=True)
+        self.history_store = HistoryStore()  # v9.2新增：SQLite历史库
+        self.weekly_log = WeeklyLog(WEEKLY_DIR)  # v9.2新增：只追加周记录
 
     def save_selection_result(self, df):
         """
@@ -272,7 +465,7 @@ class StockScreener:
         - 选出的股票列表及关键指标
         """
         if df.empty:
-            print("\n📝 本次无选股结果，不保存历史记录")
+            self._log("\n📝 本次无选股结果，不保存历史记录")
             return None
 
         # 构建保存数据
@@ -305,128 +498,28 @@ class StockScreener:
             }
             selection_data['stocks'].append(stock_info)
 
-        # 保存到单独的批次文件
-        batch_file = HISTORY_DIR / f"batch_{self.batch_id}.json"
-        with open(batch_file, 'w', encoding='utf-8') as f:
-            json.dump(selection_data, f, ensure_ascii=False, indent=2)
-
-        # 更新历史索引
-        self._update_history_index(selection_data)
+        # 写入历史库（v9.2：替代批次JSON文件和history_index.json）
+        self.history_store.save_batch(selection_data, HISTORY_SOURCE)
 
-        print(f"\n📝 选股结果已保存")
-        print(f"   批次ID: {self.batch_id}")
-        print(f"   保存路径: {batch_file}")
+        self._log(f"\n📝 选股结果已保存")
+        self._log(f"   批次ID: {self.batch_id}")
+        self._log(f"   保存路径: {self.history_store.db_path}")
 
         # 同时写入周记录
         self._save_to_weekly_record(selection_data)
 
         return self.batch_id
 
-    def _update_history_index(self, selection_data):
-        """更新历史索引文件"""
-        # 读取现有索引
-        if HISTORY_FILE.exists():
-            with open(HISTORY_FILE, 'r', encoding='utf-8') as f:
-                history_index = json.load(f)
-        else:
-            history_index = {'batches': []}
-
-        # 添加新批次摘要
-        batch_summary = {
-            'batch_id': selection_data['batch_id'],
-            'selection_time': selection_data['selection_time'],
-            'selection_date': selection_data['selection_date'],
-            'target_sector': selection_data['target_sector'],
-            'stock_count': selection_data['stock_count'],
-            'stock_codes': [s['code'] for s in selection_data['stocks']],
-            'file_path': f"batch_{selection_data['batch_id']}.json"
-        }
-
-        history_index['batches'].insert(0, batch_summary)  # 最新的放最前面
-
-        # 只保留最近30个批次
-        history_index['batches'] = history_index['batches'][:30]
-
-        # 保存索引
-        with open(HISTORY_FILE, 'w', encoding='utf-8') as f:
-            json.dump(history_index, f, ensure_ascii=False, indent=2)
-
-    def _get_week_number(self, date_str=None):
-        """获取周编号（格式：2024_W01）"""
-        if date_str:
-            dt = datetime.strptime(date_str, '%Y-%m-%d')
-        else:
-            dt = datetime.now()
-        year, week, _ = dt.isocalendar()
-        return f"{year}_W{week:02d}"
-
-    def _get_weekly_file_path(self, week_number=None):
-        """获取周记录文件路径"""
-        if week_number is None:
-            week_number = self._get_week_number()
-        return WEEKLY_DIR / f"week_{week_number}.json"
-
     def _save_to_weekly_record(self, selection_data):
         """
-        将选股结果同时写入周记录文件
-        每周一个文件，记录本周每天的选股结果
+        将选股结果同时写入周记录
+        v9.2：只向本周日志追加一行，周汇总在读取时重建
         """
-        week_number = self._get_week_number()
-        weekly_file = self._get_weekly_file_path(week_number)
-
-        # 读取现有周记录
-        if weekly_file.exists():
-            with open(weekly_file, 'r', encoding='utf-8') as f:
-                weekly_data = json.load(f)
-        else:
-            weekly_data = {
-                'week_number': week_number,
-                'start_date': '',
-                'end_date': '',
-                'daily_records': [],
-                'all_stocks': {}  # 记录本周所有被选中的股票及其出现次数
-            }
-
-        # 更新日期范围
-        current_date = selection_data['selection_date']
-        if not weekly_data['start_date'] or current_date < weekly_data['start_date']:
-            weekly_data['start_date'] = current_date
-        if not weekly_data['end_date'] or current_date > weekly_data['end_date']:
-            weekly_data['end_date'] = current_date
-
-        # 添加当日记录
-        daily_record = {
-            'date': current_date,
-            'batch_id': selection_data['batch_id'],
-            'stock_count': selection_data['stock_count'],
-            'stocks': [{'code': s['code'], 'name': s['name'], 'price': s['selection_price'],
-                       'rating': s['rating']} for s in selection_data['stocks']]
-        }
-
-        # 检查是否已有当日记录，避免重复
-        existing_dates = [r['date'] for r in weekly_data['daily_records']]
-        if current_date not in existing_dates:
-            weekly_data['daily_records'].append(daily_record)
-
-        # 更新股票出现统计
-        for stock in selection_data['stocks']:
-            code = stock['code']
-            if code not in weekly_data['all_stocks']:
-                weekly_data['all_stocks'][code] = {
-                    'name': stock['name'],
-                    'appearances': [],
-                    'count': 0
-                }
-            # 避免同日重复记录
-            if current_date not in weekly_data['all_stocks'][code]['appearances']:
-                weekly_data['all_stocks'][code]['appearances'].append(current_date)
-                weekly_data['all_stocks'][code]['count'] += 1
-
-        # 保存周记录
-        with open(weekly_file, 'w', encoding='utf-8') as f:
-            json.dump(weekly_data, f, ensure_ascii=False, indent=2)
-
-        print(f"   📅 已同步写入周记录: {week_number}")
+        try:
+            week_number = self.weekly_log.append(selection_data, HISTORY_SOURCE)
+            self._log(f"   📅 已同步写入周记录: {week_number}")
+        except Exception as e:
+            self._log(f"   ⚠️ 写入周记录失败: {e}")
 
     def get_consecutive_stocks(self, min_days=2):
         """
@@ -434,25 +527,9 @@ class StockScreener:
         min_days: 最少连续天数，默认2天
         返回：连续被选中的股票列表
         """
-        if not HISTORY_FILE.exists():
-            return []
-
-        with open(HISTORY_FILE, 'r', encoding='utf-8') as f:
-            history_index = json.load(f)
-
-        batches = history_index.get('batches', [])
-        if len(batches) < min_days:
-            return []
-
-        # 获取最近几天的选股记录
-        recent_dates = []
-        date_stocks = {}
-
-        for batch in batches[:10]:  # 检查最近10个批次
-            date = batch['selection_date']
-            if date not in date_stocks:
-                date_stocks[date] = set(batch['stock_codes'])
-                recent_dates.append(date)
+        # 获取最近10个选股日期的入选股票（同日多批次取最后一个）
+        date_stocks = self.history_store.get_date_stock_sets(source=HISTORY_SOURCE, max_dates=10)
+        recent_dates = list(date_stocks.keys())
 
         if len(recent_dates) < min_days:
             return []
@@ -468,7 +545,11 @@ class StockScreener:
                 # 检查从当前日期向前连续min_days天
                 dates_to_check = recent_dates[i-min_days+1:i+1]
                 if len(dates_to_check) == min_days:
-                    # 检查是否为连续日期（工作日）
+                    # 检查是否为连续交易日（v9.2：按交易日历，中间有未选股的交易日时不算连续）
+                    calendar = self.data.calendar
+                    if any(calendar.distance(earlier, later) != 1
+                           for earlier, later in zip(dates_to_check[1:], dates_to_check[:-1])):
+                        continue
                     common_stocks = date_stocks[dates_to_check[0]]
                     for d in dates_to_check[1:]:
                         common_stocks = common_stocks.intersection(date_stocks[d])
@@ -511,31 +592,28 @@ class StockScreener:
         if not self.is_monday:
             return
 
-        print("\n" + "=" * 70)
-        print("📊 【上周选股表现回顾】周一汇总报告")
-        print("=" * 70)
+        self._log("\n" + "=" * 70)
+        self._log("📊 【上周选股表现回顾】周一汇总报告")
+        self._log("=" * 70)
 
         # 获取上周的周编号
         last_week_dt = datetime.now() - timedelta(days=7)
-        last_week_number = self._get_week_number(last_week_dt.strftime('%Y-%m-%d'))
-        weekly_file = self._get_weekly_file_path(last_week_number)
+        last_week_number = get_week_number(last_week_dt.strftime('%Y-%m-%d'))
+        weekly_data = self.weekly_log.load_summary(last_week_number)
 
-        if not weekly_file.exists():
-            print(f"\n❌ 未找到上周({last_week_number})的选股记录")
+        if weekly_data is None:
+            self._log(f"\n❌ 未找到上周({last_week_number})的选股记录")
             return
 
-        with open(weekly_file, 'r', encoding='utf-8') as f:
-            weekly_data = json.load(f)
-
-        print(f"\n📅 上周周期: {weekly_data['start_date']} ~ {weekly_data['end_date']}")
-        print(f"📊 选股天数: {len(weekly_data['daily_records'])} 天")
-        print(f"🔢 涉及股票: {len(weekly_data['all_stocks'])} 只")
+        self._log(f"\n📅 上周周期: {weekly_data['start_date']} ~ {weekly_data['end_date']}")
+        self._log(f"📊 选股天数: {len(weekly_data['daily_records'])} 天")
+        self._log(f"🔢 涉及股票: {len(weekly_data['all_stocks'])} 只")
 
         # 获取实时行情
         try:
-            realtime_df = ak.stock_zh_a_spot_em()
+            realtime_df = self.data.spot()
         except Exception as e:
-            print(f"\n❌ 获取实时行情失败: {e}")
+            self._log(f"\n❌ 获取实时行情失败: {e}")
             return
 
         # 分析每只股票的表现
@@ -578,18 +656,18 @@ class StockScreener:
             })
 
         if not performance_results:
-            print("\n⚠️ 无法获取股票行情数据")
+            self._log("\n⚠️ 无法获取股票行情数据")
             return
 
         # 按累计涨幅排序
         performance_results.sort(key=lambda x: x['total_change'], reverse=True)
 
         # 打印详细报告
-        print("\n" + "-" * 70)
-        print("📈 【上周选股表现明细】")
-        print("-" * 70)
-        print(f"{'代码':<8} {'名称':<8} {'出现次数':>8} {'首选价格':>10} {'当前价格':>10} {'累计涨幅':>10}")
-        print("-" * 70)
+        self._log("\n" + "-" * 70)
+        self._log("📈 【上周选股表现明细】")
+        self._log("-" * 70)
+        self._log(f"{'代码':<8} {'名称':<8} {'出现次数':>8} {'首选价格':>10} {'当前价格':>10} {'累计涨幅':>10}")
+        self._log("-" * 70)
 
         total_gain = []
         win_count = 0
@@ -597,7 +675,7 @@ class StockScreener:
         for r in performance_results:
             status = "🔥" if r['total_change'] > 5 else ("📈" if r['total_change'] > 0 else "📉")
             first_price_str = f"{r['first_price']:.2f}" if r['first_price'] else "N/A"
-            print(f"{r['code']:<8} {r['name']:<8} {r['appear_count']:>8} {first_price_str:>10} "
+            self._log(f"{r['code']:<8} {r['name']:<8} {r['appear_count']:>8} {first_price_str:>10} "
                   f"{r['current_price']:>10.2f} {r['total_change']:>+9.2f}% {status}")
 
             if r['total_change'] != 0:
@@ -606,9 +684,9 @@ class StockScreener:
                     win_count += 1
 
         # 统计汇总
-        print("\n" + "-" * 70)
-        print("📊 【上周整体统计】")
-        print("-" * 70)
+        self._log("\n" + "-" * 70)
+        self._log("📊 【上周整体统计】")
+        self._log("-" * 70)
 
         if total_gain:
             avg_gain = np.mean(total_gain)
@@ -616,48 +694,31 @@ class StockScreener:
             max_loss = min(total_gain)
             win_rate = win_count / len(total_gain) * 100
 
-            print(f"   平均涨幅: {avg_gain:+.2f}%")
-            print(f"   最大盈利: {max_gain:+.2f}%")
-            print(f"   最大亏损: {max_loss:+.2f}%")
-            print(f"   胜率: {win_rate:.1f}% ({win_count}/{len(total_gain)})")
+            self._log(f"   平均涨幅: {avg_gain:+.2f}%")
+            self._log(f"   最大盈利: {max_gain:+.2f}%")
+            self._log(f"   最大亏损: {max_loss:+.2f}%")
+            self._log(f"   胜率: {win_rate:.1f}% ({win_count}/{len(total_gain)})")
 
         # 多次被选中的股票表现
         multi_select = [r for r in performance_results if r['appear_count'] >= 2]
         if multi_select:
-            print("\n" + "-" * 70)
-            print("⭐ 【多次被选中股票表现】(被选中≥2次)")
-            print("-" * 70)
+            self._log("\n" + "-" * 70)
+            self._log("⭐ 【多次被选中股票表现】(被选中≥2次)")
+            self._log("-" * 70)
 
             multi_gains = [r['total_change'] for r in multi_select]
             avg_multi = np.mean(multi_gains)
-            print(f"   数量: {len(multi_select)} 只")
-            print(f"   平均涨幅: {avg_multi:+.2f}%")
+            self._log(f"   数量: {len(multi_select)} 只")
+            self._log(f"   平均涨幅: {avg_multi:+.2f}%")
 
             if avg_multi > avg_gain:
-                print("   💡 多次选中股票跑赢整体，连续选中信号有效！")
+                self._log("   💡 多次选中股票跑赢整体，连续选中信号有效！")
 
-        print("\n" + "=" * 70)
+        self._log("\n" + "=" * 70)
 
     def get_last_selection(self):
         """获取上一次的选股记录"""
-        if not HISTORY_FILE.exists():
-            return None
-
-        with open(HISTORY_FILE, 'r', encoding='utf-8') as f:
-            history_index = json.load(f)
-
-        if not history_index.get('batches'):
-            return None
-
-        # 获取最近一次的批次
-        last_batch = history_index['batches'][0]
-        batch_file = HISTORY_DIR / last_batch['file_path']
-
-        if batch_file.exists():
-            with open(batch_file, 'r', encoding='utf-8') as f:
-                return json.load(f)
-
-        return None
+        return self.history_store.get_last_batch(source=HISTORY_SOURCE)
 
     def analyze_previous_selection(self):
         """
@@ -669,15 +730,15 @@ class StockScreener:
         3. 各评级股票的平均表现
         4. 策略有效性评估
         """
-        print("\n" + "=" * 70)
-        print("【历史选股回测分析】v7.0 策略验证")
-        print("=" * 70)
+        self._log("\n" + "=" * 70)
+        self._log("【历史选股回测分析】v7.0 策略验证")
+        self._log("=" * 70)
 
         last_selection = self.get_last_selection()
 
         if last_selection is None:
-            print("\n📊 暂无历史选股记录，跳过回测分析")
-            print("   💡 本次选股完成后将自动保存记录")
+            self._log("\n📊 暂无历史选股记录，跳过回测分析")
+            self._log("   💡 本次选股完成后将自动保存记录")
             return
 
         selection_date = last_selection['selection_date']
@@ -685,22 +746,22 @@ class StockScreener:
         batch_id = last_selection['batch_id']
         stocks = last_selection['stocks']
 
-        print(f"\n📅 上次选股时间: {selection_time}")
-        print(f"🔖 批次ID: {batch_id}")
-        print(f"🎯 目标板块: {last_selection.get('target_sector') or '全市场'}")
-        print(f"📊 选出股票数: {len(stocks)}")
+        self._log(f"\n📅 上次选股时间: {selection_time}")
+        self._log(f"🔖 批次ID: {batch_id}")
+        self._log(f"🎯 目标板块: {last_selection.get('target_sector') or '全市场'}")
+        self._log(f"📊 选出股票数: {len(stocks)}")
 
         if not stocks:
-            print("\n⚠️ 上次选股结果为空，跳过回测")
+            self._log("\n⚠️ 上次选股结果为空，跳过回测")
             return
 
-        print(f"\n⏳ 正在获取 {len(stocks)} 只股票的最新行情...")
+        self._log(f"\n⏳ 正在获取 {len(stocks)} 只股票的最新行情...")
 
         # 获取实时行情数据
         try:
-            realtime_df = ak.stock_zh_a_spot_em()
+            realtime_df = self.data.spot()
         except Exception as e:
-            print(f"\n❌ 获取实时行情失败: {e}")
+            self._log(f"\n❌ 获取实时行情失败: {e}")
             return
 
         # 分析每只股票的表现
@@ -742,37 +803,44 @@ class StockScreener:
             })
 
         if not analysis_results:
-            print("\n⚠️ 无法获取股票行情数据")
+            self._log("\n⚠️ 无法获取股票行情数据")
             return
 
         # 输出回测结果
         self._print_backtest_report(analysis_results, selection_date, batch_id)
 
     def _get_next_day_change(self, stock_code, selection_date):
-        """获取选股后次日的涨跌幅"""
+        """
+        获取选股后次日的涨跌幅
+
+        v9.2：按交易日历只请求 选股交易日~次一交易日 两根K线；选股日期不是交易日时（周末运行），
+        以之前最近的交易日收盘为基准（即选股时看到的行情）
+        """
         try:
-            # 获取选股日期后的历史数据
-            end_date = datetime.now().strftime('%Y%m%d')
-            start_date = selection_date.replace('-', '')
+            calendar = self.data.calendar
+            base_date = calendar.latest(selection_date)
+            next_date = calendar.after(base_date, 1)
+            if next_date > datetime.now().date():
+                return None  # 次一交易日还没有到
 
             hist_data = ak.stock_zh_a_hist(
                 symbol=stock_code,
                 period="daily",
-                start_date=start_date,
-                end_date=end_date,
+                start_date=base_date.strftime('%Y%m%d'),
+                end_date=next_date.strftime('%Y%m%d'),
                 adjust="qfq"
             )
 
             if hist_data is None or len(hist_data) < 2:
                 return None
 
-            # 找到选股日期的索引
+            # 找到选股交易日的索引
             hist_data['日期'] = pd.to_datetime(hist_data['日期']).dt.strftime('%Y-%m-%d')
-            selection_idx = hist_data[hist_data['日期'] == selection_date].index
+            hist_data = hist_data.reset_index(drop=True)
+            selection_idx = hist_data[hist_data['日期'] == base_date.strftime('%Y-%m-%d')].index
 
             if len(selection_idx) == 0:
-                # 如果选股当日不是交易日，找最近的交易日
-                return None
+                return None  # 选股交易日停牌
 
             idx = selection_idx[0]
             if idx + 1 < len(hist_data):
@@ -796,40 +864,37 @@ class StockScreener:
         返回：
         - 分析结果字典
         """
-        print("\n" + "=" * 70)
-        print("【指定批次选股回测分析】v8.1")
-        print("=" * 70)
+        self._log("\n" + "=" * 70)
+        self._log("【指定批次选股回测分析】v8.1")
+        self._log("=" * 70)
 
         # 读取指定批次数据
-        batch_file = HISTORY_DIR / f"batch_{batch_id}.json"
+        batch_data = self.history_store.get_batch(batch_id)
 
-        if not batch_file.exists():
-            print(f"\n❌ 批次 {batch_id} 不存在")
+        if batch_data is None:
+            self._log(f"\n❌ 批次 {batch_id} 不存在")
             return None
 
-        with open(batch_file, 'r', encoding='utf-8') as f:
-            batch_data = json.load(f)
-
         selection_date = batch_data['selection_date']
         selection_time = batch_data['selection_time']
         stocks = batch_data['stocks']
 
-        print(f"\n📅 选股时间: {selection_time}")
-        print(f"🔖 批次ID: {batch_id}")
-        print(f"🎯 目标板块: {batch_data.get('target_sector') or '全市场'}")
-        print(f"📊 选出股票数: {len(stocks)}")
+        self._log(f"\n📅 选股时间: {selection_time}")
+        self._log(f"🔖 批次ID: {batch_id}")
+        self._log(f"🎯 目标板块: {batch_data.get('target_sector') or '全市场'}")
+        self._log(f"📊 选出股票数: {len(stocks)}")
 
         if not stocks:
-            print("\n⚠️ 该批次选股结果为空")
+            self._log("\n⚠️ 该批次选股结果为空")
             return None
 
-        print(f"\n⏳ 正在获取 {len(stocks)} 只股票的最新行情...")
+        self._log(f"\n⏳ 正在获取 {len(stocks)} 只股票的最新行情...")
 
         # 获取实时行情数据
         try:
-            realtime_df = ak.stock_zh_a_spot_em()
+            realtime_df = self.data.spot()
         except Exception as e:
-            print(f"\n❌ 获取实时行情失败: {e}")
+            self._log(f"\n❌ 获取实时行情失败: {e}")
             return None
 
         # 分析每只股票的表现
@@ -871,7 +936,7 @@ class StockScreener:
             })
 
         if not analysis_results:
-            print("\n⚠️ 无法获取股票行情数据")
+            self._log("\n⚠️ 无法获取股票行情数据")
             return None
 
         # 输出回测结果
@@ -881,9 +946,9 @@ class StockScreener:
 
     def _print_backtest_report(self, results, selection_date, batch_id):
         """打印回测报告"""
-        print("\n" + "-" * 60)
-        print("📈 【回测结果详情】")
-        print("-" * 60)
+        self._log("\n" + "-" * 60)
+        self._log("📈 【回测结果详情】")
+        self._log("-" * 60)
 
         # 按评级分组统计
         rating_groups = {}
@@ -898,9 +963,9 @@ class StockScreener:
         total_cumulative = [r['total_change'] for r in results if r['total_change'] != 0]
 
         # 显示每只股票的表现
-        print("\n📋 个股表现明细:")
-        print(f"{'代码':<8} {'名称':<8} {'评级':<12} {'次日涨幅':>10} {'累计涨幅':>10} {'今日涨幅':>10}")
-        print("-" * 70)
+        self._log("\n📋 个股表现明细:")
+        self._log(f"{'代码':<8} {'名称':<8} {'评级':<12} {'次日涨幅':>10} {'累计涨幅':>10} {'今日涨幅':>10}")
+        self._log("-" * 70)
 
         # 按累计涨幅排序
         results_sorted = sorted(results, key=lambda x: x['total_change'], reverse=True)
@@ -920,12 +985,12 @@ class StockScreener:
             else:
                 status = "💔"
 
-            print(f"{r['code']:<8} {r['name']:<8} {r['rating']:<12} {next_day_str:>10} {total_str:>10} {today_str:>10} {status}")
+            self._log(f"{r['code']:<8} {r['name']:<8} {r['rating']:<12} {next_day_str:>10} {total_str:>10} {today_str:>10} {status}")
 
         # 分评级统计
-        print("\n" + "-" * 60)
-        print("📊 【分评级统计】")
-        print("-" * 60)
+        self._log("\n" + "-" * 60)
+        self._log("📊 【分评级统计】")
+        self._log("-" * 60)
 
         for rating in ['AAA(极强)', 'AA(强势)', 'A(良好)', 'B(一般)', 'C(较弱)', 'D(弱势)']:
             if rating in rating_groups:
@@ -937,18 +1002,18 @@ class StockScreener:
                 avg_cumulative = np.mean(cumulative_changes) if cumulative_changes else 0
                 win_rate = len([c for c in cumulative_changes if c > 0]) / len(cumulative_changes) * 100 if cumulative_changes else 0
 
-                print(f"   {rating}: {len(group)}只 | 次日均涨: {avg_next_day:+.2f}% | 累计均涨: {avg_cumulative:+.2f}% | 胜率: {win_rate:.1f}%")
+                self._log(f"   {rating}: {len(group)}只 | 次日均涨: {avg_next_day:+.2f}% | 累计均涨: {avg_cumulative:+.2f}% | 胜率: {win_rate:.1f}%")
 
         # 整体统计
-        print("\n" + "-" * 60)
-        print("📈 【整体表现统计】")
-        print("-" * 60)
+        self._log("\n" + "-" * 60)
+        self._log("📈 【整体表现统计】")
+        self._log("-" * 60)
 
         if total_next_day:
             avg_next_day = np.mean(total_next_day)
             win_next_day = len([c for c in total_next_day if c > 0]) / len(total_next_day) * 100
-            print(f"   次日平均涨幅: {avg_next_day:+.2f}%")
-            print(f"   次日上涨比例: {win_next_day:.1f}%")
+            self._log(f"   次日平均涨幅: {avg_next_day:+.2f}%")
+            self._log(f"   次日上涨比例: {win_next_day:.1f}%")
 
         if total_cumulative:
             avg_cumulative = np.mean(total_cumulative)
@@ -956,80 +1021,222 @@ class StockScreener:
             max_loss = min(total_cumulative)
             win_rate = len([c for c in total_cumulative if c > 0]) / len(total_cumulative) * 100
 
-            print(f"   累计平均涨幅: {avg_cumulative:+.2f}%")
-            print(f"   最大盈利: {max_gain:+.2f}%")
-            print(f"   最大亏损: {max_loss:+.2f}%")
-            print(f"   累计胜率: {win_rate:.1f}%")
+            self._log(f"   累计平均涨幅: {avg_cumulative:+.2f}%")
+            self._log(f"   最大盈利: {max_gain:+.2f}%")
+            self._log(f"   最大亏损: {max_loss:+.2f}%")
+            self._log(f"   累计胜率: {win_rate:.1f}%")
 
         # 策略评估
-        print("\n" + "-" * 60)
-        print("💡 【策略有效性评估】")
-        print("-" * 60)
+        self._log("\n" + "-" * 60)
+        self._log("💡 【策略有效性评估】")
+        self._log("-" * 60)
 
         if total_cumulative:
             if avg_cumulative > 3 and win_rate > 60:
-                print("   ✅ 策略表现优秀！建议继续使用当前筛选逻辑")
+                self._log("   ✅ 策略表现优秀！建议继续使用当前筛选逻辑")
             elif avg_cumulative > 0 and win_rate > 50:
-                print("   📊 策略表现良好，可维持现有策略")
+                self._log("   📊 策略表现良好，可维持现有策略")
             elif avg_cumulative > -2:
-                print("   ⚠️ 策略表现一般，建议优化筛选条件")
+                self._log("   ⚠️ 策略表现一般，建议优化筛选条件")
             else:
-                print("   ❌ 策略表现不佳，建议检查市场环境或调整策略")
+                self._log("   ❌ 策略表现不佳，建议检查市场环境或调整策略")
 
             # AAA级股票单独评估
             if 'AAA(极强)' in rating_groups:
                 aaa_group = rating_groups['AAA(极强)']
                 aaa_cumulative = [r['total_change'] for r in aaa_group]
                 aaa_avg = np.mean(aaa_cumulative)
-                print(f"\n   💎 AAA级标的表现: 平均涨幅 {aaa_avg:+.2f}%")
+                self._log(f"\n   💎 AAA级标的表现: 平均涨幅 {aaa_avg:+.2f}%")
                 if aaa_avg > avg_cumulative:
-                    print("      → AAA级标的跑赢整体，评级系统有效")
+                    self._log("      → AAA级标的跑赢整体，评级系统有效")
                 else:
-                    print("      → AAA级未显著跑赢，可能需调整评分权重")
+                    self._log("      → AAA级未显著跑赢，可能需调整评分权重")
+
+        self._log("\n" + "=" * 70)
+
+    def _fetch_histories(self, stock_codes, start_date):
+        """
+        多线程获取多只股票从start_date至今的日K线，每只股票只请求一次（v9.2新增）
+
+        返回：长表DataFrame [代码, 日期, 收盘]，日期为int32日序号
+        """
+        end_date = datetime.now().strftime('%Y%m%d')
+
+        def fetch(code):
+            try:
+                df = ak.stock_zh_a_hist(symbol=code, period="daily", start_date=start_date,
+                                        end_date=end_date, adjust="qfq")
+                if df is None or df.empty:
+                    return None
+                return pd.DataFrame({'代码': code, '日期': date_to_ordinal(df['日期']), '收盘': df['收盘']})
+            except Exception:
+                return None
+
+        frames = []
+        total = len(stock_codes)
+        completed = 0
+        with ThreadPoolExecutor(max_workers=min(20, max(total, 1))) as executor:
+            futures = [executor.submit(fetch, code) for code in stock_codes]
+            for future in as_completed(futures):
+                completed += 1
+                result = future.result()
+                if result is not None:
+                    frames.append(result)
+                if completed % 50 == 0 or completed == total:
+                    self._log(f"   ⏳ 已完成 {completed}/{total} ({completed*100//total}%)")
+
+        if not frames:
+            return pd.DataFrame({'代码': pd.Series(dtype=object), '日期': pd.Series(dtype='int32'),
+                                 '收盘': pd.Series(dtype='float64')})
+        return pd.concat(frames, ignore_index=True)
+
+    def analyze_all_batches_performance(self):
+        """
+        批量回测全部历史批次（v9.2新增）
+
+        从历史库读取全部批次的选股记录，对全部股票代码去重后每只只获取一次K线，
+        再通过日期连接一次性算出所有(批次, 股票)的次日涨幅和至今累计涨幅。
+        选股日不是交易日时（如周末运行），以之前最近一个交易日的收盘价为基准。
+        """
+        self._log("\n" + "=" * 70)
+        self._log("【全部历史批次批量回测】v9.2")
+        self._log("=" * 70)
 
-        print("\n" + "=" * 70)
+        df_pairs = self.history_store.load_selection_records()
+        if df_pairs.empty:
+            self._log("\n暂无历史选股记录")
+            return None
+
+        df_pairs['rating'] = df_pairs['rating'].replace('', np.nan).fillna('未评级')
+        df_pairs['selection_price'] = df_pairs['selection_price'].fillna(0)
+        df_pairs['日期'] = date_to_ordinal(df_pairs['selection_date'])
+        stock_codes = sorted(df_pairs['code'].unique())
+        start_date = pd.to_datetime(df_pairs['selection_date']).min().strftime('%Y%m%d')
+
+        self._log(f"\n📊 共 {df_pairs['batch_id'].nunique()} 个批次、{len(df_pairs)} 条选股记录、{len(stock_codes)} 只不同股票")
+        self._log(f"⏳ 正在获取自 {start_date} 以来的K线（每只股票只请求一次）...")
+
+        df_hist = self._fetch_histories(stock_codes, start_date)
+        if df_hist.empty:
+            self._log("\n❌ 无法获取历史行情")
+            return None
+
+        # 每只股票的次日收盘价和最新收盘价
+        df_hist = df_hist.sort_values(['代码', '日期']).reset_index(drop=True)
+        df_hist['次日收盘'] = df_hist.groupby('代码')['收盘'].shift(-1)
+        latest_close = df_hist.groupby('代码')['收盘'].last().rename('最新收盘')
+
+        # 按日期连接：选股日 -> 当日（或之前最近一个交易日）的K线
+        df_pairs = df_pairs.sort_values('日期')
+        df_joined = pd.merge_asof(df_pairs, df_hist.sort_values('日期'), on='日期',
+                                  left_by='code', right_by='代码', direction='backward')
+        df_joined = df_joined.join(latest_close, on='code')
+
+        df_joined['next_day_change'] = (df_joined['次日收盘'] - df_joined['收盘']) / df_joined['收盘'] * 100
+        price = df_joined['selection_price'].where(df_joined['selection_price'] > 0)
+        df_joined['total_change'] = (df_joined['最新收盘'] - price) / price * 100
+
+        self._print_all_batches_report(df_joined)
+        return df_joined
+
+    def _print_all_batches_report(self, df):
+        """打印全部批次的批量回测报告"""
+        self._log("\n" + "-" * 60)
+        self._log("📋 【分批次表现】")
+        self._log("-" * 60)
+        self._log(f"{'批次ID':<20} {'股票数':>6} {'次日均涨':>10} {'次日胜率':>10} {'累计均涨':>10} {'累计胜率':>10}")
+        self._log("-" * 70)
+
+        for batch_id, group in df.groupby('batch_id', sort=True):
+            next_day = group['next_day_change'].dropna()
+            total = group['total_change'].dropna()
+            next_avg = f"{next_day.mean():+.2f}%" if not next_day.empty else "N/A"
+            next_win = f"{(next_day > 0).mean() * 100:.1f}%" if not next_day.empty else "N/A"
+            total_avg = f"{total.mean():+.2f}%" if not total.empty else "N/A"
+            total_win = f"{(total > 0).mean() * 100:.1f}%" if not total.empty else "N/A"
+            self._log(f"{batch_id:<20} {len(group):>6} {next_avg:>10} {next_win:>10} {total_avg:>10} {total_win:>10}")
+
+        self._log("\n" + "-" * 60)
+        self._log("📊 【分评级统计】")
+        self._log("-" * 60)
+
+        for rating in ['AAA(极强)', 'AA(强势)', 'A(良好)', 'B(一般)', 'C(较弱)', 'D(弱势)', '未评级']:
+            group = df[df['rating'] == rating]
+            if group.empty:
+                continue
+            next_day = group['next_day_change'].dropna()
+            total = group['total_change'].dropna()
+            avg_next_day = next_day.mean() if not next_day.empty else 0
+            win_next_day = (next_day > 0).mean() * 100 if not next_day.empty else 0
+            avg_total = total.mean() if not total.empty else 0
+            self._log(f"   {rating}: {len(group)}只 | 次日均涨: {avg_next_day:+.2f}% | 次日胜率: {win_next_day:.1f}% | 累计均涨: {avg_total:+.2f}%")
+
+        self._log("\n" + "-" * 60)
+        self._log("📈 【整体表现统计】")
+        self._log("-" * 60)
+
+        next_day = df['next_day_change'].dropna()
+        total = df['total_change'].dropna()
+        if not next_day.empty:
+            self._log(f"   次日平均涨幅: {next_day.mean():+.2f}% | 中位数: {next_day.median():+.2f}%")
+            self._log(f"   次日上涨比例: {(next_day > 0).mean() * 100:.1f}% ({len(next_day)}条有效记录)")
+        if not total.empty:
+            self._log(f"   累计平均涨幅: {total.mean():+.2f}%")
+            self._log(f"   最大盈利: {total.max():+.2f}% | 最大亏损: {total.min():+.2f}%")
+            self._log(f"   累计胜率: {(total > 0).mean() * 100:.1f}%")
+
+        missing = df['next_day_change'].isna().sum()
+        if missing > 0:
+            self._log(f"\n   💡 {missing} 条记录暂无次日数据（选股日为最近交易日或停牌）")
+
+        self._log("\n" + "=" * 70)
+
+    def _log(self, *args, **kwargs):
+        """过程输出（v9.2新增）：有报告器时打印，reporter=None 时直接返回，不重定向标准输出"""
+        if self.reporter is not None:
+            print(*args, **kwargs)
 
     def print_header(self):
         """打印头部信息"""
-        print("=" * 70)
-        print("【A股次日冲高标的筛选系统 v8.1 - 精准剪枝版】")
-        print(f"筛选日期: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}")
-        print(f"🔖 批次ID: {self.batch_id}")
-        print("🆕 v8.1精准剪枝: 收紧筛选条件 + 综合评分阈值 + 风险收益比过滤 + 板块显示")
-        print("⚡ 参数优化: 涨幅(-1%~5.5%) | 量比(≥1.2) | 换手率(10%~18%) | 市值(40~120亿)")
-        print("🎯 最终筛选: 综合评分≥55 & 风险收益比≥1.5 & 最多20只")
-        print("🚫 板块限制: 仅沪深主板（已排除创业板、科创板、北交所）")
+        self._log("=" * 70)
+        self._log("【A股次日冲高标的筛选系统 v8.1 - 精准剪枝版】")
+        self._log(f"筛选日期: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}")
+        self._log(f"🔖 批次ID: {self.batch_id}")
+        self._log("🆕 v8.1精准剪枝: 收紧筛选条件 + 综合评分阈值 + 风险收益比过滤 + 板块显示")
+        self._log("⚡ 参数优化: 涨幅(-1%~5.5%) | 量比(≥1.2) | 换手率(10%~18%) | 市值(40~120亿)")
+        self._log("🎯 最终筛选: 综合评分≥55 & 风险收益比≥1.5 & 最多20只")
+        self._log("🚫 板块限制: 仅沪深主板（已排除创业板、科创板、北交所）")
         if self.is_monday:
-            print("📅 今日是周一，将自动生成上周选股汇总报告")
-        print("=" * 70)
+            self._log("📅 今日是周一，将自动生成上周选股汇总报告")
+        self._log("=" * 70)
         
         # 如果指定了目标板块
         if self.target_sector:
-            print(f"\n🎯 指定板块筛选: 【{self.target_sector}】")
+            self._log(f"\n🎯 指定板块筛选: 【{self.target_sector}】")
         else:
             # 显示当月主题
-            print(f"\n📅 当前月份: {self.current_month}月")
-            print(f"🎯 本月主题: 【{self.theme.get('name', '未知')}】")
-            print(f"💡 核心逻辑: {self.theme.get('logic', '')}")
+            self._log(f"\n📅 当前月份: {self.current_month}月")
+            self._log(f"🎯 本月主题: 【{self.theme.get('name', '未知')}】")
+            self._log(f"💡 核心逻辑: {self.theme.get('logic', '')}")
             
             if self.theme.get('warning'):
-                print(f"\n{self.theme['warning']}")
+                self._log(f"\n{self.theme['warning']}")
             if self.theme.get('special'):
-                print(f"🌟 特别关注: {self.theme['special']}")
+                self._log(f"🌟 特别关注: {self.theme['special']}")
             
-            print(f"\n🔍 重点关注板块: {', '.join(self.theme.get('keywords', [])[:10])}...")
-        print("-" * 70)
+            self._log(f"\n🔍 重点关注板块: {', '.join(self.theme.get('keywords', [])[:10])}...")
+        self._log("-" * 70)
     
     def list_all_concepts(self):
         """列出所有可用的概念板块"""
         try:
-            print("\n📋 正在获取所有概念板块...")
+            self._log("\n📋 正在获取所有概念板块...")
             df = ak.stock_board_concept_name_em()
             if df is not None and not df.empty:
-                print(f"\n✅ 共获取到 {len(df)} 个概念板块\n")
-                print("=" * 70)
-                print("概念板块列表:")
-                print("=" * 70)
+                self._log(f"\n✅ 共获取到 {len(df)} 个概念板块\n")
+                self._log("=" * 70)
+                self._log("概念板块列表:")
+                self._log("=" * 70)
                 
                 # 按列显示
                 for i in range(0, len(df), 3):
@@ -1038,23 +1245,23 @@ class StockScreener:
                         if i + j < len(df):
                             name = df.iloc[i + j]['板块名称']
                             row_items.append(f"{name:20s}")
-                    print("  " + "".join(row_items))
+                    self._log("  " + "".join(row_items))
                 
                 return df
         except Exception as e:
-            print(f"❌ 获取概念板块失败: {e}")
+            self._log(f"❌ 获取概念板块失败: {e}")
         return None
     
     def list_all_industries(self):
         """列出所有可用的行业板块"""
         try:
-            print("\n📋 正在获取所有行业板块...")
+            self._log("\n📋 正在获取所有行业板块...")
             df = ak.stock_board_industry_name_em()
             if df is not None and not df.empty:
-                print(f"\n✅ 共获取到 {len(df)} 个行业板块\n")
-                print("=" * 70)
-                print("行业板块列表:")
-                print("=" * 70)
+                self._log(f"\n✅ 共获取到 {len(df)} 个行业板块\n")
+                self._log("=" * 70)
+                self._log("行业板块列表:")
+                self._log("=" * 70)
                 
                 # 按列显示
                 for i in range(0, len(df), 3):
@@ -1063,11 +1270,11 @@ class StockScreener:
                         if i + j < len(df):
                             name = df.iloc[i + j]['板块名称']
                             row_items.append(f"{name:20s}")
-                    print("  " + "".join(row_items))
+                    self._log("  " + "".join(row_items))
                 
                 return df
         except Exception as e:
-            print(f"❌ 获取行业板块失败: {e}")
+            self._log(f"❌ 获取行业板块失败: {e}")
         return None
     
     def get_sector_stocks(self, sector_name):
@@ -1075,29 +1282,29 @@ class StockScreener:
         获取指定板块/概念的股票代码列表
         先尝试概念板块，再尝试行业板块
         """
-        print(f"\n🔍 正在查找板块【{sector_name}】的成分股...")
+        self._log(f"\n🔍 正在查找板块【{sector_name}】的成分股...")
         
         # 1. 先尝试概念板块
         try:
-            df = ak.stock_board_concept_cons_em(symbol=sector_name)
+            df = self.data.board_members('concept', sector_name)
             if df is not None and not df.empty:
                 codes = df['代码'].tolist()
-                print(f"✅ 在概念板块中找到 {len(codes)} 只股票")
+                self._log(f"✅ 在概念板块中找到 {len(codes)} 只股票")
                 return codes, 'concept'
         except:
             pass
         
         # 2. 再尝试行业板块
         try:
-            df = ak.stock_board_industry_cons_em(symbol=sector_name)
+            df = self.data.board_members('industry', sector_name)
             if df is not None and not df.empty:
                 codes = df['代码'].tolist()
-                print(f"✅ 在行业板块中找到 {len(codes)} 只股票")
+                self._log(f"✅ 在行业板块中找到 {len(codes)} 只股票")
                 return codes, 'industry'
         except:
             pass
         
-        print(f"❌ 未找到板块【{sector_name}】，请检查板块名称是否正确")
+        self._log(f"❌ 未找到板块【{sector_name}】，请检查板块名称是否正确")
         return [], None
         
     def get_realtime_data(self, sector_codes=None):
@@ -1106,18 +1313,20 @@ class StockScreener:
         如果指定了sector_codes，则只获取这些股票的数据
         """
         try:
-            df = ak.stock_zh_a_spot_em()
+            df = compact_spot(self.data.spot())  # v9.2：按内部类型表转换一次
+            self.spot_data = df
+            self.spot_fetched_at = self.data.spot_fetched_at
             
             # 如果指定了板块股票代码，进行筛选
             if sector_codes:
                 df = df[df['代码'].isin(sector_codes)]
-                print(f"\n📊 获取到板块内 {len(df)} 只股票的实时数据")
+                self._log(f"\n📊 获取到板块内 {len(df)} 只股票的实时数据")
             else:
-                print(f"\n📊 获取到 {len(df)} 只股票的实时数据")
+                self._log(f"\n📊 获取到 {len(df)} 只股票的实时数据")
             
             return df
         except Exception as e:
-            print(f"❌ 获取实时数据失败: {e}")
+            self._log(f"❌ 获取实时数据失败: {e}")
             return None
     
     def get_all_fund_flow_data(self):
@@ -1129,14 +1338,14 @@ class StockScreener:
             return self.fund_flow_data
         
         try:
-            print("   📥 正在获取全市场资金流向数据...")
-            df = ak.stock_individual_fund_flow_rank(indicator="今日")
+            self._log("   📥 正在获取全市场资金流向数据...")
+            df = self.data.fund_flow()
             if df is not None and not df.empty:
                 self.fund_flow_data = df
-                print(f"   ✅ 成功获取 {len(df)} 只股票的资金流向数据")
+                self._log(f"   ✅ 成功获取 {len(df)} 只股票的资金流向数据")
                 return df
         except Exception as e:
-            print(f"   ⚠️ 获取资金流向数据失败: {e}")
+            self._log(f"   ⚠️ 获取资金流向数据失败: {e}")
             self.fund_flow_data = pd.DataFrame()  # 空DataFrame避免重复调用
         return pd.DataFrame()
     
@@ -1321,23 +1530,9 @@ class StockScreener:
         获取大盘指数历史数据（用于相对强度对比）
         index_code: 000300=沪深300, 000001=上证指数
         """
-        cache_key = f"{index_code}_{days}"
-        if cache_key in self.index_history:
-            return self.index_history[cache_key]
-
         try:
-            end_date = datetime.now().strftime('%Y%m%d')
-            start_date = (datetime.now() - timedelta(days=days+30)).strftime('%Y%m%d')
-
-            df = ak.index_zh_a_hist(
-                symbol=index_code,
-                period="daily",
-                start_date=start_date,
-                end_date=end_date
-            )
-
+            df = self.data.index_history(index_code, days)  # v9.2：共享数据服务，当日有效
             if df is not None and not df.empty:
-                self.index_history[cache_key] = df
                 return df
         except Exception as e:
             pass
@@ -1358,7 +1553,8 @@ class StockScreener:
         try:
             # 获取大盘实时数据
             if self.market_index_data is None:
-                self.market_index_data = ak.stock_zh_index_spot_em()
+                self.market_index_data = self.data.index_spot()
+                self.index_spot_data = self.market_index_data
 
             # 获取沪深300和上证指数的涨跌幅
             hs300 = self.market_index_data[self.market_index_data['代码'] == '000300']
@@ -1374,7 +1570,7 @@ class StockScreener:
             daily_excess = current_change - benchmark_change
 
             # === 2. 近期相对强度（需要历史数据）===
-            stock_hist = self.get_historical_data(stock_code, days=30)
+            stock_hist = self.get_historical_data(stock_code, days=30, min_bars=20)
             index_hist = self.get_market_index_history('000300', days=30)
 
             rs_5d = 0
@@ -1476,18 +1672,20 @@ class StockScreener:
         except Exception as e:
             return 0, {'相对强度': '分析失败', '相对强度得分': 0}
 
-    def analyze_price_position(self, stock_code, stock_name):
+    def analyze_price_position(self, stock_code, stock_name, hist_data=None):
         """
         关键价格位置确认（v6.0新增）
         分析近半年至一年的走势，评估：
         1. 突破有效性：是否放量突破核心压力位
         2. 支撑稳固性：是否远离并站稳核心支撑位
 
+        hist_data: 已有的一年K线（v9.2新增，不传时获取）
         返回：(价格位置评分, 详细数据)
         """
         try:
             # 获取近一年的历史数据
-            hist_data = self.get_historical_data(stock_code, days=250)
+            if hist_data is None:
+                hist_data = self.get_historical_data(stock_code, days=250, min_bars=60)
 
             if hist_data is None or len(hist_data) < 60:
                 return 0, {'位置状态': '数据不足', '位置得分': 0}
@@ -1620,7 +1818,7 @@ class StockScreener:
         except Exception as e:
             return 0, {'位置状态': '分析失败', '位置得分': 0}
 
-    def calculate_composite_score(self, fund_consistency, fund_flow_ratio, rs_score, position_score, original_signal_strength, hot_money_score=0):
+    def calculate_composite_score(self, fund_consistency, fund_flow_ratio, rs_score, position_score, original_signal_strength, hot_money_score=0, hot_money_weight=None):
         """
         四维度综合评分系统（v9.1新增游资因子）
 
@@ -1630,14 +1828,16 @@ class StockScreener:
         3. 股价已有效突破关键压力位并远离核心支撑区
         4. 【v9.1新增】游资活跃且处于适宜买入时机
 
+        hot_money_weight: 游资权重，None时使用 HOT_MONEY_CONFIG（v9.2新增，参数方案用）
+
         返回：(综合评分, 评级, 风险提示)
         """
         # 各维度权重 - v9.1优化：新增游资因子权重
-        weight_hot_money = HOT_MONEY_CONFIG['weight_in_composite']  # v9.1新增：游资权重（默认15%）
-        weight_fund = 0.35      # 资金流向权重（从45%降至35%）
-        weight_rs = 0.25        # 相对强度权重（保持25%）
-        weight_position = 0.15  # 价格位置权重（从20%降至15%）
-        weight_original = 0.10  # 原有信号权重（保持10%）
+        weight_hot_money = HOT_MONEY_CONFIG['weight_in_composite'] if hot_money_weight is None else hot_money_weight  # v9.1新增：游资权重（默认15%）
+        weight_fund = COMPOSITE_WEIGHTS['fund']
+        weight_rs = COMPOSITE_WEIGHTS['rs']
+        weight_position = COMPOSITE_WEIGHTS['position']
+        weight_original = COMPOSITE_WEIGHTS['original']
 
         # 资金维度得分（一致性 + 流量占比）
         fund_score = (fund_consistency + fund_flow_ratio) / 2
@@ -1715,7 +1915,7 @@ class StockScreener:
         if concept_name in self.concept_stocks:
             return self.concept_stocks[concept_name]
         try:
-            df = ak.stock_board_concept_cons_em(symbol=concept_name)
+            df = self.data.board_members('concept', concept_name)
             codes = df['代码'].tolist() if not df.empty else []
             self.concept_stocks[concept_name] = codes
             return codes
@@ -1725,7 +1925,7 @@ class StockScreener:
     def get_industry_stocks(self, industry_name):
         """获取行业板块成分股"""
         try:
-            df = ak.stock_board_industry_cons_em(symbol=industry_name)
+            df = self.data.board_members('industry', industry_name)
             return df['代码'].tolist() if not df.empty else []
         except:
             return []
@@ -1733,7 +1933,7 @@ class StockScreener:
     def get_stock_concepts(self, stock_code):
         """获取个股所属概念板块"""
         try:
-            df = ak.stock_individual_info_em(symbol=stock_code)
+            df = self.data.stock_info(stock_code)
             if df is not None and not df.empty:
                 industry_row = df[df['item'] == '行业']
                 if not industry_row.empty:
@@ -1744,13 +1944,13 @@ class StockScreener:
 
     # ========== v9.1新增：游资追踪分析模块 ==========
 
-    def fetch_lhb_data(self, stock_code, lookback_days=30):
+    def fetch_lhb_data(self, stock_code, lookback_days=20):
         """
         获取个股龙虎榜数据（v9.1新增）
 
         参数：
             stock_code: 股票代码
-            lookback_days: 回溯天数
+            lookback_days: 回溯交易日数
 
         返回：
             dict: {
@@ -1761,137 +1961,14 @@ class StockScreener:
                 'net_buy': 净买入金额
             }
         """
-        try:
-            # 构建缓存文件路径
-            cache_file = HOT_MONEY_CACHE_DIR / f"lhb_{stock_code}_{datetime.now().strftime('%Y%m%d')}.json"
-
-            # 检查缓存（当日缓存有效）
-            if cache_file.exists():
-                with open(cache_file, 'r', encoding='utf-8') as f:
-                    return json.load(f)
-
-            # 获取龙虎榜数据
-            end_date = datetime.now()
-            start_date = end_date - timedelta(days=lookback_days)
-
-            result = {
-                'appearances': 0,
-                'records': [],
-                'buy_desks': defaultdict(float),
-                'sell_desks': defaultdict(float),
-                'net_buy': 0
-            }
-
-            # 获取个股龙虎榜明细（东方财富接口）
-            try:
-                # 使用全局缓存，避免重复获取（每次分析都获取全市场数据会很慢）
-                if self.lhb_cache is None:
-                    # 第一次获取时，获取整个时间段的龙虎榜数据并缓存
-                    print(f"      📊 正在获取{lookback_days}天龙虎榜数据（首次，稍后会缓存）...")
-                    try:
-                        self.lhb_cache = ak.stock_lhb_detail_em(
-                            start_date=start_date.strftime('%Y%m%d'),
-                            end_date=end_date.strftime('%Y%m%d')
-                        )
-                        if self.lhb_cache is not None and not self.lhb_cache.empty:
-                            print(f"      ✅ 成功获取{len(self.lhb_cache)}条龙虎榜记录")
-                        else:
-                            print(f"      ⚠️ 近{lookback_days}天无龙虎榜数据")
-                            self.lhb_cache = pd.DataFrame()  # 空DataFrame作为标记
-                    except Exception as e:
-                        print(f"      ⚠️ 获取龙虎榜数据失败: {str(e)[:50]}")
-                        self.lhb_cache = pd.DataFrame()  # 空DataFrame作为标记
-
-                # 从缓存中过滤出当前股票的记录
-                df_lhb = None
-                if self.lhb_cache is not None and not self.lhb_cache.empty:
-                    # 可能的列名：'代码', '股票代码', 'symbol'
-                    code_col = None
-                    for col in ['代码', '股票代码', 'symbol']:
-                        if col in self.lhb_cache.columns:
-                            code_col = col
-                            break
-
-                    if code_col:
-                        df_lhb = self.lhb_cache[self.lhb_cache[code_col] == stock_code].copy()
-
-                if df_lhb is not None and not df_lhb.empty:
-                    result['appearances'] = len(df_lhb)
+        # v9.2：龙虎榜明细和个股汇总由共享数据服务获取（全市场明细每天只获取一次，个股汇总含当日JSON缓存）
+        return self.data.lhb_summary(stock_code, lookback_days, log=self._log)
 
-                    for _, row in df_lhb.iterrows():
-                        # 确保日期格式正确
-                        date_val = row.get('上榜日期', '')
-                        if pd.notna(date_val):
-                            if isinstance(date_val, str):
-                                date_str = date_val
-                            else:
-                                date_str = pd.to_datetime(date_val).strftime('%Y-%m-%d')
-                        else:
-                            date_str = ''
-
-                        record = {
-                            'date': date_str,
-                            'reason': str(row.get('上榜原因', '')),
-                            'close_price': float(row.get('收盘价', 0)) if pd.notna(row.get('收盘价')) else 0,
-                            'change_pct': float(row.get('涨跌幅', 0)) if pd.notna(row.get('涨跌幅')) else 0,
-                            'turnover': float(row.get('成交额', 0)) if pd.notna(row.get('成交额')) else 0,
-                        }
-                        result['records'].append(record)
-
-                        # 统计买卖席位
-                        for i in range(1, 6):  # 前5大买卖席位
-                            buy_desk = row.get(f'买{i}营业部', '')
-                            sell_desk = row.get(f'卖{i}营业部', '')
-                            buy_amount_val = row.get(f'买{i}金额', 0)
-                            sell_amount_val = row.get(f'卖{i}金额', 0)
-
-                            # 安全转换金额
-                            try:
-                                buy_amount = float(buy_amount_val) if pd.notna(buy_amount_val) else 0
-                                sell_amount = float(sell_amount_val) if pd.notna(sell_amount_val) else 0
-                            except:
-                                buy_amount = 0
-                                sell_amount = 0
-
-                            if buy_desk and buy_amount > 0:
-                                result['buy_desks'][buy_desk] += buy_amount
-                            if sell_desk and sell_amount > 0:
-                                result['sell_desks'][sell_desk] += sell_amount
-
-                    # 计算净买入
-                    total_buy = sum(result['buy_desks'].values())
-                    total_sell = sum(result['sell_desks'].values())
-                    result['net_buy'] = total_buy - total_sell
-
-                    # 转换defaultdict为普通dict以便JSON序列化
-                    result['buy_desks'] = dict(result['buy_desks'])
-                    result['sell_desks'] = dict(result['sell_desks'])
-
-            except Exception as e:
-                # 只有真正的错误才打印，如果只是没有数据则静默处理
-                error_msg = str(e)
-                if 'symbol' not in error_msg.lower() and 'not found' not in error_msg.lower():
-                    pass  # 静默处理，很多股票可能没有龙虎榜数据
-
-            # 保存缓存
-            try:
-                with open(cache_file, 'w', encoding='utf-8') as f:
-                    json.dump(result, f, ensure_ascii=False, indent=2)
-            except:
-                pass  # 缓存失败不影响主流程
-
-            return result
-
-        except Exception as e:
-            # 只在调试时显示详细错误
-            # print(f"      ⚠️ {stock_code}龙虎榜数据处理异常: {str(e)[:50]}")
-            return {
-                'appearances': 0,
-                'records': [],
-                'buy_desks': {},
-                'sell_desks': {},
-                'net_buy': 0
-            }
+    def _parse_lhb_records(self, df_lhb):
+        """
+        将单只股票的龙虎榜明细汇总为上榜记录和席位统计（v9.2从fetch_lhb_data中提取，供回测复用；实现见 market_data.py）
+        """
+        return parse_lhb_records(df_lhb)
 
     def calculate_hot_money_strength(self, lhb_data, stock_code):
         """
@@ -2004,11 +2081,10 @@ class StockScreener:
 
                 for i in range(len(dates) - 1):
                     try:
-                        date1 = datetime.strptime(dates[i], '%Y-%m-%d')
-                        date2 = datetime.strptime(dates[i + 1], '%Y-%m-%d')
-                        diff = (date1 - date2).days
+                        # v9.2：相邻交易日视为连续（按交易日历，跨周末/长假也算连续）
+                        diff = self.data.calendar.distance(dates[i + 1], dates[i])
 
-                        if diff <= 3:  # 3天内视为连续
+                        if diff <= 1:
                             continuous_days += 1
                         else:
                             break
@@ -2045,7 +2121,7 @@ class StockScreener:
             return result
 
         except Exception as e:
-            print(f"      ⚠️ 计算游资强度异常: {str(e)[:50]}")
+            self._log(f"      ⚠️ 计算游资强度异常: {str(e)[:50]}")
             return {
                 'total_score': 0,
                 'frequency_score': 0,
@@ -2139,7 +2215,7 @@ class StockScreener:
             return result
 
         except Exception as e:
-            print(f"      ⚠️ 评估买入时机异常: {str(e)[:50]}")
+            self._log(f"      ⚠️ 评估买入时机异常: {str(e)[:50]}")
             return {
                 'stage': '未知',
                 'timing_score': 0,
@@ -2147,10 +2223,12 @@ class StockScreener:
                 'reason': '数据异常'
             }
 
-    def detect_risk_signals(self, lhb_data, stock_code):
+    def detect_risk_signals(self, lhb_data, stock_code, as_of=None):
         """
         识别游资撤退风险信号（v9.1新增）
 
+        as_of: 评估时点（v9.2新增，回测时传入历史日期），默认当前时间
+
         风险信号：
         1. 连续上榜后突然消失
         2. 知名游资大额卖出
@@ -2206,11 +2284,11 @@ class StockScreener:
                 if valid_records:
                     sorted_records = sorted(valid_records, key=lambda x: x['date'], reverse=True)
                     try:
-                        latest_date = datetime.strptime(sorted_records[0]['date'], '%Y-%m-%d')
-                        days_since_last = (datetime.now() - latest_date).days
+                        # v9.2：按交易日计算（周末不计入）
+                        days_since_last = self.data.calendar.distance(sorted_records[0]['date'], as_of or datetime.now())
 
                         if days_since_last >= 3:
-                            result['risk_signals'].append(f'游资消失{days_since_last}天')
+                            result['risk_signals'].append(f'游资消失{days_since_last}个交易日')
                             result['risk_score'] += 20
                             result['has_risk'] = True
                     except:
@@ -2229,7 +2307,7 @@ class StockScreener:
             return result
 
         except Exception as e:
-            print(f"      ⚠️ 检测风险信号异常: {str(e)[:50]}")
+            self._log(f"      ⚠️ 检测风险信号异常: {str(e)[:50]}")
             return {
                 'has_risk': False,
                 'risk_signals': [],
@@ -2278,7 +2356,7 @@ class StockScreener:
             return analysis
 
         except Exception as e:
-            print(f"      ⚠️ {stock_code}游资分析异常: {str(e)[:50]}")
+            self._log(f"      ⚠️ {stock_code}游资分析异常: {str(e)[:50]}")
             return {
                 'stock_code': stock_code,
                 'lhb_appearances': 0,
@@ -2313,6 +2391,110 @@ class StockScreener:
 
     # ========== v9.1 游资追踪模块结束 ==========
 
+    def score_market_sentiment(self, df_all, market_change):
+        """
+        根据全市场行情计算情绪评分（v9.2从check_market_sentiment中提取，供回测复用）
+
+        返回：(情绪分数0-100, 情绪状态, 操作建议, 状态颜色, 详细数据)
+        """
+        # 1. 涨停家数统计
+        limit_up_count = len(df_all[df_all['涨跌幅'] >= 9.8])  # 接近涨停
+        limit_down_count = len(df_all[df_all['涨跌幅'] <= -9.8])
+
+        # 2. 连板股统计（涨停且量比>1的视为可能连板）
+        potential_continuous = len(df_all[(df_all['涨跌幅'] >= 9.8) & (df_all['量比'] > 1)])
+
+        # 3. 涨跌家数
+        up_count = len(df_all[df_all['涨跌幅'] > 0])
+        down_count = len(df_all[df_all['涨跌幅'] < 0])
+        total_count = len(df_all)
+        up_ratio = up_count / total_count * 100 if total_count > 0 else 0
+
+        # 4. 两市成交额（亿元）
+        total_turnover = df_all['成交额'].sum() / 1e8
+
+        # 情绪评分逻辑
+        sentiment_score = 50  # 基础分
+
+        # 涨停家数评分（最高30分）
+        if limit_up_count >= 100:
+            sentiment_score += 30
+        elif limit_up_count >= 80:
+            sentiment_score += 25
+        elif limit_up_count >= 60:
+            sentiment_score += 20
+        elif limit_up_count >= 40:
+            sentiment_score += 10
+        elif limit_up_count < 20:
+            sentiment_score -= 20
+
+        # 涨跌比评分（最高20分）
+        if up_ratio >= 70:
+            sentiment_score += 20
+        elif up_ratio >= 60:
+            sentiment_score += 10
+        elif up_ratio < 40:
+            sentiment_score -= 15
+
+        # 成交额评分（最高15分）
+        if total_turnover >= 12000:  # 1.2万亿以上
+            sentiment_score += 15
+        elif total_turnover >= 10000:
+            sentiment_score += 10
+        elif total_turnover < 7000:
+            sentiment_score -= 10
+
+        # 大盘涨跌评分（最高15分）
+        if market_change >= 2:
+            sentiment_score += 15
+        elif market_change >= 1:
+            sentiment_score += 10
+        elif market_change < -1:
+            sentiment_score -= 10
+
+        # 连板股加分（最高10分）
+        if potential_continuous >= 15:
+            sentiment_score += 10
+        elif potential_continuous >= 10:
+            sentiment_score += 5
+
+        sentiment_score = max(0, min(100, sentiment_score))
+
+        # 情绪状态判定
+        if sentiment_score >= 75:
+            sentiment_status = "极度亢奋"
+            suggestion = "✅ 适合激进操作，妖股频出"
+            color = "🟢"
+        elif sentiment_score >= 60:
+            sentiment_status = "情绪高涨"
+            suggestion = "✅ 适合短线操作，可正常选股"
+            color = "🟢"
+        elif sentiment_score >= 45:
+            sentiment_status = "情绪温和"
+            suggestion = "⚠️ 可操作但需谨慎，降低仓位"
+            color = "🟡"
+        elif sentiment_score >= 30:
+            sentiment_status = "情绪低迷"
+            suggestion = "⚠️ 不适合激进操作，建议观望"
+            color = "🟠"
+        else:
+            sentiment_status = "极度低迷"
+            suggestion = "🔴 强烈建议空仓，市场风险极大"
+            color = "🔴"
+
+        detail = {
+            '涨停家数': limit_up_count,
+            '跌停家数': limit_down_count,
+            '连板股数': potential_continuous,
+            '上涨家数': up_count,
+            '下跌家数': down_count,
+            '上涨比例': up_ratio,
+            '成交额': total_turnover,
+            '大盘涨幅': market_change
+        }
+
+        return sentiment_score, sentiment_status, suggestion, color, detail
+
     def check_market_sentiment(self):
         """
         v8.0新增：市场情绪指标检查
@@ -2320,143 +2502,60 @@ class StockScreener:
 
         返回：(情绪分数0-100, 情绪状态, 详细数据)
         """
-        print("\n" + "=" * 70)
-        print("【v8.0 市场情绪检查】短线操作的前置条件")
-        print("=" * 70)
+        self._log("\n" + "=" * 70)
+        self._log("【v8.0 市场情绪检查】短线操作的前置条件")
+        self._log("=" * 70)
 
         try:
             # 获取A股实时行情
-            df_all = ak.stock_zh_a_spot_em()
-
-            # 1. 涨停家数统计
-            limit_up_count = len(df_all[df_all['涨跌幅'] >= 9.8])  # 接近涨停
-            limit_down_count = len(df_all[df_all['涨跌幅'] <= -9.8])
-
-            # 2. 连板股统计（涨停且量比>1的视为可能连板）
-            potential_continuous = len(df_all[(df_all['涨跌幅'] >= 9.8) & (df_all['量比'] > 1)])
-
-            # 3. 涨跌家数
-            up_count = len(df_all[df_all['涨跌幅'] > 0])
-            down_count = len(df_all[df_all['涨跌幅'] < 0])
-            total_count = len(df_all)
-            up_ratio = up_count / total_count * 100 if total_count > 0 else 0
-
-            # 4. 两市成交额（亿元）
-            total_turnover = df_all['成交额'].sum() / 1e8
+            df_all = self.data.spot()
 
-            # 5. 大盘涨跌幅
+            # 大盘涨跌幅
             try:
-                index_data = ak.stock_zh_index_spot_em()
+                index_data = self.data.index_spot()
+                self.index_spot_data = index_data
                 sh_index = index_data[index_data['代码'] == '000001']
                 market_change = sh_index['涨跌幅'].values[0] if not sh_index.empty else 0
             except:
                 market_change = 0
 
-            # 情绪评分逻辑
-            sentiment_score = 50  # 基础分
-
-            # 涨停家数评分（最高30分）
-            if limit_up_count >= 100:
-                sentiment_score += 30
-            elif limit_up_count >= 80:
-                sentiment_score += 25
-            elif limit_up_count >= 60:
-                sentiment_score += 20
-            elif limit_up_count >= 40:
-                sentiment_score += 10
-            elif limit_up_count < 20:
-                sentiment_score -= 20
-
-            # 涨跌比评分（最高20分）
-            if up_ratio >= 70:
-                sentiment_score += 20
-            elif up_ratio >= 60:
-                sentiment_score += 10
-            elif up_ratio < 40:
-                sentiment_score -= 15
-
-            # 成交额评分（最高15分）
-            if total_turnover >= 12000:  # 1.2万亿以上
-                sentiment_score += 15
-            elif total_turnover >= 10000:
-                sentiment_score += 10
-            elif total_turnover < 7000:
-                sentiment_score -= 10
-
-            # 大盘涨跌评分（最高15分）
-            if market_change >= 2:
-                sentiment_score += 15
-            elif market_change >= 1:
-                sentiment_score += 10
-            elif market_change < -1:
-                sentiment_score -= 10
-
-            # 连板股加分（最高10分）
-            if potential_continuous >= 15:
-                sentiment_score += 10
-            elif potential_continuous >= 10:
-                sentiment_score += 5
-
-            sentiment_score = max(0, min(100, sentiment_score))
-
-            # 情绪状态判定
-            if sentiment_score >= 75:
-                sentiment_status = "极度亢奋"
-                suggestion = "✅ 适合激进操作，妖股频出"
-                color = "🟢"
-            elif sentiment_score >= 60:
-                sentiment_status = "情绪高涨"
-                suggestion = "✅ 适合短线操作，可正常选股"
-                color = "🟢"
-            elif sentiment_score >= 45:
-                sentiment_status = "情绪温和"
-                suggestion = "⚠️ 可操作但需谨慎，降低仓位"
-                color = "🟡"
-            elif sentiment_score >= 30:
-                sentiment_status = "情绪低迷"
-                suggestion = "⚠️ 不适合激进操作，建议观望"
-                color = "🟠"
-            else:
-                sentiment_status = "极度低迷"
-                suggestion = "🔴 强烈建议空仓，市场风险极大"
-                color = "🔴"
+            sentiment_score, sentiment_status, suggestion, color, detail = self.score_market_sentiment(
+                df_all, market_change
+            )
+            limit_up_count = detail['涨停家数']
+            limit_down_count = detail['跌停家数']
+            potential_continuous = detail['连板股数']
+            up_count = detail['上涨家数']
+            down_count = detail['下跌家数']
+            up_ratio = detail['上涨比例']
+            total_turnover = detail['成交额']
 
             # 打印情绪报告
-            print(f"\n{color} 【市场情绪评分】: {sentiment_score:.0f}/100 - {sentiment_status}")
-            print(f"   {suggestion}")
-            print(f"\n   📊 市场数据:")
-            print(f"      • 涨停家数: {limit_up_count} 只 | 跌停家数: {limit_down_count} 只")
-            print(f"      • 潜在连板: {potential_continuous} 只")
-            print(f"      • 涨跌比例: {up_count}涨 / {down_count}跌 ({up_ratio:.1f}%)")
-            print(f"      • 两市成交: {total_turnover:.0f} 亿元")
-            print(f"      • 上证指数: {market_change:+.2f}%")
-
-            detail = {
-                '涨停家数': limit_up_count,
-                '跌停家数': limit_down_count,
-                '连板股数': potential_continuous,
-                '上涨家数': up_count,
-                '下跌家数': down_count,
-                '上涨比例': up_ratio,
-                '成交额': total_turnover,
-                '大盘涨幅': market_change
-            }
+            self._log(f"\n{color} 【市场情绪评分】: {sentiment_score:.0f}/100 - {sentiment_status}")
+            self._log(f"   {suggestion}")
+            self._log(f"\n   📊 市场数据:")
+            self._log(f"      • 涨停家数: {limit_up_count} 只 | 跌停家数: {limit_down_count} 只")
+            self._log(f"      • 潜在连板: {potential_continuous} 只")
+            self._log(f"      • 涨跌比例: {up_count}涨 / {down_count}跌 ({up_ratio:.1f}%)")
+            self._log(f"      • 两市成交: {total_turnover:.0f} 亿元")
+            self._log(f"      • 上证指数: {market_change:+.2f}%")
 
             return sentiment_score, sentiment_status, detail
 
         except Exception as e:
-            print(f"\n⚠️ 市场情绪检查失败: {e}")
-            print("   跳过情绪过滤，继续选股流程")
+            self._log(f"\n⚠️ 市场情绪检查失败: {e}")
+            self._log("   跳过情绪过滤，继续选股流程")
             return 50, "无法判断", {}
 
     
     def step1_filter_by_change_pct(self, df):
         """第一步：涨幅区间筛选 (v8.1优化: -1% ~ 5.5%)"""
-        print("\n" + "-" * 50)
-        print("【第一步】涨幅区间筛选: -1% ≤ 涨幅 ≤ 5.5%")
-        print("   💡 v8.1优化: 收紧区间，聚焦更稳健的标的")
+        low, high = self.params['change_pct_min'], self.params['change_pct_max']
+        self._log("\n" + "-" * 50)
+        self._log(f"【第一步】涨幅区间筛选: {low:g}% ≤ 涨幅 ≤ {high:g}%")
+        self._log("   💡 v8.1优化: 收紧区间，聚焦更稳健的标的")
 
-        df_filtered = df[(df['涨跌幅'] >= -1) & (df['涨跌幅'] <= 5.5)].copy()
+        df_filtered = df[(df['涨跌幅'] >= low) & (df['涨跌幅'] <= high)]
 
         # 排除ST股票
         df_filtered = df_filtered[~df_filtered['名称'].str.contains('ST|退', na=False)]
@@ -2479,12 +2578,12 @@ class StockScreener:
         pullback_count = len(df_filtered[df_filtered['涨跌幅'] < 0])
         strong_count = len(df_filtered[df_filtered['涨跌幅'] > 5])
 
-        print(f"   ✅ 筛选后剩余: {len(df_filtered)} 只（仅沪深主板）")
-        print(f"   ⚠️ 已排除: 创业板{excluded_cyb}只 | 科创板{excluded_kcb}只")
+        self._log(f"   ✅ 筛选后剩余: {len(df_filtered)} 只（仅沪深主板）")
+        self._log(f"   ⚠️ 已排除: 创业板{excluded_cyb}只 | 科创板{excluded_kcb}只")
         if pullback_count > 0:
-            print(f"   📉 包含回调股: {pullback_count} 只（捕捉反转机会）")
+            self._log(f"   📉 包含回调股: {pullback_count} 只（捕捉反转机会）")
         if strong_count > 0:
-            print(f"   📈 包含强势股: {strong_count} 只（涨幅5-5.5%）")
+            self._log(f"   📈 包含强势股: {strong_count} 只（涨幅5-{high:g}%）")
         return df_filtered
 
     def _calculate_monthly_gain(self, stock_code):
@@ -2493,7 +2592,7 @@ class StockScreener:
         v8.0优化：增加强势股回调判断
         """
         try:
-            hist_data = self.get_historical_data(stock_code, days=35)
+            hist_data = self.get_historical_data(stock_code, days=35, min_bars=20)
 
             if hist_data is None or len(hist_data) < 20:
                 return stock_code, None, None, True  # 数据不足，保留
@@ -2537,17 +2636,17 @@ class StockScreener:
         原逻辑：月涨幅 < 30%
         新增：允许月涨幅20-50%但近3日回调的强势股
         """
-        print("\n" + "-" * 50)
-        print("【第1.5步】月涨幅筛选: < 30% 或 (20-50%且近3日回调)")
-        print("   💡 v8.0优化: 增加强势股回调逻辑，捕捉二次启动机会")
-        print("   ⚡ 使用多线程加速处理")
+        self._log("\n" + "-" * 50)
+        self._log("【第1.5步】月涨幅筛选: < 30% 或 (20-50%且近3日回调)")
+        self._log("   💡 v8.0优化: 增加强势股回调逻辑，捕捉二次启动机会")
+        self._log("   ⚡ 使用多线程加速处理")
 
         if df.empty:
             return df
 
         stock_codes = df['代码'].tolist()
         total = len(stock_codes)
-        print(f"\n   ⏳ 正在并行计算 {total} 只股票的月涨幅...")
+        self._log(f"\n   ⏳ 正在并行计算 {total} 只股票的月涨幅...")
 
         # 存储结果：{stock_code: (monthly_gain, reason, is_qualified)}
         results = {}
@@ -2574,92 +2673,88 @@ class StockScreener:
 
                 completed += 1
                 if completed % 100 == 0 or completed == total:
-                    print(f"   ⏳ 已完成 {completed}/{total} ({completed*100//total}%)")
+                    self._log(f"   ⏳ 已完成 {completed}/{total} ({completed*100//total}%)")
 
-        # 根据结果筛选
-        qualified_stocks = []
+        # 根据结果筛选（v9.2：按行标签选行后整列写入新字段，不再逐行复制）
+        qualified_index = []
+        qualified_fields = []
         strong_pullback_count = 0
-        for idx, row in df.iterrows():
-            stock_code = row['代码']
+        for idx, stock_code in df['代码'].items():
             monthly_gain, reason, is_qualified = results.get(stock_code, (None, None, True))
 
             if is_qualified:
-                row_copy = row.copy()
-                row_copy['月涨幅'] = monthly_gain
-                row_copy['月涨幅类型'] = reason
-                qualified_stocks.append(row_copy)
+                qualified_index.append(idx)
+                qualified_fields.append({'月涨幅': monthly_gain, '月涨幅类型': reason})
                 if reason == "强势回调":
                     strong_pullback_count += 1
 
-        df_filtered = pd.DataFrame(qualified_stocks)
+        df_filtered = attach_columns(df, qualified_index, qualified_fields)
 
         excluded_count = len(df) - len(df_filtered)
-        print(f"\n   ✅ 筛选后剩余: {len(df_filtered)} 只")
+        self._log(f"\n   ✅ 筛选后剩余: {len(df_filtered)} 只")
         if strong_pullback_count > 0:
-            print(f"   🔥 包含强势回调: {strong_pullback_count} 只（月涨幅20-50%但近期企稳）")
+            self._log(f"   🔥 包含强势回调: {strong_pullback_count} 只（月涨幅20-50%但近期企稳）")
         if excluded_count > 0:
-            print(f"   ⚠️ 已排除 {excluded_count} 只月涨幅过高且未回调的股票")
+            self._log(f"   ⚠️ 已排除 {excluded_count} 只月涨幅过高且未回调的股票")
 
         return df_filtered
 
     def step2_filter_by_volume_ratio(self, df):
         """第二步：量比筛选 (v8.1优化: 量比 >= 1.2)"""
-        print("\n" + "-" * 50)
-        print("【第二步】热度筛选: 量比 ≥ 1.2")
-        print("   💡 v8.1优化: 提高量比要求，过滤成交清淡标的")
+        min_ratio = self.params['volume_ratio_min']
+        self._log("\n" + "-" * 50)
+        self._log(f"【第二步】热度筛选: 量比 ≥ {min_ratio:g}")
+        self._log("   💡 v8.1优化: 提高量比要求，过滤成交清淡标的")
 
-        df_filtered = df[df['量比'] >= 1.2].copy()
+        df_filtered = df[df['量比'] >= min_ratio]
         
-        print(f"   ✅ 筛选后剩余: {len(df_filtered)} 只")
+        self._log(f"   ✅ 筛选后剩余: {len(df_filtered)} 只")
         return df_filtered
     
     def step3_filter_by_turnover(self, df):
         """第三步：换手率筛选 (v8.1优化: 10% ~ 18%)"""
-        print("\n" + "-" * 50)
-        print("【第三步】活跃度筛选: 10% ≤ 换手率 ≤ 18%")
-        print("   💡 v8.1优化: 收紧区间，聚焦活跃但不过热的标的")
+        low, high = self.params['turnover_min'], self.params['turnover_max']
+        self._log("\n" + "-" * 50)
+        self._log(f"【第三步】活跃度筛选: {low:g}% ≤ 换手率 ≤ {high:g}%")
+        self._log("   💡 v8.1优化: 收紧区间，聚焦活跃但不过热的标的")
 
-        df_filtered = df[(df['换手率'] >= 10) & (df['换手率'] <= 18)].copy()
+        df_filtered = df[(df['换手率'] >= low) & (df['换手率'] <= high)]
 
         # 统计高换手率股票
         super_active = len(df_filtered[df_filtered['换手率'] >= 15])
 
-        print(f"   ✅ 筛选后剩余: {len(df_filtered)} 只")
+        self._log(f"   ✅ 筛选后剩余: {len(df_filtered)} 只")
         if super_active > 0:
-            print(f"   🔥 超活跃股: {super_active} 只（换手率≥15%）")
+            self._log(f"   🔥 超活跃股: {super_active} 只（换手率≥15%）")
         return df_filtered
     
     def step4_filter_by_market_cap(self, df):
         """第四步：流通市值筛选 (v8.1优化: 40亿 ~ 120亿)"""
-        print("\n" + "-" * 50)
-        print("【第四步】规模筛选: 40亿 ≤ 流通市值 ≤ 120亿")
-        print("   💡 v8.1优化: 收紧区间，兼顾流动性和稳定性")
+        low, high = self.params['market_cap_min'], self.params['market_cap_max']
+        self._log("\n" + "-" * 50)
+        self._log(f"【第四步】规模筛选: {low:g}亿 ≤ 流通市值 ≤ {high:g}亿")
+        self._log("   💡 v8.1优化: 收紧区间，兼顾流动性和稳定性")
 
-        df['流通市值_亿'] = df['流通市值'] / 1e8
-        df_filtered = df[(df['流通市值_亿'] >= 40) & (df['流通市值_亿'] <= 120)].copy()
+        df = df.assign(流通市值_亿=df['流通市值'] / 1e8)
+        df_filtered = df[(df['流通市值_亿'] >= low) & (df['流通市值_亿'] <= high)]
 
         # 统计小盘股数量
         small_cap = len(df_filtered[df_filtered['流通市值_亿'] < 50])
 
-        print(f"   ✅ 筛选后剩余: {len(df_filtered)} 只")
+        self._log(f"   ✅ 筛选后剩余: {len(df_filtered)} 只")
         if small_cap > 0:
-            print(f"   📌 小盘股: {small_cap} 只（市值30-50亿，游资偏好）")
+            self._log(f"   📌 小盘股: {small_cap} 只（市值30-50亿，游资偏好）")
         return df_filtered
     
-    def get_historical_data(self, stock_code, days=30):
-        """获取个股历史K线数据"""
+    def get_historical_data(self, stock_code, days=30, min_bars=None):
+        """
+        获取个股历史K线数据（v9.2：按内部类型表转换，日期为int32日序号）
+
+        min_bars: 需要的最少K线根数（v9.2新增），不足时由数据服务记录，后续步骤不再请求该股票
+        """
         try:
-            end_date = datetime.now().strftime('%Y%m%d')
-            start_date = (datetime.now() - timedelta(days=days+30)).strftime('%Y%m%d')
-            
-            df = ak.stock_zh_a_hist(
-                symbol=stock_code, 
-                period="daily",
-                start_date=start_date, 
-                end_date=end_date,
-                adjust="qfq"
-            )
-            return df
+            df = self.data.history(stock_code, days, min_bars=min_bars)  # v9.2：经共享数据服务，较短区间从已获取的长区间截取
+            return compact_history(df) if df is not None else None
         except:
             return None
     
@@ -2671,9 +2766,9 @@ class StockScreener:
         2. 优选超大单和大单流入的股票（看涨信号）
         3. 【v6.0新增】资金一致性分析 + 流量占比评估
         """
-        print("\n" + "-" * 50)
-        print("【第五步】💰 资金流向深度分析（v6.0升级版）")
-        print("   ⚡ 策略升级: 主力信号 + 资金一致性 + 流量占比")
+        self._log("\n" + "-" * 50)
+        self._log("【第五步】💰 资金流向深度分析（v6.0升级版）")
+        self._log("   ⚡ 策略升级: 主力信号 + 资金一致性 + 流量占比")
 
         if df.empty:
             return df
@@ -2681,10 +2776,11 @@ class StockScreener:
         # 预先获取所有资金流向数据（避免循环中重复调用）
         self.get_all_fund_flow_data()
 
-        qualified_stocks = []
+        qualified_index = []
+        qualified_fields = []
         fund_signals = []
 
-        print(f"\n   ⏳ 正在分析 {len(df)} 只股票的资金流向...")
+        self._log(f"\n   ⏳ 正在分析 {len(df)} 只股票的资金流向...")
 
         processed_count = 0
 
@@ -2695,7 +2791,7 @@ class StockScreener:
 
             processed_count += 1
             if processed_count % 10 == 0:
-                print(f"   ⏳ 已处理 {processed_count}/{len(df)} 只...")
+                self._log(f"   ⏳ 已处理 {processed_count}/{len(df)} 只...")
 
             # 分析资金流向信号（原有逻辑）
             signal_type, signal_strength, detail = self.analyze_fund_flow_signal(stock_code, stock_name)
@@ -2707,18 +2803,19 @@ class StockScreener:
 
             # 如果无法获取资金流向数据，默认保留（赋予NEUTRAL信号）
             if signal_type == 'UNKNOWN':
-                row_copy = row.copy()
-                row_copy['资金信号'] = 'NEUTRAL'
-                row_copy['信号强度'] = 0
-                row_copy['主力净流入'] = 0
-                row_copy['主力占比'] = 0
-                row_copy['超大单净流入'] = 0
-                row_copy['超大单占比'] = 0
-                row_copy['资金一致性'] = '未知'
-                row_copy['一致性得分'] = 0
-                row_copy['流量占比'] = 0
-                row_copy['流量占比得分'] = 0
-                qualified_stocks.append(row_copy)
+                qualified_index.append(idx)
+                qualified_fields.append({
+                    '资金信号': 'NEUTRAL',
+                    '信号强度': 0,
+                    '主力净流入': 0,
+                    '主力占比': 0,
+                    '超大单净流入': 0,
+                    '超大单占比': 0,
+                    '资金一致性': '未知',
+                    '一致性得分': 0,
+                    '流量占比': 0,
+                    '流量占比得分': 0,
+                })
                 fund_signals.append('NEUTRAL')
                 continue
 
@@ -2732,24 +2829,25 @@ class StockScreener:
 
             # 保留看涨、强烈看涨、中性信号的股票
             if signal_type in ['STRONG_BUY', 'BUY', 'NEUTRAL']:
-                row_copy = row.copy()
-                row_copy['资金信号'] = signal_type
-                row_copy['信号强度'] = signal_strength
-                row_copy['主力净流入'] = detail.get('主力净流入', 0)
-                row_copy['主力占比'] = detail.get('主力占比', 0)
-                row_copy['超大单净流入'] = detail.get('超大单净流入', 0)
-                row_copy['超大单占比'] = detail.get('超大单占比', 0)
-                # v6.0新增字段
-                row_copy['资金一致性'] = depth_detail.get('一致性', '未知')
-                row_copy['一致性得分'] = consistency_score
-                row_copy['整体净流入'] = depth_detail.get('整体净流入', 0)
-                row_copy['散户净流入'] = depth_detail.get('散户净流入', 0)
-                row_copy['流量占比'] = depth_detail.get('流量占比', 0)
-                row_copy['流量占比得分'] = flow_ratio_score
-                qualified_stocks.append(row_copy)
+                qualified_index.append(idx)
+                qualified_fields.append({
+                    '资金信号': signal_type,
+                    '信号强度': signal_strength,
+                    '主力净流入': detail.get('主力净流入', 0),
+                    '主力占比': detail.get('主力占比', 0),
+                    '超大单净流入': detail.get('超大单净流入', 0),
+                    '超大单占比': detail.get('超大单占比', 0),
+                    # v6.0新增字段
+                    '资金一致性': depth_detail.get('一致性', '未知'),
+                    '一致性得分': consistency_score,
+                    '整体净流入': depth_detail.get('整体净流入', 0),
+                    '散户净流入': depth_detail.get('散户净流入', 0),
+                    '流量占比': depth_detail.get('流量占比', 0),
+                    '流量占比得分': flow_ratio_score,
+                })
                 fund_signals.append(signal_type)
 
-        df_filtered = pd.DataFrame(qualified_stocks)
+        df_filtered = attach_columns(df, qualified_index, qualified_fields)
 
         # 统计信号分布
         if not df_filtered.empty:
@@ -2761,20 +2859,20 @@ class StockScreener:
             strong_consistency = len(df_filtered[df_filtered['资金一致性'] == '强一致流入'])
             absorption = len(df_filtered[df_filtered['资金一致性'] == '主力吸筹'])
 
-            print(f"\n   ✅ 筛选后剩余: {len(df_filtered)} 只")
-            print(f"   📊 信号分布: 强烈看涨={strong_buy_count} | 看涨={buy_count} | 中性={neutral_count}")
-            print(f"   💎 资金一致性: 强一致流入={strong_consistency} | 主力吸筹={absorption}")
+            self._log(f"\n   ✅ 筛选后剩余: {len(df_filtered)} 只")
+            self._log(f"   📊 信号分布: 强烈看涨={strong_buy_count} | 看涨={buy_count} | 中性={neutral_count}")
+            self._log(f"   💎 资金一致性: 强一致流入={strong_consistency} | 主力吸筹={absorption}")
             if strong_buy_count > 0:
-                print(f"   ⭐ 发现 {strong_buy_count} 只【超大单往里冲】的强势股！")
+                self._log(f"   ⭐ 发现 {strong_buy_count} 只【超大单往里冲】的强势股！")
         else:
-            print(f"   ✅ 筛选后剩余: 0 只")
+            self._log(f"   ✅ 筛选后剩余: 0 只")
 
         return df_filtered
     
     def step6_filter_by_volume_pattern(self, df):
         """第六步：成交量形态筛选 (台阶式稳步放大)"""
-        print("\n" + "-" * 50)
-        print("【第六步】动能确认: 成交量台阶式放大")
+        self._log("\n" + "-" * 50)
+        self._log("【第六步】动能确认: 成交量台阶式放大")
         
         if df.empty:
             return df
@@ -2784,7 +2882,7 @@ class StockScreener:
         for idx, row in df.iterrows():
             stock_code = row['代码']
             
-            hist_data = self.get_historical_data(stock_code)
+            hist_data = self.get_historical_data(stock_code, min_bars=10)
             if hist_data is None or len(hist_data) < 10:
                 continue
             
@@ -2799,16 +2897,16 @@ class StockScreener:
                     volume_volatility = np.std(recent_volumes) / np.mean(recent_volumes)
                     
                     if volume_increase > 0.1 and volume_volatility < 0.8:
-                        qualified_stocks.append(row)
+                        qualified_stocks.append(idx)
         
-        df_filtered = pd.DataFrame(qualified_stocks)
-        print(f"   ✅ 筛选后剩余: {len(df_filtered)} 只")
+        df_filtered = df.loc[qualified_stocks]
+        self._log(f"   ✅ 筛选后剩余: {len(df_filtered)} 只")
         return df_filtered
     
     def step7_filter_by_ma_trend(self, df):
         """第七步：趋势确认 (均线多头排列)"""
-        print("\n" + "-" * 50)
-        print("【第七步】趋势确认: 均线多头排列 (MA5>MA10>MA20, 股价>MA60)")
+        self._log("\n" + "-" * 50)
+        self._log("【第七步】趋势确认: 均线多头排列 (MA5>MA10>MA20, 股价>MA60)")
         
         if df.empty:
             return df
@@ -2818,7 +2916,7 @@ class StockScreener:
         for idx, row in df.iterrows():
             stock_code = row['代码']
             
-            hist_data = self.get_historical_data(stock_code, days=90)
+            hist_data = self.get_historical_data(stock_code, days=90, min_bars=60)
             if hist_data is None or len(hist_data) < 60:
                 continue
             
@@ -2839,22 +2937,23 @@ class StockScreener:
                 ma_diverging = False
             
             if ma_bullish and above_ma60 and ma_diverging:
-                qualified_stocks.append(row)
+                qualified_stocks.append(idx)
         
-        df_filtered = pd.DataFrame(qualified_stocks)
-        print(f"   ✅ 筛选后剩余: {len(df_filtered)} 只")
+        df_filtered = df.loc[qualified_stocks]
+        self._log(f"   ✅ 筛选后剩余: {len(df_filtered)} 只")
         return df_filtered
     
     def step8_filter_by_intraday_strength(self, df):
         """第八步：强度确认 (分时图强度)"""
-        print("\n" + "-" * 50)
-        print("【第八步】强度确认: 分时走势强于大盘")
+        self._log("\n" + "-" * 50)
+        self._log("【第八步】强度确认: 分时走势强于大盘")
         
         if df.empty:
             return df
         
         try:
-            index_data = ak.stock_zh_index_spot_em()
+            index_data = self.data.index_spot()
+            self.index_spot_data = index_data
             sh_index = index_data[index_data['代码'] == '000001']
             if not sh_index.empty:
                 market_change = sh_index['涨跌幅'].values[0]
@@ -2863,66 +2962,57 @@ class StockScreener:
         except:
             market_change = 0
         
-        qualified_stocks = []
-        
-        for idx, row in df.iterrows():
-            stock_change = row['涨跌幅']
-            if stock_change > market_change + 2:
-                qualified_stocks.append(row)
-        
-        df_filtered = pd.DataFrame(qualified_stocks)
-        print(f"   ✅ 筛选后剩余: {len(df_filtered)} 只")
-        print(f"   📈 今日大盘涨幅: {market_change:.2f}%")
+        df_filtered = df[df['涨跌幅'] > float(market_change) + 2]
+        self._log(f"   ✅ 筛选后剩余: {len(df_filtered)} 只")
+        self._log(f"   📈 今日大盘涨幅: {market_change:.2f}%")
         return df_filtered
     
     def step9_filter_by_win_rate(self, df):
         """第九步：胜率筛选 (v8.0优化: 近20日上涨天数≥12天)"""
-        print("\n" + "-" * 50)
-        print("【第九步】胜率筛选: 近20个交易日上涨天数 ≥ 12天")
-        print("   💡 v8.0优化: 从60日改为20日，更贴近短线动能")
+        self._log("\n" + "-" * 50)
+        self._log("【第九步】胜率筛选: 近20个交易日上涨天数 ≥ 12天")
+        self._log("   💡 v8.0优化: 从60日改为20日，更贴近短线动能")
 
         if df.empty:
             return df
 
-        qualified_stocks = []
+        qualified_index = []
+        qualified_fields = []
 
-        for idx, row in df.iterrows():
-            stock_code = row['代码']
-
-            hist_data = self.get_historical_data(stock_code, days=30)
+        for idx, stock_code in df['代码'].items():
+            hist_data = self.get_historical_data(stock_code, days=30, min_bars=20)
             if hist_data is None or len(hist_data) < 20:
                 continue
 
-            # 取最近20个交易日
+            # 取最近20个交易日，计算涨跌情况
             recent_20_days = hist_data.tail(20)
+            day_change = recent_20_days['收盘'] - recent_20_days['开盘']
 
-            # 计算涨跌情况
-            recent_20_days['涨跌'] = recent_20_days['收盘'] - recent_20_days['开盘']
-
-            up_days = len(recent_20_days[recent_20_days['涨跌'] > 0])
-            down_days = len(recent_20_days[recent_20_days['涨跌'] < 0])
+            up_days = int((day_change > 0).sum())
+            down_days = int((day_change < 0).sum())
 
             # 近20日上涨天数≥12天（胜率60%）
             if up_days >= 12:
-                row_copy = row.copy()
-                row_copy['上涨天数'] = up_days
-                row_copy['下跌天数'] = down_days
-                row_copy['胜率'] = f"{up_days}/20"
-                row_copy['胜率百分比'] = up_days / 20 * 100
-                qualified_stocks.append(row_copy)
-
-        df_filtered = pd.DataFrame(qualified_stocks)
+                qualified_index.append(idx)
+                qualified_fields.append({
+                    '上涨天数': up_days,
+                    '下跌天数': down_days,
+                    '胜率': f"{up_days}/20",
+                    '胜率百分比': up_days / 20 * 100,
+                })
+
+        df_filtered = attach_columns(df, qualified_index, qualified_fields)
         if not df_filtered.empty:
-            print(f"   ✅ 筛选后剩余: {len(df_filtered)} 只")
+            self._log(f"   ✅ 筛选后剩余: {len(df_filtered)} 只")
             avg_up = df_filtered['上涨天数'].mean() if '上涨天数' in df_filtered.columns else 0
             avg_win_rate = df_filtered['胜率百分比'].mean() if '胜率百分比' in df_filtered.columns else 0
-            print(f"   📊 平均上涨天数: {avg_up:.1f} 天 | 平均胜率: {avg_win_rate:.1f}%")
+            self._log(f"   📊 平均上涨天数: {avg_up:.1f} 天 | 平均胜率: {avg_win_rate:.1f}%")
             # 统计超高胜率股票
             super_high = len(df_filtered[df_filtered['上涨天数'] >= 15])
             if super_high > 0:
-                print(f"   🔥 超强势股: {super_high} 只（近20日上涨≥15天）")
+                self._log(f"   🔥 超强势股: {super_high} 只（近20日上涨≥15天）")
         else:
-            print(f"   ✅ 筛选后剩余: 0 只")
+            self._log(f"   ✅ 筛选后剩余: 0 只")
 
         return df_filtered
     
@@ -3062,12 +3152,12 @@ class StockScreener:
 
     def step10_theme_scoring(self, df):
         """第十步：主题加分"""
-        print("\n" + "-" * 50)
+        self._log("\n" + "-" * 50)
 
         if self.target_sector:
-            print(f"【第十步】板块标识: 标注所属板块【{self.target_sector}】")
+            self._log(f"【第十步】板块标识: 标注所属板块【{self.target_sector}】")
         else:
-            print(f"【第十步】主题加分: 匹配{self.current_month}月【{self.theme.get('name', '')}】主题")
+            self._log(f"【第十步】主题加分: 匹配{self.current_month}月【{self.theme.get('name', '')}】主题")
 
         if df.empty:
             return df
@@ -3109,50 +3199,270 @@ class StockScreener:
             theme_scores.append(score)
             matched_themes.append(", ".join(matched) if matched else "无直接匹配")
 
-        df = df.copy()
-        df['主题得分'] = theme_scores
-        df['匹配主题'] = matched_themes
+        df = df.assign(主题得分=theme_scores, 匹配主题=matched_themes)
 
         # 按资金信号强度、主题得分、涨跌幅排序
         df = df.sort_values(['信号强度', '主题得分', '涨跌幅'], ascending=[False, False, False])
 
         theme_matched = len(df[df['主题得分'] > 0])
         if self.target_sector:
-            print(f"   ✅ 所有 {len(df)} 只股票均属于【{self.target_sector}】板块")
+            self._log(f"   ✅ 所有 {len(df)} 只股票均属于【{self.target_sector}】板块")
+        else:
+            self._log(f"   ✅ 其中 {theme_matched} 只匹配当月主题")
+
+        return df
+
+    def composite_upper_bound(self, row, rs_score=None, position_score=None, hot_money_score=None):
+        """
+        综合评分上界（v9.2新增）
+
+        资金维度和原有信号在第五步已知；未计算的维度取可能的最大值（相对强度的当日部分由实时行情确定）。
+        综合评分对各维度单调不减，上界不会低于实际评分。
+        """
+        if rs_score is None:
+            rs_score = self._relative_strength_upper_bound(row['涨跌幅'])
+        if position_score is None:
+            position_score = PRUNING_CONFIG['position_max']
+        if hot_money_score is None:
+            hot_money_score = PRUNING_CONFIG['hot_money_max']
+        # 多参数方案时取各方案游资权重下的最大值
+        weights = [params['hot_money_weight'] for params in self.profiles.values()] or [None]
+        return max(
+            self.calculate_composite_score(
+                row.get('一致性得分', 0), row.get('流量占比得分', 0), rs_score, position_score,
+                row.get('信号强度', 0), hot_money_score, hot_money_weight=weight
+            )[0]
+            for weight in weights
+        )
+
+    def _relative_strength_upper_bound(self, current_change):
+        """相对强度得分上界：当日超额部分按实时行情计算，5日/10日/趋势部分取最大值（v9.2新增）"""
+        try:
+            if self.market_index_data is None:
+                self.market_index_data = self.data.index_spot()
+                self.index_spot_data = self.market_index_data
+            hs300 = self.market_index_data[self.market_index_data['代码'] == '000300']
+            daily_excess = current_change - (hs300['涨跌幅'].values[0] if not hs300.empty else 0)
+        except Exception:
+            return 15
+        if daily_excess > 3:
+            daily_score = 10
+        elif daily_excess > 2:
+            daily_score = 7
+        elif daily_excess > 1:
+            daily_score = 5
+        elif daily_excess > 0:
+            daily_score = 3
+        elif daily_excess > -1:
+            daily_score = 0
         else:
-            print(f"   ✅ 其中 {theme_matched} 只匹配当月主题")
+            daily_score = -5
+        # 5日超额最多+5，10日超额最多+5，趋势最多+5，总分限制在15以内
+        return min(15, daily_score + 15)
+
+    def fill_sectors(self, df_result, cache=None):
+        """为入选股票查询所属板块/行业，并同步到因子表（v9.2从第十一步提取）"""
+        cache = {} if cache is None else cache
+        missing = [code for code in df_result['代码'] if code not in cache]
+        if self.budget is not None and missing and not self.budget.affordable(SECTOR_FACTOR, len(missing)):
+            # v9.2新增：截止时间模式下剩余时间不够时不查询，标记为降级
+            self._log(f"   ⏰ 剩余时间不足，跳过 {len(missing)} 只股票的所属板块查询")
+            self.budget.mark(SECTOR_FACTOR, len(missing))
+            for code in missing:
+                cache[code] = "未查询（时间不足）"
+            df_result = self._mark_degraded(df_result, df_result['代码'].isin(missing), SECTOR_FACTOR)
+        sectors = []
+        for stock_code in df_result['代码']:
+            if stock_code not in cache:
+                with self._timed(SECTOR_FACTOR):
+                    try:
+                        cache[stock_code] = self.get_stock_concepts(stock_code) or "未知板块"
+                    except:
+                        cache[stock_code] = "未知板块"
+            sectors.append(cache[stock_code])
+        df_result = df_result.assign(所属板块=sectors)
+        if self.evaluated_features is not None and len(df_result):
+            self.evaluated_features.loc[df_result.index, '所属板块'] = sectors
+        return df_result
+
+    def _timed(self, factor):
+        """截止时间模式下计时一个维度（v9.2新增），否则不计时"""
+        return self.budget.timed(factor) if self.budget is not None else nullcontext()
 
+    def _mark_degraded(self, df, mask, factor):
+        """在"降级因子"列追加一个维度（v9.2新增），同步到因子表"""
+        if '降级因子' not in df.columns:
+            df = df.assign(降级因子='')
+        marked = df.loc[mask, '降级因子'].map(lambda v: f"{v}|{factor}" if v else factor)
+        df = df.copy()
+        df.loc[mask, '降级因子'] = marked
+        if self.evaluated_features is not None and '降级因子' in self.evaluated_features.columns:
+            self.evaluated_features.loc[marked.index, '降级因子'] = marked
         return df
 
+    @staticmethod
+    def _empty_hot_money(stock_code, score=0):
+        """没有游资数据（K线不足或截止时间降级）时的默认分析结果"""
+        return {
+            'stock_code': stock_code,
+            'lhb_appearances': 0,
+            'net_buy_amount': 0,
+            'strength_score': 0,
+            'timing_score': 0,
+            'risk_score': 0,
+            'has_hot_money': False,
+            'is_active': False,
+            '综合游资评分': score,
+            'strength_detail': {},
+            'timing_detail': {},
+            'risk_detail': {}
+        }
+
+    def apply_profile(self, features, params):
+        """
+        在共享因子表上应用一个参数方案（v9.2新增）
+
+        features 为第十一步完整评估过的候选股；被剪枝的股票上界按各方案游资权重的最大值计算，任何方案下都达不到阈值。
+        第1~4步的区间按方案重新过滤，综合评分按方案的游资权重重算，
+        再按第十一步的阈值、排序规则和数量限制取结果；不请求任何行情数据
+        """
+        if features is None or features.empty:
+            return pd.DataFrame()
+        df = features
+        df = df[(df['涨跌幅'] >= params['change_pct_min']) & (df['涨跌幅'] <= params['change_pct_max'])
+                & (df['量比'] >= params['volume_ratio_min'])
+                & (df['换手率'] >= params['turnover_min']) & (df['换手率'] <= params['turnover_max'])
+                & (df['流通市值_亿'] >= params['market_cap_min']) & (df['流通市值_亿'] <= params['market_cap_max'])]
+        if df.empty:
+            return df
+
+        scores = [
+            self.calculate_composite_score(
+                row.get('一致性得分', 0), row.get('流量占比得分', 0), row['相对强度得分'], row['位置得分'],
+                row.get('信号强度', 0), row['游资评分'], hot_money_weight=params['hot_money_weight']
+            )
+            for _, row in df.iterrows()
+        ]
+        df = df.assign(
+            综合评分=[score[0] for score in scores],
+            综合评级=[score[1] for score in scores],
+            风险提示=[score[2] for score in scores],
+            矛盾信号=['|'.join(score[3]) if score[3] else '' for score in scores],
+        )
+        df = df[(df['综合评分'] >= params['composite_min']) & (df['风险收益比'] >= params['risk_reward_min'])]
+        if df.empty:
+            return df
+        # 与第十一步相同的排序：游资活跃优先，再按综合评分（游资活跃加5分权重）
+        df = df.assign(排序权重=df['综合评分'] + df['游资活跃'].astype(int) * 5)
+        df = df.sort_values(['游资活跃', '排序权重'], ascending=[False, False]).drop('排序权重', axis=1)
+        return df.head(params['max_output'])
+
+    def apply_profiles(self):
+        """各参数方案的结果（v9.2新增）：共享第十一步的因子表，只为入选股票查询所属板块"""
+        self._log("\n" + "-" * 50)
+        self._log(f"【参数方案】{len(self.profiles)} 套参数共享同一批候选股")
+        sector_cache = {}
+        results = {}
+        for name, params in self.profiles.items():
+            df = self.apply_profile(self.scored_features, params)
+            if not df.empty:
+                df = self.fill_sectors(df, sector_cache)
+            results[name] = df
+
+        self._log(f"\n   {'方案':<14} {'入选':>4}  前5只")
+        for name, df in results.items():
+            top = '、'.join(df['名称'].astype(str).head(5)) if not df.empty else '-'
+            self._log(f"   {name:<14} {len(df):>4}  {top}")
+        return results
+
+    @staticmethod
+    def _top_n_settled(qualified, max_output, bound):
+        """
+        前N名是否已确定（v9.2新增）
+
+        排序规则：游资活跃优先，再按 综合评分+游资活跃×5；
+        已入选的第N名严格高于剩余股票可能达到的最好排序键（游资活跃、上界+5）时，剩余股票进不了前N名
+        """
+        if len(qualified) < max_output:
+            return False
+        keys = sorted(((active, score + active * 5) for active, score in qualified.values()), reverse=True)
+        return keys[max_output - 1] > (True, bound + 5)
+
     def step11_multidimensional_analysis(self, df):
         """
         第十一步：四维度综合分析（v9.1新增游资追踪）
         整合：资金共振 + 市场相对强度 + 关键价格位置 + 游资动向
         v9.1新增：游资追踪分析及评分
         """
-        print("\n" + "-" * 50)
-        print("【第十一步】🎯 四维度综合分析（v9.1新增游资追踪）")
-        print("   📊 维度1: 资金共振（主力+整体一致性）")
-        print("   📈 维度2: 市场相对强度（跑赢大盘）")
-        print("   📍 维度3: 关键价格位置（突破+支撑）")
-        print("   💰 维度4: 游资动向（龙虎榜+买入时机）【v9.1新增】")
-        print("   🔥 筛选标准: 综合评分≥55 + 风险收益比≥1.5")
+        self._log("\n" + "-" * 50)
+        self._log("【第十一步】🎯 四维度综合分析（v9.1新增游资追踪）")
+        self._log("   📊 维度1: 资金共振（主力+整体一致性）")
+        self._log("   📈 维度2: 市场相对强度（跑赢大盘）")
+        self._log("   📍 维度3: 关键价格位置（突破+支撑）")
+        self._log("   💰 维度4: 游资动向（龙虎榜+买入时机）【v9.1新增】")
+        composite_min = self.params['composite_min']
+        rr_min = self.params['risk_reward_min']
+        max_output = self.params['max_output']
+        self._log(f"   🔥 筛选标准: 综合评分≥{composite_min:g} + 风险收益比≥{rr_min:g}")
 
         if df.empty:
             return df
 
-        print(f"\n   ⏳ 正在进行 {len(df)} 只股票的多维度深度分析...")
+        self._log(f"\n   ⏳ 正在进行 {len(df)} 只股票的多维度深度分析...")
 
         # 获取全市场数据用于板块龙头识别
         try:
-            df_all_market = ak.stock_zh_a_spot_em()
+            df_all_market = compact_spot(self.data.spot())
         except:
             df_all_market = None
 
-        qualified_stocks = []
+        # v9.2新增：按综合评分上界从高到低评估，上界达不到阈值/进不了前N名的股票不再做昂贵分析
+        # （截止时间模式下同样按上界排序，时间不够时被降级或放弃的是最不可能入选的股票）
+        pruning = PRUNING_CONFIG['enabled']
+        budget = self.budget
+        prioritise = pruning or budget is not None
+        bounds = {idx: self.composite_upper_bound(row) for idx, row in df.iterrows()} if prioritise else {}
+        order = sorted(df.index, key=lambda i: -bounds[i]) if prioritise else list(df.index)
+        if budget is not None:
+            self._log(f"   ⏰ 截止时间 {budget.deadline:%H:%M:%S}（剩余 {max(budget.seconds_left(), 0):.0f} 秒），"
+                  f"时间不足时依次降级: {' → '.join(DEADLINE_CONFIG['degrade_order'] + [SECTOR_FACTOR])}")
+        positions = {idx: pos for pos, idx in enumerate(df.index)}
+
+        qualified = {}  # {行标签: (游资活跃, 综合评分)}
+        evaluated = {}  # v9.2新增：全部候选股的因子向量（被剪枝的股票只有已计算的部分）
+        pruned = defaultdict(int)
         processed_count = 0
 
-        for idx, row in df.iterrows():
+        for rank, idx in enumerate(order):
+            row = df.loc[idx]
+            if pruning:
+                bound = bounds[idx]
+                if bound < composite_min:
+                    # 按上界降序评估：之后的股票上界更低，都达不到阈值
+                    for rest in order[rank:]:
+                        evaluated[rest] = {'综合评分上界': bounds[rest], '剪枝': '评分上界'}
+                    pruned['评分上界'] += len(order) - rank
+                    break
+                if not self.profiles and self._top_n_settled(qualified, max_output, bound):
+                    for rest in order[rank:]:
+                        evaluated[rest] = {'综合评分上界': bounds[rest], '剪枝': '排名上界'}
+                    pruned['排名上界'] += len(order) - rank
+                    break
+
+            # v9.2新增：截止时间模式，到时不再分析；剩余时间不够全部完整分析时降级可选维度
+            degraded = set()
+            if budget is not None:
+                if budget.expired() and processed_count >= DEADLINE_CONFIG['min_analyzed']:
+                    for rest in order[rank:]:
+                        evaluated[rest] = {'综合评分上界': bounds[rest], '剪枝': '截止时间'}
+                    budget.abandoned = len(order) - rank
+                    pruned['截止时间'] += len(order) - rank
+                    break
+                if budget.expired():
+                    degraded = set(DEADLINE_CONFIG['degrade_order'])
+                else:
+                    degraded = budget.plan(len(order) - rank, ['风险收益比', '相对强度'])
+
             stock_code = row['代码']
             stock_name = row['名称']
             current_change = row['涨跌幅']
@@ -3161,120 +3471,155 @@ class StockScreener:
 
             processed_count += 1
             if processed_count % 5 == 0:
-                print(f"   ⏳ 已完成 {processed_count}/{len(df)} 只...")
+                self._log(f"   ⏳ 已完成 {processed_count}/{len(df)} 只...")
 
-            # === 维度2：市场相对强度分析 ===
-            rs_score, rs_detail = self.analyze_relative_strength(stock_code, stock_name, current_change)
-
-            # === 维度3：关键价格位置分析 ===
-            position_score, position_detail = self.analyze_price_position(stock_code, stock_name)
-
-            # === v8.0新增：板块龙头识别 ===
-            is_leader, leader_level, leader_detail = self.identify_sector_leader(
-                stock_code, stock_name, current_change, turnover_amount, df_all_market
-            )
-
-            # === v8.0新增：风险收益比计算 ===
-            hist_data = self.get_historical_data(stock_code, days=30)
-            stop_loss, take_profit, risk_reward, rr_detail = self.calculate_risk_reward_ratio(
-                stock_code, current_price, hist_data
-            )
+            # === v8.0新增：风险收益比计算（v9.2：先于其他维度计算，不达标的股票无需继续分析）===
+            with self._timed('风险收益比'):
+                hist_data = self.get_historical_data(stock_code, days=30, min_bars=20)
+                stop_loss, take_profit, risk_reward, rr_detail = self.calculate_risk_reward_ratio(
+                    stock_code, current_price, hist_data
+                )
+            rr_fields = {
+                '止损位': stop_loss,
+                '止盈位': take_profit,
+                '风险收益比': risk_reward,
+                '止损幅度': rr_detail.get('止损幅度', 0),
+                '止盈幅度': rr_detail.get('止盈幅度', 0),
+            }
+            if pruning and risk_reward < rr_min:
+                evaluated[idx] = {**rr_fields, '综合评分上界': bounds[idx], '剪枝': '风险收益比'}
+                pruned['风险收益比'] += 1
+                continue
 
             # === v9.1新增：游资追踪分析 ===
             hot_money_analysis = {}
-            if hist_data is not None and len(hist_data) >= 20:
+            if '游资' in degraded:
+                # v9.2新增：截止时间降级，按无上榜处理
+                hot_money_analysis = self._empty_hot_money(stock_code, DEADLINE_CONFIG['fallback_scores']['游资'])
+            elif hist_data is not None and len(hist_data) >= 20:
                 # akshare返回的列名是中文的
                 recent_high = hist_data['最高'].tail(60).max() if len(hist_data) >= 60 else hist_data['最高'].max()
                 recent_low = hist_data['最低'].tail(60).min() if len(hist_data) >= 60 else hist_data['最低'].min()
-                hot_money_analysis = self.analyze_hot_money_for_stock(
-                    stock_code, current_price, recent_high, recent_low
-                )
+                with self._timed('游资'):
+                    hot_money_analysis = self.analyze_hot_money_for_stock(
+                        stock_code, current_price, recent_high, recent_low
+                    )
             else:
                 # 数据不足，使用默认值
-                hot_money_analysis = {
-                    'stock_code': stock_code,
-                    'lhb_appearances': 0,
-                    'net_buy_amount': 0,
-                    'strength_score': 0,
-                    'timing_score': 0,
-                    'risk_score': 0,
-                    'has_hot_money': False,
-                    'is_active': False,
-                    '综合游资评分': 0,
-                    'strength_detail': {},
-                    'timing_detail': {},
-                    'risk_detail': {}
-                }
+                hot_money_analysis = self._empty_hot_money(stock_code)
+            hot_money_score = hot_money_analysis.get('综合游资评分', 0)
+
+            # === 维度2：市场相对强度分析 ===
+            with self._timed('相对强度'):
+                rs_score, rs_detail = self.analyze_relative_strength(stock_code, stock_name, current_change)
+
+            # v9.2新增：已知风险收益比/游资/相对强度后再次收紧上界，价格位置（一年K线）按需获取
+            if pruning:
+                bound = self.composite_upper_bound(row, rs_score=rs_score, hot_money_score=hot_money_score)
+                if bound < composite_min or (not self.profiles and self._top_n_settled(qualified, max_output, bound)):
+                    reason = '评分上界' if bound < composite_min else '排名上界'
+                    evaluated[idx] = {**rr_fields, '相对强度得分': rs_score, '游资评分': hot_money_score,
+                                      '综合评分上界': bound, '剪枝': reason}
+                    pruned[reason] += 1
+                    continue
+
+            # === 维度3：关键价格位置分析 ===
+            if '价格位置' in degraded:
+                # v9.2新增：截止时间降级，内存中已有一年K线时照常分析，否则取近似得分
+                cached = self.data.peek_history(stock_code, 250)
+                if cached is not None:
+                    degraded.discard('价格位置')
+                    position_score, position_detail = self.analyze_price_position(
+                        stock_code, stock_name, hist_data=compact_history(cached))
+                else:
+                    position_score = DEADLINE_CONFIG['fallback_scores']['价格位置']
+                    position_detail = {'位置状态': '未分析（时间不足）', '位置得分': position_score}
+            else:
+                with self._timed('价格位置'):
+                    position_score, position_detail = self.analyze_price_position(stock_code, stock_name)
+
+            # === v8.0新增：板块龙头识别 ===
+            is_leader, leader_level, leader_detail = self.identify_sector_leader(
+                stock_code, stock_name, current_change, turnover_amount, df_all_market
+            )
 
             # === 综合评分 ===
             fund_consistency = row.get('一致性得分', 0)
             fund_flow_ratio = row.get('流量占比得分', 0)
             original_signal_strength = row.get('信号强度', 0)
-            hot_money_score = hot_money_analysis.get('综合游资评分', 0)
 
             composite_score, rating, risk_warning, contradictions = self.calculate_composite_score(
                 fund_consistency, fund_flow_ratio, rs_score, position_score, original_signal_strength, hot_money_score
             )
 
-            # v8.1新增：获取股票所属板块/行业
-            sector_info = ""
-            try:
-                sector_info = self.get_stock_concepts(stock_code)
-                if not sector_info:
-                    sector_info = "未知板块"
-            except:
-                sector_info = "未知板块"
-
-            # 构建结果行
-            row_copy = row.copy()
-            # 相对强度字段
-            row_copy['相对强度'] = rs_detail.get('相对强度', '未知')
-            row_copy['相对强度得分'] = rs_score
-            row_copy['当日超额'] = rs_detail.get('当日超额', 0)
-            row_copy['5日超额'] = rs_detail.get('5日超额', 0)
-            row_copy['沪深300涨幅'] = rs_detail.get('沪深300涨幅', 0)
-            # 价格位置字段
-            row_copy['位置状态'] = position_detail.get('位置状态', '未知')
-            row_copy['位置得分'] = position_score
-            row_copy['突破状态'] = position_detail.get('突破状态', '')
-            row_copy['支撑状态'] = position_detail.get('支撑状态', '')
-            row_copy['距半年高点'] = position_detail.get('距半年高点', '')
-            row_copy['距半年低点'] = position_detail.get('距半年低点', '')
-            row_copy['是否放量'] = position_detail.get('是否放量', False)
-            # 综合评分字段
-            row_copy['综合评分'] = composite_score
-            row_copy['综合评级'] = rating
-            row_copy['风险提示'] = risk_warning
-            row_copy['矛盾信号'] = '|'.join(contradictions) if contradictions else ''
-            # v8.0新增字段
-            row_copy['是否龙头'] = is_leader
-            row_copy['龙头等级'] = leader_level
-            row_copy['涨幅排名'] = leader_detail.get('涨幅排名', 0)
-            row_copy['止损位'] = stop_loss
-            row_copy['止盈位'] = take_profit
-            row_copy['风险收益比'] = risk_reward
-            row_copy['止损幅度'] = rr_detail.get('止损幅度', 0)
-            row_copy['止盈幅度'] = rr_detail.get('止盈幅度', 0)
-            # v8.1新增字段
-            row_copy['所属板块'] = sector_info
-            # v9.1新增字段：游资追踪
-            row_copy['游资评分'] = hot_money_score
-            row_copy['龙虎榜次数'] = hot_money_analysis.get('lhb_appearances', 0)
-            row_copy['游资净买入'] = hot_money_analysis.get('net_buy_amount', 0)
-            row_copy['游资强度'] = hot_money_analysis.get('strength_score', 0)
-            row_copy['买入时机'] = hot_money_analysis.get('timing_score', 0)
-            row_copy['游资风险'] = hot_money_analysis.get('risk_score', 0)
-            row_copy['有游资'] = hot_money_analysis.get('has_hot_money', False)
-            row_copy['游资活跃'] = hot_money_analysis.get('is_active', False)
-            row_copy['游资阶段'] = hot_money_analysis.get('timing_detail', {}).get('stage', '观望')
-            row_copy['游资建议'] = hot_money_analysis.get('timing_detail', {}).get('recommendation', '观望')
-            row_copy['游资风险提示'] = hot_money_analysis.get('risk_detail', {}).get('suggestion', '')
+            # 构建结果行（v9.2：新字段先收集为字典，最后整列写入）
+            fields = {
+                # 相对强度字段
+                '相对强度': rs_detail.get('相对强度', '未知'),
+                '相对强度得分': rs_score,
+                '当日超额': rs_detail.get('当日超额', 0),
+                '5日超额': rs_detail.get('5日超额', 0),
+                '沪深300涨幅': rs_detail.get('沪深300涨幅', 0),
+                # 价格位置字段
+                '位置状态': position_detail.get('位置状态', '未知'),
+                '位置得分': position_score,
+                '突破状态': position_detail.get('突破状态', ''),
+                '支撑状态': position_detail.get('支撑状态', ''),
+                '距半年高点': position_detail.get('距半年高点', ''),
+                '距半年低点': position_detail.get('距半年低点', ''),
+                '是否放量': position_detail.get('是否放量', False),
+                # 综合评分字段
+                '综合评分': composite_score,
+                '综合评级': rating,
+                '风险提示': risk_warning,
+                '矛盾信号': '|'.join(contradictions) if contradictions else '',
+                # v8.0新增字段
+                '是否龙头': is_leader,
+                '龙头等级': leader_level,
+                '涨幅排名': leader_detail.get('涨幅排名', 0),
+                **rr_fields,
+                # v8.1新增字段（v9.2：只为最终入选的股票查询）
+                '所属板块': '',
+                # v9.1新增字段：游资追踪
+                '游资评分': hot_money_score,
+                '龙虎榜次数': hot_money_analysis.get('lhb_appearances', 0),
+                '游资净买入': hot_money_analysis.get('net_buy_amount', 0),
+                '游资强度': hot_money_analysis.get('strength_score', 0),
+                '买入时机': hot_money_analysis.get('timing_score', 0),
+                '游资风险': hot_money_analysis.get('risk_score', 0),
+                '有游资': hot_money_analysis.get('has_hot_money', False),
+                '游资活跃': hot_money_analysis.get('is_active', False),
+                '游资阶段': hot_money_analysis.get('timing_detail', {}).get('stage', '观望'),
+                '游资建议': hot_money_analysis.get('timing_detail', {}).get('recommendation', '观望'),
+                '游资风险提示': hot_money_analysis.get('risk_detail', {}).get('suggestion', ''),
+            }
 
-            # v8.1新增：剪枝逻辑 - 只保留综合评分≥55且风险收益比≥1.5的股票
-            if composite_score >= 55 and risk_reward >= 1.5:
-                qualified_stocks.append(row_copy)
+            if budget is not None:
+                fields['降级因子'] = '|'.join(factor for factor in DEADLINE_CONFIG['degrade_order'] if factor in degraded)
+                for factor in degraded:
+                    budget.mark(factor)
 
-        df_result = pd.DataFrame(qualified_stocks)
+            evaluated[idx] = fields
+
+            # v8.1新增：剪枝逻辑 - 只保留综合评分≥55且风险收益比≥1.5的股票
+            if composite_score >= composite_min and risk_reward >= rr_min:
+                qualified[idx] = (bool(fields['游资活跃']), composite_score)
+
+        if pruned:
+            detail = ' | '.join(f"{reason}={count}" for reason, count in pruned.items())
+            self._log(f"\n   ✂️ 上界剪枝: 完整分析 {processed_count}/{len(df)} 只，跳过 {sum(pruned.values())} 只（{detail}）")
+        if budget is not None:
+            self._log(f"   ⏰ 截止时间降级: {budget.describe()}")
+
+        # 按原顺序输出（与不剪枝时的行顺序一致）
+        evaluated_index = sorted(evaluated, key=positions.get)
+        qualified_index = sorted(qualified, key=positions.get)
+        self.evaluated_features = attach_columns(df, evaluated_index, [evaluated[idx] for idx in evaluated_index])
+        if self.profiles:
+            # 完整评估过的候选股（不含被剪枝的），供各参数方案重新过滤和评分
+            scored_index = [idx for idx in evaluated_index if '剪枝' not in evaluated[idx]]
+            self.scored_features = attach_columns(df, scored_index, [evaluated[idx] for idx in scored_index])
+        df_result = attach_columns(df, qualified_index, [evaluated[idx] for idx in qualified_index])
 
         if not df_result.empty:
             # v9.1优化：优先展示游资活跃的股票，然后按综合评分排序
@@ -3284,9 +3629,13 @@ class StockScreener:
 
             # v8.1新增：限制最终输出数量为前20只
             original_count = len(df_result)
-            if len(df_result) > 20:
-                df_result = df_result.head(20)
-                print(f"\n   🎯 v8.1剪枝: 从{original_count}只筛选出综合评分最高的前20只")
+            if len(df_result) > max_output:
+                df_result = df_result.head(max_output)
+                self._log(f"\n   🎯 v8.1剪枝: 从{original_count}只筛选出综合评分最高的前{max_output}只")
+
+            # v8.1新增：获取股票所属板块/行业（v9.2：只查询最终入选的股票；多参数方案时在应用方案后查询）
+            if not self.profiles:
+                df_result = self.fill_sectors(df_result)
 
             # 统计评级分布
             aaa_count = len(df_result[df_result['综合评级'].str.startswith('AAA')])
@@ -3311,179 +3660,408 @@ class StockScreener:
             building_stage = len(df_result[df_result['游资阶段'] == '建仓期'])
             accumulating_stage = len(df_result[df_result['游资阶段'] == '加仓期'])
 
-            print(f"\n   ✅ 四维度分析完成: {len(df_result)} 只 (已过滤: 综合评分≥55 & 风险收益比≥1.5)")
-            print(f"   🏆 综合评级: AAA={aaa_count} | AA={aa_count} | A={a_count}")
-            print(f"   📈 相对强势: {strong_rs} 只跑赢大盘")
-            print(f"   📍 位置良好: {good_position} 只处于有利位置")
-            print(f"   🔥 龙头情况: 龙头={leader_count}只(超级龙头={super_leader}) | 风险收益比≥2={good_rr}只(≥3={excellent_rr}只)")
-            print(f"   💰 v9.1游资: 活跃={hot_money_active}只 | 有介入={hot_money_present}只 | 建仓期={building_stage}只 | 加仓期={accumulating_stage}只")
+            self._log(f"\n   ✅ 四维度分析完成: {len(df_result)} 只 (已过滤: 综合评分≥{composite_min:g} & 风险收益比≥{rr_min:g})")
+            self._log(f"   🏆 综合评级: AAA={aaa_count} | AA={aa_count} | A={a_count}")
+            self._log(f"   📈 相对强势: {strong_rs} 只跑赢大盘")
+            self._log(f"   📍 位置良好: {good_position} 只处于有利位置")
+            self._log(f"   🔥 龙头情况: 龙头={leader_count}只(超级龙头={super_leader}) | 风险收益比≥2={good_rr}只(≥3={excellent_rr}只)")
+            self._log(f"   💰 v9.1游资: 活跃={hot_money_active}只 | 有介入={hot_money_present}只 | 建仓期={building_stage}只 | 加仓期={accumulating_stage}只")
 
             if aaa_count > 0:
-                print(f"   ⭐⭐⭐ 发现 {aaa_count} 只【四维共振】顶级标的！")
+                self._log(f"   ⭐⭐⭐ 发现 {aaa_count} 只【四维共振】顶级标的！")
             if super_leader > 0:
-                print(f"   👑 发现 {super_leader} 只【超级龙头】股！")
+                self._log(f"   👑 发现 {super_leader} 只【超级龙头】股！")
             if hot_money_active > 0:
-                print(f"   💸 发现 {hot_money_active} 只【游资活跃】股！")
+                self._log(f"   💸 发现 {hot_money_active} 只【游资活跃】股！")
         else:
-            print(f"   ✅ 分析完成: 0 只 (所有股票均未达到: 综合评分≥55 & 风险收益比≥1.5)")
+            self._log(f"   ✅ 分析完成: 0 只 (所有股票均未达到: 综合评分≥{composite_min:g} & 风险收益比≥{rr_min:g})")
+
+        if not self.evaluated_features.empty:
+            selected_codes = set(df_result['代码']) if not df_result.empty else set()
+            self.evaluated_features['是否入选'] = self.evaluated_features['代码'].isin(selected_codes)
 
         return df_result
     
-    def run(self, sector_codes=None):
-        """执行完整筛选流程（v8.0优化版）"""
+    def run(self, sector_codes=None, resume=None):
+        """
+        执行完整筛选流程（v8.0优化版；v9.2：分阶段剖析 + 数据源健康监控）
+
+        resume: 从检查点续跑（RunCheckpoint，v9.2新增），沿用其批次ID和数据，从最后完成的步骤继续
+        返回：ScreenResult（最终结果、各阶段存活股票、市场情绪、各阶段耗时、批次ID）
+        """
+        self._begin_run(resume)
+        self.profiler.activate()
+        self.source_health.activate()
+        try:
+            self._run_pipeline(sector_codes)
+            if self.checkpoint is not None:
+                self.checkpoint.complete()  # v9.2新增：正常结束后删除检查点，中断时保留供续跑
+        finally:
+            self.save_run_profile()
+        return ScreenResult(self.batch_id, HISTORY_SOURCE, final=self.result_df, stages=self.stage_frames,
+                            sentiment=self.sentiment, profile=self.profiler.to_dict(),
+                            run_status=self.run_status, target_sector=self.target_sector,
+                            profiles=self.profile_results,
+                            degraded=self.budget.summary() if self.budget is not None else None,
+                            skipped=self.data.skipped(self.run_started))
+
+    def _begin_run(self, resume=None):
+        """
+        重置单次运行的状态（v9.2新增）
+
+        同一实例重复调用 run() 时生成新的批次ID、剖析器和健康监控器，清空实时数据；
+        板块成分股、指数K线、龙虎榜等缓存在同一天内继续复用。续跑时沿用检查点的批次ID。
+        """
+        if self.run_count or resume is not None:
+            now = datetime.now()
+            self.today = now.strftime('%Y%m%d')
+            self.batch_id = resume.batch_id if resume is not None else new_batch_id(now)
+            self.selection_date = now.strftime('%Y-%m-%d')
+            self.is_monday = now.weekday() == 0
+            self.profiler = RunProfiler(self.batch_id, HISTORY_SOURCE)
+            self.source_health = SourceHealth(self.batch_id, HISTORY_SOURCE)
+            self.fund_flow_data = None
+            self.market_index_data = None
+            self.spot_data = None
+            self.spot_fetched_at = None
+            self.index_spot_data = None
+            self.evaluated_features = None
+            self.scored_features = None
+        self.run_count += 1
+        self.run_started = datetime.now()
+        self.budget = DeadlineBudget(self.deadline) if self.deadline is not None else None
+        self.resuming = resume is not None
+        if resume is not None:
+            self.checkpoint = resume
+        elif CHECKPOINT_CONFIG['enabled'] and self.checkpointing and not self.daemon_mode:
+            self.checkpoint = RunCheckpoint(self.batch_id, HISTORY_SOURCE)
+            try:
+                clear_stale(HISTORY_SOURCE)
+            except Exception:
+                pass
+        else:
+            self.checkpoint = None
+        self.run_status = None
+        self.result_df = None
+        self.stage_frames = {}
+        self.sentiment = None
+        self.profile_results = {}
+
+    def _run_step(self, name, func, df, checkpoint=True, after=None):
+        """
+        执行一个筛选步骤：计入剖析器，记录并保存该步骤之后存活的股票（v9.2新增）
+
+        after: 本次计划中排在该步骤之前的步骤名（记入剖析文件，供 stage_planner 判断实测通过率是否有条件）
+        """
+        fields = {} if after is None else {'after': list(after)}
+        df = self.profiler.run_stage(name, func, df, **fields)
+        self.stage_frames[name] = df
+        if checkpoint:
+            self._save_checkpoint(name, df)
+        return df
+
+    def _save_checkpoint(self, name=None, df=None):
+        """
+        保存检查点（v9.2新增）：步骤之后存活的股票和新获取的数据，name为None时只保存数据
+        保存失败不影响选股流程
+        """
+        if self.checkpoint is None:
+            return
+        try:
+            if name is None:
+                self.checkpoint.save_data(self.data)
+            else:
+                self.checkpoint.save_stage(name, df, self.data)
+        except Exception as e:
+            self._log(f"   ⚠️ 保存检查点失败: {str(e)[:50]}")
+            self.checkpoint = None
+
+    def _start_checkpoint(self, sector_codes):
+        """
+        开始记录检查点，续跑时恢复数据（v9.2新增）
+
+        返回：续跑时已完成的步骤名列表，否则为空列表
+        """
+        if self.checkpoint is None:
+            return []
+        if not self.resuming:
+            try:
+                self.checkpoint.start({
+                    'target_sector': self.target_sector,
+                    'sector_codes': list(sector_codes) if sector_codes else None,
+                    'params': self.base_params,
+                    'profiles': list(self.profiles),
+                })
+            except Exception as e:
+                self._log(f"   ⚠️ 创建检查点失败: {str(e)[:50]}")
+                self.checkpoint = None
+            return []
+
+        restored = self.checkpoint.restore_data(self.data)
+        completed = self.checkpoint.completed_stages
+        self._log(f"\n♻️ 续跑批次 {self.batch_id}: 已完成 {len(completed)} 个步骤"
+              f"{'（最后完成: ' + completed[-1] + '）' if completed else ''}，恢复 {restored} 只股票的日K线")
+        return completed
+
+    def plan_stages(self, df=None):
+        """
+        规划第1~9步的执行顺序（v9.2新增）
+
+        各步骤都是逐行判断的独立条件，按 单只代价/淘汰率 从小到大执行：
+        只用实时行情的步骤（含第8步）先执行，逐只下载K线的步骤最后执行，最终入选集合不变；
+        实测通过率只用于同类数据步骤之间的先后（如第6/7/9步谁先下载K线）
+        """
+        selectivity = None
+        if PLANNER_CONFIG['enabled'] and PLANNER_CONFIG['learn_selectivity']:
+            try:
+                selectivity = observed_selectivity('scan_stock_v9', SCREEN_STAGES)
+            except Exception as e:
+                self._log(f"   ⚠️ 读取实测通过率失败，使用声明值: {e}")
+        plan = plan_order(SCREEN_STAGES, base_columns=df.columns if df is not None else None,
+                          selectivity=selectivity)
+        if PLANNER_CONFIG['enabled']:
+            self._log(f"\n📋 筛选顺序（按代价规划）: {' → '.join(stage['name'] for stage in plan)}")
+        return plan
+
+    def _run_pipeline(self, sector_codes=None):
+        """筛选流程主体（每个阶段计入剖析器；v9.2：每个步骤后保存检查点，续跑时跳过已完成的步骤）"""
         self.print_header()
+        completed = self._start_checkpoint(sector_codes)
 
         # 【v8.0新增】市场情绪检查
-        sentiment_score, sentiment_status, sentiment_detail = self.check_market_sentiment()
+        with self.profiler.stage('市场情绪'):
+            sentiment_score, sentiment_status, sentiment_detail = self.check_market_sentiment()
+        self.sentiment = {'score': sentiment_score, 'status': sentiment_status, 'detail': sentiment_detail}
 
         # 情绪过滤：低于30分时给出强烈警告
         if sentiment_score < 30:
-            print("\n" + "🔴" * 35)
-            print("⚠️  市场情绪极度低迷，强烈建议空仓观望！")
-            print("   继续选股风险极大，请谨慎决策")
-            print("🔴" * 35)
-            user_input = input("\n是否继续选股？(输入yes继续，其他键退出): ").strip().lower()
+            self._log("\n" + "🔴" * 35)
+            self._log("⚠️  市场情绪极度低迷，强烈建议空仓观望！")
+            self._log("   继续选股风险极大，请谨慎决策")
+            self._log("🔴" * 35)
+            if completed:
+                # 续跑：中断前已经选择继续选股
+                user_input = 'yes'
+                self._log("\n♻️ 续跑: 中断前已选择继续选股")
+            elif self.weak_market_policy == 'ask' and self.reporter is not None:
+                user_input = input("\n是否继续选股？(输入yes继续，其他键退出): ").strip().lower()
+            else:
+                # 不打印时无法询问，ask按abort处理
+                user_input = 'yes' if self.weak_market_policy == 'continue' else ''
+                self._log(f"\n🤖 无人值守模式: 按策略 {self.weak_market_policy} 处理")
             if user_input != 'yes':
-                print("\n✅ 已退出选股流程，空仓观望是最好的策略")
+                self._log("\n✅ 已退出选股流程，空仓观望是最好的策略")
+                self.run_status = 'skipped'
                 return
         elif sentiment_score < 45:
-            print("\n" + "🟠" * 35)
-            print("⚠️  市场情绪偏弱，建议降低仓位或观望")
-            print("   即使选出股票，也应轻仓试探")
-            print("🟠" * 35)
+            self._log("\n" + "🟠" * 35)
+            self._log("⚠️  市场情绪偏弱，建议降低仓位或观望")
+            self._log("   即使选出股票，也应轻仓试探")
+            self._log("🟠" * 35)
 
-        # 【v7.0新增】周一时先进行上周汇总报告
-        if self.is_monday:
-            self.analyze_last_week_performance()
+        # 【v7.0新增】周一时先进行上周汇总报告（v9.2：续跑时中断前已经执行过、常驻服务模式下跳过）
+        if self.is_monday and not self.resuming and not self.daemon_mode:
+            with self.profiler.stage('上周回顾'):
+                self.analyze_last_week_performance()
 
-        # 【v7.0新增】先进行历史回测分析
-        self.analyze_previous_selection()
+        # 【v7.0新增】先进行历史回测分析（v9.2：常驻服务模式下跳过）
+        if not self.resuming and not self.daemon_mode:
+            with self.profiler.stage('上次回测'):
+                self.analyze_previous_selection()
 
-        print("\n" + "=" * 70)
-        print("【开始本次选股筛选】")
-        print("=" * 70)
+        self._log("\n" + "=" * 70)
+        self._log("【开始本次选股筛选】")
+        self._log("=" * 70)
 
         # 获取实时数据
-        df = self.get_realtime_data(sector_codes)
+        with self.profiler.stage('实时行情') as stage:
+            df = self.get_realtime_data(sector_codes)
+            stage['rows_out'] = len(df) if df is not None else None
+        if df is not None:
+            self.stage_frames['实时行情'] = df
         if df is None or df.empty:
-            print("\n❌ 无法获取数据或板块内无股票，程序退出")
-            return
-        
-        # 第一步：涨幅筛选
-        df = self.step1_filter_by_change_pct(df)
-        if df.empty:
-            self.output_result(pd.DataFrame())
+            self._log("\n❌ 无法获取数据或板块内无股票，程序退出")
+            self.run_status = 'no_data'
             return
+        self._save_checkpoint()
 
-        # 第1.5步：月涨幅筛选（排除短期涨幅过大的股票）
-        df = self.step1b_filter_by_monthly_gain(df)
-        if df.empty:
-            self.output_result(pd.DataFrame())
-            return
+        # 第1~9步：按代价和通过率规划执行顺序（v9.2新增，见 SCREEN_STAGES / stage_planner.py）
+        # 续跑时沿用中断前的执行顺序，已完成的步骤直接读取检查点
+        if completed and self.checkpoint.manifest['plan']:
+            by_name = {stage['name']: stage for stage in SCREEN_STAGES}
+            plan = [by_name[name] for name in self.checkpoint.manifest['plan']]
+        else:
+            plan = self.plan_stages(df)
+            if self.checkpoint is not None:
+                try:
+                    self.checkpoint.set_plan([stage['name'] for stage in plan])
+                except Exception as e:
+                    self._log(f"   ⚠️ 保存检查点失败: {str(e)[:50]}")
+                    self.checkpoint = None
+        if completed:
+            for name in completed:
+                self.stage_frames[name] = self.checkpoint.load_stage(name)
+            df = self.stage_frames[completed[-1]]
+            if df.empty:
+                with self.profiler.stage('输出结果'):
+                    self.output_result(pd.DataFrame())
+                return
+
+        history_notice = False
+        for i, stage in enumerate(plan):
+            if stage['name'] in completed:
+                continue
+            if stage['data'] == 'history' and not history_notice:
+                self._log(f"\n⏳ 正在分析 {len(df)} 只股票的历史数据，请稍候...")
+                history_notice = True
+            df = self._run_step(stage['name'], getattr(self, stage['method']), df,
+                                after=[st['name'] for st in plan[:i]])
+            if df.empty:
+                with self.profiler.stage('输出结果'):
+                    self.output_result(pd.DataFrame())
+                return
 
-        # 第二步：量比筛选
-        df = self.step2_filter_by_volume_ratio(df)
-        if df.empty:
-            self.output_result(pd.DataFrame())
-            return
-        
-        # 第三步：换手率筛选
-        df = self.step3_filter_by_turnover(df)
-        if df.empty:
-            self.output_result(pd.DataFrame())
-            return
-        
-        # 第四步：流通市值筛选
-        df = self.step4_filter_by_market_cap(df)
-        if df.empty:
-            self.output_result(pd.DataFrame())
-            return
-        
-        # 第五步：资金流向筛选（新增核心步骤）
-        df = self.step5_filter_by_fund_flow(df)
-        if df.empty:
-            self.output_result(pd.DataFrame())
-            return
-        
-        print(f"\n⏳ 正在分析 {len(df)} 只股票的历史数据，请稍候...")
-        
-        # 第六步：成交量形态筛选
-        df = self.step6_filter_by_volume_pattern(df)
-        if df.empty:
-            self.output_result(pd.DataFrame())
-            return
-        
-        # 第七步：均线趋势筛选
-        df = self.step7_filter_by_ma_trend(df)
-        if df.empty:
-            self.output_result(pd.DataFrame())
-            return
-        
-        # 第八步：分时强度筛选
-        df = self.step8_filter_by_intraday_strength(df)
-        if df.empty:
-            self.output_result(pd.DataFrame())
-            return
-        
-        # 第九步：胜率筛选
-        df = self.step9_filter_by_win_rate(df)
-        if df.empty:
-            self.output_result(pd.DataFrame())
-            return
-        
         # 第十步：主题加分
-        df = self.step10_theme_scoring(df)
+        if '第10步 主题' not in completed:
+            df = self._run_step('第10步 主题', self.step10_theme_scoring, df)
 
-        # 第十一步：三维度综合分析（v6.0新增）
-        df = self.step11_multidimensional_analysis(df)
+        # 第十一步：三维度综合分析（v6.0新增；v9.2：续跑时重新执行，只保存新获取的数据）
+        df = self._run_step('第11步 综合分析', self.step11_multidimensional_analysis, df, checkpoint=False)
+        self._save_checkpoint()
+
+        # v9.2新增：多参数方案共享因子表，主方案（第一个）作为本次结果保存和展示
+        if self.profiles:
+            with self.profiler.stage('参数方案'):
+                self.profile_results = self.apply_profiles()
+            df = self.profile_results[next(iter(self.profiles))]
+            if self.evaluated_features is not None and not self.evaluated_features.empty:
+                self.evaluated_features['是否入选'] = self.evaluated_features['代码'].isin(set(df['代码']) if not df.empty else set())
+
+        # v9.2新增：保存全部候选股因子
+        self.save_feature_snapshot()
 
         # 输出结果
-        self.output_result(df)
+        with self.profiler.stage('输出结果'):
+            self.output_result(df)
     
+    def save_run_profile(self):
+        """
+        保存本次运行的分阶段剖析和数据源健康指标（v9.2新增）
+        剖析失败不影响选股流程
+        """
+        try:
+            if self.reporter is not None:
+                self.profiler.print_summary()
+            path = self.profiler.save()
+            if path is not None:
+                self._log(f"\n⏱️ 运行剖析已保存: {path.name}（python run_profiler.py compare 对比多次运行）")
+        except Exception as e:
+            self._log(f"\n⚠️ 保存运行剖析失败: {str(e)[:50]}")
+
+        if self.reporter is not None:
+            self.data.print_skipped(self.run_started)
+
+        try:
+            if self.reporter is not None:
+                self.source_health.print_report()
+            path = self.source_health.save()
+            if path is not None:
+                self._log(f"\n📡 数据源健康指标已保存: {path.name}（python source_health.py trend 查看走势）")
+        except Exception as e:
+            self._log(f"\n⚠️ 保存数据源健康指标失败: {str(e)[:50]}")
+
+    def archive_market_snapshot(self):
+        """
+        归档本次运行已获取的市场数据（v9.2新增）
+        只保存已经下载过的数据，不额外调用接口；归档失败不影响选股流程
+        """
+        if not ARCHIVE_CONFIG['auto_archive'] or self.spot_data is None:
+            return
+
+        try:
+            archiver = SnapshotArchiver()
+            saved = archiver.save_snapshot({
+                'spot': self.spot_data,
+                'fund_flow': self.fund_flow_data,
+                'index_spot': self.index_spot_data,
+            }, captured_at=self.spot_fetched_at)
+            saved += archiver.save_lhb(self.data.lhb_cache)
+            if saved:
+                self._log(f"\n📦 已归档市场快照: {len(saved)} 个文件")
+        except Exception as e:
+            self._log(f"\n⚠️ 归档市场快照失败: {str(e)[:50]}")
+
+    def save_feature_snapshot(self):
+        """
+        保存第十一步评估过的全部候选股因子到因子库（v9.2新增）
+        保存失败不影响选股流程
+        """
+        if not FEATURE_STORE_CONFIG['auto_save'] or self.evaluated_features is None:
+            return
+
+        try:
+            path = FeatureStore().save(self.evaluated_features, self.batch_id, self.selection_date)
+            if path is not None:
+                self._log(f"\n🧬 已保存 {len(self.evaluated_features)} 只候选股的因子: {path.parent.name}/{path.name}")
+        except Exception as e:
+            self._log(f"\n⚠️ 保存因子失败: {str(e)[:50]}")
+
     def output_result(self, df):
-        """输出筛选结果（v7.0升级版 - 三维度展示 + 历史记录 + 连续选中标识）"""
-        print("\n" + "=" * 70)
-        print("【筛选结果】v7.0 三维度综合分析")
-        print("=" * 70)
+        """
+        保存并输出筛选结果（v7.0升级版 - 三维度展示 + 历史记录 + 连续选中标识）
 
-        if df.empty:
-            print("\n🔴 今日暂无符合条件的标的")
-            print("\n💡 提示: 严格遵循首要原则 - 无标的满足则当日放弃，不强行开仓")
-        else:
-            # 获取连续选中的股票（需要先保存当前结果才能检测）
-            consecutive_stocks = {}
+        v9.2：保存（行情归档、历史库、周记录、连续选中标记）始终执行，屏幕展示交给报告器
+        """
+        df = widen_for_output(df)  # v9.2：float32/分类列恢复为通用类型后再展示和保存
+        self.result_df = df
+        # v9.2新增：归档本次行情快照，供历史回放和回测使用
+        self.archive_market_snapshot()
 
+        if not df.empty:
             # 先保存选股结果，以便检测连续选中
             self.save_selection_result(df)
 
-            # 检测连续选中的股票
-            consecutive_list = self.get_consecutive_stocks(min_days=2)
-            for item in consecutive_list:
-                consecutive_stocks[item['code']] = item['consecutive_days']
-
-            # 在df中标记连续选中的股票
+            # 检测连续选中的股票，在df中标记
+            consecutive_stocks = {item['code']: item['consecutive_days']
+                                  for item in self.get_consecutive_stocks(min_days=2)}
             df['连续选中天数'] = df['代码'].apply(lambda x: consecutive_stocks.get(x, 0))
+
+        if self.reporter is not None:
+            self.reporter.report_result(self, df)
+
+    def print_result(self, df):
+        """在控制台展示筛选结果（v9.2：从output_result中分离，由ConsoleReporter调用）"""
+        self._log("\n" + "=" * 70)
+        self._log("【筛选结果】v7.0 三维度综合分析")
+        self._log("=" * 70)
+
+        if df.empty:
+            self._log("\n🔴 今日暂无符合条件的标的")
+            self._log("\n💡 提示: 严格遵循首要原则 - 无标的满足则当日放弃，不强行开仓")
+        else:
             sector_info = f"【{self.target_sector}】板块内" if self.target_sector else ""
-            print(f"\n🟢 {sector_info}共筛选出 {len(df)} 只潜在次日冲高标的")
+            self._log(f"\n🟢 {sector_info}共筛选出 {len(df)} 只潜在次日冲高标的")
+            if self.budget is not None and self.budget.summary():
+                self._log(f"\n⏰ 截止时间模式: 部分维度因时间不足降级（{self.budget.describe()}），见各股票的降级维度")
 
             # ========== 连续选中股票特别提示 ==========
             consecutive_df = df[df['连续选中天数'] >= 2].copy()
             if not consecutive_df.empty:
                 consecutive_df = consecutive_df.sort_values('连续选中天数', ascending=False)
-                print(f"\n{'🔥'*20}")
-                print(f"🌟🌟🌟 【重点关注 - 连续选中股票】共 {len(consecutive_df)} 只 🌟🌟🌟")
-                print(f"💡 这些股票连续2天以上被选中，走势持续良好！")
-                print(f"{'🔥'*20}")
+                self._log(f"\n{'🔥'*20}")
+                self._log(f"🌟🌟🌟 【重点关注 - 连续选中股票】共 {len(consecutive_df)} 只 🌟🌟🌟")
+                self._log(f"💡 这些股票连续2天以上被选中，走势持续良好！")
+                self._log(f"{'🔥'*20}")
 
                 for idx, row in consecutive_df.iterrows():
                     days = int(row['连续选中天数'])
                     stars = "⭐" * min(days, 5)
                     current_price = row.get('最新价', row.get('收盘', 0))
-                    print(f"\n  {stars} {row['代码']} | {row['名称']} | 连续 {days} 天被选中")
-                    print(f"      💰 当前价: {current_price:.2f}元 | 涨幅: {row['涨跌幅']:.2f}% | 评级: {row['综合评级']}")
-                    print(f"      📊 资金: {row.get('资金一致性', '未知')} | 强度: {row.get('相对强度', '未知')} | 位置: {row.get('位置状态', '未知')}")
+                    self._log(f"\n  {stars} {row['代码']} | {row['名称']} | 连续 {days} 天被选中")
+                    self._log(f"      💰 当前价: {current_price:.2f}元 | 涨幅: {row['涨跌幅']:.2f}% | 评级: {row['综合评级']}")
+                    self._log(f"      📊 资金: {row.get('资金一致性', '未知')} | 强度: {row.get('相对强度', '未知')} | 位置: {row.get('位置状态', '未知')}")
 
-                print(f"\n{'='*60}")
+                self._log(f"\n{'='*60}")
 
             # 按综合评级分类显示
             aaa_stocks = df[df['综合评级'].str.startswith('AAA')]
@@ -3493,109 +4071,109 @@ class StockScreener:
 
             # 1. 显示AAA级标的（三维共振）
             if not aaa_stocks.empty:
-                print(f"\n{'='*60}")
-                print(f"⭐⭐⭐ 【AAA级 - 三维共振顶级标的】({len(aaa_stocks)}只)")
-                print(f"{'='*60}")
+                self._log(f"\n{'='*60}")
+                self._log(f"⭐⭐⭐ 【AAA级 - 三维共振顶级标的】({len(aaa_stocks)}只)")
+                self._log(f"{'='*60}")
 
                 for idx, row in aaa_stocks.iterrows():
                     self._print_stock_detail(row, level='AAA')
 
             # 2. 显示AA级标的
             if not aa_stocks.empty:
-                print(f"\n{'='*60}")
-                print(f"⭐⭐ 【AA级 - 强势标的】({len(aa_stocks)}只)")
-                print(f"{'='*60}")
+                self._log(f"\n{'='*60}")
+                self._log(f"⭐⭐ 【AA级 - 强势标的】({len(aa_stocks)}只)")
+                self._log(f"{'='*60}")
 
                 for idx, row in aa_stocks.iterrows():
                     self._print_stock_detail(row, level='AA')
 
             # 3. 显示A级标的
             if not a_stocks.empty:
-                print(f"\n{'='*60}")
-                print(f"⭐ 【A级 - 良好标的】({len(a_stocks)}只)")
-                print(f"{'='*60}")
+                self._log(f"\n{'='*60}")
+                self._log(f"⭐ 【A级 - 良好标的】({len(a_stocks)}只)")
+                self._log(f"{'='*60}")
 
                 for idx, row in a_stocks.iterrows():
                     self._print_stock_detail(row, level='A')
 
             # 4. 显示其他标的（B/C/D级）
             if not other_stocks.empty:
-                print(f"\n{'='*60}")
-                print(f"📋 【B/C/D级 - 观察标的】({len(other_stocks)}只)")
-                print(f"{'='*60}")
+                self._log(f"\n{'='*60}")
+                self._log(f"📋 【B/C/D级 - 观察标的】({len(other_stocks)}只)")
+                self._log(f"{'='*60}")
 
                 for idx, row in other_stocks.head(5).iterrows():  # 只显示前5只
                     self._print_stock_detail(row, level='other')
 
                 if len(other_stocks) > 5:
-                    print(f"\n   ... 还有 {len(other_stocks) - 5} 只，建议谨慎观察")
+                    self._log(f"\n   ... 还有 {len(other_stocks) - 5} 只，建议谨慎观察")
 
             # 输出股票代码汇总
-            print("\n" + "-" * 60)
-            print("📋 股票代码汇总（按综合评级排序）:")
+            self._log("\n" + "-" * 60)
+            self._log("📋 股票代码汇总（按综合评级排序）:")
 
             if not aaa_stocks.empty:
-                print(f"   ⭐⭐⭐ AAA级: {', '.join(aaa_stocks['代码'].tolist())}")
+                self._log(f"   ⭐⭐⭐ AAA级: {', '.join(aaa_stocks['代码'].tolist())}")
             if not aa_stocks.empty:
-                print(f"   ⭐⭐ AA级: {', '.join(aa_stocks['代码'].tolist())}")
+                self._log(f"   ⭐⭐ AA级: {', '.join(aa_stocks['代码'].tolist())}")
             if not a_stocks.empty:
-                print(f"   ⭐ A级: {', '.join(a_stocks['代码'].tolist())}")
+                self._log(f"   ⭐ A级: {', '.join(a_stocks['代码'].tolist())}")
 
             # 三维度综合建议
-            print("\n" + "-" * 60)
-            print("💡 【v6.0 三维度操作建议】")
+            self._log("\n" + "-" * 60)
+            self._log("💡 【v6.0 三维度操作建议】")
 
-            print("\n   📊 维度1 - 资金共振:")
+            self._log("\n   📊 维度1 - 资金共振:")
             strong_consistency = df[df['资金一致性'] == '强一致流入']
             if not strong_consistency.empty:
-                print(f"      ✅ 发现 {len(strong_consistency)} 只【强一致流入】标的")
-                print(f"         → 主力与整体资金同向流入，最佳买入信号")
+                self._log(f"      ✅ 发现 {len(strong_consistency)} 只【强一致流入】标的")
+                self._log(f"         → 主力与整体资金同向流入，最佳买入信号")
             absorption = df[df['资金一致性'] == '主力吸筹']
             if not absorption.empty:
-                print(f"      📈 发现 {len(absorption)} 只【主力吸筹】标的")
-                print(f"         → 主力逆势买入，关注后续放量")
+                self._log(f"      📈 发现 {len(absorption)} 只【主力吸筹】标的")
+                self._log(f"         → 主力逆势买入，关注后续放量")
 
-            print("\n   📈 维度2 - 相对强度:")
+            self._log("\n   📈 维度2 - 相对强度:")
             strong_rs = df[df['相对强度'].isin(['显著强势', '相对强势'])]
             if not strong_rs.empty:
-                print(f"      ✅ 发现 {len(strong_rs)} 只【跑赢大盘】标的")
+                self._log(f"      ✅ 发现 {len(strong_rs)} 只【跑赢大盘】标的")
                 avg_excess = strong_rs['当日超额'].mean()
-                print(f"         → 平均超额收益: {avg_excess:.2f}%")
+                self._log(f"         → 平均超额收益: {avg_excess:.2f}%")
             weak_rs = df[df['相对强度'].isin(['相对弱势', '显著弱势'])]
             if not weak_rs.empty:
-                print(f"      ⚠️ 有 {len(weak_rs)} 只相对弱势，需警惕")
+                self._log(f"      ⚠️ 有 {len(weak_rs)} 只相对弱势，需警惕")
 
-            print("\n   📍 维度3 - 价格位置:")
+            self._log("\n   📍 维度3 - 价格位置:")
             good_position = df[df['位置状态'].isin(['突破确认+支撑稳固', '位置良好'])]
             if not good_position.empty:
-                print(f"      ✅ 发现 {len(good_position)} 只【位置良好】标的")
+                self._log(f"      ✅ 发现 {len(good_position)} 只【位置良好】标的")
                 breakthrough = df[df['突破状态'].str.contains('突破', na=False)]
                 if not breakthrough.empty:
-                    print(f"         → 其中 {len(breakthrough)} 只已突破关键压力位")
+                    self._log(f"         → 其中 {len(breakthrough)} 只已突破关键压力位")
 
             # 风险提示
-            print("\n   ⚠️ 风险警示:")
+            self._log("\n   ⚠️ 风险警示:")
             contradiction_stocks = df[df['矛盾信号'] != '']
             if not contradiction_stocks.empty:
-                print(f"      → 有 {len(contradiction_stocks)} 只存在信号矛盾，建议保守对待")
+                self._log(f"      → 有 {len(contradiction_stocks)} 只存在信号矛盾，建议保守对待")
                 for idx, row in contradiction_stocks.head(3).iterrows():
-                    print(f"         {row['代码']} {row['名称']}: {row['矛盾信号']}")
+                    self._log(f"         {row['代码']} {row['名称']}: {row['矛盾信号']}")
 
-            print("\n   【操作要点】")
-            print("   1. 优先关注AAA/AA级标的，三维度信号协同一致")
-            print("   2. 次日竞价阶段确认资金是否持续流入")
-            print("   3. 确认个股相对大盘是否保持强势")
-            print("   4. 关注突破后的量价配合和支撑位有效性")
-            print("   5. 若三维度出现矛盾信号，建议放弃或减仓")
+            self._log("\n   【操作要点】")
+            self._log("   1. 优先关注AAA/AA级标的，三维度信号协同一致")
+            self._log("   2. 次日竞价阶段确认资金是否持续流入")
+            self._log("   3. 确认个股相对大盘是否保持强势")
+            self._log("   4. 关注突破后的量价配合和支撑位有效性")
+            self._log("   5. 若三维度出现矛盾信号，建议放弃或减仓")
 
             if self.current_month == 4:
-                print("\n   ⚠️ 4月年报季警示: 注意规避业绩雷，建议轻仓观望!")
+                self._log("\n   ⚠️ 4月年报季警示: 注意规避业绩雷，建议轻仓观望!")
 
-        print("\n" + "=" * 70)
-        print("⚠️  风险提示: 本筛选仅供参考，不构成投资建议")
-        print("    v7.0 三维度分析旨在降低风险，但不能完全规避")
-        print("    投资有风险，入市需谨慎")
-        print("=" * 70)
+        self._log("\n" + "=" * 70)
+        self._log("⚠️  风险提示: 本筛选仅供参考，不构成投资建议")
+        self._log("    v7.0 三维度分析旨在降低风险，但不能完全规避")
+        self._log("    投资有风险，入市需谨慎")
+        self._log("=" * 70)
 
     def _print_stock_detail(self, row, level='A'):
         """打印个股详细信息（v8.0优化版 - 含龙头标识和止损止盈）"""
@@ -3628,35 +4206,35 @@ class StockScreener:
         # v8.1新增：板块信息
         sector = row.get('所属板块', '未知板块')
 
-        print(f"\n  {icon} {row['代码']} | {row['名称']} | 💰当前价: {current_price:.2f}元{consecutive_tag}{leader_tag}")
-        print(f"     🏆 综合评级: {row['综合评级']} | 评分: {row['综合评分']:.1f}")
-        print(f"     🏢 所属板块: {sector}")
+        self._log(f"\n  {icon} {row['代码']} | {row['名称']} | 💰当前价: {current_price:.2f}元{consecutive_tag}{leader_tag}")
+        self._log(f"     🏆 综合评级: {row['综合评级']} | 评分: {row['综合评分']:.1f}")
+        self._log(f"     🏢 所属板块: {sector}")
 
         # 基础数据
         monthly_gain_type = row.get('月涨幅类型', '')
         monthly_tag = f" ({monthly_gain_type})" if monthly_gain_type == '强势回调' else ""
-        print(f"     📊 涨幅: {row['涨跌幅']:.2f}% | 量比: {row['量比']:.2f} | "
+        self._log(f"     📊 涨幅: {row['涨跌幅']:.2f}% | 量比: {row['量比']:.2f} | "
               f"换手率: {row['换手率']:.2f}% | 流通市值: {row['流通市值_亿']:.1f}亿{monthly_tag}")
 
         # 资金流向（维度1）
         consistency = row.get('资金一致性', '未知')
         main_flow = row.get('主力净流入', 0) / 1e8
         flow_ratio = row.get('流量占比', 0)
-        print(f"     💰 资金共振: {consistency} | 主力净流入: {main_flow:.2f}亿 | 流量占比: {flow_ratio:.1f}%")
+        self._log(f"     💰 资金共振: {consistency} | 主力净流入: {main_flow:.2f}亿 | 流量占比: {flow_ratio:.1f}%")
 
         # 相对强度（维度2）
         rs_status = row.get('相对强度', '未知')
         daily_excess = row.get('当日超额', 0)
         rs_5d = row.get('5日超额', 0)
         hs300_change = row.get('沪深300涨幅', 0)
-        print(f"     📈 相对强度: {rs_status} | 当日超额: {daily_excess:+.2f}% | 5日超额: {rs_5d:+.2f}% (沪深300: {hs300_change:.2f}%)")
+        self._log(f"     📈 相对强度: {rs_status} | 当日超额: {daily_excess:+.2f}% | 5日超额: {rs_5d:+.2f}% (沪深300: {hs300_change:.2f}%)")
 
         # 价格位置（维度3）
         position_status = row.get('位置状态', '未知')
         breakthrough = row.get('突破状态', '')
         support = row.get('支撑状态', '')
         is_volume = "放量" if row.get('是否放量', False) else "缩量"
-        print(f"     📍 价格位置: {position_status} | {breakthrough} | {support} | {is_volume}")
+        self._log(f"     📍 价格位置: {position_status} | {breakthrough} | {support} | {is_volume}")
 
         # v9.1新增：游资动向（维度4）
         hot_money_score = row.get('游资评分', 0)
@@ -3668,8 +4246,8 @@ class StockScreener:
             net_buy = row.get('游资净买入', 0) / 1e8  # 转换为亿元
             active_tag = "🔥活跃" if hot_money_active else ""
             stage_icon = {"建仓期": "🟢", "加仓期": "🟡", "拉升期": "🟠", "出货期": "🔴"}.get(hot_money_stage, "⚪")
-            print(f"     💰 游资动向: 评分{hot_money_score:.1f} | 上榜{lhb_count}次 | 净买入{net_buy:.2f}亿 {active_tag}")
-            print(f"     💸 操作阶段: {stage_icon}{hot_money_stage} | 建议: {hot_money_recommendation}")
+            self._log(f"     💰 游资动向: 评分{hot_money_score:.1f} | 上榜{lhb_count}次 | 净买入{net_buy:.2f}亿 {active_tag}")
+            self._log(f"     💸 操作阶段: {stage_icon}{hot_money_stage} | 建议: {hot_money_recommendation}")
 
         # v8.0新增：止损止盈和风险收益比
         stop_loss = row.get('止损位', 0)
@@ -3679,24 +4257,29 @@ class StockScreener:
         take_profit_pct = row.get('止盈幅度', 0)
         if stop_loss > 0 and take_profit > 0:
             rr_status = "优秀" if risk_reward >= 3 else ("良好" if risk_reward >= 2 else "一般")
-            print(f"     ⚖️  止损: {stop_loss:.2f}元({stop_loss_pct:+.1f}%) | "
+            self._log(f"     ⚖️  止损: {stop_loss:.2f}元({stop_loss_pct:+.1f}%) | "
                   f"止盈: {take_profit:.2f}元({take_profit_pct:+.1f}%) | "
                   f"风险收益比: {risk_reward:.2f} ({rr_status})")
 
         # 风险提示
         risk = row.get('风险提示', '')
         if risk and not risk.startswith('✅'):
-            print(f"     {risk}")
+            self._log(f"     {risk}")
+
+        # v9.2新增：截止时间模式下因时间不足未完整分析的维度
+        degraded = row.get('降级因子', '')
+        if isinstance(degraded, str) and degraded:
+            self._log(f"     ⏰ 降级维度: {degraded.replace('|', '、')}（时间不足，使用近似值）")
 
         # 胜率信息（v8.0改为20日）
         if '胜率' in row and pd.notna(row.get('胜率')):
             win_rate_pct = row.get('胜率百分比', 0)
-            print(f"     📊 近20日胜率: {row['胜率']} ({win_rate_pct:.0f}%) | "
+            self._log(f"     📊 近20日胜率: {row['胜率']} ({win_rate_pct:.0f}%) | "
                   f"上涨{row['上涨天数']}天 vs 下跌{row['下跌天数']}天")
 
         # 主题匹配
         if row.get('主题得分', 0) > 0:
-            print(f"     🎯 {row['匹配主题']}")
+            self._log(f"     🎯 {row['匹配主题']}")
 
 
 def show_monthly_calendar():
@@ -3718,22 +4301,18 @@ def show_weekly_records():
     print("📅 【周选股记录】")
     print("=" * 70)
 
-    if not WEEKLY_DIR.exists():
-        print("\n暂无周记录")
-        return
-
-    weekly_files = sorted(WEEKLY_DIR.glob("week_*.json"), reverse=True)
-    if not weekly_files:
+    weekly_log = WeeklyLog(WEEKLY_DIR)
+    weeks = weekly_log.list_weeks()
+    if not weeks:
         print("\n暂无周记录")
         return
 
-    print(f"\n共有 {len(weekly_files)} 周记录:\n")
+    print(f"\n共有 {len(weeks)} 周记录:\n")
     print(f"{'序号':<6} {'周编号':<15} {'日期范围':<25} {'选股天数':>8} {'涉及股票':>8}")
     print("-" * 70)
 
-    for i, wf in enumerate(weekly_files[:12], 1):  # 只显示最近12周
-        with open(wf, 'r', encoding='utf-8') as f:
-            data = json.load(f)
+    for i, week_number in enumerate(weeks[:12], 1):  # 只显示最近12周
+        data = weekly_log.load_summary(week_number)
         date_range = f"{data.get('start_date', 'N/A')} ~ {data.get('end_date', 'N/A')}"
         print(f"{i:<6} {data['week_number']:<15} {date_range:<25} {len(data['daily_records']):>8} {len(data['all_stocks']):>8}")
 
@@ -3746,19 +4325,14 @@ def show_history_list():
     print("📚 【历史选股记录】v8.1")
     print("=" * 70)
 
-    if not HISTORY_FILE.exists():
-        print("\n暂无历史选股记录")
-        return
-
-    with open(HISTORY_FILE, 'r', encoding='utf-8') as f:
-        history_index = json.load(f)
-
-    batches = history_index.get('batches', [])
+    history_store = HistoryStore()
+    batches = history_store.list_batches(source=HISTORY_SOURCE, limit=30)  # 只显示最近30个批次
     if not batches:
         print("\n暂无历史选股记录")
         return
 
-    print(f"\n共有 {len(batches)} 条历史记录:\n")
+    total = history_store.count_batches(source=HISTORY_SOURCE)
+    print(f"\n共有 {total} 条历史记录（显示最近 {len(batches)} 条）:\n")
     print(f"{'序号':<6} {'批次ID':<20} {'选股时间':<22} {'板块':<12} {'股票数':>6}")
     print("-" * 70)
 
@@ -3798,8 +4372,95 @@ def show_history_list():
             break
 
 
+HEADLESS_MODES = ['market', 'sector', 'batches', 'calendar', 'weekly', 'concepts', 'industries']
+
+
+def headless_main(argv):
+    """
+    无人值守入口（v9.2新增）：带参数运行时不进入交互菜单，返回退出码
+
+    模式：market 全市场筛选 | sector 指定板块筛选（--sector 可给多个，成分股取并集）|
+          batches 批量回测全部历史批次 | calendar 主题日历 | weekly 周记录 | concepts/industries 板块列表
+    """
+    parser = build_parser(
+        "A股次日冲高标的筛选 v9 - 无人值守模式",
+        epilog="退出码: " + ", ".join(f"{code}={name}" for name, code in EXIT_CODES.items()))
+    parser.add_argument('--mode', choices=HEADLESS_MODES, default='market', help='运行模式（默认market）')
+    parser.add_argument('--sector', nargs='+', default=[], help='板块/概念名称（sector模式，可多个）')
+    parser.add_argument('--on-weak-market', choices=WEAK_MARKET_POLICIES, default='abort',
+                        help='市场情绪低于30分时的处理（默认abort放弃选股）')
+    parser.add_argument('--profile', nargs='+', default=[], choices=list(SCREEN_PROFILES),
+                        help='同时评估多套参数方案（第一个为主方案），数据只获取一次')
+    parser.add_argument('--deadline', help='截止时间 HH:MM，时间不足时第十一步降级游资/价格位置/所属板块分析')
+    parser.add_argument('--budget', type=float, help='时间预算（秒，从现在起），与 --deadline 二选一')
+    parser.add_argument('--resume', action='store_true',
+                        help='续跑当天最近一次中断的运行（沿用原参数、参数方案和板块范围）')
+    args = parser.parse_args(argv)
+
+    try:
+        params = parse_overrides(args.overrides, SCREEN_PARAMS)
+        deadline = parse_deadline(args.deadline, args.budget)
+    except ValueError as e:
+        parser.error(str(e))
+
+    if args.mode in ('calendar', 'weekly', 'batches', 'concepts', 'industries'):
+        actions = {
+            'calendar': show_monthly_calendar,
+            'weekly': show_weekly_records,
+            'batches': lambda: StockScreener().analyze_all_batches_performance(),
+            'concepts': lambda: StockScreener().list_all_concepts(),
+            'industries': lambda: StockScreener().list_all_industries(),
+        }
+        try:
+            actions[args.mode]()
+        except Exception as e:
+            print(f"❌ 运行失败: {type(e).__name__}: {e}", file=sys.stderr)
+            return EXIT_CODES['error']
+        return EXIT_CODES['selected']
+
+    if args.resume:
+        checkpoint = RunCheckpoint.latest(HISTORY_SOURCE)
+        if checkpoint is None:
+            parser.error("当天没有可续跑的中断运行")
+        meta = checkpoint.manifest['meta']
+        screener = StockScreener(target_sector=meta.get('target_sector'), params=meta.get('params'),
+                                 reporter=None if args.quiet else 'console', profiles=meta.get('profiles') or [])
+        screener.weak_market_policy = args.on_weak_market
+        screener.deadline = deadline
+        return run_screening(screener, args,
+                             lambda: screener.run(sector_codes=meta.get('sector_codes'), resume=checkpoint),
+                             HISTORY_SOURCE, screener.params)
+
+    if args.mode == 'sector' and not args.sector:
+        parser.error("sector模式需要 --sector 指定板块/概念名称")
+
+    # 静默模式不使用报告器，省去结果展示的格式化
+    screener = StockScreener(target_sector='、'.join(args.sector) or None, params=params,
+                             reporter=None if args.quiet else 'console', profiles=args.profile)
+    screener.weak_market_policy = args.on_weak_market
+    screener.deadline = deadline
+
+    def run():
+        if args.mode == 'market':
+            screener.run()
+            return
+        sector_codes = []
+        for name in args.sector:
+            codes, _ = screener.get_sector_stocks(name)
+            sector_codes.extend(c for c in (codes or []) if c not in sector_codes)
+        if not sector_codes:
+            screener.run_status = 'no_data'
+            return
+        screener.run(sector_codes=sector_codes)
+
+    return run_screening(screener, args, run, HISTORY_SOURCE, screener.params)
+
+
 def main():
-    """主函数"""
+    """主函数（v9.2：带参数运行时进入无人值守模式，见 python scan_stock_v9.py --help）"""
+    if len(sys.argv) > 1:
+        sys.exit(headless_main(sys.argv[1:]))
+
     print("\n" + "=" * 70)
     print("【A股次日冲高标的筛选系统 v9.1 - 游资追踪版】")
     print("  🆕 v9.1游资追踪: 龙虎榜分析 + 游资强度评分 + 买入时机判断 + 风险预警")
@@ -3818,16 +4479,20 @@ def main():
     print("  5. 查看全年主题日历")
     print("  6. 查看历史选股记录 🆕 [支持选择批次回测对比]")
     print("  7. 查看周选股记录")
+    print("  8. 批量回测全部历史批次 🆕 [v9.2]")
 
     try:
-        choice = input("\n请输入选项 (1/2/3/4/5/6/7，回车默认1): ").strip()
+        choice = input("\n请输入选项 (1/2/3/4/5/6/7/8，回车默认1): ").strip()
     except:
         choice = "1"
 
     if not choice:
         choice = "1"
 
-    if choice == "7":
+    if choice == "8":
+        screener = StockScreener()
+        screener.analyze_all_batches_performance()
+    elif choice == "7":
         show_weekly_records()
     elif choice == "6":
         show_history_list()
@@ -0,0 +1,216 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+无人值守命令行 v1.0
+
+问题背景：
+scan_stock_v9 和 select_stock_v2_enhanced 的 main() 都是基于 input() 的交互菜单，
+scan_stock_v9 在市场情绪低于30分时还会在 run() 中途等待输入，无法由 cron 或预热调度器定时驱动；
+下游工具只能从带emoji的屏幕输出里解析选股结果。
+
+功能：
+1. 公共参数：输出格式(json/csv/parquet)、输出路径、静默模式、筛选参数覆盖（--set 名称=值）
+2. 静默模式：运行期间的屏幕输出全部丢弃，标准输出只写结果，错误信息写标准错误
+3. 结果格式：json 包含状态、批次ID、生效参数和入选股票明细；csv/parquet 只包含入选股票明细；
+   多参数方案运行时 json 增加 profiles（各方案的入选明细），csv/parquet 各方案上下拼接并增加"参数方案"列
+4. 退出码：调度器据此判断运行结果，见 EXIT_CODES
+5. 截止时间模式（--deadline/--budget）下，json 的 degraded 字段给出各维度被降级的股票数
+
+说明：
+- 两个脚本带参数运行时进入无人值守模式，不带参数时仍是原来的交互菜单
+- 情绪低迷时的处理策略（--on-weak-market）只对 scan_stock_v9 生效，无人值守模式默认放弃选股
+
+使用方法：
+    python scan_stock_v9.py --mode market --format json --quiet
+    python scan_stock_v9.py --mode sector --sector 人工智能 半导体 --set composite_min=60 -o result.csv --format csv
+    python scan_stock_v9.py --mode market --on-weak-market continue --quiet
+    python scan_stock_v9.py --mode market --profile v8.1 v8.0 hot_money_25 --quiet
+    python scan_stock_v9.py --mode market --deadline 14:55 --quiet
+    python select_stock_v2_enhanced.py --format parquet -o pattern.parquet --quiet
+"""
+
+import argparse
+import json
+import sys
+from datetime import datetime
+
+from frame_schema import widen_for_output
+from lazy_import import LazyModule
+from screen_result import quiet_output
+
+pd = LazyModule('pandas')
+
+# ============================================================
+# 退出码
+# ============================================================
+EXIT_CODES = {
+    'selected': 0,  # 正常完成，有入选股票
+    'error': 1,  # 运行异常
+    'usage': 2,  # 参数错误（argparse默认）
+    'empty': 3,  # 正常完成，无入选股票
+    'skipped': 4,  # 市场情绪低迷，按策略放弃选股
+    'no_data': 5,  # 无法获取行情数据或板块内无股票
+}
+
+OUTPUT_FORMATS = ['json', 'csv', 'parquet']
+WEAK_MARKET_POLICIES = ['ask', 'continue', 'abort']  # 询问（交互菜单的行为）/ 继续选股 / 放弃选股
+
+
+def build_parser(description, epilog=None):
+    """带公共参数的命令行解析器，各脚本在此基础上添加自己的参数"""
+    parser = argparse.ArgumentParser(description=description, epilog=epilog,
+                                     formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--format', choices=OUTPUT_FORMATS, default='json', help='结果格式（默认json）')
+    parser.add_argument('-o', '--output', default='-', help='结果文件路径，"-"表示标准输出（默认，parquet必须指定文件）')
+    parser.add_argument('-q', '--quiet', action='store_true', help='静默模式：不打印运行过程')
+    parser.add_argument('--set', dest='overrides', nargs='+', default=[], metavar='名称=值',
+                        help='覆盖筛选参数，如 composite_min=60 max_output=10')
+    return parser
+
+
+def parse_overrides(pairs, defaults):
+    """
+    解析 --set 名称=值，按默认值的类型转换
+
+    返回：参数字典；名称不存在或值无法转换时抛出 ValueError
+    """
+    params = {}
+    for pair in pairs:
+        name, sep, value = pair.partition('=')
+        name = name.strip()
+        if not sep or name not in defaults:
+            raise ValueError(f"未知参数: {pair}（可用: {', '.join(defaults)}）")
+        default = defaults[name]
+        try:
+            if isinstance(default, bool):
+                params[name] = value.strip().lower() in ('1', 'true', 'yes', 'on')
+            elif isinstance(default, int):
+                params[name] = int(value)
+            else:
+                params[name] = float(value)
+        except ValueError:
+            raise ValueError(f"参数值无效: {pair}")
+    return params
+
+
+def result_status(screener):
+    """根据筛选器的运行状态和结果确定状态名"""
+    status = getattr(screener, 'run_status', None)
+    if status:
+        return status
+    df = getattr(screener, 'result_df', None)
+    return 'selected' if df is not None and not df.empty else 'empty'
+
+
+def _records(df):
+    """DataFrame转为可JSON序列化的记录列表（NaN为null）"""
+    if df is None or df.empty:
+        return []
+    return json.loads(df.to_json(orient='records', force_ascii=False, date_format='iso'))
+
+
+def result_payload(df, meta, profiles=None):
+    """json结果：状态等元信息 + 入选股票明细（多参数方案时增加 profiles）"""
+    df = widen_for_output(df) if df is not None else pd.DataFrame()
+    payload = {**meta, 'count': len(df), 'stocks': _records(df)}
+    if profiles:
+        payload['profiles'] = {name: {'count': len(frame), 'stocks': _records(widen_for_output(frame))}
+                               for name, frame in profiles.items()}
+    return payload
+
+
+def write_result(df, fmt, output, meta, profiles=None):
+    """
+    写出结果
+
+    参数：
+    - df: 入选股票（可为None）
+    - fmt: json / csv / parquet
+    - output: 文件路径，"-"表示标准输出
+    - meta: 状态、批次ID、参数等（仅json输出）
+    - profiles: {参数方案名: 入选股票}（多参数方案运行时）
+    """
+    if fmt == 'json':
+        text = json.dumps(result_payload(df, meta, profiles), ensure_ascii=False, indent=2)
+        if output == '-':
+            sys.stdout.write(text + '\n')
+        else:
+            with open(output, 'w', encoding='utf-8') as f:
+                f.write(text + '\n')
+        return
+
+    df = widen_for_output(df) if df is not None else pd.DataFrame()
+    profiles = {name: widen_for_output(frame) for name, frame in (profiles or {}).items()}
+    if profiles:
+        frames = [frame.assign(参数方案=name) for name, frame in profiles.items() if not frame.empty]
+        df = pd.concat(frames, ignore_index=True) if frames else pd.DataFrame(columns=['参数方案'])
+        df = df[['参数方案'] + [col for col in df.columns if col != '参数方案']]
+    if fmt == 'csv':
+        if output == '-':
+            df.to_csv(sys.stdout, index=False)
+        else:
+            df.to_csv(output, index=False, encoding='utf-8-sig')
+    else:
+        # 代码/名称等混合类型列统一为字符串，避免parquet写入失败
+        df = df.astype({col: str for col in df.columns if df[col].dtype == object})
+        df.to_parquet(output, index=False)
+
+
+def run_screening(screener, args, run, script, params=None):
+    """
+    无人值守执行一次筛选并写出结果
+
+    参数：
+    - screener: 筛选器实例（运行后读取其 run_status / result_df / batch_id）
+    - args: 解析后的命令行参数（format/output/quiet）
+    - run: 无参数的执行函数
+    - script: 脚本标识（写入结果）
+    - params: 生效的筛选参数（写入结果）
+
+    返回：退出码
+    """
+    if args.format == 'parquet' and args.output == '-':
+        print("❌ parquet格式必须用 -o 指定输出文件", file=sys.stderr)
+        return EXIT_CODES['usage']
+
+    meta = execute(screener, run, script, params, args.quiet)
+    try:
+        write_result(getattr(screener, 'result_df', None), args.format, args.output, meta,
+                     profiles=getattr(screener, 'profile_results', None))
+    except Exception as e:
+        print(f"❌ 写出结果失败: {type(e).__name__}: {e}", file=sys.stderr)
+        return EXIT_CODES['error']
+    return meta['exit_code']
+
+
+def execute(screener, run, script, params=None, quiet=False):
+    """
+    执行一次筛选，返回结果元信息（状态、退出码、批次ID、耗时、生效参数、错误）
+
+    运行异常不向外抛出，记为 error 状态并写标准错误（常驻服务与命令行共用）
+    quiet: 命令行静默模式下丢弃运行期间的标准输出（数据模块的警告等，避免混入写到标准输出的结果）；
+           筛选器 reporter=None 时本身不打印，常驻服务不重定向标准输出（会影响其他线程）
+    """
+    started_at = datetime.now()
+    error = None
+    try:
+        with quiet_output(quiet):
+            run()
+        status = result_status(screener)
+    except Exception as e:
+        error = f"{type(e).__name__}: {e}"
+        status = 'error'
+        print(f"❌ 运行失败: {error}", file=sys.stderr)
+
+    budget = getattr(screener, 'budget', None)  # 截止时间模式的降级统计
+    return {
+        'script': script,
+        'status': status,
+        'exit_code': EXIT_CODES[status],
+        'batch_id': getattr(screener, 'batch_id', None),
+        'started_at': started_at.strftime('%Y-%m-%d %H:%M:%S'),
+        'elapsed': round((datetime.now() - started_at).total_seconds(), 2),
+        'params': params or {},
+        'error': error,
+        'degraded': budget.summary() if budget is not None else {},
+    }
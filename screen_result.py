@@ -0,0 +1,140 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+筛选结果对象与报告器 v1.0
+
+问题背景：
+StockScreener.run() 没有返回值，最终结果只存在于 output_result 里——它一边打印一边保存，
+各步骤的中间结果和运行指标也只体现在屏幕输出中。常驻进程或notebook想反复调用筛选器、
+复用已经热起来的缓存时，只能解析上千行带emoji的文字，每次还要付出格式化输出的开销。
+
+功能：
+1. ScreenResult：run() 的返回值，包含最终入选DataFrame、各阶段存活的DataFrame、市场情绪、
+   各阶段耗时和批次ID
+2. 报告器：控制台展示从筛选流程中分离出来，由报告器负责；
+   ConsoleReporter 保持原有的屏幕输出；reporter=None 时筛选器的过程输出（_log）直接返回，
+   不格式化打印、也不替换进程的标准输出（常驻服务的其他线程照常输出）
+3. 保存逻辑（历史库、周记录、行情归档、连续选中标记）与报告器无关，始终执行
+
+使用方法：
+    from scan_stock_v9 import StockScreener
+    screener = StockScreener(reporter=None)      # 不打印
+    result = screener.run()
+    result.final                                 # 最终入选
+    result.stages['第5步 资金流向']               # 第5步之后存活的股票
+    result.survivors()                           # 各阶段剩余数量
+    StockScreener(reporter=None, profiles=['v8.1', 'v8.0']).run().profiles   # 多参数方案各自的结果
+    result = screener.run()                      # 再次运行：新批次ID，板块成分/指数K线等缓存复用
+"""
+
+import os
+from contextlib import contextmanager, redirect_stdout
+
+from lazy_import import LazyModule
+
+pd = LazyModule('pandas')
+
+
+@contextmanager
+def quiet_output(enabled):
+    """丢弃期间的标准输出（命令行静默模式用；替换的是整个进程的 sys.stdout，不要在多线程服务中使用）"""
+    if not enabled:
+        yield
+        return
+    with open(os.devnull, 'w', encoding='utf-8') as devnull, redirect_stdout(devnull):
+        yield
+
+
+class ConsoleReporter:
+    """控制台报告器：筛选过程和结果照常打印（交互菜单的默认行为）"""
+
+    def report_result(self, screener, df):
+        """展示最终结果（各脚本的 print_result 负责具体格式）"""
+        screener.print_result(df)
+
+
+def make_reporter(reporter):
+    """'console' → ConsoleReporter；None → 不打印；其他对象需实现 report_result(screener, df)"""
+    if reporter == 'console':
+        return ConsoleReporter()
+    return reporter
+
+
+class ScreenResult:
+    """
+    一次筛选运行的结构化结果
+
+    属性：
+    - batch_id / script / target_sector
+    - status: selected 有入选 / empty 无入选 / skipped 情绪低迷放弃 / no_data 无行情数据
+    - final: 最终入选DataFrame（无入选时为空表）
+    - stages: {阶段名: 该阶段之后存活的DataFrame}，按执行顺序
+    - sentiment: {'score', 'status', 'detail'}，没有情绪检查的脚本为None
+    - timings: {阶段名: 耗时(秒)}
+    - profile: 完整的剖析结果（run_profiler.RunProfiler.to_dict）
+    - profiles: {参数方案名: 该方案的入选DataFrame}（多参数方案运行时，final为第一个方案的结果）
+    - degraded: {维度: 被降级的股票数}（截止时间模式下因时间不足降级/未分析的情况，未设置截止时间时为空）
+    - skipped: {代码: 原因}（日K线获取失败/无数据/根数不足、后续步骤不再请求的股票）
+    """
+
+    def __init__(self, batch_id, script, final=None, stages=None, sentiment=None,
+                 profile=None, run_status=None, target_sector=None, profiles=None,
+                 degraded=None, skipped=None):
+        self.batch_id = batch_id
+        self.script = script
+        self.target_sector = target_sector
+        self.final = final if final is not None else pd.DataFrame()
+        self.stages = stages or {}
+        self.sentiment = sentiment
+        self.profile = profile or {}
+        self.timings = {r['name']: r['wall'] for r in self.profile.get('stages', [])}
+        self.elapsed = self.profile.get('wall')
+        self.status = run_status or ('selected' if not self.final.empty else 'empty')
+        self.profiles = profiles or {}
+        self.degraded = degraded or {}
+        self.skipped = skipped or {}
+
+    @property
+    def codes(self):
+        """最终入选的股票代码列表"""
+        return self.final['代码'].astype(str).tolist() if '代码' in self.final.columns else []
+
+    def profile_codes(self):
+        """各参数方案入选的股票代码"""
+        return {name: df['代码'].astype(str).tolist() if '代码' in df.columns else []
+                for name, df in self.profiles.items()}
+
+    def survivors(self):
+        """各阶段之后剩余的股票数"""
+        return {name: len(df) for name, df in self.stages.items()}
+
+    def summary(self):
+        """可直接JSON序列化的摘要（不含DataFrame）"""
+        sentiment = None
+        if self.sentiment is not None:
+            sentiment = {'score': self.sentiment.get('score'), 'status': self.sentiment.get('status')}
+        summary = {
+            'batch_id': self.batch_id,
+            'script': self.script,
+            'status': self.status,
+            'target_sector': self.target_sector,
+            'count': len(self.final),
+            'codes': self.codes,
+            'survivors': self.survivors(),
+            'sentiment': sentiment,
+            'timings': {name: round(seconds, 3) for name, seconds in self.timings.items()},
+            'elapsed': round(self.elapsed, 3) if self.elapsed is not None else None,
+        }
+        if self.profiles:
+            summary['profiles'] = self.profile_codes()
+        if self.degraded:
+            summary['degraded'] = self.degraded
+        if self.skipped:
+            summary['skipped'] = self.skipped
+        return summary
+
+    def __len__(self):
+        return len(self.final)
+
+    def __repr__(self):
+        return f"<ScreenResult {self.script} {self.batch_id} {self.status} 入选{len(self.final)}只>"
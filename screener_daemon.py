@@ -0,0 +1,431 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+常驻选股服务 v1.0
+
+问题背景：
+每次运行 scan_stock_v9 都要重新启动解释器、导入akshare、下载全市场实时行情、资金流向排名、
+30天龙虎榜明细和指数K线，然后才开始筛选；盘中临时想看某个板块时，要等几分钟才有结果。
+
+功能：
+1. 常驻进程持有一个共享行情数据服务（market_data.MarketDataService），交易时段内定时刷新
+   实时行情、资金流向排名和指数行情，每天预取一次龙虎榜明细
+2. 预热：按实时行情筛掉不满足第1~5步、第8步的股票，为剩余股票预取日K线（最长窗口，
+   其他窗口从中截取），之后的全市场/板块筛选大部分K线直接从内存读取
+3. 本机HTTP接口（只监听127.0.0.1），返回与无人值守命令行相同结构的JSON：
+   POST /scan 全市场筛选 | /scan_sector 板块筛选 | /four_day 四日形态 | /stop 停止服务
+   GET  /history 历史批次 | /status 服务状态
+   Host/Origin 不是本机的请求一律拒绝（防止网页跨站触发筛选或停止服务）
+4. 命令行客户端：同一脚本，不需要导入akshare/pandas
+
+原理：
+第1~9步都是逐行判断的独立条件，板块筛选在每一步的存活股票都是全市场存活股票的子集，
+所以全市场预热过的K线覆盖了板块筛选需要的K线（参数覆盖放宽条件时，多出的股票按需获取）。
+
+说明：
+- 筛选请求串行执行（各次运行写同一个历史库，剖析器按进程记录），刷新和预热也在同一把锁内进行
+- 筛选结果照常保存到历史库和周记录，与命令行运行相同；预热不保存任何结果
+- 筛选以常驻服务模式运行：不做上周回顾和上次回测分析，不记录检查点；
+  批次ID同一秒内重复时追加序号（history_store.new_batch_id），连续请求不会互相覆盖
+- 服务停止后缓存随进程释放，落盘缓存（龙虎榜个股汇总等）仍按原规则复用
+
+使用方法：
+    python screener_daemon.py serve                           # 启动服务（前台运行）
+    python screener_daemon.py scan                            # 全市场筛选
+    python screener_daemon.py scan --set composite_min=60 --profile v8.1 v8.0
+    python screener_daemon.py scan_sector 人工智能 半导体       # 板块筛选（成分股取并集）
+    python screener_daemon.py scan --deadline 14:55           # 截止时间模式（时间不足时降级可选维度）
+    python screener_daemon.py four_day                        # 四日形态选股
+    python screener_daemon.py history [来源] [条数]            # 最近的历史批次（来源默认scan_stock_v9）
+    python screener_daemon.py history 批次ID                   # 指定批次详情
+    python screener_daemon.py status                          # 缓存命中、最近刷新时间
+    python screener_daemon.py stop                            # 停止服务
+"""
+
+import json
+import sys
+import threading
+import time
+from datetime import datetime
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlencode, urlparse
+from urllib.request import Request, urlopen
+from urllib.error import HTTPError, URLError
+
+# ============================================================
+# 服务配置
+# ============================================================
+DAEMON_CONFIG = {
+    "host": "127.0.0.1",  # 只监听本机
+    "port": 8765,
+    "refresh_interval": 60,  # 交易时段内刷新实时行情/资金流向/指数行情的间隔（秒）
+    "warm_interval": 900,  # 重新预热日K线的间隔（秒，需小于 SERVICE_CONFIG['history_max_age']）
+    "warm_days": 250,  # 预热日K线的窗口（第十一步价格位置分析的最长窗口）
+    "session": ("09:15", "15:05"),  # 交易时段（交易日，按交易日历判断）
+    "request_timeout": 900,  # 客户端等待结果的超时（秒）
+}
+
+COMMANDS = ['serve', 'scan', 'scan_sector', 'four_day', 'history', 'status', 'stop']
+
+# 会启动筛选或停止服务的请求只接受 POST（浏览器页面无法用 <img>/<script> 等方式发起），
+# 只读请求 /status、/history 用 GET
+POST_PATHS = {'/scan', '/scan_sector', '/four_day', '/stop'}
+GET_PATHS = {'/status', '/history'}
+LOCAL_HOSTS = {'127.0.0.1', 'localhost', '::1'}
+
+
+def in_session(now=None, calendar=None):
+    """是否处于交易时段（交易日 session 区间内；不传交易日历时按工作日判断）"""
+    now = now or datetime.now()
+    start, end = DAEMON_CONFIG['session']
+    trading_day = calendar.is_trading_day(now) if calendar is not None else now.weekday() < 5
+    return trading_day and start <= now.strftime('%H:%M') <= end
+
+
+class ScreenerDaemon:
+    """常驻服务：共享数据服务 + 串行执行筛选请求 + 定时刷新/预热"""
+
+    def __init__(self, data=None):
+        from market_data import MarketDataService
+
+        self.data = data if data is not None else MarketDataService()
+        self.run_lock = threading.Lock()
+        self.stop_event = threading.Event()
+        self.started_at = datetime.now()
+        self.last_refresh = None
+        self.last_warm = None
+        self.warm_codes = 0
+        self.requests = 0
+
+    # ---------- 刷新与预热 ----------
+
+    def refresh(self):
+        """刷新盘中数据，失败项打印警告"""
+        import scan_stock_v9
+
+        with self.run_lock:
+            failed = self.data.refresh(lhb_days=scan_stock_v9.HOT_MONEY_CONFIG['lookback_days'])
+        self.last_refresh = datetime.now()
+        if failed:
+            print(f"⚠️ 刷新失败: {', '.join(failed)}", file=sys.stderr)
+
+    def warm(self):
+        """
+        按只用实时行情/资金排名/指数行情的筛选步骤缩小范围，为剩余股票预取日K线
+
+        返回：预取的股票数
+        """
+        import scan_stock_v9
+
+        with self.run_lock:
+            screener = scan_stock_v9.StockScreener(reporter=None, data=self.data)
+            df = screener.get_realtime_data()
+            if df is None or df.empty:
+                return 0
+            for stage in screener.plan_stages(df):
+                if stage['data'] != 'history' and not df.empty:
+                    df = getattr(screener, stage['method'])(df)
+            for code in df['代码']:
+                self.data.history(code, DAEMON_CONFIG['warm_days'])
+        self.last_warm = datetime.now()
+        self.warm_codes = len(df)
+        return len(df)
+
+    def _maintain(self):
+        """后台线程：交易时段内定时刷新，按间隔重新预热"""
+        while not self.stop_event.wait(DAEMON_CONFIG['refresh_interval']):
+            if not in_session(calendar=self.data.calendar):
+                continue
+            try:
+                self.refresh()
+                if self.last_warm is None or (datetime.now() - self.last_warm).total_seconds() >= DAEMON_CONFIG['warm_interval']:
+                    self.warm()
+            except Exception as e:
+                print(f"⚠️ 后台刷新异常: {type(e).__name__}: {e}", file=sys.stderr)
+
+    # ---------- 请求处理 ----------
+
+    def scan(self, query, sectors=None):
+        """全市场/板块筛选，返回json结果"""
+        import scan_stock_v9
+        from deadline_budget import parse_deadline
+        from screen_cli import execute, parse_overrides, result_payload, WEAK_MARKET_POLICIES
+
+        params = parse_overrides(query.get('set', []), scan_stock_v9.SCREEN_PARAMS)
+        profiles = query.get('profile', [])
+        unknown = [name for name in profiles if name not in scan_stock_v9.SCREEN_PROFILES]
+        if unknown:
+            raise ValueError(f"未知参数方案: {', '.join(unknown)}（可用: {', '.join(scan_stock_v9.SCREEN_PROFILES)}）")
+        policy = query.get('on_weak_market', ['abort'])[0]
+        if policy not in WEAK_MARKET_POLICIES:
+            raise ValueError(f"on_weak_market 可选: {', '.join(WEAK_MARKET_POLICIES)}")
+        budget = query.get('budget', [None])[0]
+        deadline = parse_deadline(query.get('deadline', [None])[0], float(budget) if budget else None)
+
+        with self.run_lock:
+            screener = scan_stock_v9.StockScreener(target_sector='、'.join(sectors or []) or None, params=params,
+                                                   reporter=None, profiles=profiles, data=self.data)
+            screener.daemon_mode = True  # 跳过上周回顾/上次回测，不记录检查点
+            screener.weak_market_policy = policy
+            screener.deadline = deadline
+
+            def run():
+                if not sectors:
+                    screener.run()
+                    return
+                sector_codes = []
+                for name in sectors:
+                    codes, _ = screener.get_sector_stocks(name)
+                    sector_codes.extend(c for c in (codes or []) if c not in sector_codes)
+                if not sector_codes:
+                    screener.run_status = 'no_data'
+                    return
+                screener.run(sector_codes=sector_codes)
+
+            meta = execute(screener, run, scan_stock_v9.HISTORY_SOURCE, screener.params)
+        return result_payload(screener.result_df, meta, screener.profile_results)
+
+    def four_day(self, query):
+        """四日形态选股，返回json结果"""
+        import select_stock_v2_enhanced
+        from screen_cli import execute, parse_overrides, result_payload
+
+        params = parse_overrides(query.get('set', []), select_stock_v2_enhanced.PATTERN_PARAMS)
+        with self.run_lock:
+            screener = select_stock_v2_enhanced.StockScreener(params=params, reporter=None, data=self.data)
+            meta = execute(screener, screener.run, 'select_stock_v2_enhanced', screener.params)
+        return result_payload(screener.result_df, meta)
+
+    def history(self, query):
+        """历史批次列表或指定批次详情（只读，不占用运行锁）"""
+        from history_store import HistoryStore
+
+        store = HistoryStore()
+        batch_id = query.get('batch_id', [None])[0]
+        if batch_id:
+            batch = store.get_batch(batch_id)
+            if batch is None:
+                raise ValueError(f"批次不存在: {batch_id}")
+            return batch
+        source = query.get('source', ['scan_stock_v9'])[0]
+        limit = int(query.get('limit', ['20'])[0])
+        return {'source': source, 'total': store.count_batches(source=source),
+                'batches': store.list_batches(source=source, limit=limit)}
+
+    def status(self):
+        """服务状态和数据服务统计"""
+        def fmt(value):
+            return value.strftime('%Y-%m-%d %H:%M:%S') if value else None
+
+        return {
+            'started_at': fmt(self.started_at),
+            'in_session': in_session(calendar=self.data.calendar),
+            'last_refresh': fmt(self.last_refresh),
+            'last_warm': fmt(self.last_warm),
+            'warm_codes': self.warm_codes,
+            'requests': self.requests,
+            'busy': self.run_lock.locked(),
+            'data': self.data.summary(),
+        }
+
+    def handle(self, path, query):
+        """按路径分发请求，返回可JSON序列化的结果；参数错误抛出 ValueError"""
+        self.requests += 1
+        if path == '/scan':
+            return self.scan(query)
+        if path == '/scan_sector':
+            sectors = query.get('sector', [])
+            if not sectors:
+                raise ValueError("scan_sector 需要 sector 参数")
+            return self.scan(query, sectors)
+        if path == '/four_day':
+            return self.four_day(query)
+        if path == '/history':
+            return self.history(query)
+        if path == '/status':
+            return self.status()
+        raise LookupError(path)
+
+    # ---------- 服务 ----------
+
+    def serve(self, host=None, port=None):
+        """启动服务（阻塞直到 stop 请求或 Ctrl-C）"""
+        daemon = self
+        host = host or DAEMON_CONFIG['host']
+        port = port or DAEMON_CONFIG['port']
+
+        class Handler(BaseHTTPRequestHandler):
+            def _reply(self, code, payload):
+                body = json.dumps(payload, ensure_ascii=False, default=str).encode('utf-8')
+                self.send_response(code)
+                self.send_header('Content-Type', 'application/json; charset=utf-8')
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def _is_local(self):
+                """Host 和 Origin（如果有）都必须指向本机"""
+                host = urlparse('//' + (self.headers.get('Host') or '')).hostname
+                if host not in LOCAL_HOSTS:
+                    return False
+                origin = self.headers.get('Origin')
+                return origin is None or urlparse(origin).hostname in LOCAL_HOSTS
+
+            def _dispatch(self, method, path, query):
+                if not self._is_local():
+                    self._reply(403, {'error': "只接受来自本机的请求"})
+                    return
+                allowed = POST_PATHS if method == 'POST' else GET_PATHS
+                if path not in allowed:
+                    other = GET_PATHS if method == 'POST' else POST_PATHS
+                    if path in other:
+                        self._reply(405, {'error': f"{path} 需要使用 {'GET' if method == 'POST' else 'POST'} 请求"})
+                    else:
+                        self._reply(404, {'error': f"未知请求: {path}"})
+                    return
+                if path == '/stop':
+                    self._reply(200, {'stopping': True})
+                    threading.Thread(target=server.shutdown, daemon=True).start()
+                    return
+                try:
+                    self._reply(200, daemon.handle(path, query))
+                except LookupError:
+                    self._reply(404, {'error': f"未知请求: {path}"})
+                except ValueError as e:
+                    self._reply(400, {'error': str(e)})
+                except Exception as e:
+                    self._reply(500, {'error': f"{type(e).__name__}: {e}"})
+
+            def do_GET(self):
+                url = urlparse(self.path)
+                self._dispatch('GET', url.path, parse_qs(url.query))
+
+            def do_POST(self):
+                url = urlparse(self.path)
+                length = int(self.headers.get('Content-Length') or 0)
+                body = self.rfile.read(length).decode('utf-8') if length else ''
+                query = parse_qs(url.query)
+                for key, values in parse_qs(body).items():
+                    query.setdefault(key, []).extend(values)
+                self._dispatch('POST', url.path, query)
+
+        server = ThreadingHTTPServer((host, port), Handler)
+        print(f"🚀 常驻选股服务已启动: http://{host}:{port}")
+        print("⏳ 正在预热（实时行情/资金流向/指数/龙虎榜/日K线）...")
+        start = time.perf_counter()
+        try:
+            self.refresh()
+            print(f"✅ 预热完成: {self.warm()} 只股票的日K线，用时 {time.perf_counter() - start:.1f}s")
+        except Exception as e:
+            print(f"⚠️ 预热失败，首次请求时按需获取: {type(e).__name__}: {e}")
+
+        maintainer = threading.Thread(target=self._maintain, daemon=True)
+        maintainer.start()
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            self.stop_event.set()
+            server.server_close()
+            print("\n👋 常驻选股服务已停止")
+
+
+# ============================================================
+# 命令行客户端
+# ============================================================
+
+def request(path, query=None, host=None, port=None):
+    """
+    向常驻服务发送请求
+
+    会启动筛选或停止服务的请求（POST_PATHS）以 POST 表单发送，其余用 GET 查询参数
+
+    返回：(HTTP状态码, 结果字典)；服务未启动时抛出 URLError
+    """
+    host = host or DAEMON_CONFIG['host']
+    port = port or DAEMON_CONFIG['port']
+    url = f"http://{host}:{port}{path}"
+    encoded = urlencode(query or {}, doseq=True)
+    if path in POST_PATHS:
+        req = Request(url, data=encoded.encode('utf-8'), method='POST',
+                      headers={'Content-Type': 'application/x-www-form-urlencoded'})
+    else:
+        req = Request(url + ('?' + encoded if encoded else ''), method='GET')
+    try:
+        with urlopen(req, timeout=DAEMON_CONFIG['request_timeout']) as resp:
+            return resp.status, json.loads(resp.read().decode('utf-8'))
+    except HTTPError as e:
+        return e.code, json.loads(e.read().decode('utf-8') or '{}')
+
+
+def _option_values(args, name):
+    """取出 --name 之后到下一个 -- 选项之前的值，返回 (值列表, 剩余参数)"""
+    if name not in args:
+        return [], args
+    i = args.index(name)
+    j = i + 1
+    while j < len(args) and not args[j].startswith('--'):
+        j += 1
+    return args[i + 1:j], args[:i] + args[j:]
+
+
+def client_query(command, args):
+    """命令行参数转为请求路径和查询参数"""
+    overrides, args = _option_values(args, '--set')
+    profiles, args = _option_values(args, '--profile')
+    policy, args = _option_values(args, '--on-weak-market')
+    deadline, args = _option_values(args, '--deadline')
+    budget, args = _option_values(args, '--budget')
+    query = {}
+    if overrides:
+        query['set'] = overrides
+    if profiles:
+        query['profile'] = profiles
+    if policy:
+        query['on_weak_market'] = policy[0]
+    if deadline:
+        query['deadline'] = deadline[0]
+    if budget:
+        query['budget'] = budget[0]
+
+    if command == 'scan_sector':
+        query['sector'] = args
+    elif command == 'history':
+        if args and args[0][:8].isdigit() and '_' in args[0]:
+            query['batch_id'] = args[0]
+        else:
+            if args:
+                query['source'] = args[0]
+            if len(args) > 1:
+                query['limit'] = args[1]
+    return '/' + command, query
+
+
+def main():
+    """命令行入口"""
+    args = sys.argv[1:]
+    if not args or args[0] not in COMMANDS:
+        print(__doc__)
+        return
+
+    command = args[0]
+    if command == 'serve':
+        ScreenerDaemon().serve()
+        return
+
+    path, query = client_query(command, args[1:])
+    try:
+        code, payload = request(path, query)
+    except URLError as e:
+        print(f"❌ 无法连接常驻服务（先运行 python screener_daemon.py serve）: {e.reason}", file=sys.stderr)
+        sys.exit(1)
+    print(json.dumps(payload, ensure_ascii=False, indent=2, default=str))
+    if code != 200:
+        sys.exit(2 if code == 400 else 1)
+    if 'exit_code' in payload:
+        sys.exit(payload['exit_code'])
+
+
+if __name__ == "__main__":
+    main()
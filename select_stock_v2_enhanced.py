@@ -9,6 +9,26 @@ v2.1 新增功能：
 2. 游资追踪分析：整合龙虎榜数据，识别游资介入情况
 3. 回测验证功能：追踪形态后续表现，验证策略有效性
 
+v2.2 新增功能：
+1. 全历史事件研究：基于本地日K线库，对全部60开头股票的多年历史做向量化形态检测，
+   统计每次形态出现后1~10日的收益分布、最大涨幅/最大回撤和最佳卖出日
+   用法：python select_stock_v2_enhanced.py event [开始日期] [结束日期]
+2. 选股结果写入SQLite历史库（history_store.py），与scan_stock_v9共用selection_history/history.db
+3. 分阶段剖析：与scan_stock_v9共用run_profiler.py，记录各阶段耗时/接口调用/缓存命中率，
+   每批次保存profile_{批次ID}.json
+4. 数据源健康监控：与scan_stock_v9共用source_health.py，按接口统计延迟分位数、失败率和重试次数，
+   每批次保存health_{批次ID}.json
+5. 无人值守模式：带参数运行时支持参数覆盖（--set，形态参数见PATTERN_PARAMS）、json/csv/parquet输出、
+   静默模式，以退出码报告结果，供cron/调度器调用（screen_cli.py）
+   用法：python select_stock_v2_enhanced.py --format json --quiet
+6. 按需导入：akshare/pandas/numpy在第一次使用时才导入；缓存目录在创建筛选器时建立，导入模块不再创建目录
+7. 库调用接口：run() 返回 ScreenResult（最终结果、各阶段存活股票、各阶段耗时、批次ID），
+   屏幕展示交给报告器，StockScreener(reporter=None) 整个运行不打印（screen_result.py）
+8. 共享行情数据服务：实时行情、日K线（含原K线缓存）、龙虎榜改由 market_data.py 获取，
+   与scan_stock_v9传入同一个 MarketDataService 时不再重复下载（python run_combined.py 依次运行两个策略）
+9. 交易日历：日K线窗口按交易日请求（days 根K线，不再多取30个自然日），龙虎榜回溯20个交易日，
+   游资连续上榜按相邻交易日判断（trade_calendar.py）
+
 核心策略：
 Day1 (涨停启动): 涨幅>=9.8%，记录基础量V1
 Day2 (放量洗盘): 成交量>1.2*V1，涨幅<3%（假阴真阳）
@@ -16,42 +36,64 @@ Day3 (回调确认): 涨幅在-5%~0%之间，成交量<1.5*Day2量
 Day4 (缩量买点): 成交量<=0.55*V1，涨幅在-3%~3%之间（买入信号）
 """
 
-import akshare as ak
-import pandas as pd
-import numpy as np
-from datetime import datetime, timedelta
+from datetime import datetime
 from concurrent.futures import ThreadPoolExecutor, as_completed
 import warnings
-import json
-import os
 from pathlib import Path
-from collections import defaultdict
 import time
-import hashlib
+import sys
+from lazy_import import LazyModule
+from market_archive import BarStore
+from history_store import HistoryStore, new_batch_id
+from run_profiler import RunProfiler, InstrumentedModule
+from source_health import SourceHealth
+from screen_cli import build_parser, parse_overrides, run_screening, EXIT_CODES
+from screen_result import ScreenResult, make_reporter
+from market_data import MarketDataService, HOT_MONEY_CACHE_DIR
 warnings.filterwarnings('ignore')
 
+# v2.2：akshare/pandas/numpy按需导入
+pd = LazyModule('pandas')
+np = LazyModule('numpy')
+ak = InstrumentedModule(LazyModule('akshare'))  # v2.2：ak.*调用自动计入当前剖析阶段
+
 # ============================================================
 # 目录配置
 # ============================================================
 HISTORY_DIR = Path(__file__).parent / "selection_history"
-HISTORY_FILE = HISTORY_DIR / "history_index.json"
 WEEKLY_DIR = HISTORY_DIR / "weekly"
-HOT_MONEY_CACHE_DIR = Path(__file__).parent / "hot_money_cache"
-KLINE_CACHE_DIR = Path(__file__).parent / "kline_cache"  # v2.1新增：K线数据缓存
+# 游资缓存 HOT_MONEY_CACHE_DIR、K线缓存 KLINE_CACHE_DIR 见 market_data.py（v2.2：与scan_stock_v9共用）
+# v2.2：目录在创建筛选器时建立，导入模块（如只做事件研究）不再创建目录
 
-# 创建必要的目录
-HISTORY_DIR.mkdir(parents=True, exist_ok=True)
-WEEKLY_DIR.mkdir(parents=True, exist_ok=True)
-HOT_MONEY_CACHE_DIR.mkdir(parents=True, exist_ok=True)
-KLINE_CACHE_DIR.mkdir(parents=True, exist_ok=True)
+# ============================================================
+# 缓存配置（v2.1新增）：CACHE_CONFIG 和 CacheManager 已迁移至 market_data.py（v2.2）
+# ============================================================
 
 # ============================================================
-# 缓存配置（v2.1新增）
+# 四日形态参数（v2.2：从形态判定中提取，供事件研究和无人值守模式 --set 覆盖）
 # ============================================================
-CACHE_CONFIG = {
-    "kline_expire_hours": 24,  # K线数据缓存24小时
-    "enable_cache": True,  # 是否启用缓存
-    "cache_version": "v1",  # 缓存版本号
+PATTERN_PARAMS = {
+    "day1_pct_min": 9.8,  # Day1：涨停启动，涨幅下限(%)
+    "day2_vol_ratio_min": 1.2,  # Day2：成交量 > V1 × 该值
+    "day2_pct_max": 3.0,  # Day2：涨幅上限(%)
+    "day3_pct_min": -5.0,  # Day3：涨幅下限(%)，不含
+    "day3_pct_max": 0.0,  # Day3：涨幅上限(%)，不含
+    "day3_vol_ratio_max": 1.5,  # Day3：成交量 < Day2量 × 该值
+    "day4_vol_ratio_max": 0.55,  # Day4：成交量 ≤ V1 × 该值
+    "day4_pct_min": -3.0,  # Day4：涨幅下限(%)
+    "day4_pct_max": 3.0,  # Day4：涨幅上限(%)
+    "max_pattern_age": 10,  # 只保留形态起始日在该天数以内的股票
+}
+
+# ============================================================
+# 事件研究配置（v2.2新增）
+# ============================================================
+BACKTEST_DIR = Path(__file__).parent / "backtest_results"  # 事件研究结果保存目录
+
+EVENT_STUDY_CONFIG = {
+    "start_date": "20200101",  # 默认研究起始日期
+    "forward_days": 10,  # 跟踪买入后的交易日数（与backtest_pattern一致）
+    "report_days": [1, 3, 5, 10],  # 报告中展示分布的持有天数
 }
 
 # ============================================================
@@ -77,7 +119,7 @@ KNOWN_HOT_MONEY_DESKS = {
 }
 
 HOT_MONEY_CONFIG = {
-    "lookback_days": 30,
+    "lookback_days": 20,  # 龙虎榜回溯交易日数（v2.2：按交易日历，原为30个自然日）
     "min_appearances": 2,
     "min_net_buy": 5000000,
     "continuity_days": 3,
@@ -103,111 +145,21 @@ MONTHLY_THEMES = {
 }
 
 
-class CacheManager:
-    """
-    缓存管理器（v2.1新增）
-    负责K线数据的缓存读写，大幅提升重复运行速度
-    """
-
-    def __init__(self):
-        self.cache_dir = KLINE_CACHE_DIR
-        self.expire_hours = CACHE_CONFIG['kline_expire_hours']
-        self.enabled = CACHE_CONFIG['enable_cache']
-        self.version = CACHE_CONFIG['cache_version']
-
-    def _get_cache_key(self, stock_code, days):
-        """生成缓存键"""
-        key_str = f"{stock_code}_{days}_{self.version}"
-        return hashlib.md5(key_str.encode()).hexdigest()
-
-    def _get_cache_path(self, cache_key):
-        """获取缓存文件路径"""
-        # 按日期分目录存储
-        today = datetime.now().strftime('%Y%m%d')
-        date_dir = self.cache_dir / today
-        date_dir.mkdir(exist_ok=True)
-        return date_dir / f"{cache_key}.pkl"
-
-    def _is_cache_valid(self, cache_path):
-        """检查缓存是否有效"""
-        if not cache_path.exists():
-            return False
-
-        # 检查文件修改时间
-        mtime = datetime.fromtimestamp(cache_path.stat().st_mtime)
-        now = datetime.now()
-        age_hours = (now - mtime).total_seconds() / 3600
-
-        return age_hours < self.expire_hours
-
-    def get(self, stock_code, days):
-        """读取缓存"""
-        if not self.enabled:
-            return None
-
-        try:
-            cache_key = self._get_cache_key(stock_code, days)
-            cache_path = self._get_cache_path(cache_key)
-
-            if self._is_cache_valid(cache_path):
-                df = pd.read_pickle(cache_path)
-                return df
-        except Exception as e:
-            pass
-
-        return None
-
-    def set(self, stock_code, days, data):
-        """写入缓存"""
-        if not self.enabled or data is None:
-            return
-
-        try:
-            cache_key = self._get_cache_key(stock_code, days)
-            cache_path = self._get_cache_path(cache_key)
-
-            # 保存为pickle格式（速度快）
-            data.to_pickle(cache_path)
-        except Exception as e:
-            pass
-
-    def clear_old_caches(self):
-        """清理过期缓存"""
-        try:
-            for date_dir in self.cache_dir.iterdir():
-                if not date_dir.is_dir():
-                    continue
-
-                # 删除3天前的缓存目录
-                try:
-                    date_str = date_dir.name
-                    cache_date = datetime.strptime(date_str, '%Y%m%d')
-                    age_days = (datetime.now() - cache_date).days
-
-                    if age_days > 3:
-                        import shutil
-                        shutil.rmtree(date_dir)
-                        print(f"   已清理过期缓存: {date_str}")
-                except:
-                    pass
-        except Exception as e:
-            pass
-
-
 class StockScreener:
     """股票筛选器 - v2.1 增强版"""
 
-    def __init__(self, target_sector=None):
+    def __init__(self, target_sector=None, params=None, reporter='console', data=None):
+        for path in (HISTORY_DIR, WEEKLY_DIR, HOT_MONEY_CACHE_DIR):
+            path.mkdir(parents=True, exist_ok=True)
         self.today = datetime.now().strftime('%Y%m%d')
         self.current_month = datetime.now().month
         self.theme = MONTHLY_THEMES.get(self.current_month, {})
-        self.batch_id = datetime.now().strftime('%Y%m%d_%H%M%S')
+        self.batch_id = new_batch_id()
         self.selection_date = datetime.now().strftime('%Y-%m-%d')
         self.is_monday = datetime.now().weekday() == 0
-        self.lhb_cache = None  # 龙虎榜数据缓存
 
-        # v2.1新增：缓存管理器
-        self.cache_manager = CacheManager()
+        # v2.1新增：缓存管理器（v2.2：由共享行情数据服务管理，实时行情/日K线/龙虎榜可与scan_stock_v9共用）
+        self.data = data if data is not None else MarketDataService(source=ak)
 
         # 统计信息
         self.stats = {
@@ -215,163 +167,37 @@ class StockScreener:
             'cache_misses': 0,
             'api_calls': 0,
         }
-
-    def get_historical_data(self, stock_code, days=30):
+        self.profiler = RunProfiler(self.batch_id, 'select_stock_v2_enhanced')  # v2.2新增：分阶段剖析
+        self.source_health = SourceHealth(self.batch_id, 'select_stock_v2_enhanced')  # v2.2新增：数据源健康监控
+        self.params = {**PATTERN_PARAMS, **(params or {})}  # v2.2新增：形态参数
+        self.run_status = None  # v2.2新增：提前结束的原因（no_data），正常完成为None
+        self.result_df = None  # v2.2新增：最终入选结果（无人值守模式写出）
+        self.reporter = make_reporter(reporter)  # v2.2新增：结果展示（None时整个运行不打印）
+        self.stage_frames = {}  # v2.2新增：各阶段之后存活的股票
+        self.run_count = 0  # v2.2新增：本实例已运行次数（重复运行时重置单次状态）
+        self.run_started = None  # v2.2新增：本次运行开始时刻（汇总无数据记录用）
+
+    def get_historical_data(self, stock_code, days=30, min_bars=None):
         """
         获取个股历史K线数据（v2.1增强：支持缓存）
+
+        min_bars: 需要的最少K线根数（v2.2新增），不足时由数据服务记录，后续请求直接跳过
         """
-        # 先尝试从缓存读取
-        cached_data = self.cache_manager.get(stock_code, days)
-        if cached_data is not None:
+        # v2.2：先查共享数据服务的内存K线，再查落盘缓存，都没有时才调用接口
+        df, source = self.data.history_with_source(stock_code, days, disk_cache=True, min_bars=min_bars)
+        if source in ('memory', 'disk'):
             self.stats['cache_hits'] += 1
-            return cached_data
-
-        self.stats['cache_misses'] += 1
-
-        try:
-            end_date = datetime.now().strftime('%Y%m%d')
-            start_date = (datetime.now() - timedelta(days=days+30)).strftime('%Y%m%d')
-
-            df = ak.stock_zh_a_hist(
-                symbol=stock_code,
-                period="daily",
-                start_date=start_date,
-                end_date=end_date,
-                adjust="qfq"
-            )
-
-            self.stats['api_calls'] += 1
-
-            # 写入缓存
-            if df is not None and not df.empty:
-                self.cache_manager.set(stock_code, days, df)
-
-            return df
-        except Exception as e:
-            return None
+        else:
+            self.stats['cache_misses'] += 1
+            if source == 'api':
+                self.stats['api_calls'] += 1
+        return df
 
     # ========== 游资追踪功能（从v9.1完整移植）==========
 
-    def fetch_lhb_data(self, stock_code, lookback_days=30):
-        """获取个股龙虎榜数据"""
-        try:
-            # 构建缓存文件路径
-            cache_file = HOT_MONEY_CACHE_DIR / f"lhb_{stock_code}_{datetime.now().strftime('%Y%m%d')}.json"
-
-            # 检查缓存
-            if cache_file.exists():
-                with open(cache_file, 'r', encoding='utf-8') as f:
-                    return json.load(f)
-
-            # 获取龙虎榜数据
-            end_date = datetime.now()
-            start_date = end_date - timedelta(days=lookback_days)
-
-            result = {
-                'appearances': 0,
-                'records': [],
-                'buy_desks': defaultdict(float),
-                'sell_desks': defaultdict(float),
-                'net_buy': 0
-            }
-
-            try:
-                # 使用全局缓存，避免重复获取
-                if self.lhb_cache is None:
-                    try:
-                        self.lhb_cache = ak.stock_lhb_detail_em(
-                            start_date=start_date.strftime('%Y%m%d'),
-                            end_date=end_date.strftime('%Y%m%d')
-                        )
-                        if self.lhb_cache is not None and not self.lhb_cache.empty:
-                            pass
-                        else:
-                            self.lhb_cache = pd.DataFrame()
-                    except Exception as e:
-                        self.lhb_cache = pd.DataFrame()
-
-                # 从缓存中过滤出当前股票的记录
-                df_lhb = None
-                if self.lhb_cache is not None and not self.lhb_cache.empty:
-                    code_col = None
-                    for col in ['代码', '股票代码', 'symbol']:
-                        if col in self.lhb_cache.columns:
-                            code_col = col
-                            break
-
-                    if code_col:
-                        df_lhb = self.lhb_cache[self.lhb_cache[code_col] == stock_code].copy()
-
-                if df_lhb is not None and not df_lhb.empty:
-                    result['appearances'] = len(df_lhb)
-
-                    for _, row in df_lhb.iterrows():
-                        date_val = row.get('上榜日期', '')
-                        if pd.notna(date_val):
-                            if isinstance(date_val, str):
-                                date_str = date_val
-                            else:
-                                date_str = pd.to_datetime(date_val).strftime('%Y-%m-%d')
-                        else:
-                            date_str = ''
-
-                        record = {
-                            'date': date_str,
-                            'reason': str(row.get('上榜原因', '')),
-                            'close_price': float(row.get('收盘价', 0)) if pd.notna(row.get('收盘价')) else 0,
-                            'change_pct': float(row.get('涨跌幅', 0)) if pd.notna(row.get('涨跌幅')) else 0,
-                            'turnover': float(row.get('成交额', 0)) if pd.notna(row.get('成交额')) else 0,
-                        }
-                        result['records'].append(record)
-
-                        # 统计买卖席位
-                        for i in range(1, 6):
-                            buy_desk = row.get(f'买{i}营业部', '')
-                            sell_desk = row.get(f'卖{i}营业部', '')
-                            buy_amount_val = row.get(f'买{i}金额', 0)
-                            sell_amount_val = row.get(f'卖{i}金额', 0)
-
-                            try:
-                                buy_amount = float(buy_amount_val) if pd.notna(buy_amount_val) else 0
-                                sell_amount = float(sell_amount_val) if pd.notna(sell_amount_val) else 0
-                            except:
-                                buy_amount = 0
-                                sell_amount = 0
-
-                            if buy_desk and buy_amount > 0:
-                                result['buy_desks'][buy_desk] += buy_amount
-                            if sell_desk and sell_amount > 0:
-                                result['sell_desks'][sell_desk] += sell_amount
-
-                    # 计算净买入
-                    total_buy = sum(result['buy_desks'].values())
-                    total_sell = sum(result['sell_desks'].values())
-                    result['net_buy'] = total_buy - total_sell
-
-                    # 转换为普通dict
-                    result['buy_desks'] = dict(result['buy_desks'])
-                    result['sell_desks'] = dict(result['sell_desks'])
-
-            except Exception as e:
-                pass
-
-            # 保存缓存
-            try:
-                with open(cache_file, 'w', encoding='utf-8') as f:
-                    json.dump(result, f, ensure_ascii=False, indent=2)
-            except:
-                pass
-
-            return result
-
-        except Exception as e:
-            return {
-                'appearances': 0,
-                'records': [],
-                'buy_desks': {},
-                'sell_desks': {},
-                'net_buy': 0
-            }
+    def fetch_lhb_data(self, stock_code, lookback_days=20):
+        """获取个股龙虎榜数据（v2.2：由共享数据服务获取，与scan_stock_v9共用全市场明细和个股汇总）"""
+        return self.data.lhb_summary(stock_code, lookback_days, log=self._log)
 
     def calculate_hot_money_strength(self, lhb_data, stock_code):
         """计算游资强度评分"""
@@ -463,11 +289,10 @@ class StockScreener:
 
                 for i in range(len(dates) - 1):
                     try:
-                        date1 = datetime.strptime(dates[i], '%Y-%m-%d')
-                        date2 = datetime.strptime(dates[i + 1], '%Y-%m-%d')
-                        diff = (date1 - date2).days
+                        # v2.2：相邻交易日视为连续（按交易日历，跨周末/长假也算连续）
+                        diff = self.data.calendar.distance(dates[i + 1], dates[i])
 
-                        if diff <= 3:
+                        if diff <= 1:
                             continuous_days += 1
                         else:
                             break
@@ -661,17 +486,17 @@ class StockScreener:
             # 转换日期格式
             hist_data['日期'] = pd.to_datetime(hist_data['日期'])
 
-            # 找到买入日期的索引
-            buy_data = hist_data[hist_data['日期'] == buy_dt]
+            # 找到买入日期的位置（按位置而不是行标签，后面用 iloc 向后取K线）
+            buy_positions = np.flatnonzero((hist_data['日期'] == buy_dt).to_numpy())
 
-            if buy_data.empty:
+            if len(buy_positions) == 0:
                 return {
                     'can_backtest': False,
                     'reason': '未找到买入日期数据'
                 }
 
-            buy_idx = buy_data.index[0]
-            buy_price = float(buy_data.iloc[0]['收盘'])
+            buy_idx = int(buy_positions[0])
+            buy_price = float(hist_data.iloc[buy_idx]['收盘'])
 
             # 计算后续表现
             result = {
@@ -751,32 +576,33 @@ class StockScreener:
 
     def identify_4day_pattern(self, df_all):
         """识别四日形态"""
-        print("\n" + "=" * 70)
-        print("【开始四日形态识别】v2.1 增强版")
-        print("=" * 70)
-        print("\n⏳ 第一步：筛选上证A股（60开头）...")
+        self._log("\n" + "=" * 70)
+        self._log("【开始四日形态识别】v2.1 增强版")
+        self._log("=" * 70)
+        self._log("\n⏳ 第一步：筛选上证A股（60开头）...")
 
         # 清理过期缓存
-        print("\n⏳ 清理过期缓存...")
-        self.cache_manager.clear_old_caches()
+        self._log("\n⏳ 清理过期缓存...")
+        self.data.clear_old_caches()
 
         try:
-            realtime_df = ak.stock_zh_a_spot_em()
+            realtime_df = self.data.spot()
         except Exception as e:
-            print(f"❌ 获取实时数据失败: {e}")
+            self._log(f"❌ 获取实时数据失败: {e}")
+            self.run_status = 'no_data'
             return pd.DataFrame()
 
         shanghai_stocks = realtime_df[realtime_df['代码'].str.startswith('60')].copy()
         shanghai_stocks = shanghai_stocks[~shanghai_stocks['名称'].str.contains('ST|退', na=False)]
 
-        print(f"✅ 共获取 {len(shanghai_stocks)} 只上证A股（已排除ST股）")
+        self._log(f"✅ 共获取 {len(shanghai_stocks)} 只上证A股（已排除ST股）")
 
         if shanghai_stocks.empty:
-            print("❌ 未找到符合条件的上证A股")
+            self._log("❌ 未找到符合条件的上证A股")
             return pd.DataFrame()
 
-        print(f"\n⏳ 第二步：逐个分析每只股票的历史K线数据...")
-        print(f"   💡 启用缓存机制，大幅提升分析速度")
+        self._log(f"\n⏳ 第二步：逐个分析每只股票的历史K线数据...")
+        self._log(f"   💡 启用缓存机制，大幅提升分析速度")
 
         qualified_stocks = []
         total_stocks = len(shanghai_stocks)
@@ -806,13 +632,13 @@ class StockScreener:
                     pass
 
                 if processed % 50 == 0 or processed == total_stocks:
-                    print(f"   ⏳ 已分析 {processed}/{total_stocks} ({processed*100//total_stocks}%) | "
+                    self._log(f"   ⏳ 已分析 {processed}/{total_stocks} ({processed*100//total_stocks}%) | "
                           f"找到形态: {found_pattern_count} 只 | "
                           f"缓存命中: {self.stats['cache_hits']} | "
                           f"缓存未命中: {self.stats['cache_misses']}")
 
-        print(f"\n✅ 分析完成！共发现 {found_pattern_count} 只符合四日形态的股票")
-        print(f"   📊 缓存统计: 命中率 {self.stats['cache_hits']/(self.stats['cache_hits']+self.stats['cache_misses'])*100:.1f}% "
+        self._log(f"\n✅ 分析完成！共发现 {found_pattern_count} 只符合四日形态的股票")
+        self._log(f"   📊 缓存统计: 命中率 {self.stats['cache_hits']/(self.stats['cache_hits']+self.stats['cache_misses'])*100:.1f}% "
               f"({self.stats['cache_hits']}/{self.stats['cache_hits']+self.stats['cache_misses']})")
 
         if not qualified_stocks:
@@ -821,20 +647,20 @@ class StockScreener:
         df_result = pd.DataFrame(qualified_stocks)
 
         # 过滤掉形态周期早于10天以上的股票
-        print(f"\n⏳ 第三步：过滤时效性...")
+        self._log(f"\n⏳ 第三步：过滤时效性...")
         original_count = len(df_result)
         current_date = datetime.now()
         df_result['pattern_start_date_dt'] = pd.to_datetime(df_result['pattern_start_date'])
         df_result['days_since_pattern'] = (current_date - df_result['pattern_start_date_dt']).dt.days
 
         # 只保留10天以内的形态
-        df_result = df_result[df_result['days_since_pattern'] <= 10].copy()
+        df_result = df_result[df_result['days_since_pattern'] <= self.params['max_pattern_age']].copy()
         filtered_count = original_count - len(df_result)
 
         if filtered_count > 0:
-            print(f"   ✅ 过滤掉 {filtered_count} 只超过10天的旧形态，保留 {len(df_result)} 只")
+            self._log(f"   ✅ 过滤掉 {filtered_count} 只超过10天的旧形态，保留 {len(df_result)} 只")
         else:
-            print(f"   ✅ 所有形态均在10天以内，无需过滤")
+            self._log(f"   ✅ 所有形态均在10天以内，无需过滤")
 
         # 删除临时列
         df_result = df_result.drop(columns=['pattern_start_date_dt', 'days_since_pattern'])
@@ -849,7 +675,7 @@ class StockScreener:
         stock_name = stock_row['名称']
 
         try:
-            hist_data = self.get_historical_data(stock_code, days=30)
+            hist_data = self.get_historical_data(stock_code, days=30, min_bars=10)
 
             if hist_data is None or len(hist_data) < 10:
                 return None
@@ -904,7 +730,7 @@ class StockScreener:
 
                         '最新价': float(day4['收盘']),
                         '涨跌幅': float(day4.get('涨跌幅', 0)),
-                        '量比': pattern_info['vol_ratio_day4'] / 0.55,
+                        '量比': pattern_info['vol_ratio_day4'] / self.params['day4_vol_ratio_max'],
                         '换手率': stock_row.get('换手率', 0),
                         '流通市值': stock_row.get('流通市值', 0),
                         '成交额': float(day4.get('成交额', 0)),
@@ -930,26 +756,28 @@ class StockScreener:
             pct3 = float(day3.get('涨跌幅', 0))
             pct4 = float(day4.get('涨跌幅', 0))
 
+            p = self.params
+
             # Day1: 涨停启动
-            if pct1 < 9.8:
+            if pct1 < p['day1_pct_min']:
                 return False, {}
 
             # Day2: 放量洗盘
-            if v2 <= v1 * 1.2:
+            if v2 <= v1 * p['day2_vol_ratio_min']:
                 return False, {}
-            if pct2 >= 3.0:
+            if pct2 >= p['day2_pct_max']:
                 return False, {}
 
             # Day3: 回调确认
-            if pct3 >= 0 or pct3 <= -5.0:
+            if pct3 >= p['day3_pct_max'] or pct3 <= p['day3_pct_min']:
                 return False, {}
-            if v3 >= v2 * 1.5:
+            if v3 >= v2 * p['day3_vol_ratio_max']:
                 return False, {}
 
             # Day4: 缩量买点
-            if v4 > v1 * 0.55:
+            if v4 > v1 * p['day4_vol_ratio_max']:
                 return False, {}
-            if pct4 < -3.0 or pct4 > 3.0:
+            if pct4 < p['day4_pct_min'] or pct4 > p['day4_pct_max']:
                 return False, {}
 
             pattern_info = {
@@ -970,8 +798,8 @@ class StockScreener:
         if df.empty:
             return df
 
-        print("\n⏳ 第四步：为筛选出的股票添加增强分析...")
-        print("   📊 分析内容：技术指标 + 游资追踪 + 回测验证")
+        self._log("\n⏳ 第四步：为筛选出的股票添加增强分析...")
+        self._log("   📊 分析内容：技术指标 + 游资追踪 + 回测验证")
 
         qualified_stocks = []
         processed = 0
@@ -982,10 +810,10 @@ class StockScreener:
             processed += 1
 
             if processed % 3 == 0 or processed == total:
-                print(f"   ⏳ 已分析 {processed}/{total}...")
+                self._log(f"   ⏳ 已分析 {processed}/{total}...")
 
             # 1. 技术分析
-            hist_data = self.get_historical_data(stock_code, days=90)
+            hist_data = self.get_historical_data(stock_code, days=90, min_bars=60)
 
             if hist_data is None or len(hist_data) < 60:
                 row_copy = row.copy()
@@ -1143,7 +971,7 @@ class StockScreener:
         df_result = pd.DataFrame(qualified_stocks)
         df_result = df_result.sort_values('综合评分', ascending=False)
 
-        print(f"\n✅ 增强分析完成")
+        self._log(f"\n✅ 增强分析完成")
 
         # 统计回测信息
         can_backtest = len(df_result[df_result['可回测'] == True])
@@ -1151,14 +979,14 @@ class StockScreener:
             backtest_df = df_result[df_result['可回测'] == True]
             avg_next_day = backtest_df['次日涨幅'].mean()
             win_rate = len(backtest_df[backtest_df['次日涨幅'] > 0]) / len(backtest_df) * 100
-            print(f"   📊 回测统计: {can_backtest}只可回测 | 次日平均涨幅{avg_next_day:.2f}% | 胜率{win_rate:.1f}%")
+            self._log(f"   📊 回测统计: {can_backtest}只可回测 | 次日平均涨幅{avg_next_day:.2f}% | 胜率{win_rate:.1f}%")
 
         return df_result
 
     def save_selection_result(self, df):
         """保存选股结果"""
         if df.empty:
-            print("\n📝 本次无选股结果，不保存历史记录")
+            self._log("\n📝 本次无选股结果，不保存历史记录")
             return None
 
         selection_data = {
@@ -1183,62 +1011,131 @@ class StockScreener:
             }
             selection_data['stocks'].append(stock_info)
 
-        batch_file = HISTORY_DIR / f"batch_{self.batch_id}.json"
-        with open(batch_file, 'w', encoding='utf-8') as f:
-            json.dump(selection_data, f, ensure_ascii=False, indent=2)
+        history_store = HistoryStore()
+        history_store.save_batch(selection_data, 'select_stock_v2_enhanced')
 
-        print(f"\n📝 选股结果已保存")
-        print(f"   批次ID: {self.batch_id}")
-        print(f"   保存路径: {batch_file}")
+        self._log(f"\n📝 选股结果已保存")
+        self._log(f"   批次ID: {self.batch_id}")
+        self._log(f"   保存路径: {history_store.db_path}")
 
         return self.batch_id
 
+    def _log(self, *args, **kwargs):
+        """过程输出（v2.2新增）：有报告器时打印，reporter=None 时直接返回，不重定向标准输出"""
+        if self.reporter is not None:
+            print(*args, **kwargs)
+
     def print_header(self):
         """打印头部信息"""
-        print("=" * 70)
-        print("【A股四日形态选股系统 v2.1 - 增强版】")
-        print(f"筛选日期: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}")
-        print(f"🔖 批次ID: {self.batch_id}")
-        print("🎯 策略: Day1涨停 → Day2放量洗盘 → Day3回调 → Day4缩量买点")
-        print("📊 适用: 仅上证A股（60开头）")
-        print("🆕 v2.1新功能: 数据缓存 + 游资追踪 + 回测验证")
-        print("=" * 70)
+        self._log("=" * 70)
+        self._log("【A股四日形态选股系统 v2.1 - 增强版】")
+        self._log(f"筛选日期: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}")
+        self._log(f"🔖 批次ID: {self.batch_id}")
+        self._log("🎯 策略: Day1涨停 → Day2放量洗盘 → Day3回调 → Day4缩量买点")
+        self._log("📊 适用: 仅上证A股（60开头）")
+        self._log("🆕 v2.1新功能: 数据缓存 + 游资追踪 + 回测验证")
+        self._log("=" * 70)
 
     def run(self):
-        """执行完整筛选流程"""
+        """
+        执行完整筛选流程（v2.2：分阶段剖析 + 数据源健康监控）
+
+        返回：ScreenResult（最终结果、各阶段存活股票、各阶段耗时、批次ID）
+        """
+        self._begin_run()
+        self.profiler.activate()
+        self.source_health.activate()
+        try:
+            self._run_pipeline()
+        finally:
+            try:
+                if self.reporter is not None:
+                    self.profiler.print_summary()
+                path = self.profiler.save()
+                if path is not None:
+                    self._log(f"\n⏱️ 运行剖析已保存: {path.name}（python run_profiler.py compare 对比多次运行）")
+            except Exception as e:
+                self._log(f"\n⚠️ 保存运行剖析失败: {str(e)[:50]}")
+            if self.reporter is not None:
+                self.data.print_skipped(self.run_started)
+            try:
+                if self.reporter is not None:
+                    self.source_health.print_report()
+                path = self.source_health.save()
+                if path is not None:
+                    self._log(f"\n📡 数据源健康指标已保存: {path.name}（python source_health.py trend 查看走势）")
+            except Exception as e:
+                self._log(f"\n⚠️ 保存数据源健康指标失败: {str(e)[:50]}")
+        return ScreenResult(self.batch_id, 'select_stock_v2_enhanced', final=self.result_df,
+                            stages=self.stage_frames, profile=self.profiler.to_dict(),
+                            run_status=self.run_status, skipped=self.data.skipped(self.run_started))
+
+    def _begin_run(self):
+        """
+        重置单次运行的状态（v2.2新增）
+
+        同一实例重复调用 run() 时生成新的批次ID、剖析器和健康监控器；共享数据服务（K线/龙虎榜）继续复用
+        """
+        if self.run_count:
+            now = datetime.now()
+            self.today = now.strftime('%Y%m%d')
+            self.batch_id = new_batch_id(now)
+            self.selection_date = now.strftime('%Y-%m-%d')
+            self.is_monday = now.weekday() == 0
+            self.stats = {'cache_hits': 0, 'cache_misses': 0, 'api_calls': 0}
+            self.profiler = RunProfiler(self.batch_id, 'select_stock_v2_enhanced')
+            self.source_health = SourceHealth(self.batch_id, 'select_stock_v2_enhanced')
+        self.run_count += 1
+        self.run_started = datetime.now()
+        self.run_status = None
+        self.result_df = None
+        self.stage_frames = {}
+
+    def _run_pipeline(self):
+        """筛选流程主体（每个阶段计入剖析器）"""
         self.print_header()
 
-        print("\n" + "=" * 70)
-        print("【开始四日形态筛选】v2.1")
-        print("=" * 70)
+        self._log("\n" + "=" * 70)
+        self._log("【开始四日形态筛选】v2.1")
+        self._log("=" * 70)
 
         # 执行形态识别
-        df = self.identify_4day_pattern(None)
+        with self.profiler.stage('形态识别') as stage:
+            df = self.identify_4day_pattern(None)
+            stage['rows_out'] = len(df)
+        self.stage_frames['形态识别'] = df
 
         if df.empty:
-            print("\n🔴 今日暂无符合四日形态的标的")
+            self._log("\n🔴 今日暂无符合四日形态的标的")
             return
 
         # 添加增强分析
-        df = self.add_enhanced_analysis(df)
+        df = self.profiler.run_stage('增强分析', self.add_enhanced_analysis, df)
+        self.stage_frames['增强分析'] = df
 
         # 输出结果
-        self.output_result(df)
+        with self.profiler.stage('输出结果'):
+            self.output_result(df)
 
     def output_result(self, df):
-        """输出筛选结果"""
-        print("\n" + "=" * 70)
-        print("【筛选结果】v2.1 四日形态 + 游资追踪 + 回测验证")
-        print("=" * 70)
+        """保存并输出筛选结果（v2.2：保存始终执行，屏幕展示交给报告器）"""
+        self.result_df = df
+        if not df.empty:
+            self.save_selection_result(df)
+        if self.reporter is not None:
+            self.reporter.report_result(self, df)
+
+    def print_result(self, df):
+        """在控制台展示筛选结果（v2.2：从output_result中分离，由ConsoleReporter调用）"""
+        self._log("\n" + "=" * 70)
+        self._log("【筛选结果】v2.1 四日形态 + 游资追踪 + 回测验证")
+        self._log("=" * 70)
 
         if df.empty:
-            print("\n🔴 今日暂无符合条件的标的")
+            self._log("\n🔴 今日暂无符合条件的标的")
             return
 
-        # 保存结果
-        self.save_selection_result(df)
-
-        print(f"\n🟢 共筛选出 {len(df)} 只符合四日形态的上证A股")
+        self._log(f"\n🟢 共筛选出 {len(df)} 只符合四日形态的上证A股")
 
         # 按评级分类
         aaa_stocks = df[df['综合评级'].str.startswith('AAA')]
@@ -1254,9 +1151,9 @@ class StockScreener:
             ('other', other_stocks, '📋 【B/C级 - 观察形态】'),
         ]:
             if not stocks.empty:
-                print(f"\n{'='*60}")
-                print(f"{title}({len(stocks)}只)")
-                print(f"{'='*60}")
+                self._log(f"\n{'='*60}")
+                self._log(f"{title}({len(stocks)}只)")
+                self._log(f"{'='*60}")
 
                 for idx, row in stocks.iterrows():
                     if level == 'other' and idx >= stocks.index[5]:
@@ -1264,24 +1161,24 @@ class StockScreener:
                     self._print_stock_detail_v2(row, level=level)
 
                 if level == 'other' and len(stocks) > 5:
-                    print(f"\n   ... 还有 {len(stocks) - 5} 只")
+                    self._log(f"\n   ... 还有 {len(stocks) - 5} 只")
 
         # 代码汇总
-        print("\n" + "-" * 60)
-        print("📋 股票代码汇总:")
+        self._log("\n" + "-" * 60)
+        self._log("📋 股票代码汇总:")
         if not aaa_stocks.empty:
-            print(f"   ⭐⭐⭐ AAA级: {', '.join(aaa_stocks['代码'].tolist())}")
+            self._log(f"   ⭐⭐⭐ AAA级: {', '.join(aaa_stocks['代码'].tolist())}")
         if not aa_stocks.empty:
-            print(f"   ⭐⭐ AA级: {', '.join(aa_stocks['代码'].tolist())}")
+            self._log(f"   ⭐⭐ AA级: {', '.join(aa_stocks['代码'].tolist())}")
         if not a_stocks.empty:
-            print(f"   ⭐ A级: {', '.join(a_stocks['代码'].tolist())}")
+            self._log(f"   ⭐ A级: {', '.join(a_stocks['代码'].tolist())}")
 
         # v2.1新增：回测统计
         can_backtest_df = df[df['可回测'] == True]
         if not can_backtest_df.empty:
-            print("\n" + "-" * 60)
-            print("📊 【回测统计】v2.1")
-            print("-" * 60)
+            self._log("\n" + "-" * 60)
+            self._log("📊 【回测统计】v2.1")
+            self._log("-" * 60)
 
             next_day_changes = can_backtest_df['次日涨幅'].dropna()
             if not next_day_changes.empty:
@@ -1291,87 +1188,310 @@ class StockScreener:
                 win_count = len(next_day_changes[next_day_changes > 0])
                 win_rate = win_count / len(next_day_changes) * 100
 
-                print(f"   可回测样本: {len(can_backtest_df)} 只")
-                print(f"   次日平均涨幅: {avg_next:+.2f}%")
-                print(f"   次日最大涨幅: {max_next:+.2f}%")
-                print(f"   次日最大跌幅: {min_next:+.2f}%")
-                print(f"   次日胜率: {win_rate:.1f}% ({win_count}/{len(next_day_changes)})")
+                self._log(f"   可回测样本: {len(can_backtest_df)} 只")
+                self._log(f"   次日平均涨幅: {avg_next:+.2f}%")
+                self._log(f"   次日最大涨幅: {max_next:+.2f}%")
+                self._log(f"   次日最大跌幅: {min_next:+.2f}%")
+                self._log(f"   次日胜率: {win_rate:.1f}% ({win_count}/{len(next_day_changes)})")
 
                 # 3日和5日统计
                 day3_changes = can_backtest_df['3日涨幅'].dropna()
                 if not day3_changes.empty:
                     avg_3d = day3_changes.mean()
-                    print(f"   3日平均涨幅: {avg_3d:+.2f}%")
+                    self._log(f"   3日平均涨幅: {avg_3d:+.2f}%")
 
                 day5_changes = can_backtest_df['5日涨幅'].dropna()
                 if not day5_changes.empty:
                     avg_5d = day5_changes.mean()
-                    print(f"   5日平均涨幅: {avg_5d:+.2f}%")
+                    self._log(f"   5日平均涨幅: {avg_5d:+.2f}%")
 
                 # 最佳卖点统计
                 best_sell_days = can_backtest_df['最佳卖点'].dropna()
                 if not best_sell_days.empty:
                     avg_best = best_sell_days.mean()
-                    print(f"   平均最佳卖点: 第{avg_best:.1f}天")
+                    self._log(f"   平均最佳卖点: 第{avg_best:.1f}天")
 
         # 游资统计
         hot_money_active = len(df[df['游资活跃'] == True])
         if hot_money_active > 0:
-            print("\n" + "-" * 60)
-            print("💰 【游资统计】v2.1")
-            print("-" * 60)
-            print(f"   游资活跃: {hot_money_active} 只")
+            self._log("\n" + "-" * 60)
+            self._log("💰 【游资统计】v2.1")
+            self._log("-" * 60)
+            self._log(f"   游资活跃: {hot_money_active} 只")
 
             for stage in ['建仓期', '加仓期']:
                 stage_stocks = df[df['游资阶段'] == stage]
                 if not stage_stocks.empty:
-                    print(f"   {stage}: {len(stage_stocks)} 只")
+                    self._log(f"   {stage}: {len(stage_stocks)} 只")
 
-        print("\n" + "=" * 70)
-        print("⚠️  风险提示: 本筛选仅供参考，不构成投资建议")
-        print("=" * 70)
+        self._log("\n" + "=" * 70)
+        self._log("⚠️  风险提示: 本筛选仅供参考，不构成投资建议")
+        self._log("=" * 70)
 
     def _print_stock_detail_v2(self, row, level='A'):
         """打印个股详细信息"""
         icons = {'AAA': '🔥', 'AA': '📈', 'A': '📌', 'other': '📋'}
         icon = icons.get(level, '📋')
 
-        print(f"\n  {icon} {row['代码']} | {row['名称']}")
-        print(f"     🏆 综合评级: {row['综合评级']} | 评分: {row['综合评分']:.1f}")
-        print(f"     📅 形态周期: {row['pattern_start_date']} ~ {row['buy_date']}")
-        print(f"     💰 买入价格: {row['day4_close']:.2f}元")
+        self._log(f"\n  {icon} {row['代码']} | {row['名称']}")
+        self._log(f"     🏆 综合评级: {row['综合评级']} | 评分: {row['综合评分']:.1f}")
+        self._log(f"     📅 形态周期: {row['pattern_start_date']} ~ {row['buy_date']}")
+        self._log(f"     💰 买入价格: {row['day4_close']:.2f}元")
 
         # 四日数据
-        print(f"\n     📊 四日形态:")
-        print(f"        Day1: 涨停{row['day1_pct_chg']:.2f}% | 量{row['day1_vol']:.0f}")
-        print(f"        Day2: 涨{row['day2_pct_chg']:.2f}% | 量{row['day2_vol']:.0f} (放量{row['vol_ratio_day2']:.2f}倍)")
-        print(f"        Day3: 跌{abs(row['day3_pct_chg']):.2f}% | 量{row['day3_vol']:.0f}")
-        print(f"        Day4: 涨{row['day4_pct_chg']:.2f}% | 量{row['day4_vol']:.0f} (缩量至{row['vol_ratio_day4']:.2f}倍)")
+        self._log(f"\n     📊 四日形态:")
+        self._log(f"        Day1: 涨停{row['day1_pct_chg']:.2f}% | 量{row['day1_vol']:.0f}")
+        self._log(f"        Day2: 涨{row['day2_pct_chg']:.2f}% | 量{row['day2_vol']:.0f} (放量{row['vol_ratio_day2']:.2f}倍)")
+        self._log(f"        Day3: 跌{abs(row['day3_pct_chg']):.2f}% | 量{row['day3_vol']:.0f}")
+        self._log(f"        Day4: 涨{row['day4_pct_chg']:.2f}% | 量{row['day4_vol']:.0f} (缩量至{row['vol_ratio_day4']:.2f}倍)")
 
         # 技术分析
-        print(f"\n     📈 技术分析: {row['均线排列']}")
+        self._log(f"\n     📈 技术分析: {row['均线排列']}")
 
         # v2.1新增：游资信息
         if row['龙虎榜次数'] > 0 or row['游资活跃']:
             net_buy_yi = row['游资净买入'] / 1e8
             active_tag = "🔥活跃" if row['游资活跃'] else ""
-            print(f"     💰 游资动向: 上榜{row['龙虎榜次数']}次 | 净买入{net_buy_yi:.2f}亿 {active_tag}")
-            print(f"        阶段: {row['游资阶段']} | 建议: {row['游资建议']}")
+            self._log(f"     💰 游资动向: 上榜{row['龙虎榜次数']}次 | 净买入{net_buy_yi:.2f}亿 {active_tag}")
+            self._log(f"        阶段: {row['游资阶段']} | 建议: {row['游资建议']}")
 
         # v2.1新增：回测信息
         if row['可回测']:
-            print(f"     📊 回测验证:")
+            self._log(f"     📊 回测验证:")
             if row['次日涨幅'] is not None:
                 status = "✅" if row['次日涨幅'] > 0 else "❌"
-                print(f"        次日涨幅: {row['次日涨幅']:+.2f}% {status}")
+                self._log(f"        次日涨幅: {row['次日涨幅']:+.2f}% {status}")
             if row['最大涨幅'] is not None:
-                print(f"        最大涨幅: {row['最大涨幅']:+.2f}% (第{row['最佳卖点']}天)")
+                self._log(f"        最大涨幅: {row['最大涨幅']:+.2f}% (第{row['最佳卖点']}天)")
             if row['最大回撤'] is not None:
-                print(f"        最大回撤: {row['最大回撤']:+.2f}%")
+                self._log(f"        最大回撤: {row['最大回撤']:+.2f}%")
+
+
+def find_4day_pattern_hits(pct, vol, params=None):
+    """
+    向量化四日形态检测（v2.2新增，判定条件与 StockScreener._check_4day_pattern 一致）
+
+    参数：按日期升序排列的涨跌幅、成交量数组；params 为形态参数（默认 PATTERN_PARAMS）
+    返回：满足形态的Day1下标数组（买入日Day4 = 下标 + 3）
+    """
+    if len(pct) < 4:
+        return np.array([], dtype=int)
+
+    p = params or PATTERN_PARAMS
+    pct1, pct2, pct3, pct4 = pct[:-3], pct[1:-2], pct[2:-1], pct[3:]
+    v1, v2, v3, v4 = vol[:-3], vol[1:-2], vol[2:-1], vol[3:]
+
+    mask = (
+        (pct1 >= p['day1_pct_min']) &  # Day1: 涨停启动
+        (v2 > v1 * p['day2_vol_ratio_min']) & (pct2 < p['day2_pct_max']) &  # Day2: 放量洗盘
+        (pct3 < p['day3_pct_max']) & (pct3 > p['day3_pct_min']) & (v3 < v2 * p['day3_vol_ratio_max']) &  # Day3: 回调确认
+        (v4 <= v1 * p['day4_vol_ratio_max']) & (pct4 >= p['day4_pct_min']) & (pct4 <= p['day4_pct_max'])  # Day4: 缩量买点
+    )
+    return np.flatnonzero(mask)
+
+
+def forward_return_matrix(close, buy_idx, horizon):
+    """
+    以买入日收盘价为基准的后续收益矩阵（v2.2新增）
+
+    返回：(事件数 × horizon) 的收益率矩阵(%)，第k列为买入后第k+1个交易日，超出数据范围为NaN
+    """
+    padded = np.concatenate([close, np.full(horizon, np.nan)])
+    offsets = buy_idx[:, None] + np.arange(1, horizon + 1)
+    with np.errstate(all='ignore'):
+        return (padded[offsets] / close[buy_idx][:, None] - 1) * 100
+
+
+class PatternEventStudy:
+    """
+    四日形态全历史事件研究（v2.2新增）
+
+    backtest_pattern 只能回测最近10天内的形态、逐根K线循环；
+    这里对本地日K线库中全部60开头股票的完整历史做向量化检测，
+    用数组下标一次取出每次形态出现后1~10日的收益，判断形态本身是否有统计优势。
+    """
+
+    def __init__(self, start_date=None, end_date=None, bar_store=None):
+        self.start_date = start_date or EVENT_STUDY_CONFIG['start_date']
+        self.end_date = end_date or datetime.now().strftime('%Y%m%d')
+        self.bar_store = bar_store or BarStore()
+        self.horizon = EVENT_STUDY_CONFIG['forward_days']
+
+    def collect_events(self):
+        """检测全部形态事件，返回事件表（每行一次形态及其后续1~10日收益）"""
+        names = self.bar_store.load_names()
+        codes = [code for code in self.bar_store.list_codes()
+                 if code.startswith('60') and not any(tag in names.get(code, '') for tag in ['ST', '退'])]
+        if not codes:
+            print("❌ 日K线库中没有60开头的股票，请先运行: python market_archive.py bars")
+            return pd.DataFrame()
+
+        print(f"\n⏳ 正在扫描 {len(codes)} 只上证A股的历史K线 ({self.start_date} ~ {self.end_date})...")
+        day_columns = [f"D{k}" for k in range(1, self.horizon + 1)]
+        frames = []
+        begin = time.time()
+
+        for n, code in enumerate(codes, 1):
+            hist = self.bar_store.get(code, self.start_date, self.end_date)
+            if hist is not None and len(hist) >= 4:
+                close = hist['收盘'].to_numpy(dtype=float)
+                vol = hist['成交量'].to_numpy(dtype=float)
+                if '涨跌幅' in hist.columns:
+                    pct = hist['涨跌幅'].to_numpy(dtype=float)
+                else:
+                    pct = hist['收盘'].pct_change().to_numpy(dtype=float) * 100
+
+                day1_idx = find_4day_pattern_hits(pct, vol)
+                if len(day1_idx) > 0:
+                    buy_idx = day1_idx + 3
+                    df_event = pd.DataFrame(forward_return_matrix(close, buy_idx, self.horizon), columns=day_columns)
+                    df_event.insert(0, '代码', code)
+                    df_event.insert(1, '名称', names.get(code, ''))
+                    df_event.insert(2, 'pattern_start_date', hist['日期'].iloc[day1_idx].dt.strftime('%Y-%m-%d').values)
+                    df_event.insert(3, 'buy_date', hist['日期'].iloc[buy_idx].dt.strftime('%Y-%m-%d').values)
+                    df_event.insert(4, 'buy_price', close[buy_idx])
+                    df_event.insert(5, 'vol_ratio_day4', vol[buy_idx] / vol[day1_idx])
+                    frames.append(df_event)
+
+            if n % 200 == 0 or n == len(codes):
+                print(f"   ⏳ 已扫描 {n}/{len(codes)} ({n*100//len(codes)}%) | 耗时 {time.time() - begin:.0f}s")
+
+        if not frames:
+            return pd.DataFrame()
+
+        events = pd.concat(frames, ignore_index=True)
+        returns = events[day_columns].to_numpy()
+        tracked = (~np.isnan(returns)).sum(axis=1)
+        filled = np.where(np.isnan(returns), -np.inf, returns)
+
+        # 与backtest_pattern口径一致：以买入价为起点，最大涨幅≥0、最大回撤≤0，从未高于买入价时最佳卖出日为0
+        events['days_tracked'] = tracked
+        with np.errstate(all='ignore'):
+            events['max_gain'] = np.where(tracked > 0, np.fmax(np.nanmax(returns, axis=1), 0), np.nan)
+            events['max_loss'] = np.where(tracked > 0, np.fmin(np.nanmin(returns, axis=1), 0), np.nan)
+        best_day = filled.argmax(axis=1) + 1
+        events['best_sell_day'] = np.where((tracked > 0) & (filled.max(axis=1) > 0), best_day, 0)
+        return events
+
+    def summarize(self, events):
+        """按持有天数统计收益分布"""
+        tracked = events[events['days_tracked'] > 0]
+        by_day = []
+        for k in range(1, self.horizon + 1):
+            returns = tracked[f"D{k}"].dropna()
+            if returns.empty:
+                continue
+            by_day.append({
+                '持有天数': k,
+                '样本数': len(returns),
+                '胜率': (returns > 0).mean() * 100,
+                '平均': returns.mean(),
+                '中位数': returns.median(),
+                'P10': returns.quantile(0.1),
+                'P90': returns.quantile(0.9),
+            })
+        return pd.DataFrame(by_day)
+
+    def print_report(self, events, df_by_day):
+        """打印事件研究报告"""
+        print("\n" + "=" * 70)
+        print(f"📈 【四日形态全历史事件研究】{self.start_date} ~ {self.end_date}")
+        print("=" * 70)
+
+        tracked = events[events['days_tracked'] > 0]
+        print(f"\n📊 共发现 {len(events)} 次形态 | 涉及 {events['代码'].nunique()} 只股票 | 有后续数据 {len(tracked)} 次")
+
+        if df_by_day.empty:
+            print("\n⚠️ 没有可统计的后续数据")
+            print("\n" + "=" * 70)
+            return
+
+        print(f"\n📋 【持有N日收益分布】")
+        print(f"{'持有':>4} {'样本':>6} {'胜率':>8} {'平均':>8} {'中位数':>8} {'P10':>8} {'P90':>8}")
+        print("-" * 60)
+        for _, row in df_by_day.iterrows():
+            marker = " ⭐" if row['持有天数'] in EVENT_STUDY_CONFIG['report_days'] else ""
+            print(f"{int(row['持有天数']):>3}日 {int(row['样本数']):>6} {row['胜率']:>7.1f}% {row['平均']:>+7.2f}% "
+                  f"{row['中位数']:>+7.2f}% {row['P10']:>+7.2f}% {row['P90']:>+7.2f}%{marker}")
+
+        print(f"\n📋 【{self.horizon}日内最大涨幅/最大回撤】")
+        print(f"   最大涨幅: 平均 {tracked['max_gain'].mean():+.2f}% | 中位数 {tracked['max_gain'].median():+.2f}% | "
+              f"≥5%的比例 {(tracked['max_gain'] >= 5).mean() * 100:.1f}%")
+        print(f"   最大回撤: 平均 {tracked['max_loss'].mean():+.2f}% | 中位数 {tracked['max_loss'].median():+.2f}% | "
+              f"≤-5%的比例 {(tracked['max_loss'] <= -5).mean() * 100:.1f}%")
+
+        print(f"\n📋 【最佳卖出日分布】（0表示{self.horizon}日内从未高于买入价）")
+        day_counts = tracked['best_sell_day'].value_counts().sort_index()
+        for day, count in day_counts.items():
+            bar = "█" * int(count / len(tracked) * 50)
+            print(f"   {int(day):>2}日: {count:>5} ({count / len(tracked) * 100:5.1f}%) {bar}")
+
+        best = df_by_day.loc[df_by_day['平均'].idxmax()]
+        print(f"\n💡 【结论】")
+        print(f"   平均收益最高的持有期: {int(best['持有天数'])}日（平均 {best['平均']:+.2f}%，胜率 {best['胜率']:.1f}%）")
+        if best['平均'] > 0 and best['胜率'] > 50:
+            print("   ✅ 形态存在正向统计优势，可结合游资/情绪过滤进一步提升")
+        else:
+            print("   ⚠️ 形态本身没有明显统计优势，需要叠加其他过滤条件")
+
+        events_by_year = tracked.assign(年份=tracked['buy_date'].str[:4]).groupby('年份')
+        print(f"\n📅 【分年度表现】")
+        for year, group in events_by_year:
+            d1 = group['D1'].dropna()
+            d5 = group['D5'].dropna() if 'D5' in group.columns else pd.Series(dtype=float)
+            d1_win = f"{(d1 > 0).mean() * 100:.1f}%" if not d1.empty else "N/A"
+            d5_avg = f"{d5.mean():+.2f}%" if not d5.empty else "N/A"
+            print(f"   {year}: {len(group):>4}次 | 次日胜率 {d1_win} | 5日平均 {d5_avg}")
+
+        print("\n" + "=" * 70)
+
+    def run(self):
+        """执行事件研究并保存结果"""
+        events = self.collect_events()
+        if events.empty:
+            print("\n🔴 研究区间内没有发现四日形态")
+            return events
+
+        df_by_day = self.summarize(events)
+        self.print_report(events, df_by_day)
+
+        BACKTEST_DIR.mkdir(parents=True, exist_ok=True)
+        tag = f"{self.start_date}_{self.end_date}"
+        events.to_csv(BACKTEST_DIR / f"pattern_events_{tag}.csv", index=False, encoding='utf-8-sig')
+        df_by_day.to_csv(BACKTEST_DIR / f"pattern_events_{tag}_by_day.csv", index=False, encoding='utf-8-sig')
+        print(f"\n💾 事件研究结果已保存: {BACKTEST_DIR}")
+        return events
+
+
+def headless_main(argv):
+    """无人值守入口（v2.2新增）：带参数运行时不进入交互流程，返回退出码"""
+    parser = build_parser(
+        "A股四日形态选股 v2.2 - 无人值守模式",
+        epilog="退出码: " + ", ".join(f"{code}={name}" for name, code in EXIT_CODES.items()))
+    args = parser.parse_args(argv)
+    try:
+        params = parse_overrides(args.overrides, PATTERN_PARAMS)
+    except ValueError as e:
+        parser.error(str(e))
+
+    screener = StockScreener(params=params, reporter=None if args.quiet else 'console')
+    return run_screening(screener, args, screener.run, 'select_stock_v2_enhanced', screener.params)
 
 
 def main():
     """主函数"""
+    # v2.2新增：事件研究模式
+    args = sys.argv[1:]
+    if args and args[0] == 'event':
+        start_date = args[1] if len(args) > 1 else None
+        end_date = args[2] if len(args) > 2 else None
+        PatternEventStudy(start_date, end_date).run()
+        return
+
+    # v2.2新增：无人值守模式
+    if args:
+        sys.exit(headless_main(args))
+
     print("\n" + "=" * 70)
     print("【A股四日形态选股系统 v2.1 - 增强版】")
     print("  🎯 核心策略: Day1涨停 → Day2放量 → Day3回调 → Day4缩量")
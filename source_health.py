@@ -0,0 +1,329 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+数据源健康监控 v1.0
+
+问题背景：
+接口失败时代码里只有零散的"⚠️ 获取龙虎榜数据失败"之类提示，其余失败直接被except吞掉，
+无法知道东方财富各接口的延迟分布和失败率，也就无法确定并发上限、判断14:30那次运行是否被数据源拖慢。
+
+功能：
+1. 逐次分类：每次 ak.* 调用按接口记录耗时并归类为 成功 / 空数据 / 失败 / 超时
+2. 按接口重试（可选）：只有在 retry_endpoints 中列出的接口，超时和连接中断（数据源偶发抖动）
+   才按配置的次数重试，重试次数计入统计；默认只列出单只股票/指数的日K线这类可安全重复的小请求，
+   全市场行情、资金排名、龙虎榜明细等整表拉取不重试（重复拉取代价大，失败由调用方按原逻辑处理）；
+   参数错误、解析失败等其他异常一律不重试，原样抛出
+3. 健康报告：运行结束打印每个接口的 p50/p95/p99 延迟、失败率、空数据率、重试次数
+4. 机器可读指标：每批次保存 selection_history/health_{批次ID}.json（含延迟直方图），
+   并向 selection_history/source_health.jsonl 追加一行，用于观察数据源随时间的退化
+
+说明：
+调用由 run_profiler.InstrumentedModule 统一拦截，筛选器代码中的 ak.xxx(...) 无需改动；
+没有激活监控器时（如单独调用某个函数）不计时、不重试，与直接调用akshare完全一致。
+
+使用方法：
+    python source_health.py show [批次ID]     # 查看某次运行的健康报告（默认最近一次）
+    python source_health.py trend [接口名]    # 查看最近各次运行的p95延迟和失败率走势
+"""
+
+import json
+import os
+import sys
+import threading
+import time
+from datetime import datetime
+from pathlib import Path
+
+# ============================================================
+# 健康监控配置
+# ============================================================
+HEALTH_DIR = Path(__file__).parent / "selection_history"  # 与剖析文件放在一起
+HEALTH_LOG = HEALTH_DIR / "source_health.jsonl"  # 每次运行追加一行的指标日志
+
+SOURCE_HEALTH_CONFIG = {
+    "enabled": True,  # 是否保存指标文件
+    # 超时/连接中断时重试的接口及最大重试次数（未列出的接口只监控、不重试）
+    "retry_endpoints": {
+        "stock_zh_a_hist": 2,
+        "index_zh_a_hist": 2,
+    },
+    "retry_backoff": 1.0,  # 首次重试前等待秒数，之后每次翻倍
+    "latency_buckets": [0.1, 0.25, 0.5, 1, 2, 5, 10, 30],  # 延迟直方图上界（秒），超出最后一档计入"+Inf"
+    "warn_error_rate": 0.2,  # 失败率（失败+超时）超过此值时报告中标记⚠️
+    "warn_p95": 10.0,  # p95延迟超过此秒数时报告中标记⚠️
+    "trend_runs": 10,  # trend 命令默认显示的最近运行次数
+}
+
+OUTCOMES = ['success', 'empty', 'error', 'timeout']
+OUTCOME_LABELS = {'success': '成功', 'empty': '空数据', 'error': '失败', 'timeout': '超时'}
+
+# 按异常类名识别（requests/urllib3的异常不继承内置TimeoutError，按类名判断可不依赖requests）
+TIMEOUT_ERRORS = {'TimeoutError', 'Timeout', 'ReadTimeout', 'ConnectTimeout', 'ReadTimeoutError',
+                  'ConnectTimeoutError'}
+CONNECTION_ERRORS = {'ConnectionError', 'ConnectionResetError', 'RemoteDisconnected', 'ProtocolError',
+                     'ChunkedEncodingError', 'IncompleteRead'}
+
+_active_monitor = None  # 当前进程中正在记录的监控器
+
+
+def _exception_names(exc):
+    return {cls.__name__ for cls in type(exc).__mro__}
+
+
+def classify_exception(exc):
+    """异常归类：'timeout' 或 'error'"""
+    if _exception_names(exc) & TIMEOUT_ERRORS or 'timed out' in str(exc).lower():
+        return 'timeout'
+    return 'error'
+
+
+def is_retryable(exc):
+    """超时和连接中断属于数据源抖动，可以重试"""
+    return classify_exception(exc) == 'timeout' or bool(_exception_names(exc) & CONNECTION_ERRORS)
+
+
+def classify_result(result):
+    """返回值归类：'empty'（None或空DataFrame）或 'success'"""
+    if result is None or getattr(result, 'empty', False) is True:
+        return 'empty'
+    return 'success'
+
+
+def percentile(sorted_values, q):
+    """最近秩法百分位数（sorted_values已升序）"""
+    if not sorted_values:
+        return None
+    rank = max(int(-(-q * len(sorted_values) // 100)), 1)  # ceil(q/100 * n)
+    return sorted_values[min(rank, len(sorted_values)) - 1]
+
+
+def _histogram(latencies):
+    buckets = SOURCE_HEALTH_CONFIG['latency_buckets']
+    counts = {f"{b:g}": 0 for b in buckets}
+    counts['+Inf'] = 0
+    for value in latencies:
+        for b in buckets:
+            if value <= b:
+                counts[f"{b:g}"] += 1
+                break
+        else:
+            counts['+Inf'] += 1
+    return counts
+
+
+def _new_endpoint():
+    return {'latencies': [], 'retries': 0, **{outcome: 0 for outcome in OUTCOMES}}
+
+
+class SourceHealth:
+    """单次运行的数据源健康监控器"""
+
+    def __init__(self, batch_id, script):
+        self.batch_id = batch_id
+        self.script = script
+        self.started_at = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+        self._endpoints = {}
+        self._lock = threading.Lock()
+
+    def activate(self):
+        """设为当前监控器（InstrumentedModule的调用计入此监控器）"""
+        global _active_monitor
+        _active_monitor = self
+        return self
+
+    def record(self, endpoint, outcome, elapsed, retried=False):
+        """记录一次调用尝试（可在多个线程中同时调用）"""
+        with self._lock:
+            ep = self._endpoints.setdefault(endpoint, _new_endpoint())
+            ep[outcome] += 1
+            ep['latencies'].append(elapsed)
+            if retried:
+                ep['retries'] += 1
+
+    def call(self, endpoint, func, args, kwargs, on_attempt=None):
+        """
+        执行一次接口调用：计时、归类，retry_endpoints 中的接口超时/连接中断时按配置重试
+
+        参数：
+        - on_attempt: 每次尝试结束后的回调 on_attempt(elapsed, result, error)，供剖析器记账
+        """
+        max_retries = SOURCE_HEALTH_CONFIG['retry_endpoints'].get(endpoint, 0)
+        attempt = 0
+        while True:
+            start = time.perf_counter()
+            try:
+                result = func(*args, **kwargs)
+            except Exception as e:
+                elapsed = time.perf_counter() - start
+                retry = attempt < max_retries and is_retryable(e)
+                self.record(endpoint, classify_exception(e), elapsed, retried=retry)
+                if on_attempt is not None:
+                    on_attempt(elapsed, None, True)
+                if not retry:
+                    raise
+                time.sleep(SOURCE_HEALTH_CONFIG['retry_backoff'] * (2 ** attempt))
+                attempt += 1
+                continue
+
+            elapsed = time.perf_counter() - start
+            self.record(endpoint, classify_result(result), elapsed)
+            if on_attempt is not None:
+                on_attempt(elapsed, result, False)
+            return result
+
+    def to_dict(self):
+        """健康指标（可直接JSON序列化）"""
+        with self._lock:
+            endpoints = {name: dict(ep, latencies=list(ep['latencies'])) for name, ep in self._endpoints.items()}
+
+        metrics = {}
+        for name, ep in sorted(endpoints.items()):
+            latencies = sorted(ep['latencies'])
+            calls = len(latencies)
+            failed = ep['error'] + ep['timeout']
+            metrics[name] = {
+                'calls': calls,
+                **{outcome: ep[outcome] for outcome in OUTCOMES},
+                'retries': ep['retries'],
+                'error_rate': failed / calls if calls else 0.0,
+                'empty_rate': ep['empty'] / calls if calls else 0.0,
+                'p50': percentile(latencies, 50),
+                'p95': percentile(latencies, 95),
+                'p99': percentile(latencies, 99),
+                'max': latencies[-1] if latencies else None,
+                'total_time': sum(latencies),
+                'histogram': _histogram(latencies),
+            }
+
+        return {
+            'batch_id': self.batch_id,
+            'script': self.script,
+            'started_at': self.started_at,
+            'calls': sum(m['calls'] for m in metrics.values()),
+            'retries': sum(m['retries'] for m in metrics.values()),
+            'endpoints': metrics,
+        }
+
+    def save(self, health_dir=None):
+        """保存指标文件并追加指标日志，返回指标文件路径"""
+        if not SOURCE_HEALTH_CONFIG['enabled']:
+            return None
+        health_dir = Path(health_dir) if health_dir else HEALTH_DIR
+        health_dir.mkdir(parents=True, exist_ok=True)
+        metrics = self.to_dict()
+
+        path = health_dir / f"health_{self.batch_id}.json"
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump(metrics, f, ensure_ascii=False, indent=2)
+
+        # 指标日志每次运行一行（不含直方图），与周记录相同用单次O_APPEND写入
+        line = {k: v for k, v in metrics.items() if k != 'endpoints'}
+        line['endpoints'] = {name: {k: v for k, v in m.items() if k != 'histogram'}
+                             for name, m in metrics['endpoints'].items()}
+        data = (json.dumps(line, ensure_ascii=False) + "\n").encode('utf-8')
+        fd = os.open(health_dir / HEALTH_LOG.name, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+        try:
+            os.write(fd, data)
+        finally:
+            os.close(fd)
+        return path
+
+    def print_report(self):
+        """打印本次运行的数据源健康表"""
+        print_health_report(self.to_dict())
+
+
+def _format_seconds(value):
+    return "-" if value is None else f"{value:.2f}s"
+
+
+def print_health_report(metrics):
+    """打印健康表（metrics为to_dict()或health_*.json的内容）"""
+    print("\n" + "-" * 100)
+    print(f"📡 【数据源健康】接口调用 {metrics['calls']} 次 | 重试 {metrics['retries']} 次")
+    print("-" * 100)
+    if not metrics['endpoints']:
+        print("   本次运行没有接口调用")
+        return
+
+    print(f"{'接口':<36} {'次数':>5} {'成功':>5} {'空':>4} {'失败':>4} {'超时':>4} {'重试':>4} "
+          f"{'p50':>7} {'p95':>7} {'p99':>7} {'失败率':>7}")
+    for name, m in sorted(metrics['endpoints'].items(), key=lambda kv: kv[1]['total_time'], reverse=True):
+        degraded = (m['error_rate'] > SOURCE_HEALTH_CONFIG['warn_error_rate']
+                    or (m['p95'] or 0) > SOURCE_HEALTH_CONFIG['warn_p95'])
+        flag = " ⚠️" if degraded else ""
+        print(f"{name:<36} {m['calls']:>5} {m['success']:>5} {m['empty']:>4} {m['error']:>4} {m['timeout']:>4} "
+              f"{m['retries']:>4} {_format_seconds(m['p50']):>7} {_format_seconds(m['p95']):>7} "
+              f"{_format_seconds(m['p99']):>7} {m['error_rate'] * 100:>6.1f}%{flag}")
+
+
+def load_health_log(health_dir=None):
+    """读取指标日志（按运行先后），跳过写到一半的残行"""
+    path = (Path(health_dir) if health_dir else HEALTH_DIR) / HEALTH_LOG.name
+    if not path.exists():
+        return []
+    records = []
+    with open(path, 'r', encoding='utf-8') as f:
+        for line in f:
+            try:
+                records.append(json.loads(line))
+            except ValueError:
+                continue
+    return records
+
+
+def print_trend(records, endpoint=None):
+    """按接口显示最近各次运行的p95延迟和失败率"""
+    records = records[-SOURCE_HEALTH_CONFIG['trend_runs']:]
+    if not records:
+        print("\n暂无数据源健康记录")
+        return
+
+    names = []
+    for record in records:
+        for name in record['endpoints']:
+            if name not in names and (endpoint is None or name == endpoint):
+                names.append(name)
+
+    print("\n" + "=" * 70)
+    print(f"📡 【数据源健康走势】最近 {len(records)} 次运行（p95延迟 / 失败率）")
+    print("=" * 70)
+    for name in names:
+        print(f"\n📋 {name}")
+        for record in records:
+            m = record['endpoints'].get(name)
+            if m is None:
+                continue
+            print(f"   {record['batch_id']:<18} {record['script']:<26} {m['calls']:>5}次 "
+                  f"p95 {_format_seconds(m['p95']):>7} | 失败率 {m['error_rate'] * 100:>5.1f}% | 重试 {m['retries']}")
+
+
+def main():
+    """命令行入口"""
+    args = sys.argv[1:]
+    if not args:
+        print(__doc__)
+        return
+
+    command = args[0]
+    if command == 'show':
+        if len(args) > 1:
+            path = HEALTH_DIR / f"health_{args[1]}.json"
+        else:
+            paths = sorted(HEALTH_DIR.glob("health_*.json"))
+            path = paths[-1] if paths else None
+        if path is None or not path.exists():
+            print("\n暂无数据源健康记录")
+            return
+        with open(path, 'r', encoding='utf-8') as f:
+            metrics = json.load(f)
+        print(f"\n批次: {metrics['batch_id']} | {metrics['script']} | {metrics['started_at']}")
+        print_health_report(metrics)
+    elif command == 'trend':
+        print_trend(load_health_log(), args[1] if len(args) > 1 else None)
+    else:
+        print(__doc__)
+
+
+if __name__ == "__main__":
+    main()
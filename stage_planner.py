@@ -0,0 +1,169 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+筛选阶段代价规划 v1.0
+
+问题背景：
+scan_stock_v9 的筛选步骤按固定顺序执行，第1.5步（月涨幅）、第5步（资金流向）、第6/7/9步
+都要逐只股票下载日K线或查询资金数据，却排在只用实时行情就能判断的第8步（涨幅 > 大盘+2%）之前，
+大量最终会被第8步淘汰的股票先付出了下载K线的代价。
+
+原理：
+1. 每个阶段声明：单只股票代价（cost）、所需数据（data）、预期通过率（selectivity）、
+   依赖的列（requires）和新增的列（produces）
+2. 各阶段都是逐行判断的独立条件（一只股票是否保留只取决于它自己和全市场数据），
+   条件的交集与执行顺序无关，调整顺序不会改变最终入选集合
+3. 独立条件的最优顺序按 cost / (1 - selectivity) 从小到大排列：便宜、淘汰率高的先执行；
+   有列依赖的阶段只有在依赖满足后才可被选择（贪心拓扑排序）
+4. 阶段之间的先后按声明通过率规划；同类数据（data 相同）的阶段之间再按实测通过率调整先后。
+   剖析文件（run_profiler）中的 rows_out / rows_in 是"经过之前各阶段之后"的条件通过率，
+   只统计该阶段在同类阶段中最先执行的运行（此时各同类阶段的前置条件相同，实测值可以互相比较），
+   也不用它替换声明值去和其他类别的阶段比较，避免规划随执行顺序漂移
+
+说明：
+规划只改变筛选条件的执行顺序，不改变任何条件本身；评分类步骤（主题、综合分析）不参与规划，始终在最后执行。
+"""
+
+import json
+from pathlib import Path
+
+# ============================================================
+# 规划配置
+# ============================================================
+PLANNER_CONFIG = {
+    "enabled": True,  # 关闭后按声明顺序执行（与v9.1及之前的固定顺序一致）
+    "learn_selectivity": True,  # 是否使用剖析文件中的实测通过率
+    "history_runs": 10,  # 统计实测通过率使用的最近运行次数
+    "min_rows": 20,  # 输入行数少于此值的阶段记录不参与统计（样本太少）
+}
+
+MIN_REJECT_RATE = 0.001  # 通过率接近1时的淘汰率下限，避免除零
+
+
+def stage_rank(stage, selectivity=None):
+    """排序键：单只股票代价 / 淘汰率，越小越先执行"""
+    s = stage['selectivity'] if selectivity is None else selectivity
+    return stage['cost'] / max(1.0 - s, MIN_REJECT_RATE)
+
+
+def _peers(stages):
+    """阶段名 → 同类数据（data 相同）的其他阶段名集合"""
+    groups = {}
+    for stage in stages:
+        groups.setdefault(stage.get('data'), set()).add(stage['name'])
+    return {stage['name']: groups[stage.get('data')] - {stage['name']} for stage in stages}
+
+
+def observed_selectivity(script, stages, profile_dir=None, runs=None):
+    """
+    从最近的剖析文件统计各阶段实测通过率
+
+    只统计该阶段在同类阶段中最先执行的记录（剖析记录的 after 中没有同类阶段）；
+    没有 after 的记录（无法判断执行位置）不参与统计
+
+    返回：{阶段名: 平均通过率}（rows_out / rows_in）
+    """
+    import run_profiler
+
+    profile_dir = Path(profile_dir) if profile_dir else run_profiler.PROFILE_DIR
+    runs = runs or PLANNER_CONFIG['history_runs']
+    peers = _peers(stages)
+    ratios = {}
+    for path in sorted(profile_dir.glob("profile_*.json"), reverse=True):
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                profile = json.load(f)
+        except Exception:
+            continue
+        if profile.get('script') != script:
+            continue
+        for record in profile.get('stages', []):
+            name, after = record.get('name'), record.get('after')
+            if name not in peers or after is None or peers[name] & set(after):
+                continue
+            rows_in, rows_out = record.get('rows_in'), record.get('rows_out')
+            if rows_in and rows_out is not None and rows_in >= PLANNER_CONFIG['min_rows']:
+                ratios.setdefault(name, []).append(rows_out / rows_in)
+        runs -= 1
+        if runs <= 0:
+            break
+    return {name: sum(values) / len(values) for name, values in ratios.items()}
+
+
+def _dependencies_met(plan, base_columns):
+    """计划中每个阶段依赖的列是否都在它之前产生（或输入已有、或不由任何阶段产生）"""
+    produced_by = {col: stage['name'] for stage in plan for col in stage.get('produces', [])}
+    available = set(base_columns) if base_columns is not None else set()
+    done = set()
+    for stage in plan:
+        if not all(col in available or produced_by.get(col) in done or col not in produced_by
+                   for col in stage.get('requires', [])):
+            return False
+        done.add(stage['name'])
+    return True
+
+
+def plan_order(stages, base_columns=None, selectivity=None):
+    """
+    规划筛选阶段的执行顺序
+
+    参数：
+    - stages: 阶段声明列表（按声明顺序），每项含 name/cost/selectivity/data，可选 requires/produces
+    - base_columns: 输入DataFrame已有的列（requires 中不在这里、也不由其他阶段产生的列视为已满足）
+    - selectivity: {阶段名: 实测通过率}，只用于调整同类数据阶段之间的先后
+
+    返回：按执行顺序排列的阶段列表（每项附加 'planned_selectivity' 和 'rank'）
+    """
+    selectivity = selectivity or {}
+    if not PLANNER_CONFIG['enabled']:
+        return [dict(stage, planned_selectivity=stage['selectivity'], rank=None) for stage in stages]
+
+    # 1. 按声明通过率贪心拓扑排序
+    produced_by = {}
+    for stage in stages:
+        for col in stage.get('produces', []):
+            produced_by[col] = stage['name']
+
+    available = set(base_columns) if base_columns is not None else set()
+    done = set()
+    remaining = list(stages)
+    order = []
+    while remaining:
+        ready = [
+            stage for stage in remaining
+            if all(col in available or produced_by.get(col) in done or col not in produced_by
+                   for col in stage.get('requires', []))
+        ]
+        if not ready:
+            # 依赖无法满足（声明有误）时按声明顺序执行剩余阶段
+            ready = remaining[:1]
+        best = min(ready, key=lambda st: (stage_rank(st), stages.index(st)))
+        order.append(best)
+        remaining.remove(best)
+        done.add(best['name'])
+        available.update(best.get('produces', []))
+
+    # 2. 同类数据阶段在各自占据的位置上按实测通过率重新排列（依赖不满足时保持原顺序）
+    def learned_rank(stage):
+        return stage_rank(stage, selectivity.get(stage['name']))
+
+    for data in {stage.get('data') for stage in order}:
+        slots = [i for i, stage in enumerate(order) if stage.get('data') == data]
+        group = sorted((order[i] for i in slots), key=lambda st: (learned_rank(st), order.index(st)))
+        candidate = list(order)
+        for i, stage in zip(slots, group):
+            candidate[i] = stage
+        if _dependencies_met(candidate, base_columns):
+            order = candidate
+
+    return [dict(stage, planned_selectivity=selectivity.get(stage['name'], stage['selectivity']),
+                 rank=learned_rank(stage)) for stage in order]
+
+
+def expected_cost(plan, rows):
+    """按通过率估算一份计划的总代价（单只股票代价 × 到达该阶段的预期行数）"""
+    total = 0.0
+    for stage in plan:
+        total += stage['cost'] * rows
+        rows *= stage.get('planned_selectivity', stage['selectivity'])
+    return total
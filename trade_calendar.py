@@ -0,0 +1,232 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+本地交易日历 v1.0
+
+问题背景：
+各脚本的日期窗口都按自然日估算：日K线多取30个自然日（timedelta(days=days+30)）、
+龙虎榜回溯 timedelta(days=lookback_days)、"3个自然日内视为连续上榜"，
+回测再按每年250个交易日把自然日换算成K线根数。自然日和交易日之间差着周末和长假，
+窗口要么多取（30日窗口实际下载40多根K线），要么在国庆/春节前后算错；
+选股日期不是交易日时（周末运行），次日涨跌幅直接放弃计算。
+
+功能：
+1. 交易日历：第一次使用时获取全部交易日（新浪交易日历接口），落盘后当月内直接读取本地文件
+2. O(1) 换算：日期 → 交易日序号（非交易日取之前/之后最近的交易日），序号 → 日期
+3. 交易日查询：是否交易日、N个交易日之前/之后的日期、两个日期间隔的交易日数、以某日结束的N根K线窗口起点
+4. 无法获取日历且没有本地文件时按工作日（周一至周五）处理，并给出提示
+
+原理：
+- 交易日列表保存为有序数组，另建"自然日偏移 → 当日或之前最近交易日序号"的查找表（1990年至今约1.3万项），
+  日期和序号互相换算都是一次数组访问
+- 超出日历范围的日期（日历还没有公布的下一年、回测用的截断日历之前）按工作日外推
+
+使用方法：
+    from trade_calendar import load_calendar
+    calendar = load_calendar()
+    calendar.window_start('2026-01-05', 30)     # 截至该日30根日K线的起始交易日
+    calendar.after('2025-09-30', 1)             # 国庆后第一个交易日
+    python trade_calendar.py 20251001 5         # 查看某日前后5个交易日
+"""
+
+import sys
+from datetime import date, datetime, timedelta
+from pathlib import Path
+
+from lazy_import import LazyModule
+
+np = LazyModule('numpy')
+pd = LazyModule('pandas')
+ak = LazyModule('akshare')
+
+# ============================================================
+# 交易日历配置
+# ============================================================
+CALENDAR_FILE = Path(__file__).parent / "selection_history" / "trade_calendar.txt"
+
+CALENDAR_CONFIG = {
+    "max_age_days": 30,  # 本地日历文件的有效期（自然日），过期后重新获取（节假日安排按年公布）
+    "fallback_start": "19901219",  # 按工作日处理时的日历起点（沪市开市日）
+    "future_days": 400,  # 按工作日处理时日历延伸到今天之后的自然日数
+}
+
+_fallback_warned = False
+
+
+def _to_date(value):
+    """把 date/datetime/Timestamp/'YYYYMMDD'/'YYYY-MM-DD' 转为 date"""
+    if isinstance(value, datetime):
+        return value.date()
+    if isinstance(value, date):
+        return value
+    if hasattr(value, 'date') and callable(value.date):
+        return value.date()
+    text = str(value).strip()
+    if len(text) == 8 and text.isdigit():
+        return datetime.strptime(text, '%Y%m%d').date()
+    return datetime.strptime(text[:10], '%Y-%m-%d').date()
+
+
+class TradeCalendar:
+    """
+    交易日历索引
+
+    参数：
+    - dates: 交易日列表（任意可转为日期的值，无需有序、可重复）
+    - source: 日历来源说明（sina / file / weekdays / 其他）
+    """
+
+    def __init__(self, dates, source=None):
+        days = sorted({_to_date(d) for d in dates})
+        if not days:
+            raise ValueError("交易日历为空")
+        self.source = source
+        self.dates = days
+        self.first = days[0]
+        self.last = days[-1]
+        self._base = self.first.toordinal()
+        # 自然日偏移 → 当日或之前最近交易日的序号
+        self._floor = [0] * (self.last.toordinal() - self._base + 1)
+        for i in range(len(days) - 1):
+            start, end = days[i].toordinal() - self._base, days[i + 1].toordinal() - self._base
+            self._floor[start:end] = [i] * (end - start)
+        self._floor[-1] = len(days) - 1
+
+    def __len__(self):
+        return len(self.dates)
+
+    def __repr__(self):
+        return f"<TradeCalendar {self.first}~{self.last} {len(self.dates)}个交易日 来源:{self.source}>"
+
+    # ---------- 日期 ↔ 序号 ----------
+
+    def floor(self, d):
+        """当日或之前最近交易日的序号（早于日历起点时按工作日外推为负数）"""
+        d = _to_date(d)
+        offset = d.toordinal() - self._base
+        if offset < 0:
+            return -int(np.busday_count(d + timedelta(days=1), self.first)) - 1
+        if offset >= len(self._floor):
+            return len(self.dates) - 1 + int(np.busday_count(self.last + timedelta(days=1), d + timedelta(days=1)))
+        return self._floor[offset]
+
+    def ceil(self, d):
+        """当日或之后最近交易日的序号"""
+        d = _to_date(d)
+        i = self.floor(d)
+        return i if self.date_at(i) == d else i + 1
+
+    def date_at(self, i):
+        """序号对应的交易日（超出范围时按工作日外推）"""
+        if 0 <= i < len(self.dates):
+            return self.dates[i]
+        if i < 0:
+            return np.busday_offset(self.first, i, roll='backward').astype(object)
+        return np.busday_offset(self.last, i - len(self.dates) + 1, roll='forward').astype(object)
+
+    # ---------- 交易日查询 ----------
+
+    def is_trading_day(self, d):
+        d = _to_date(d)
+        return self.date_at(self.floor(d)) == d
+
+    def latest(self, d=None):
+        """当日或之前最近的交易日（默认今天）"""
+        return self.date_at(self.floor(d or date.today()))
+
+    def before(self, d, n=1):
+        """d 之前第 n 个交易日（不含 d 当天）"""
+        return self.date_at(self.ceil(d) - n)
+
+    def after(self, d, n=1):
+        """d 之后第 n 个交易日（不含 d 当天）"""
+        return self.date_at(self.floor(d) + n)
+
+    def window_start(self, end, n):
+        """截至 end（当日或之前最近交易日）的 n 根日K线窗口的起始交易日"""
+        return self.date_at(self.floor(end) - max(n, 1) + 1)
+
+    def count(self, start, end):
+        """[start, end] 区间内的交易日数"""
+        return max(self.floor(end) - self.ceil(start) + 1, 0)
+
+    def distance(self, earlier, later):
+        """两个日期相隔的交易日数（later 所在交易日序号 - earlier 所在交易日序号）"""
+        return self.floor(later) - self.floor(earlier)
+
+
+def weekday_calendar(start=None, end=None):
+    """按工作日（周一至周五）生成的日历"""
+    start = _to_date(start or CALENDAR_CONFIG['fallback_start'])
+    end = _to_date(end or date.today() + timedelta(days=CALENDAR_CONFIG['future_days']))
+    return TradeCalendar(pd.bdate_range(start, end).date, source='weekdays')
+
+
+def _read_file(path):
+    with open(path, 'r', encoding='utf-8') as f:
+        return [line.strip() for line in f if line.strip()]
+
+
+def _write_file(path, calendar):
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp_path = path.with_suffix('.txt.tmp')
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        f.write('\n'.join(d.strftime('%Y-%m-%d') for d in calendar.dates))
+    tmp_path.replace(path)
+
+
+def load_calendar(source=None, path=None):
+    """
+    加载交易日历：本地文件（有效期内） → 接口（成功后落盘） → 过期的本地文件 → 工作日
+
+    参数：
+    - source: 行情接口模块（需要 tool_trade_date_hist_sina；默认 akshare，回放/基准测试时传入离线数据源）
+    - path: 本地日历文件（默认 CALENDAR_FILE）
+    """
+    global _fallback_warned
+    path = Path(path or CALENDAR_FILE)
+    stale = None
+    if path.exists():
+        try:
+            cached = TradeCalendar(_read_file(path), source='file')
+            age = (datetime.now() - datetime.fromtimestamp(path.stat().st_mtime)).days
+            if age <= CALENDAR_CONFIG['max_age_days'] and cached.last > date.today():
+                return cached
+            stale = cached
+        except Exception:
+            stale = None
+
+    try:
+        df = (source if source is not None else ak).tool_trade_date_hist_sina()
+        calendar = TradeCalendar(df['trade_date'], source='sina')
+        try:
+            _write_file(path, calendar)
+        except Exception:
+            pass  # 落盘失败不影响使用
+        return calendar
+    except Exception as e:
+        if stale is not None:
+            return stale
+        if not _fallback_warned:
+            print(f"   ⚠️ 无法获取交易日历（{str(e)[:40]}），按工作日计算日期窗口")
+            _fallback_warned = True
+        return weekday_calendar()
+
+
+def main():
+    """命令行入口：python trade_calendar.py 日期 [N]"""
+    args = sys.argv[1:]
+    if not args:
+        print(__doc__)
+        return
+    d = _to_date(args[0])
+    n = int(args[1]) if len(args) > 1 else 5
+    calendar = load_calendar()
+    print(f"📅 {calendar}")
+    print(f"   {d} {'是' if calendar.is_trading_day(d) else '不是'}交易日")
+    print(f"   之前{n}个交易日: {' '.join(str(calendar.before(d, k)) for k in range(n, 0, -1))}")
+    print(f"   之后{n}个交易日: {' '.join(str(calendar.after(d, k)) for k in range(1, n + 1))}")
+
+
+if __name__ == "__main__":
+    main()
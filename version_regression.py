@@ -0,0 +1,497 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+历史版本回归对比 v1.0
+
+问题背景：
+release_history/ 保存了 scan_stock_v2 ~ v8 和旧版四日形态选股脚本，每个版本都调整过阈值和权重，
+但各版本只能在各自发布当天联网运行，从来没有在同一份数据上比较过，
+无法量化某次发布对运行速度和选股命中率的影响。
+
+功能：
+1. 同一数据：所有版本读取同一份离线数据——合成行情（固定随机种子），
+   或 market_archive 中某一天某一时刻的归档快照 + bar_store 日K线（时点回放）
+2. 断网运行：加载各版本时把 akshare 替换为离线数据源，不提供的接口（板块成分、个股历史资金流等）
+   一律返回空表，不会访问网络
+3. 互不干扰：每个版本从源文件重新加载，历史记录/缓存等目录全部指向临时目录，不改动仓库中的任何文件
+4. 对比报告：各版本耗时、接口调用次数、入选数量、与基准版本的重合/新增/移除，逐只股票对比排名和评分；
+   回放模式下用日K线计算入选股票的次日/3日收益和胜率
+5. 结果保存：regression_results/regress_{数据标识}_{时间}.csv（逐只入选明细）和 .json（汇总）
+
+说明：
+- 第一个版本作为基准，其余版本与它比较
+- 合成行情没有"次日"数据，只对比速度和选股差异；命中率需要使用回放模式
+- 旧版本 output_result 会打印并写历史文件，回归运行时替换为只收集结果
+
+使用方法：
+    python version_regression.py list                               # 列出可对比的版本
+    python version_regression.py run                                # 全部版本，合成行情
+    python version_regression.py run v8 v9 --size 2000              # 指定版本和合成规模
+    python version_regression.py run v7 v8 v9 --replay 20260115     # 回放归档数据（含次日命中率）
+    python version_regression.py run v8 v9 --replay 20260115 --at 1430  # 回放指定时刻的快照
+"""
+
+import builtins
+import importlib.util
+import io
+import json
+import shutil
+import sys
+import tempfile
+import threading
+import time
+from contextlib import redirect_stdout
+from datetime import datetime
+from pathlib import Path
+
+import pandas as pd
+import numpy as np
+import warnings
+from benchmark_stages import SyntheticMarket, ReplayMarket
+from frame_schema import widen_for_output
+from run_profiler import InstrumentedModule
+warnings.filterwarnings('ignore')
+
+# ============================================================
+# 回归对比配置
+# ============================================================
+ROOT_DIR = Path(__file__).parent
+REGRESSION_DIR = ROOT_DIR / "regression_results"  # 结果保存目录
+
+# 版本标识: (源文件相对路径, 说明)
+VERSIONS = {
+    'v2': ('release_history/scan_stock_v2.py', '次日冲高 v2'),
+    'v3': ('release_history/scan_stock_v3.py', '次日冲高 v3'),
+    'v4': ('release_history/scan_stock_v4.py', '次日冲高 v4 资金流向'),
+    'v5': ('release_history/scan_stock_v5.py', '次日冲高 v5 板块筛选'),
+    'v6': ('release_history/scan_stock_v6.py', '次日冲高 v6 资金一致性'),
+    'v7': ('release_history/scan_stock_v7.py', '次日冲高 v7 三维度'),
+    'v8': ('release_history/scan_stock_v8.py', '次日冲高 v8 精准剪枝'),
+    'v9': ('scan_stock_v9.py', '次日冲高 v9 游资追踪（当前）'),
+    'p2.0': ('release_history/select_stock_v2_4day_pattern.py', '四日形态 v2.0'),
+    'p2.2': ('select_stock_v2_enhanced.py', '四日形态 v2.2（当前）'),
+}
+
+REGRESSION_CONFIG = {
+    "size": 1000,  # 合成行情股票数
+    "forward_days": [1, 3],  # 回放模式下计算的持有天数
+    "score_columns": ['综合评分', '信号强度', '主题得分'],  # 依次取第一个存在的列作为评分
+    "report_rows": 30,  # 逐只对比表最多显示的股票数
+    "continue_on_weak_market": True,  # v8起市场情绪低迷时会询问是否继续，回归时一律继续以便对比选股
+}
+
+# 当前版本依赖的共享模块路径，运行期间指向临时目录
+SHARED_PATHS = [
+    ('history_store', 'HISTORY_DB', 'selection_history/history.db'),
+    ('feature_store', 'FEATURE_STORE_DIR', 'feature_store'),
+    ('market_archive', 'ARCHIVE_DIR', 'market_archive'),
+    ('run_profiler', 'PROFILE_DIR', 'selection_history'),
+    ('source_health', 'HEALTH_DIR', 'selection_history'),
+    ('market_data', 'HOT_MONEY_CACHE_DIR', 'hot_money_cache'),
+    ('market_data', 'KLINE_CACHE_DIR', 'kline_cache'),
+    ('checkpoint', 'CHECKPOINT_DIR', 'selection_history/checkpoints'),
+    ('trade_calendar', 'CALENDAR_FILE', 'selection_history/trade_calendar.txt'),
+]
+
+# 离线数据源不提供、直接返回空表的接口（旧版本在主题匹配/板块筛选/资金持续性中调用）
+EMPTY_ENDPOINTS = {
+    'stock_board_concept_name_em': ['板块名称', '板块代码'],
+    'stock_board_industry_name_em': ['板块名称', '板块代码'],
+    'stock_board_concept_cons_em': ['代码', '名称'],
+    'stock_board_industry_cons_em': ['代码', '名称'],
+    'stock_individual_fund_flow': ['日期', '主力净流入-净额', '主力净流入-净占比'],
+}
+
+
+# ============================================================
+# 离线数据源
+# ============================================================
+
+class OfflineSource:
+    """
+    离线akshare替身
+
+    转发到合成/回放行情，按接口统计调用次数（线程安全）；
+    EMPTY_ENDPOINTS 中的接口返回空表，其余未知接口抛出 NotImplementedError
+    （不用ConnectionError，避免当前版本的数据源健康监控按网络故障重试）。
+    """
+
+    def __init__(self, market):
+        self._market = market
+        self._lock = threading.Lock()
+        self.calls = {}
+        self.unsupported = set()
+
+    def reset(self):
+        with self._lock:
+            self.calls = {}
+            self.unsupported = set()
+
+    def _count(self, name):
+        with self._lock:
+            self.calls[name] = self.calls.get(name, 0) + 1
+
+    def __getattr__(self, name):
+        if name.startswith('__'):
+            raise AttributeError(name)
+        target = getattr(self._market, name, None)
+        if target is None and name in EMPTY_ENDPOINTS:
+            columns = EMPTY_ENDPOINTS[name]
+            target = lambda *args, **kwargs: pd.DataFrame(columns=columns)
+
+        def call(*args, **kwargs):
+            self._count(name)
+            if target is None:
+                with self._lock:
+                    self.unsupported.add(name)
+                raise NotImplementedError(f"离线回归不提供接口: {name}")
+            return target(*args, **kwargs)
+        return call
+
+
+# ============================================================
+# 加载与运行
+# ============================================================
+
+def load_version(key, work_dir, source):
+    """
+    从源文件重新加载一个版本
+
+    加载前把模块的 __file__ 指向临时目录，模块级的 Path(__file__).parent / "..." 目录
+    （历史记录、游资缓存、K线缓存等）因此全部落在临时目录；import akshare 得到的是离线数据源。
+    """
+    rel_path = VERSIONS[key][0]
+    module_name = f"_regress_{key.replace('.', '_')}"
+    spec = importlib.util.spec_from_file_location(module_name, ROOT_DIR / rel_path)
+    module = importlib.util.module_from_spec(spec)
+    module.__file__ = str(work_dir / rel_path)
+    (work_dir / rel_path).parent.mkdir(parents=True, exist_ok=True)
+
+    saved = sys.modules.get('akshare')
+    sys.modules['akshare'] = source
+    try:
+        spec.loader.exec_module(module)
+    finally:
+        if saved is not None:
+            sys.modules['akshare'] = saved
+        else:
+            sys.modules.pop('akshare', None)
+    if isinstance(getattr(module, 'ak', None), InstrumentedModule):
+        module.ak = InstrumentedModule(source)  # 当前版本保留接口剖析和健康统计
+    else:
+        module.ak = source
+    return module
+
+
+def _score_column(df):
+    for col in REGRESSION_CONFIG['score_columns']:
+        if col in df.columns:
+            return col
+    return None
+
+
+def _normalize_selection(df):
+    """入选结果统一为 [排名, 代码, 名称, 评分, 评级]"""
+    if df is None or df.empty:
+        return pd.DataFrame(columns=['排名', '代码', '名称', '评分', '评级'])
+    df = widen_for_output(df).reset_index(drop=True)
+    score_col = _score_column(df)
+    rating_col = next((c for c in ['综合评级', '评级'] if c in df.columns), None)
+    return pd.DataFrame({
+        '排名': np.arange(1, len(df) + 1),
+        '代码': df['代码'].astype(str).values,
+        '名称': df['名称'].astype(str).values if '名称' in df.columns else '',
+        '评分': pd.to_numeric(df[score_col], errors='coerce').values if score_col else np.nan,
+        '评级': df[rating_col].astype(str).values if rating_col else '',
+    })
+
+
+def _answer_prompt(prompt=''):
+    """流程中的交互：情绪低迷时按配置继续，其余一律取默认值"""
+    if '继续选股' in str(prompt) and REGRESSION_CONFIG['continue_on_weak_market']:
+        return 'yes'
+    return ''
+
+
+def run_version(key, source, work_dir, as_of=None):
+    """
+    在离线数据上运行一个版本的完整流程
+
+    返回：{version, label, seconds, cpu, api_calls, endpoints, unsupported, error, selections, log_tail}
+    """
+    result = {'version': key, 'label': VERSIONS[key][1], 'error': None}
+    log = io.StringIO()
+    captured = []
+    saved_input = builtins.input
+    builtins.input = _answer_prompt
+
+    try:
+        with redirect_stdout(log):
+            module = load_version(key, work_dir, source)
+            screener = module.StockScreener()
+            if as_of is not None:
+                # 月份主题按回放日期取，与当天实际运行一致
+                screener.current_month = as_of.month
+                screener.theme = module.MONTHLY_THEMES.get(as_of.month, {})
+            screener.output_result = lambda df: captured.append(df)
+
+            source.reset()
+            wall_start = time.perf_counter()
+            cpu_start = time.process_time()
+            try:
+                screener.run()
+            except Exception as e:
+                result['error'] = f"{type(e).__name__}: {str(e)[:80]}"
+            result['seconds'] = time.perf_counter() - wall_start
+            result['cpu'] = time.process_time() - cpu_start
+    except Exception as e:
+        result['error'] = f"加载失败 {type(e).__name__}: {str(e)[:80]}"
+        result['seconds'] = result['cpu'] = 0.0
+    finally:
+        builtins.input = saved_input
+
+    result['api_calls'] = sum(source.calls.values())
+    result['endpoints'] = dict(source.calls)
+    result['unsupported'] = sorted(source.unsupported)
+    result['selections'] = _normalize_selection(captured[-1] if captured else None)
+    result['log_tail'] = log.getvalue()[-2000:]
+    return result
+
+
+def forward_returns(codes, replay_date, bar_store, days=None):
+    """
+    回放日收盘买入、持有N个交易日的收益（%）
+
+    返回：DataFrame(index=代码, columns=['{N}日收益', ...])，没有后续K线的为NaN
+    """
+    days = days or REGRESSION_CONFIG['forward_days']
+    rows = {}
+    for code in set(codes):
+        df = bar_store.get(code)
+        row = {f"{n}日收益": np.nan for n in days}
+        if df is not None and not df.empty:
+            close = pd.to_numeric(df['收盘'], errors='coerce').to_numpy()
+            pos = int((df['日期'] <= replay_date).sum()) - 1
+            if pos >= 0 and close[pos] > 0:
+                for n in days:
+                    if pos + n < len(close):
+                        row[f"{n}日收益"] = (close[pos + n] / close[pos] - 1) * 100
+        rows[code] = row
+    return pd.DataFrame.from_dict(rows, orient='index')
+
+
+# ============================================================
+# 对比与报告
+# ============================================================
+
+def compare_versions(results, forward=None):
+    """
+    汇总各版本结果
+
+    返回：(summary列表, 逐只入选明细DataFrame)
+    """
+    base = results[0]
+    base_codes = set(base['selections']['代码'])
+    summary = []
+    frames = []
+
+    for r in results:
+        sel = r['selections'].copy()
+        codes = set(sel['代码'])
+        item = {
+            'version': r['version'],
+            'label': r['label'],
+            'seconds': round(r['seconds'], 3),
+            'cpu': round(r['cpu'], 3),
+            'api_calls': r['api_calls'],
+            'selected': len(sel),
+            'common_with_base': len(codes & base_codes),
+            'added_vs_base': sorted(codes - base_codes),
+            'removed_vs_base': sorted(base_codes - codes),
+            'jaccard_vs_base': len(codes & base_codes) / len(codes | base_codes) if codes | base_codes else 1.0,
+            'unsupported': r['unsupported'],
+            'error': r['error'],
+        }
+        if forward is not None and not sel.empty:
+            sel = sel.join(forward, on='代码')
+            for col in forward.columns:
+                valid = sel[col].dropna()
+                item[f'{col}_均值'] = round(float(valid.mean()), 3) if not valid.empty else None
+                item[f'{col}_胜率'] = round(float((valid > 0).mean() * 100), 1) if not valid.empty else None
+        summary.append(item)
+        sel.insert(0, '版本', r['version'])
+        frames.append(sel)
+
+    details = pd.concat(frames, ignore_index=True) if frames else pd.DataFrame()
+    return summary, details
+
+
+def print_report(summary, details, forward_columns=None, data_tag=''):
+    """打印版本对比报告"""
+    base = summary[0]['version']
+    print("\n" + "=" * 90)
+    print(f"🧪 【历史版本回归对比】数据: {data_tag} | 基准版本: {base}")
+    print("=" * 90)
+
+    header = f"{'版本':<6} {'说明':<22} {'耗时':>8} {'接口':>6} {'入选':>5} {'重合':>5} {'新增':>5} {'移除':>5}"
+    for col in forward_columns or []:
+        header += f" {col + '均值':>9} {col + '胜率':>9}"
+    print(header)
+    print("-" * 90)
+    for item in summary:
+        line = (f"{item['version']:<6} {item['label'][:20]:<22} {item['seconds']:>7.1f}s {item['api_calls']:>6} "
+                f"{item['selected']:>5} {item['common_with_base']:>5} {len(item['added_vs_base']):>5} "
+                f"{len(item['removed_vs_base']):>5}")
+        for col in forward_columns or []:
+            avg, win = item.get(f'{col}_均值'), item.get(f'{col}_胜率')
+            line += f" {f'{avg:+.2f}%' if avg is not None else 'N/A':>9} {f'{win:.1f}%' if win is not None else 'N/A':>9}"
+        print(line)
+
+    problems = [item for item in summary if item['error'] or item['unsupported']]
+    if problems:
+        print("\n⚠️ 运行提示:")
+        for item in problems:
+            if item['error']:
+                print(f"   {item['version']}: {item['error']}")
+            if item['unsupported']:
+                print(f"   {item['version']}: 离线不提供的接口（按失败处理）: {', '.join(item['unsupported'])}")
+
+    if details.empty:
+        print("\n🔴 所有版本均无入选股票")
+        return
+
+    # 逐只对比：每个版本的排名/评分
+    versions = [item['version'] for item in summary]
+    pivot_rank = details.pivot_table(index='代码', columns='版本', values='排名', aggfunc='first')
+    pivot_score = details.pivot_table(index='代码', columns='版本', values='评分', aggfunc='first')
+    names = details.drop_duplicates('代码').set_index('代码')['名称']
+    order = pivot_rank.notna().sum(axis=1).sort_values(ascending=False).index[:REGRESSION_CONFIG['report_rows']]
+
+    print(f"\n📋 逐只对比（排名/评分，'-'为未入选，按入选版本数排序，最多{REGRESSION_CONFIG['report_rows']}只）")
+    print(f"{'代码':<8} {'名称':<10}" + "".join(f" {v:>12}" for v in versions))
+    for code in order:
+        cells = []
+        for v in versions:
+            rank = pivot_rank.at[code, v] if v in pivot_rank.columns else np.nan
+            score = pivot_score.at[code, v] if v in pivot_score.columns else np.nan
+            if pd.isna(rank):
+                cells.append('-')
+            else:
+                cells.append(f"#{int(rank)}/{score:.1f}" if pd.notna(score) else f"#{int(rank)}")
+        print(f"{code:<8} {str(names.get(code, ''))[:8]:<10}" + "".join(f" {c:>12}" for c in cells))
+
+    print("\n" + "=" * 90)
+
+
+def save_results(summary, details, data_tag):
+    """保存汇总JSON和逐只明细CSV，返回(json路径, csv路径)"""
+    REGRESSION_DIR.mkdir(parents=True, exist_ok=True)
+    stem = f"regress_{data_tag}_{datetime.now().strftime('%Y%m%d_%H%M%S')}"
+    json_path = REGRESSION_DIR / f"{stem}.json"
+    csv_path = REGRESSION_DIR / f"{stem}.csv"
+    with open(json_path, 'w', encoding='utf-8') as f:
+        json.dump({'data': data_tag, 'created_at': datetime.now().strftime('%Y-%m-%d %H:%M:%S'),
+                   'versions': summary}, f, ensure_ascii=False, indent=2)
+    details.to_csv(csv_path, index=False, encoding='utf-8-sig')
+    return json_path, csv_path
+
+
+def run_regression(versions=None, size=None, replay_date=None, at_time=None):
+    """
+    在同一份离线数据上依次运行各版本并对比
+
+    参数：
+    - versions: 版本标识列表（第一个为基准），None表示全部
+    - size: 合成行情股票数（回放模式下为最多股票数）
+    - replay_date / at_time: 回放归档数据的日期和时刻，None表示使用合成行情
+    """
+    versions = versions or list(VERSIONS)
+    unknown = [v for v in versions if v not in VERSIONS]
+    if unknown:
+        raise ValueError(f"未知版本: {', '.join(unknown)}（python version_regression.py list 查看）")
+    size = size or REGRESSION_CONFIG['size']
+
+    if replay_date:
+        market = ReplayMarket(size, replay_date, at_time)
+        as_of = market.replay_date
+        data_tag = f"replay{as_of.strftime('%Y%m%d')}"
+    else:
+        market = SyntheticMarket(size)
+        as_of = None
+        data_tag = f"synthetic{size}"
+
+    source = OfflineSource(market)
+    work_dir = Path(tempfile.mkdtemp(prefix="regress_"))
+    saved_paths = []
+    for module_name, attr, rel_path in SHARED_PATHS:
+        module = importlib.import_module(module_name)
+        saved_paths.append((module, attr, getattr(module, attr)))
+        setattr(module, attr, work_dir / "shared" / rel_path)
+
+    results = []
+    try:
+        for key in versions:
+            print(f"⏳ 正在运行 {key}（{VERSIONS[key][1]}）...")
+            r = run_version(key, source, work_dir / key, as_of)
+            status = f"❌ {r['error']}" if r['error'] else f"入选 {len(r['selections'])} 只"
+            print(f"   {status} | 耗时 {r['seconds']:.1f}s | 接口调用 {r['api_calls']} 次")
+            results.append(r)
+    finally:
+        for module, attr, value in saved_paths:
+            setattr(module, attr, value)
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+    forward = None
+    if replay_date:
+        codes = set().union(*[set(r['selections']['代码']) for r in results])
+        forward = forward_returns(codes, as_of, market.bar_store) if codes else None
+
+    summary, details = compare_versions(results, forward)
+    print_report(summary, details, list(forward.columns) if forward is not None else None, data_tag)
+    json_path, csv_path = save_results(summary, details, data_tag)
+    print(f"\n💾 对比结果已保存: {json_path.name} / {csv_path.name}")
+    return summary, details
+
+
+def main():
+    """命令行入口"""
+    args = sys.argv[1:]
+    if not args:
+        print(__doc__)
+        return
+
+    command = args[0]
+    if command == 'list':
+        print("\n可对比的版本：")
+        for key, (rel_path, label) in VERSIONS.items():
+            print(f"   {key:<6} {label:<24} {rel_path}")
+        return
+    if command != 'run':
+        print(__doc__)
+        return
+
+    versions, size, replay_date, at_time = [], None, None, None
+    rest = args[1:]
+    i = 0
+    while i < len(rest):
+        if rest[i] == '--size' and i + 1 < len(rest):
+            size = int(rest[i + 1])
+            i += 2
+        elif rest[i] == '--replay' and i + 1 < len(rest):
+            replay_date = rest[i + 1]
+            i += 2
+        elif rest[i] == '--at' and i + 1 < len(rest):
+            at_time = rest[i + 1]
+            i += 2
+        else:
+            versions.append(rest[i])
+            i += 1
+
+    try:
+        run_regression(versions or None, size, replay_date, at_time)
+    except ValueError as e:
+        print(f"❌ {e}")
+
+
+if __name__ == "__main__":
+    main()
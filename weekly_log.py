@@ -0,0 +1,213 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+周选股记录日志 v1.0（只追加）
+
+问题背景：
+原来的 _save_to_weekly_record 每次都要读出整个 week_*.json，列表扫描去重、更新 all_stocks 计数后再整体重写。
+scan_stock_v9 和 select_stock_v2_enhanced 共用 selection_history 目录，两个筛选器同时运行时，
+后写入的一方会覆盖先写入的一方，造成选股记录丢失。
+
+原理：
+1. 只追加的事件日志：每次选股只向 week_{周编号}.jsonl 追加一行，
+   使用 O_APPEND 单次写入，多进程同时追加也不会互相覆盖，写入耗时与历史长度无关
+2. 物化周汇总：week_{周编号}.json 保持原有结构（daily_records / all_stocks），
+   只在读取时发现日志比汇总新才重建，先写临时文件再原子替换
+3. 兼容旧文件：只有 week_*.json 没有日志的旧周记录，首次追加时独占创建日志并把旧的每日记录转写进去（只迁移一次）
+
+目录结构：
+selection_history/weekly/
+    week_2026_W03.jsonl   # 事件日志（每行一次选股）
+    week_2026_W03.json    # 物化汇总（自动重建，可随时删除）
+"""
+
+import json
+import os
+from datetime import datetime
+from pathlib import Path
+
+# ============================================================
+# 周记录配置
+# ============================================================
+WEEKLY_DIR = Path(__file__).parent / "selection_history" / "weekly"  # 周记录保存目录
+
+
+def get_week_number(date_str=None):
+    """获取周编号（格式：2024_W01）"""
+    if date_str:
+        dt = datetime.strptime(date_str, '%Y-%m-%d')
+    else:
+        dt = datetime.now()
+    year, week, _ = dt.isocalendar()
+    return f"{year}_W{week:02d}"
+
+
+def _json_default(value):
+    """numpy标量转为Python原生类型"""
+    if hasattr(value, 'item'):
+        return value.item()
+    return str(value)
+
+
+class WeeklyLog:
+    """周选股记录（只追加日志 + 物化汇总）"""
+
+    def __init__(self, weekly_dir=None):
+        self.weekly_dir = Path(weekly_dir) if weekly_dir else WEEKLY_DIR
+        self.weekly_dir.mkdir(parents=True, exist_ok=True)
+
+    def _log_path(self, week_number):
+        return self.weekly_dir / f"week_{week_number}.jsonl"
+
+    def _summary_path(self, week_number):
+        return self.weekly_dir / f"week_{week_number}.json"
+
+    def _append_line(self, path, record):
+        """以单次O_APPEND写入追加一行（多进程并发追加安全）"""
+        line = (json.dumps(record, ensure_ascii=False, default=_json_default) + "\n").encode('utf-8')
+        fd = os.open(path, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+        try:
+            os.write(fd, line)
+        finally:
+            os.close(fd)
+
+    def append(self, selection_data, source):
+        """
+        追加一次选股记录，返回周编号
+
+        参数：
+        - selection_data: 批次字典（batch_id, selection_date, stocks, ...）
+        - source: 来源脚本（如 'scan_stock_v9'）
+        """
+        week_number = get_week_number(selection_data['selection_date'])
+        log_path = self._log_path(week_number)
+        if not log_path.exists():
+            self._migrate_legacy(week_number)
+
+        record = {
+            'date': selection_data['selection_date'],
+            'batch_id': selection_data['batch_id'],
+            'source': source,
+            'stock_count': selection_data['stock_count'],
+            'stocks': [{'code': s['code'], 'name': s['name'], 'price': s['selection_price'],
+                        'rating': s['rating']} for s in selection_data['stocks']]
+        }
+        self._append_line(log_path, record)
+        return week_number
+
+    def _migrate_legacy(self, week_number):
+        """
+        旧版只有week_*.json的周记录，把其中的每日记录转写为日志
+
+        日志文件以独占方式（O_EXCL）创建，只有创建成功的进程执行迁移，旧记录一次写入；
+        多个进程同时首次追加时，其他进程看到日志已存在直接返回，旧记录不会重复转写
+        """
+        summary_path = self._summary_path(week_number)
+        if not summary_path.exists():
+            return
+        try:
+            with open(summary_path, 'r', encoding='utf-8') as f:
+                legacy = json.load(f)
+            if 'log_size' in legacy:
+                return
+            lines = "".join(
+                json.dumps({**daily_record, 'source': 'legacy'}, ensure_ascii=False, default=_json_default) + "\n"
+                for daily_record in legacy.get('daily_records', [])
+            ).encode('utf-8')
+            try:
+                fd = os.open(self._log_path(week_number), os.O_WRONLY | os.O_APPEND | os.O_CREAT | os.O_EXCL, 0o644)
+            except FileExistsError:
+                return  # 其他进程已创建日志（并完成迁移）
+            try:
+                os.write(fd, lines)
+            finally:
+                os.close(fd)
+        except Exception as e:
+            print(f"   ⚠️ 迁移旧周记录{summary_path.name}失败: {e}")
+
+    def _read_log(self, log_path):
+        """读取日志，跳过写到一半的残行"""
+        records = []
+        with open(log_path, 'r', encoding='utf-8') as f:
+            for line in f:
+                try:
+                    records.append(json.loads(line))
+                except ValueError:
+                    continue
+        return records
+
+    def _build_summary(self, week_number, records):
+        """由日志记录物化周汇总（与原week_*.json结构一致）"""
+        summary = {
+            'week_number': week_number,
+            'start_date': '',
+            'end_date': '',
+            'daily_records': [],
+            'all_stocks': {}  # 记录本周所有被选中的股票及其出现次数
+        }
+        seen_dates = set()
+
+        for record in records:
+            current_date = record['date']
+            if not summary['start_date'] or current_date < summary['start_date']:
+                summary['start_date'] = current_date
+            if not summary['end_date'] or current_date > summary['end_date']:
+                summary['end_date'] = current_date
+
+            # 每天只保留第一条每日记录
+            if current_date not in seen_dates:
+                seen_dates.add(current_date)
+                summary['daily_records'].append({k: v for k, v in record.items() if k != 'source'})
+
+            # 股票出现统计（同日重复不计）
+            for stock in record['stocks']:
+                info = summary['all_stocks'].setdefault(stock['code'], {
+                    'name': stock['name'],
+                    'appearances': [],
+                    'count': 0
+                })
+                if current_date not in info['appearances']:
+                    info['appearances'].append(current_date)
+                    info['count'] += 1
+
+        return summary
+
+    def load_summary(self, week_number):
+        """
+        读取周汇总，日志比汇总新时先重建
+
+        返回：周汇总字典，没有该周记录时返回None
+        """
+        log_path = self._log_path(week_number)
+        summary_path = self._summary_path(week_number)
+
+        if not log_path.exists():
+            # 旧版周记录（无日志）直接读取
+            if summary_path.exists():
+                with open(summary_path, 'r', encoding='utf-8') as f:
+                    return json.load(f)
+            return None
+
+        log_size = log_path.stat().st_size
+        if summary_path.exists():
+            try:
+                with open(summary_path, 'r', encoding='utf-8') as f:
+                    summary = json.load(f)
+                if summary.get('log_size') == log_size:
+                    return summary
+            except Exception:
+                pass
+
+        summary = self._build_summary(week_number, self._read_log(log_path))
+        summary['log_size'] = log_size
+
+        tmp_path = summary_path.with_name(f"{summary_path.name}.{os.getpid()}.tmp")
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(summary, f, ensure_ascii=False, indent=2, default=_json_default)
+        os.replace(tmp_path, summary_path)
+        return summary
+
+    def list_weeks(self):
+        """全部周编号（最新的在前）"""
+        weeks = {p.stem[len("week_"):] for p in self.weekly_dir.glob("week_*.json*") if not p.name.endswith('.tmp')}
+        return sorted(weeks, reverse=True)